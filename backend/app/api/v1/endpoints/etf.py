@@ -1,21 +1,29 @@
 from fastapi import APIRouter, HTTPException, Query, Request
-from typing import List, Dict, Optional
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Optional, Tuple
 import numpy as np
 import pandas as pd
+from contextlib import asynccontextmanager
 from datetime import datetime, time
 from zoneinfo import ZoneInfo
+import asyncio
 import logging
 import re
 
 from app.core.cache import etf_cache
 from app.services.akshare_service import ak_service
 from app.services.valuation_service import valuation_service
-from app.services.etf_classifier import ETFClassifier
+from app.services.etf_classifier import etf_classifier
 from app.services.trend_cache_service import trend_cache_service
 from app.services.temperature_cache_service import temperature_cache_service
 from app.services.grid_service import calculate_grid_params_cached
 from app.services.fund_flow_cache_service import fund_flow_cache_service
 from app.services.metrics_service import calculate_period_metrics
+from app.services.indicator_engine import compute_indicators
+from app.services.panel_service import panel_service
+from app.services.quote_stream import quote_stream_hub, HEARTBEAT_FRAME
+from app.core.config import settings
+from app.core.executors import api_executor, ExecutorBusyError
 from app.core.config_loader import metric_config
 from app.middleware.rate_limit import limiter
 
@@ -71,7 +79,7 @@ async def get_popular_tags():
     return POPULAR_TAGS
 
 @router.get("/search", response_model=List[Dict])
-@limiter.limit("30/minute")
+@limiter.limit("120/minute")
 async def search_etf(
     request: Request,
     q: Optional[str] = Query(None, min_length=1, description="ETF代码或名称关键字"),
@@ -84,6 +92,43 @@ async def search_etf(
         return etf_cache.search(q)
     return []
 
+# 标签浏览排序字段
+BROWSE_SORT_FIELDS = {"volume", "change_pct", "price"}
+
+
+def _split_tags(value: Optional[str]) -> List[str]:
+    return [t.strip() for t in value.split(",") if t.strip()] if value else []
+
+
+@router.get("/browse")
+@limiter.limit("120/minute")
+async def browse_etf(
+    request: Request,
+    tags: Optional[str] = Query(None, max_length=200, description="逗号分隔，须全部命中（AND）"),
+    any_tags: Optional[str] = Query(None, max_length=200, description="逗号分隔，命中其一即可（OR）"),
+    exclude: Optional[str] = Query(None, max_length=200, description="逗号分隔，排除带有这些标签的 ETF（NOT）"),
+    group: Optional[str] = Query(None, max_length=20, description="仅包含带有该 group 标签的 ETF"),
+    sort: Optional[str] = Query(None, description="排序字段：volume / change_pct / price"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+):
+    """
+    按多标签组合浏览 ETF（分页、排序，并返回命中集合内各标签数量用于分面）
+    """
+    if sort is not None and sort not in BROWSE_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"不支持的排序字段: {sort}")
+    return etf_cache.browse(
+        all_tags=_split_tags(tags),
+        any_tags=_split_tags(any_tags),
+        exclude_tags=_split_tags(exclude),
+        group=group,
+        sort_by=sort,
+        descending=order == "desc",
+        offset=offset,
+        limit=limit,
+    )
+
 @router.get("/batch-price")
 @limiter.limit("120/minute")
 async def get_batch_price(
@@ -101,17 +146,7 @@ async def get_batch_price(
     if not code_list:
         raise HTTPException(status_code=400, detail="无有效的 ETF 代码（需为6位数字）")
 
-    items = []
-    for code in code_list:
-        info = etf_cache.etf_map.get(code)
-        if info:
-            items.append({
-                "code": info.get("code", code),
-                "name": info.get("name", ""),
-                "price": info.get("price", 0),
-                "change_pct": info.get("change_pct", 0),
-                "tags": info.get("tags", []),
-            })
+    items = etf_cache.get_quotes(code_list)
 
     # 添加更新时间（中国时区），确保前端显示一致
     update_time = datetime.fromtimestamp(
@@ -126,12 +161,182 @@ async def get_batch_price(
     }
 
 
+@router.get("/changes")
+@limiter.limit("120/minute")
+async def get_etf_changes(
+    request: Request,
+    since: int = Query(0, ge=0, description="上次拿到的 seq，首次传 0"),
+):
+    """
+    增量获取行情变化（仅从内存缓存读取）
+
+    返回 since 之后报价或信息变化的 ETF 与被移除的代码；full=true 表示序号已过期
+    （或服务已重启），客户端应重新全量拉取后以返回的 seq 继续。
+    """
+    changes = etf_cache.changes.changes_since(since)
+    return {
+        "seq": changes["seq"],
+        "full": changes["full"],
+        "items": etf_cache.get_quotes(changes["codes"]),
+        "removed": changes["removed"],
+    }
+
+
+async def _quote_event_stream(request: Request, code_list: List[str]):
+    """推送连接的事件流：先发快照，之后发增量帧，空闲时发心跳"""
+    subscription = quote_stream_hub.subscribe(code_list)
+    try:
+        yield quote_stream_hub.snapshot_frame(code_list)
+        while not await request.is_disconnected():
+            frame = await subscription.next_frame(settings.QUOTE_STREAM_HEARTBEAT)
+            yield frame if frame is not None else HEARTBEAT_FRAME
+    finally:
+        quote_stream_hub.unsubscribe(subscription)
+
+
+@router.get("/stream")
+@limiter.limit("30/minute")
+async def stream_quotes(
+    request: Request,
+    codes: str = Query(..., description="逗号分隔的 ETF 代码列表，如 510300,510500"),
+):
+    """
+    实时行情推送（Server-Sent Events）
+
+    连接建立后先推送 snapshot 事件（订阅代码的当前行情），此后每次行情刷新
+    推送变化代码的 quote 事件、被移除代码的 removed 事件；收到 resync 事件时
+    客户端应重新建立连接。事件 id 为变更流序号，可配合 /etf/changes 补齐断线期间的变化。
+    """
+    ETF_CODE_RE = re.compile(r"^\d{6}$")
+    code_list = list(dict.fromkeys(c.strip() for c in codes.split(",") if c.strip()))
+    if not code_list or len(code_list) > settings.QUOTE_STREAM_MAX_CODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"codes 参数无效或超过 {settings.QUOTE_STREAM_MAX_CODES} 个",
+        )
+    code_list = [c for c in code_list if ETF_CODE_RE.match(c)]
+    if not code_list:
+        raise HTTPException(status_code=400, detail="无有效的 ETF 代码（需为6位数字）")
+
+    return StreamingResponse(
+        _quote_event_stream(request, code_list),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# 温度热力图单次最多 ETF 数
+HEATMAP_MAX_CODES = 100
+
+
+# 温度热力图同时读取历史行情的 ETF 数
+HEATMAP_FETCH_CONCURRENCY = 10
+
+
+async def _load_heatmap_frames(code_list: List[str]) -> Dict[str, pd.DataFrame]:
+    """经 IO 池并发读取多只 ETF 的历史行情（含实时价格点），读取失败的跳过"""
+    semaphore = asyncio.Semaphore(HEATMAP_FETCH_CONCURRENCY)
+
+    async def load(code: str) -> Optional[pd.DataFrame]:
+        async with semaphore:
+            try:
+                return await api_executor.run_io(ak_service.get_etf_history_frame, code, "daily", "qfq")
+            except Exception as e:
+                logger.warning(f"Heatmap: failed to load history for {code}: {e}")
+                return None
+
+    results = await asyncio.gather(*(load(code) for code in code_list))
+    return {
+        code: df
+        for code, df in zip(code_list, results)
+        if df is not None and not df.empty
+    }
+
+
+@router.get("/temperature-heatmap")
+@limiter.limit("10/minute")
+async def get_temperature_heatmap(
+    request: Request,
+    codes: Optional[str] = Query(None, description="逗号分隔的 ETF 代码列表，最多 100 个"),
+    tag: Optional[str] = Query(None, min_length=1, max_length=20, description="按标签选取 ETF"),
+):
+    """
+    多只 ETF 的市场温度热力图
+
+    温度与日线均线排列由 panel_service 对全部 ETF 一次矩阵计算。
+    codes 与 tag 二选一，codes 优先。
+    """
+    ETF_CODE_RE = re.compile(r"^\d{6}$")
+    if codes:
+        code_list = [c.strip() for c in codes.split(",") if c.strip()]
+        if not code_list or len(code_list) > HEATMAP_MAX_CODES:
+            raise HTTPException(status_code=400, detail=f"codes 参数无效或超过 {HEATMAP_MAX_CODES} 个")
+        code_list = list(dict.fromkeys(c for c in code_list if ETF_CODE_RE.match(c)))
+        if not code_list:
+            raise HTTPException(status_code=400, detail="无有效的 ETF 代码（需为6位数字）")
+    elif tag:
+        code_list = [item["code"] for item in etf_cache.filter_by_tag(tag, limit=HEATMAP_MAX_CODES)]
+    else:
+        raise HTTPException(status_code=400, detail="需要提供 codes 或 tag 参数")
+
+    async with _endpoint_slot("temperature-heatmap"):
+        frames = await _load_heatmap_frames(code_list)
+        computed = await api_executor.run_compute(panel_service.compute, frames)
+
+    items = []
+    missing = []
+    for code in code_list:
+        result = computed.get(code)
+        temperature = result["temperature"] if result else None
+        if temperature is None:
+            missing.append(code)
+            continue
+        info = etf_cache.get_etf_info(code) or {}
+        daily_trend = result["daily_trend"] or {}
+        items.append({
+            "code": code,
+            "name": info.get("name", ""),
+            "change_pct": info.get("change_pct"),
+            "score": temperature["score"],
+            "level": temperature["level"],
+            "ma_alignment": daily_trend.get("ma_alignment"),
+            "last_date": result["last_date"],
+        })
+
+    return {
+        "items": items,
+        "missing": missing,
+    }
+
+
+# 各接口并发上限（未列出的取 API_ENDPOINT_CONCURRENCY）
+ENDPOINT_CONCURRENCY = {
+    "info": 16,
+    "history": 8,
+    "metrics": 4,
+    "grid-suggestion": 4,
+    "fund-flow": 8,
+    "temperature-heatmap": 2,
+}
+
+
+@asynccontextmanager
+async def _endpoint_slot(endpoint: str):
+    """占用接口并发名额，排队已满时返回 503"""
+    try:
+        async with api_executor.slot(endpoint, ENDPOINT_CONCURRENCY.get(endpoint)):
+            yield
+    except ExecutorBusyError:
+        raise HTTPException(status_code=503, detail="服务繁忙，请稍后重试")
+
+
 @router.get("/{code}/info")
 async def get_etf_info(code: str):
     """
     获取 ETF 实时基础信息
     """
-    info = ak_service.get_etf_info(code)
+    async with _endpoint_slot("info"):
+        info = await api_executor.run_io(ak_service.get_etf_info, code)
     if not info:
         raise HTTPException(status_code=404, detail="ETF not found")
     
@@ -151,8 +356,7 @@ async def get_etf_info(code: str):
     # 补充 tags（优先从缓存读取，缓存无则实时分类）
     info["tags"] = info.get("tags", [])
     if not info["tags"]:
-        classifier = ETFClassifier()
-        tags = classifier.classify(info.get("name", ""), code)
+        tags = etf_classifier.classify(info.get("name", ""), code)
         info["tags"] = [t.to_dict() for t in tags]
 
     return info
@@ -162,32 +366,44 @@ async def get_etf_history(code: str, period: str = "daily", adjust: str = "qfq")
     """
     获取 ETF 历史行情 (包含实时点拼接)
     """
-    data = ak_service.get_etf_history(code, period, adjust)
+    async with _endpoint_slot("history"):
+        data = await api_executor.run_io(ak_service.get_etf_history, code, period, adjust)
     if not data:
         raise HTTPException(status_code=404, detail="History data not found")
     return data
 
-@router.get("/{code}/metrics")
-async def get_etf_metrics(code: str, period: str = "5y", force_refresh: bool = False):
+def _history_freshness(code: str) -> Dict:
+    """本地历史数据年龄（stale-while-revalidate 下可能返回过期数据）"""
+    age = ak_service.get_history_age(code, period="daily", adjust="qfq")
+    if age is None:
+        return {"data_age_seconds": None, "is_stale": False}
+    return {
+        "data_age_seconds": int(age),
+        "is_stale": age > settings.HISTORY_CACHE_TTL,
+    }
+
+def _load_metrics_frame(code: str) -> Tuple[pd.DataFrame, Dict]:
+    """读取指标计算所需的历史数据（日线前复权，按日期索引升序）与数据年龄"""
+    df = ak_service.get_etf_history_frame(code, period="daily", adjust="qfq")
+    if not df.empty:
+        df["date"] = pd.to_datetime(df["date"])
+        df = df.set_index("date").sort_index()
+    return df, _history_freshness(code)
+
+def _price_metrics(df: pd.DataFrame, period: str) -> Optional[Dict]:
     """
-    计算核心指标: CAGR, MaxDrawdown, Volatility
-    默认基于 daily, qfq 数据
-    
+    基于价格序列的指标：区间 CAGR / 回撤 / 波动率、ATR、N 日高点回撤
+
+    纯函数（仅依赖参数与 metric_config），可在进程池中执行。
+
     Args:
-        code: ETF 代码
+        df: 按日期索引升序的全量历史数据
         period: 计算周期 (1y, 3y, 5y, all)
-        force_refresh: 强制刷新缓存
+
+    Returns:
+        指标字典；区间只有 1 个数据点时带 single_point=True；区间无数据时返回 None
     """
-    # 1. 获取全量历史数据
-    history = ak_service.get_etf_history(code, period="daily", adjust="qfq")
-    if not history:
-        raise HTTPException(status_code=404, detail="Data not found for metrics")
-    
-    df = pd.DataFrame(history)
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.set_index("date").sort_index()
-    
-    # 2. 根据 period 筛选数据
+    # 根据 period 筛选数据
     end_date = df.index[-1]
     
     if period == "1y":
@@ -209,11 +425,12 @@ async def get_etf_metrics(code: str, period: str = "5y", force_refresh: bool = F
     # 边界情况处理：数据点不足
     if len(df_period) < 2:
         if df_period.empty:
-            raise HTTPException(status_code=404, detail="Not enough data for metrics")
+            return None
         
         # 如果只有1个数据点，返回零值指标，避免前端崩溃
         single_date = df_period.index[0].strftime("%Y-%m-%d")
         return {
+            "single_point": True,
             "period": f"{single_date} to {single_date}",
             "total_return": 0.0,
             "cagr": 0.0,
@@ -227,18 +444,9 @@ async def get_etf_metrics(code: str, period: str = "5y", force_refresh: bool = F
             "risk_level": "Low"
         }
 
-    # 3. 计算核心指标（复用纯函数）
+    # 计算核心指标（复用纯函数）
     closes = df_period["close"]
     period_metrics = calculate_period_metrics(closes)
-    
-    # 获取估值数据 (非阻塞或独立获取，不因估值失败影响指标)
-    # 此功能暂时关闭，如需开启请参考 AGENTS.md
-    valuation_data = None
-    # try:
-    #     valuation_data = valuation_service.get_valuation(code)
-    # except Exception as e:
-    #     # log but don't fail
-    #     pass
 
     # --- New Metrics Calculation (ATR & Current Drawdown) ---
     atr_val = None
@@ -248,27 +456,11 @@ async def get_etf_metrics(code: str, period: str = "5y", force_refresh: bool = F
     effective_drawdown_days = 0
     
     # ATR Calculation
-    atr_period = metric_config.atr_period
     # Need enough data for rolling window
+    atr_period = metric_config.atr_period
     if len(df) > atr_period + 1:
-        # Calculate True Range (TR)
-        # TR = Max(High-Low, |High-PrevClose|, |Low-PrevClose|)
-        # We need to shift close to get PrevClose
-        prev_close = df["close"].shift(1)
-        high = df["high"]
-        low = df["low"]
-        close = df["close"]
-        
-        tr1 = high - low
-        tr2 = (high - prev_close).abs()
-        tr3 = (low - prev_close).abs()
-        
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        # Simple Moving Average for ATR
-        atr_series = tr.rolling(window=atr_period).mean()
-        # Get the latest ATR (from the last row)
-        if not pd.isna(atr_series.iloc[-1]):
-             atr_val = float(atr_series.iloc[-1])
+        # TR = Max(High-Low, |High-PrevClose|, |Low-PrevClose|), ATR = SMA(TR)
+        atr_val = compute_indicators(df, atr_period=atr_period).last_atr()
 
     # Drawdown from N-day Peak (Configurable)
     # 峰值计算：历史收盘价窗口 + 当天实时价
@@ -330,13 +522,29 @@ async def get_etf_metrics(code: str, period: str = "5y", force_refresh: bool = F
         else:
             current_drawdown = 0.0
 
-    # --- Trend and Temperature Analysis ---
+    return {
+        "period": f"{df_period.index[0].date()} to {df_period.index[-1].date()}",
+        **period_metrics,
+        "atr": round(atr_val, 4) if atr_val is not None else None,
+        "current_drawdown": round(current_drawdown, 4) if current_drawdown is not None else None,
+        "drawdown_days": dd_days,
+        "effective_drawdown_days": effective_drawdown_days,
+        "current_drawdown_peak_date": current_drawdown_peak_date,
+        "days_since_peak": days_since_peak,
+    }
+
+def _trend_metrics(code: str, df: pd.DataFrame, force_refresh: bool) -> Dict:
+    """日 / 周趋势与市场温度（经由带缓存的服务，需在本进程内计算）"""
+    # 全量历史的衍生序列只转换一次，日趋势 / 温度共享（按需惰性计算）
+    indicators = compute_indicators(df, atr_period=metric_config.atr_period)
+
     # 准备用于趋势分析的 DataFrame（需要 date 和 close 列）
     df_for_trend = df.reset_index()  # 将 date 从索引恢复为列
     
     # 日趋势分析（使用缓存服务）
     daily_trend = trend_cache_service.get_daily_trend(
-        code, df_for_trend, realtime_price=None, force_refresh=force_refresh
+        code, df_for_trend, realtime_price=None, force_refresh=force_refresh,
+        indicators=indicators,
     )
     
     # 周趋势分析（使用缓存服务）
@@ -346,25 +554,64 @@ async def get_etf_metrics(code: str, period: str = "5y", force_refresh: bool = F
     
     # 市场温度计算（使用缓存服务）
     temperature = temperature_cache_service.calculate_temperature(
-        code, df_for_trend, realtime_price=None, force_refresh=force_refresh
+        code, df_for_trend, realtime_price=None, force_refresh=force_refresh,
+        indicators=indicators,
     )
-
     return {
-        "period": f"{df_period.index[0].date()} to {df_period.index[-1].date()}",
-        **period_metrics,
-        "valuation": valuation_data,
-        "atr": round(atr_val, 4) if atr_val is not None else None,
-        "current_drawdown": round(current_drawdown, 4) if current_drawdown is not None else None,
-        "drawdown_days": dd_days,
-        "effective_drawdown_days": effective_drawdown_days,
-        "current_drawdown_peak_date": current_drawdown_peak_date,
-        "days_since_peak": days_since_peak,
         "daily_trend": daily_trend,
         "weekly_trend": weekly_trend,
-        "temperature": temperature
+        "temperature": temperature,
+    }
+
+@router.get("/{code}/metrics")
+async def get_etf_metrics(code: str, period: str = "5y", force_refresh: bool = False):
+    """
+    计算核心指标: CAGR, MaxDrawdown, Volatility
+    默认基于 daily, qfq 数据
+    
+    Args:
+        code: ETF 代码
+        period: 计算周期 (1y, 3y, 5y, all)
+        force_refresh: 强制刷新缓存
+    """
+    async with _endpoint_slot("metrics"):
+        # 1. 获取全量历史数据（直接取 DataFrame，避免 list[dict] 往返）
+        df, freshness = await api_executor.run_io(_load_metrics_frame, code)
+        if df.empty:
+            raise HTTPException(status_code=404, detail="Data not found for metrics")
+
+        # 2. 价格指标（纯计算，可在进程池中执行）
+        price_metrics = await api_executor.run_process(_price_metrics, df, period)
+        if price_metrics is None:
+            raise HTTPException(status_code=404, detail="Not enough data for metrics")
+        if price_metrics.pop("single_point", False):
+            return price_metrics
+
+        # 3. 趋势与温度（带缓存的服务）
+        trend_metrics = await api_executor.run_compute(_trend_metrics, code, df, force_refresh)
+    
+    # 获取估值数据 (非阻塞或独立获取，不因估值失败影响指标)
+    # 此功能暂时关闭，如需开启请参考 AGENTS.md
+    valuation_data = None
+    # try:
+    #     valuation_data = valuation_service.get_valuation(code)
+    # except Exception as e:
+    #     # log but don't fail
+    #     pass
+
+    return {
+        **price_metrics,
+        "valuation": valuation_data,
+        **trend_metrics,
+        **freshness,
     }
 
 
+def _load_grid_suggestion(code: str, force_refresh: bool) -> Tuple[Dict, Dict]:
+    """网格参数与其所依据的历史数据年龄（而非网格的计算时间）"""
+    return calculate_grid_params_cached(code, force_refresh=force_refresh), _history_freshness(code)
+
+
 @router.get("/{code}/grid-suggestion")
 async def get_grid_suggestion(code: str, force_refresh: bool = False):
     """
@@ -382,8 +629,11 @@ async def get_grid_suggestion(code: str, force_refresh: bool = False):
     import time
     start_time = time.time()
     
-    # 使用缓存版本的计算函数
-    result = calculate_grid_params_cached(code, force_refresh=force_refresh)
+    # 使用缓存版本的计算函数（缓存未命中时以拉取历史数据为主，放在 IO 线程池）
+    async with _endpoint_slot("grid-suggestion"):
+        result, freshness = await api_executor.run_io(
+            _load_grid_suggestion, code, force_refresh
+        )
     
     elapsed = time.time() - start_time
     is_cached = elapsed < 0.1  # 如果响应时间小于 100ms，认为是缓存命中
@@ -396,13 +646,19 @@ async def get_grid_suggestion(code: str, force_refresh: bool = False):
     if not result:
         raise HTTPException(status_code=400, detail="Insufficient data for grid calculation")
 
-    return result
+    return {
+        **result,
+        **freshness,
+    }
 
 
 @router.get("/{code}/fund-flow")
 async def get_fund_flow(code: str, force_refresh: bool = False):
     """获取 ETF 资金流向数据（份额规模、排名）"""
-    result = fund_flow_cache_service.get_fund_flow(code, force_refresh=force_refresh)
+    async with _endpoint_slot("fund-flow"):
+        result = await api_executor.run_io(
+            fund_flow_cache_service.get_fund_flow, code, force_refresh=force_refresh
+        )
     if not result:
         raise HTTPException(
             status_code=404,
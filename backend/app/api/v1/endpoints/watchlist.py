@@ -12,6 +12,7 @@ from app.api.v1.endpoints.auth import get_current_user
 from app.models.user import User, Watchlist
 from app.services.akshare_service import ak_service
 from app.services.metrics_service import metrics_service
+from app.services.metrics_snapshot_service import metrics_snapshot_service
 from app.services.trend_service import trend_service
 from app.services.temperature_service import temperature_service
 
@@ -40,24 +41,33 @@ def process_watchlist_item(item: Watchlist) -> Dict[str, Any]:
     temperature_level = None
     
     try:
-        # 获取历史数据（复用缓存）
-        history = ak_service.get_etf_history(item.etf_code, period="daily", adjust="qfq")
-        if history and len(history) > 0:
-            df = pd.DataFrame(history)
-            df["date"] = pd.to_datetime(df["date"])
-            df = df.sort_values("date")
-            
-            # 计算周趋势
-            weekly_trend = trend_service.get_weekly_trend(df)
-            if weekly_trend:
-                weekly_direction = weekly_trend.get("direction")
-                consecutive_weeks = weekly_trend.get("consecutive_weeks")
-            
-            # 计算温度
-            temperature = temperature_service.calculate_temperature(df)
-            if temperature:
-                temperature_score = temperature.get("score")
-                temperature_level = temperature.get("level")
+        # 收盘后优先使用当日指标快照（由收盘告警检查 / 每日摘要写入）
+        snapshot = metrics_snapshot_service.get(item.etf_code, require_data_date=True)
+        if snapshot is not None:
+            weekly_trend = snapshot.get("weekly_trend")
+            temperature = snapshot.get("temperature")
+        else:
+            weekly_trend = None
+            temperature = None
+            # 获取历史数据（复用缓存）
+            history = ak_service.get_etf_history(item.etf_code, period="daily", adjust="qfq")
+            if history and len(history) > 0:
+                df = pd.DataFrame(history)
+                df["date"] = pd.to_datetime(df["date"])
+                df = df.sort_values("date")
+
+                # 计算周趋势
+                weekly_trend = trend_service.get_weekly_trend(df)
+
+                # 计算温度
+                temperature = temperature_service.calculate_temperature(df)
+
+        if weekly_trend:
+            weekly_direction = weekly_trend.get("direction")
+            consecutive_weeks = weekly_trend.get("consecutive_weeks")
+        if temperature:
+            temperature_score = temperature.get("score")
+            temperature_level = temperature.get("level")
     except Exception as e:
         # 趋势和温度计算失败不影响主流程
         pass
@@ -1,99 +1,177 @@
+import threading
 import time
 from typing import List, Dict, Optional
 import logging
 
+from app.core.change_feed import ChangeFeed
+from app.core.quote_table import EMPTY_QUOTE_TABLE, QuoteTable
+
 logger = logging.getLogger(__name__)
 
 class ETFCacheManager:
     def __init__(self):
-        # 存储全量 ETF 列表 [{"code": "510300", "name": "沪深300ETF", ...}]
-        self.etf_list: List[Dict] = []
-        
-        # 简单的哈希映射用于快速查找信息
-        self.etf_map: Dict[str, Dict] = {}
+        # 全量 ETF 行情的列式快照（见 QuoteTable）；只读，每次更新都构建新表整体替换
+        self._table: QuoteTable = EMPTY_QUOTE_TABLE
+        # 写方互斥（set_etf_list / update_etf_info 基于当前表构建并替换）
+        self._write_lock = threading.Lock()
         
         self.last_updated: float = 0
+        # 当前快照是否来自在线数据源的成功刷新（磁盘缓存 / 兜底数据中的价格可能已过时）
+        self.is_live: bool = False
         # 缓存有效期 (秒) - 搜索列表和基础行情
         self.ttl = 60 
 
-    def set_etf_list(self, data: List[Dict]):
-        """更新 ETF 列表缓存"""
-        self.etf_list = data
-        # 建立 code -> info 映射，方便 O(1) 查找
-        # 注意：etf_map 的 value 与 etf_list 的 item 是同一对象引用，
-        # update_etf_info 的 merge 语义依赖此 identity 保证 list/map 同步更新。
-        self.etf_map = {item["code"]: item for item in data}
+        # 行情变更流：每次刷新发布变化的代码（到价提醒索引、客户端增量拉取）
+        self.changes = ChangeFeed()
+
+    def snapshot(self) -> QuoteTable:
+        """当前行情快照（读方应只取一次并在其上完成整个请求）"""
+        return self._table
+
+    def set_etf_list(self, data: List[Dict], live: bool = False):
+        """
+        更新 ETF 列表缓存（增量）
+
+        与当前快照逐行比较：只有报价变化时以新数值列构建共享结构的新快照；代码集合、名称或标签
+        变化时全量构建新快照。两种情况都一次替换，并向 changes 发布变化的代码。
+
+        Args:
+            data: 全量 ETF 行情
+            live: 数据是否来自在线数据源的成功刷新（磁盘缓存 / 兜底数据为 False），随事件发布
+        """
+        table: Optional[QuoteTable] = None
+        with self._write_lock:
+            current = self._table
+            delta = current.diff_numeric(data) if len(current) else None
+            if delta is not None:
+                rows, columns = delta
+                # 新数值列构建新表一次替换，读方持有的旧表不变
+                self._table = current.with_numeric(columns)
+                changed, removed = [current.codes[i] for i in rows], []
+            else:
+                table = QuoteTable.from_records(data)
+                # 预先构建搜索索引与标签倒排，避免首个请求承担构建开销
+                table.search_index
+                table.tag_matrix
+                self._table = table
+                changed, removed = current.changed_codes(table)
         self.last_updated = time.time()
-        logger.info(f"Cache updated with {len(data)} ETFs at {self.last_updated}")
+        self.is_live = live
+        if table is None:
+            logger.info(f"Cache refreshed: {len(changed)} of {len(current)} ETFs changed at {self.last_updated}")
+        else:
+            logger.info(f"Cache updated with {len(table)} ETFs at {self.last_updated}")
+
+        self.changes.publish(changed, removed, full=table is not None, live=live)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._write_lock:
+            removed = self._table.codes
+            self._table = EMPTY_QUOTE_TABLE
+        self.last_updated = 0
+        self.is_live = False
+        if removed:
+            self.changes.publish([], removed, full=True)
+
+    @property
+    def etf_list(self) -> List[Dict]:
+        """全量列表视图（每次物化新字典，修改不影响缓存）"""
+        return self._table.rows()
+
+    @property
+    def etf_map(self) -> Dict[str, Dict]:
+        """code -> info 视图（每次物化新字典，修改不影响缓存）"""
+        table = self._table
+        return {code: table.row(i) for i, code in enumerate(table.codes)}
 
     def get_etf_list(self) -> List[Dict]:
         return self.etf_list
 
     def get_etf_info(self, code: str) -> Optional[Dict]:
-        """获取单个 ETF 的最新缓存信息"""
-        return self.etf_map.get(code)
+        """获取单个 ETF 的最新缓存信息（副本）"""
+        table = self._table
+        row = table.position(code)
+        return table.row(row) if row is not None else None
+
+    def get_quotes(self, codes: List[str]) -> List[Dict]:
+        """
+        批量获取轻量行情（code / name / price / change_pct / tags）
+
+        Args:
+            codes: ETF 代码列表（未知代码跳过，重复代码保留）
+
+        Returns:
+            按 codes 顺序的行情列表，缺失价格按 0 返回
+        """
+        return self._table.quotes(codes)
 
     def update_etf_info(self, info: Dict):
         """Manually update/insert an ETF info (e.g. from client sync)"""
         code = info.get("code")
         if not code:
             return
-        
-        # Update map (merge 语义，保留已有字段如 tags)
-        existing = self.etf_map.get(code)
-        if existing:
-            existing.update(info)
-        else:
-            self.etf_map[code] = info
-
-        # Update list (同样 merge 语义)
-        found = False
-        for i, item in enumerate(self.etf_list):
-            if item["code"] == code:
-                item.update(info)
-                found = True
-                break
-        if not found:
-            self.etf_list.append(info)
+
+        # merge 语义，保留已有字段如 tags；始终写时复制出新表一次替换（已有代码只复制数值列，
+        # 新代码或名称、标签变化时全量重建）
+        with self._write_lock:
+            table = self._table
+            row = table.position(code)
+            updated = table.with_row_update(row, info) if row is not None else None
+            self._table = updated if updated is not None else table.with_record(info)
+        self.changes.publish([code])
 
     def filter_by_tag(self, tag_label: str, limit: int = 50) -> List[Dict]:
         """按标签筛选 ETF"""
-        results = []
-        for item in self.etf_list:
-            for t in item.get("tags", []):
-                if t.get("label") == tag_label:
-                    results.append(item)
-                    break
-            if len(results) >= limit:
-                break
-        return results
+        table = self._table
+        return table.rows(table.tag_positions(tag_label)[:limit])
+
+    def browse(
+        self,
+        all_tags: Optional[List[str]] = None,
+        any_tags: Optional[List[str]] = None,
+        exclude_tags: Optional[List[str]] = None,
+        group: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = True,
+        offset: int = 0,
+        limit: int = 50,
+    ) -> Dict:
+        """
+        按多标签组合浏览 ETF（分页、排序、分面计数）
+
+        Args:
+            all_tags: 必须全部带有的标签（AND）
+            any_tags: 至少带有其一的标签（OR）
+            exclude_tags: 不能带有的标签（NOT）
+            group: 必须带有该 group 下的标签
+            sort_by: price / change_pct / volume，None 时按列表顺序
+            descending: 是否降序
+            offset: 分页偏移
+            limit: 每页数量
+
+        Returns:
+            {"total", "items", "facets"}，facets 为命中集合内各标签的数量
+        """
+        table = self._table
+        mask = table.select(all_tags or (), any_tags or (), exclude_tags or (), group)
+        positions = table.order(mask, sort_by, descending)
+        return {
+            "total": len(positions),
+            "items": table.rows(positions[offset:offset + limit]),
+            "facets": table.facets(mask),
+        }
 
     def search(self, query: str, limit: int = 20) -> List[Dict]:
-        """内存搜索：匹配代码或名称"""
+        """内存搜索：匹配代码前缀、名称或拼音首字母，按相关度排序"""
         if not query:
             return []
-        
-        query = query.lower()
-        results = []
-        # 优先匹配代码
-        for item in self.etf_list:
-            if item["code"].startswith(query):
-                results.append(item)
-                if len(results) >= limit:
-                    return results
-        
-        # 其次匹配名称
-        if len(results) < limit:
-            for item in self.etf_list:
-                if item not in results and query in item["name"].lower():
-                    results.append(item)
-                    if len(results) >= limit:
-                        break
-        return results
+        table = self._table
+        return table.rows(table.search_index.search(query, limit))
 
     @property
     def is_initialized(self) -> bool:
-        return len(self.etf_list) > 0
+        return len(self._table) > 0
 
     @property
     def is_stale(self) -> bool:
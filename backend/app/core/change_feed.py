@@ -0,0 +1,130 @@
+"""
+ChangeFeed - ETF 行情变更流
+
+每次行情刷新只发布发生变化的代码，附带单调递增的序号：
+- 进程内消费者（如到价提醒索引）通过 subscribe 在刷新线程中同步收到事件
+- 客户端记住上次的 seq，用 changes_since 拉取此后变化的代码；
+  序号过旧（事件已被淘汰）或来自上一个进程时返回 full=True，应改为全量拉取
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 保留的最近事件数（约 4 小时的 60 秒刷新）
+MAX_EVENTS = 256
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """一次行情变更"""
+    seq: int
+    timestamp: float
+    codes: Tuple[str, ...]     # 新增或数据变化的代码
+    removed: Tuple[str, ...]   # 从列表中移除的代码
+    full: bool = False         # 是否为全量替换（代码集合、名称或标签变化）
+    live: bool = False         # 报价是否来自在线数据源的成功刷新（而非磁盘缓存 / 兜底数据）
+
+
+ChangeListener = Callable[[ChangeEvent], None]
+
+
+class ChangeFeed:
+    """行情变更流（线程安全）"""
+
+    def __init__(self, max_events: int = MAX_EVENTS) -> None:
+        self._lock = threading.Lock()
+        self._events: Deque[ChangeEvent] = deque(maxlen=max_events)
+        self._seq = 0
+        self._listeners: List[ChangeListener] = []
+
+    @property
+    def seq(self) -> int:
+        """最新事件序号（0 表示尚无事件）"""
+        return self._seq
+
+    def subscribe(self, listener: ChangeListener) -> None:
+        """订阅变更事件（在发布线程中同步调用，应尽快返回）"""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def unsubscribe(self, listener: ChangeListener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def publish(
+        self,
+        codes: Iterable[str],
+        removed: Iterable[str] = (),
+        full: bool = False,
+        live: bool = False,
+    ) -> ChangeEvent:
+        """
+        发布一次变更并通知订阅者
+
+        Args:
+            codes: 新增或数据变化的代码
+            removed: 被移除的代码
+            full: 是否为全量替换
+            live: 报价是否来自在线数据源的成功刷新
+
+        Returns:
+            发布的事件
+        """
+        with self._lock:
+            self._seq += 1
+            event = ChangeEvent(
+                seq=self._seq,
+                timestamp=time.time(),
+                codes=tuple(codes),
+                removed=tuple(removed),
+                full=full,
+                live=live,
+            )
+            self._events.append(event)
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Change feed listener failed: {e}", exc_info=True)
+        return event
+
+    def changes_since(self, since: int) -> Dict:
+        """
+        汇总某序号之后的变化
+
+        Args:
+            since: 客户端上次看到的序号
+
+        Returns:
+            {"seq", "full", "codes", "removed"}；full=True 时 codes / removed 为空，调用方应全量拉取
+        """
+        with self._lock:
+            seq = self._seq
+            events = list(self._events)
+
+        oldest = events[0].seq if events else seq + 1
+        if since > seq or since < oldest - 1:
+            return {"seq": seq, "full": True, "codes": [], "removed": []}
+
+        changed: Dict[str, None] = {}
+        removed: Dict[str, None] = {}
+        for event in events:
+            if event.seq <= since:
+                continue
+            for code in event.codes:
+                removed.pop(code, None)
+                changed[code] = None
+            for code in event.removed:
+                changed.pop(code, None)
+                removed[code] = None
+        return {"seq": seq, "full": False, "codes": list(changed), "removed": list(removed)}
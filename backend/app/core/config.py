@@ -38,6 +38,10 @@ class Settings(BaseSettings):
     # 缓存配置
     CACHE_DIR: str = "./cache"
     CACHE_TTL: int = 3600
+    HISTORY_CACHE_TTL: int = 604800  # 历史行情列式存储新鲜期（7 天）
+    HISTORY_INCREMENTAL_OVERLAP_DAYS: int = 20  # 增量更新回溯的重叠自然日数（用于检测复权变化）
+    HISTORY_STALE_WHILE_REVALIDATE: bool = True  # 过期历史先返回旧数据，后台刷新
+    MEMORY_CACHE_MAX_BYTES: int = 128 * 1024 * 1024  # 进程内 LRU 缓存字节上限
     
     # 速率限制配置
     ENABLE_RATE_LIMIT: bool = False
@@ -48,6 +52,42 @@ class Settings(BaseSettings):
     CIRCUIT_BREAKER_THRESHOLD: float = 0.1
     CIRCUIT_BREAKER_WINDOW: int = 10
     CIRCUIT_BREAKER_COOLDOWN: int = 300
+    HISTORY_HEDGE_ENABLED: bool = True  # 主数据源超过其 p90 延迟未返回时并行请求下一个源
+    HISTORY_HEDGE_MIN_DELAY: float = 0.5  # 对冲等待下限（秒），避免延迟样本偏小时过早并发
+    HISTORY_HEDGE_DEFAULT_DELAY: float = 3.0  # 延迟样本不足时的对冲等待（秒）
+    HISTORY_HEDGE_WORKERS: int = 16  # 对冲请求线程数
+    SOURCE_ADAPTIVE_ORDER: bool = True  # 按近期成功率与延迟动态排序数据源（历史与实时列表）
+    SOURCE_MIN_SAMPLES: int = 5  # 参与排序打分所需的最少调用次数
+    SOURCE_EXPLORE_EVERY: int = 20  # 每多少次排序探索一次被降级的源，0 表示不探索
+    
+    # 告警调度配置
+    ALERT_FETCH_CONCURRENCY: int = 8  # 批量检查时并发拉取历史数据的 ETF 数
+    ALERT_FETCH_TIMEOUT: float = 60.0  # 单只 ETF 拉取超时（秒），超时跳过
+    ALERT_COMPUTE_PROCESSES: int = 0  # 指标计算进程数，0 表示在线程中计算
+    
+    # 通知发送配置
+    TELEGRAM_API_BASE_URL: str = "https://api.telegram.org/bot"
+    TELEGRAM_MAX_CONCURRENCY: int = 10  # 同时进行的发送数（也是每个 Bot 的连接池大小）
+    TELEGRAM_BOT_RATE: float = 25.0  # 每个 Bot 每秒最多发送条数（Telegram 限制约 30）
+    TELEGRAM_CHAT_INTERVAL: float = 1.0  # 同一会话相邻两条消息的最小间隔（秒）
+    TELEGRAM_MAX_RETRIES: int = 3  # 发送失败后的最大重试次数
+    TELEGRAM_RETRY_BACKOFF: float = 2.0  # 重试退避基数（秒），第 n 次重试等待 base * 2^(n-1)
+    
+    # 上游 HTTP 连接池配置
+    HTTP_POOL_MAXSIZE: int = 16  # 每个上游域名保持的最大连接数
+    HTTP_DEFAULT_TIMEOUT: float = 180.0  # 未单独配置的域名的读取超时（秒），海外服务器需较长
+    
+    # API 执行器配置
+    API_IO_WORKERS: int = 16  # 磁盘缓存 / 上游数据源调用线程数
+    API_COMPUTE_WORKERS: int = 4  # 指标计算线程数
+    API_COMPUTE_PROCESSES: int = 0  # 纯计算进程数，0 表示在计算线程中执行
+    API_ENDPOINT_CONCURRENCY: int = 8  # 单个接口默认的并发上限
+    API_ENDPOINT_QUEUE: int = 64  # 单个接口等待并发名额的请求上限，超过返回 503
+    
+    # 行情推送配置
+    QUOTE_STREAM_MAX_CODES: int = 200  # 单个推送连接最多订阅的 ETF 数
+    QUOTE_STREAM_HEARTBEAT: float = 15.0  # 无数据时发送心跳注释的间隔（秒）
+    QUOTE_STREAM_QUEUE_SIZE: int = 64  # 每个连接的待发送帧上限，积压超过时改发 resync
     
     model_config = SettingsConfigDict(
         env_file=".env",
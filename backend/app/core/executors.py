@@ -0,0 +1,273 @@
+"""
+ApiExecutor - API 请求中阻塞调用的执行器
+
+async 接口中的磁盘缓存读取、上游 HTTP、pandas 计算不能直接在事件循环中执行，
+否则一次慢请求会卡住所有接口（包括 /health）。这里提供显式的执行模型：
+- io：有界线程池，用于磁盘缓存与上游数据源调用
+- compute：有界线程池，用于依赖共享缓存的指标计算
+- process：纯函数的重计算；API_COMPUTE_PROCESSES > 0 时使用进程池，否则落在 compute 线程池
+- slot：按接口限制并发，超过排队上限时拒绝（ExecutorBusyError），并统计排队深度
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorBusyError(Exception):
+    """接口排队数已达上限"""
+
+    def __init__(self, endpoint: str) -> None:
+        super().__init__(f"Too many pending requests for {endpoint}")
+        self.endpoint = endpoint
+
+
+class _PoolStats:
+    """线程池计数：已提交未开始（排队）/ 执行中 / 已完成"""
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.lock = threading.Lock()
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+        }
+
+
+class _EndpointStats:
+    """单个接口的并发与排队统计"""
+
+    __slots__ = ("limit", "active", "waiting", "max_waiting", "rejected", "completed", "wait_seconds")
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.rejected = 0
+        self.completed = 0
+        self.wait_seconds = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "avg_wait_ms": round(self.wait_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
+
+class ApiExecutor:
+    """API 阻塞调用执行器（线程池按需创建）"""
+
+    def __init__(
+        self,
+        io_workers: Optional[int] = None,
+        compute_workers: Optional[int] = None,
+        compute_processes: Optional[int] = None,
+    ) -> None:
+        self._io_workers = io_workers or settings.API_IO_WORKERS
+        self._compute_workers = compute_workers or settings.API_COMPUTE_WORKERS
+        self._compute_processes = (
+            settings.API_COMPUTE_PROCESSES if compute_processes is None else compute_processes
+        )
+        self._lock = threading.Lock()
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._compute_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._pool_stats = {
+            "io": _PoolStats(self._io_workers),
+            "compute": _PoolStats(self._compute_workers),
+        }
+        self._endpoints: Dict[str, _EndpointStats] = {}
+        # 信号量绑定事件循环，循环变化（如测试中重建客户端）时重新创建
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 其他模块自建线程池的关闭回调（如历史数据对冲线程池），随 shutdown 一并关闭
+        self._shutdown_hooks: List[Callable[[], None]] = []
+
+    def _get_pool(self, kind: str) -> ThreadPoolExecutor:
+        with self._lock:
+            if kind == "io":
+                if self._io_pool is None:
+                    self._io_pool = ThreadPoolExecutor(self._io_workers, thread_name_prefix="api-io")
+                return self._io_pool
+            if self._compute_pool is None:
+                self._compute_pool = ThreadPoolExecutor(
+                    self._compute_workers, thread_name_prefix="api-compute"
+                )
+            return self._compute_pool
+
+    def _get_process_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self._compute_processes <= 0:
+            return None
+        with self._lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(max_workers=self._compute_processes)
+            return self._process_pool
+
+    async def _run_in_pool(self, kind: str, fn: Callable, *args, **kwargs) -> Any:
+        stats = self._pool_stats[kind]
+        # 排队计数只扣减一次：任务开始执行时，或调用方在任务开始前被取消 / 池已关闭时
+        dequeued = False
+
+        def dequeue() -> bool:
+            nonlocal dequeued
+            if dequeued:
+                return False
+            dequeued = True
+            stats.queued -= 1
+            return True
+
+        def call():
+            with stats.lock:
+                dequeue()
+                stats.running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with stats.lock:
+                    stats.running -= 1
+                    stats.completed += 1
+
+        pool = self._get_pool(kind)
+        with stats.lock:
+            stats.queued += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, call)
+        finally:
+            with stats.lock:
+                dequeue()
+
+    async def run_io(self, fn: Callable, *args, **kwargs) -> Any:
+        """在 IO 线程池中执行阻塞调用（磁盘缓存、上游 HTTP）"""
+        return await self._run_in_pool("io", fn, *args, **kwargs)
+
+    async def run_compute(self, fn: Callable, *args, **kwargs) -> Any:
+        """在计算线程池中执行（可访问进程内共享缓存的计算）"""
+        return await self._run_in_pool("compute", fn, *args, **kwargs)
+
+    async def run_process(self, fn: Callable, *args) -> Any:
+        """
+        执行无副作用的重计算
+
+        配置了 API_COMPUTE_PROCESSES 时在进程池中执行（fn 与参数须可 pickle），
+        否则或进程池损坏时在计算线程池中执行。
+        """
+        pool = self._get_process_pool()
+        if pool is None:
+            return await self.run_compute(fn, *args)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args))
+        except BrokenProcessPool as e:
+            logger.error(f"API process pool broken, computing in thread: {e}")
+            with self._lock:
+                self._process_pool = None
+            return await self.run_compute(fn, *args)
+
+    def _semaphore(self, endpoint: str, limit: int) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphores = {}
+        semaphore = self._semaphores.get(endpoint)
+        if semaphore is None:
+            semaphore = self._semaphores[endpoint] = asyncio.Semaphore(limit)
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self, endpoint: str, limit: Optional[int] = None) -> AsyncIterator[None]:
+        """
+        占用接口的一个并发名额
+
+        Args:
+            endpoint: 接口名
+            limit: 并发上限，默认取 API_ENDPOINT_CONCURRENCY
+
+        Raises:
+            ExecutorBusyError: 等待名额的请求数已达 API_ENDPOINT_QUEUE
+        """
+        limit = limit or settings.API_ENDPOINT_CONCURRENCY
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = _EndpointStats(limit)
+        semaphore = self._semaphore(endpoint, limit)
+
+        if semaphore.locked() and stats.waiting >= settings.API_ENDPOINT_QUEUE:
+            stats.rejected += 1
+            raise ExecutorBusyError(endpoint)
+
+        stats.waiting += 1
+        stats.max_waiting = max(stats.max_waiting, stats.waiting)
+        started = time.monotonic()
+        try:
+            await semaphore.acquire()
+        finally:
+            stats.waiting -= 1
+        stats.wait_seconds += time.monotonic() - started
+        stats.active += 1
+        try:
+            yield
+        finally:
+            stats.active -= 1
+            stats.completed += 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """线程池与各接口的并发 / 排队统计"""
+        return {
+            "pools": {kind: stats.to_dict() for kind, stats in self._pool_stats.items()},
+            "process_workers": self._compute_processes,
+            "endpoints": {name: stats.to_dict() for name, stats in self._endpoints.items()},
+        }
+
+    def register_shutdown(self, hook: Callable[[], None]) -> None:
+        """
+        注册关闭回调（重复注册同一回调只保留一次）
+
+        Args:
+            hook: 关闭自建线程池的回调；执行后即注销，线程池重建时应重新注册
+        """
+        with self._lock:
+            if hook not in self._shutdown_hooks:
+                self._shutdown_hooks.append(hook)
+
+    def shutdown(self) -> None:
+        """关闭全部池与已注册的线程池（不等待执行中的任务）"""
+        with self._lock:
+            pools: List[Executor] = [
+                pool for pool in (self._io_pool, self._compute_pool, self._process_pool) if pool
+            ]
+            self._io_pool = self._compute_pool = self._process_pool = None
+            hooks, self._shutdown_hooks = self._shutdown_hooks, []
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+        for hook in hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"Executor shutdown hook failed: {e}")
+
+
+# 全局单例
+api_executor = ApiExecutor()
@@ -0,0 +1,357 @@
+"""
+历史行情列式存储
+
+按 (code, period, adjust) 将日线行情落盘为单个 .npy 文件，替代 DiskCache
+中整表 pickle 的 DataFrame：
+- 文件内容为 0 维结构化数组，每个字段是一列 float64（字段名即列名），
+  字段依次排列，每一列在磁盘上连续，整体等价于 (列数, 行数) 的矩阵
+- 读取以 mmap 方式打开，按日期二分定位行区间，只触及所需切片的字节
+- 第 0 列为日期（距 1970-01-01 的天数），其后依次为 open/high/low/close/volume，
+  再后为上游返回的其他数值列（如成交额、换手率），原样保留列名
+- 旧版不带列名的 (6, 行数) 矩阵文件按固定列读取
+- 写入先落临时文件再 os.replace，读者不会看到半写状态
+- 文件 mtime 即数据拉取时间，用于判断新鲜度
+- 可选的进程内 LRU 缓存整表 DataFrame，以 (mtime, size) 校验、写入时失效
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.core.memory_cache import MemoryLRU, memory_cache
+
+logger = logging.getLogger(__name__)
+
+# 固定存储列（第 0 列固定为日期），上游返回的其他数值列追加在其后
+COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+
+
+def _to_days(values: pd.Series) -> np.ndarray:
+    """日期列（str / date / datetime）→ 距 1970-01-01 的天数"""
+    return pd.to_datetime(values).values.astype("datetime64[D]").astype(np.int64)
+
+
+def _date_to_day(value: str) -> int:
+    """单个日期（YYYY-MM-DD 或 YYYYMMDD）→ 天数"""
+    return int(np.datetime64(pd.Timestamp(value).date(), "D").astype(np.int64))
+
+
+def _extra_columns(df: pd.DataFrame) -> List[str]:
+    """固定列之外的数值列（布尔列除外）"""
+    return [
+        str(col) for col in df.columns
+        if str(col) not in COLUMNS
+        and pd.api.types.is_numeric_dtype(df[col])
+        and not pd.api.types.is_bool_dtype(df[col])
+    ]
+
+
+def _frame_to_matrix(df: pd.DataFrame) -> Tuple[List[str], np.ndarray]:
+    """DataFrame → (列名, (列数, 行数) 矩阵)，按日期升序、同日去重（保留最后一条）"""
+    names = COLUMNS + _extra_columns(df)
+    columns = {str(col): df[col] for col in df.columns}
+    days = _to_days(df["date"])
+    matrix = np.full((len(names), len(df)), np.nan, dtype=np.float64)
+    matrix[0] = days
+    for i, col in enumerate(names[1:], start=1):
+        if col in columns:
+            matrix[i] = pd.to_numeric(columns[col], errors="coerce").to_numpy(dtype=np.float64)
+
+    if matrix.shape[1] == 0:
+        return names, matrix
+    matrix = matrix[:, np.argsort(matrix[0], kind="stable")]
+    # 同一日期出现多次时保留最后一条
+    keep = np.append(matrix[0, 1:] != matrix[0, :-1], True)
+    return names, np.ascontiguousarray(matrix[:, keep])
+
+
+def _align(names: List[str], source_names: List[str], matrix: np.ndarray) -> np.ndarray:
+    """按 names 重排矩阵的行，source_names 中没有的列以 NaN 填充"""
+    if names == source_names:
+        return matrix
+    position = {name: i for i, name in enumerate(source_names)}
+    aligned = np.full((len(names), matrix.shape[1]), np.nan, dtype=np.float64)
+    for i, name in enumerate(names):
+        if name in position:
+            aligned[i] = matrix[position[name]]
+    return aligned
+
+
+def _pack(names: List[str], matrix: np.ndarray) -> np.ndarray:
+    """(列数, 行数) 矩阵 → 0 维结构化数组（字段名即列名，各列连续存放）"""
+    dtype = np.dtype([(name, np.float64, (matrix.shape[1],)) for name in names])
+    packed = np.zeros((), dtype=dtype)
+    for i, name in enumerate(names):
+        packed[name] = matrix[i]
+    return packed
+
+
+def _unpack(stored: np.ndarray) -> Optional[Tuple[List[str], np.ndarray]]:
+    """已加载（可为 mmap）的文件内容 → (列名, 矩阵视图)，格式不符时返回 None"""
+    if stored.dtype.names is None:
+        # 旧版文件：固定列的二维矩阵
+        if stored.ndim != 2 or stored.shape[0] != len(COLUMNS):
+            return None
+        return list(COLUMNS), stored
+    names = list(stored.dtype.names)
+    if stored.ndim != 0 or names[:len(COLUMNS)] != COLUMNS:
+        return None
+    # 各字段为等长 float64 列且依次排列，按 (列数, 行数) 视图读取，不复制 mmap
+    rows = stored.dtype.fields[names[0]][0].shape[0]
+    return names, np.frombuffer(stored, dtype=np.float64).reshape(len(names), rows)
+
+
+def _matrix_to_frame(names: List[str], matrix: np.ndarray) -> pd.DataFrame:
+    """矩阵 → DataFrame，date 列还原为 YYYY-MM-DD 字符串（与各数据源格式一致）"""
+    dates = matrix[0].astype(np.int64).astype("datetime64[D]").astype(str)
+    data = {"date": dates.astype(object)}
+    for i, col in enumerate(names[1:], start=1):
+        data[col] = matrix[i]
+    return pd.DataFrame(data, columns=names)
+
+
+def _bounds(
+    dates: np.ndarray,
+    start_date: Optional[str],
+    end_date: Optional[str],
+    tail: Optional[int],
+) -> Tuple[int, int]:
+    """按日期二分定位行区间 [lo, hi)"""
+    lo, hi = 0, dates.shape[0]
+    if start_date:
+        lo = int(np.searchsorted(dates, _date_to_day(start_date), side="left"))
+    if end_date:
+        hi = int(np.searchsorted(dates, _date_to_day(end_date), side="right"))
+    if tail is not None:
+        lo = max(lo, hi - tail)
+    return lo, max(lo, hi)
+
+
+class HistoryStore:
+    """历史行情列式存储（每个 code+period+adjust 一个 .npy 文件）"""
+
+    def __init__(self, root: str, memory: Optional[MemoryLRU] = None, ttl: Optional[int] = None) -> None:
+        """
+        Args:
+            memory: 进程内 LRU，为 None 时每次读取都走 mmap
+            ttl: 内存条目过期时间 = 文件 mtime + ttl（与存储新鲜期对齐）
+        """
+        self._root = root
+        self._write_lock = threading.Lock()
+        self._memory = memory
+        self._ttl = ttl
+
+    def _path(self, code: str, period: str, adjust: str) -> str:
+        return os.path.join(self._root, f"{code}_{period}_{adjust or 'none'}.npy")
+
+    @staticmethod
+    def _memory_key(code: str, period: str, adjust: str) -> Tuple[str, str, str, str]:
+        return ("history", code, period, adjust)
+
+    def _invalidate(self, code: str, period: str, adjust: str) -> None:
+        if self._memory is not None:
+            self._memory.delete(self._memory_key(code, period, adjust))
+
+    def _open(self, code: str, period: str, adjust: str) -> Optional[Tuple[List[str], np.ndarray]]:
+        """以 mmap 方式打开，返回 (列名, 矩阵)，不存在或损坏时返回 None"""
+        path = self._path(code, period, adjust)
+        if not os.path.exists(path):
+            return None
+        try:
+            opened = _unpack(np.load(path, mmap_mode="r"))
+        except (OSError, ValueError) as e:
+            logger.warning("History store file unreadable for %s: %s", code, e)
+            return None
+        if opened is None:
+            logger.warning("History store file has unexpected shape for %s", code)
+        return opened
+
+    # ==================== 写入 ====================
+
+    def write(
+        self,
+        code: str,
+        period: str,
+        adjust: str,
+        df: pd.DataFrame,
+        fetched_at: Optional[float] = None,
+    ) -> None:
+        """
+        整体写入某 ETF 的历史数据（原子替换）
+
+        Args:
+            df: 至少包含 date 列的 OHLCV DataFrame，缺失的固定列以 NaN 填充，其他数值列一并保存
+            fetched_at: 数据拉取时间戳，默认当前时间（写入文件 mtime）
+        """
+        names, matrix = _frame_to_matrix(df)
+        self._save(code, period, adjust, names, matrix, fetched_at)
+
+    def append(self, code: str, period: str, adjust: str, df: pd.DataFrame) -> int:
+        """
+        追加最后日期之后的新 K 线（已有日期的行被忽略），并刷新拉取时间
+
+        Args:
+            df: 增量 OHLCV DataFrame，可包含与已存数据重叠的日期；
+                与已存数据的列不同时取并集，缺失值以 NaN 填充
+
+        Returns:
+            实际追加的行数；无存储时等同于 write
+        """
+        incoming_names, incoming = _frame_to_matrix(df)
+        opened = self._open(code, period, adjust)
+        if opened is None or opened[1].shape[1] == 0:
+            self._save(code, period, adjust, incoming_names, incoming, None)
+            return incoming.shape[1]
+
+        stored_names, existing = opened
+        new_rows = incoming[:, incoming[0] > existing[0, -1]]
+        if new_rows.shape[1] == 0:
+            self.touch(code, period, adjust)
+            return 0
+        names = stored_names + [name for name in incoming_names if name not in stored_names]
+        combined = np.hstack([
+            _align(names, stored_names, np.asarray(existing)),
+            _align(names, incoming_names, new_rows),
+        ])
+        self._save(code, period, adjust, names, combined, None)
+        return new_rows.shape[1]
+
+    def touch(self, code: str, period: str, adjust: str, fetched_at: Optional[float] = None) -> None:
+        """仅刷新拉取时间（上游确认无新数据时使用）"""
+        path = self._path(code, period, adjust)
+        with self._write_lock:
+            if os.path.exists(path):
+                os.utime(path, None if fetched_at is None else (fetched_at, fetched_at))
+        self._invalidate(code, period, adjust)
+
+    def _save(
+        self,
+        code: str,
+        period: str,
+        adjust: str,
+        names: List[str],
+        matrix: np.ndarray,
+        fetched_at: Optional[float],
+    ) -> None:
+        path = self._path(code, period, adjust)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        packed = _pack(names, matrix)
+        with self._write_lock:
+            os.makedirs(self._root, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                # 3.0 格式支持非 ASCII 字段名（如上游的中文列名）
+                np.lib.format.write_array(f, packed, version=(3, 0))
+            os.replace(tmp_path, path)
+            if fetched_at is not None:
+                os.utime(path, (fetched_at, fetched_at))
+        self._invalidate(code, period, adjust)
+
+    def delete(self, code: str, period: str, adjust: str) -> None:
+        path = self._path(code, period, adjust)
+        with self._write_lock:
+            if os.path.exists(path):
+                os.remove(path)
+        self._invalidate(code, period, adjust)
+
+    # ==================== 读取 ====================
+
+    def read(
+        self,
+        code: str,
+        period: str,
+        adjust: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        tail: Optional[int] = None,
+    ) -> Optional[pd.DataFrame]:
+        """
+        按日期区间 / 末尾 N 行读取
+
+        Args:
+            start_date: 起始日期（含），YYYY-MM-DD 或 YYYYMMDD
+            end_date: 结束日期（含）
+            tail: 仅返回区间内最后 N 行
+
+        Returns:
+            DataFrame（columns: date, open, high, low, close, volume，其后为写入时的其他数值列），
+            无存储时返回 None
+        """
+        if self._memory is not None:
+            return self._read_memory(code, period, adjust, start_date, end_date, tail)
+
+        opened = self._open(code, period, adjust)
+        if opened is None:
+            return None
+        names, matrix = opened
+        lo, hi = _bounds(matrix[0], start_date, end_date, tail)
+        # 拷贝出 mmap，只读取 [lo, hi) 区间的字节
+        block = np.array(matrix[:, lo:hi])
+        return _matrix_to_frame(names, block)
+
+    def _read_memory(
+        self,
+        code: str,
+        period: str,
+        adjust: str,
+        start_date: Optional[str],
+        end_date: Optional[str],
+        tail: Optional[int],
+    ) -> Optional[pd.DataFrame]:
+        """经内存 LRU 读取：缓存整表 DataFrame，按日期切片后返回独立副本"""
+        try:
+            st = os.stat(self._path(code, period, adjust))
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        key = self._memory_key(code, period, adjust)
+
+        cached = self._memory.get(key)
+        if cached is None or cached[0] != stamp:
+            opened = self._open(code, period, adjust)
+            if opened is None:
+                return None
+            names, matrix = opened
+            dates = np.array(matrix[0])
+            frame = _matrix_to_frame(names, np.array(matrix))
+            expires_at = st.st_mtime + self._ttl if self._ttl else None
+            size = int(dates.nbytes + frame.memory_usage(index=True, deep=True).sum())
+            cached = (stamp, dates, frame)
+            self._memory.set(key, cached, expires_at=expires_at, size=size)
+
+        _, dates, frame = cached
+        lo, hi = _bounds(dates, start_date, end_date, tail)
+        # reset_index 生成新对象，调用方修改不会影响缓存中的整表
+        return frame.iloc[lo:hi].reset_index(drop=True)
+
+    def last_date(self, code: str, period: str, adjust: str) -> Optional[str]:
+        """最后一根 K 线的日期（YYYY-MM-DD），无存储时返回 None"""
+        opened = self._open(code, period, adjust)
+        if opened is None or opened[1].shape[1] == 0:
+            return None
+        return str(np.datetime64(int(opened[1][0, -1]), "D"))
+
+    def fetched_at(self, code: str, period: str, adjust: str) -> Optional[float]:
+        """最近一次写入（拉取）时间戳，无存储时返回 None"""
+        try:
+            return os.path.getmtime(self._path(code, period, adjust))
+        except OSError:
+            return None
+
+    def is_fresh(self, code: str, period: str, adjust: str, ttl: int) -> bool:
+        """存储是否存在且距离拉取不超过 ttl 秒"""
+        ts = self.fetched_at(code, period, adjust)
+        return ts is not None and (time.time() - ts) <= ttl
+
+
+# 单例实例
+history_store = HistoryStore(
+    os.path.join(settings.CACHE_DIR, "history"),
+    memory=memory_cache,
+    ttl=settings.HISTORY_CACHE_TTL,
+)
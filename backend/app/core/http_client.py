@@ -0,0 +1,204 @@
+"""
+HttpClient - 上游数据源共享的 HTTP 连接池
+
+服务器在海外，访问同花顺 / 上交所 / 深交所 / 东方财富时 TLS 握手往往比数据本身还慢。
+这里为每个域名维护一个常驻的 requests.Session（keep-alive 连接池），并按域名配置：
+- timeout：(连接超时, 读取超时)
+- retries：连接错误与 429 / 5xx 的重试次数（urllib3 Retry，指数退避，仅幂等方法）
+- 连接池大小（HTTP_POOL_MAXSIZE）
+Session 由多个调用方共享，不保存服务端下发的 Cookie（调用方显式传入的 cookies 仍随请求发送）。
+
+连接池只供显式使用 http_client 的数据源（同花顺历史、资金流向采集）；
+install_requests_defaults() 仅为所有 Session 设置默认 User-Agent、禁用代理、按域名补充默认超时，
+不改变模块级 requests.get / post 的行为。
+"""
+
+import logging
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+# 重试的 HTTP 状态码
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+@dataclass(frozen=True)
+class HostPolicy:
+    """单个上游域名的连接策略"""
+    connect_timeout: float
+    read_timeout: float
+    retries: int = 0
+    backoff: float = 0.5
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return (self.connect_timeout, self.read_timeout)
+
+
+# 按域名后缀匹配的策略（未列出的域名使用 HTTP_DEFAULT_TIMEOUT，不重试）
+HOST_POLICIES: Dict[str, HostPolicy] = {
+    # 同花顺 K 线：响应小，失败时由 DataSourceManager 切换数据源
+    "10jqka.com.cn": HostPolicy(connect_timeout=5, read_timeout=10, retries=1),
+    # 上交所：采集器自带按日期回溯的重试循环
+    "sse.com.cn": HostPolicy(connect_timeout=10, read_timeout=30),
+    # 深交所：份额规模接口返回较大的 Excel
+    "szse.cn": HostPolicy(connect_timeout=10, read_timeout=60, retries=1),
+    # 东方财富：列表接口分页拉取全量数据，海外访问较慢
+    "eastmoney.com": HostPolicy(connect_timeout=10, read_timeout=180, retries=1),
+    # 新浪：ETF 列表
+    "sina.com.cn": HostPolicy(connect_timeout=10, read_timeout=60, retries=1),
+}
+
+
+def policy_for(host: str) -> HostPolicy:
+    """按域名后缀查找连接策略"""
+    host = host.lower()
+    for suffix, policy in HOST_POLICIES.items():
+        if host == suffix or host.endswith("." + suffix):
+            return policy
+    return HostPolicy(connect_timeout=10, read_timeout=settings.HTTP_DEFAULT_TIMEOUT)
+
+
+def _host_of(url: str) -> str:
+    return urlsplit(url).hostname or ""
+
+
+class HttpClient:
+    """按域名复用连接的 HTTP 客户端（线程安全）"""
+
+    def __init__(self, pool_maxsize: Optional[int] = None) -> None:
+        self._pool_maxsize = pool_maxsize or settings.HTTP_POOL_MAXSIZE
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, requests.Session] = {}
+        self._requests: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+
+    def _create_session(self, host: str) -> requests.Session:
+        policy = policy_for(host)
+        session = requests.Session()
+        session.headers.update({"User-Agent": USER_AGENT})
+        session.trust_env = False
+        session.proxies = {"http": None, "https": None}
+        # 共享 Session 不保存响应 Cookie，避免调用方之间串用
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self._pool_maxsize,
+            max_retries=Retry(
+                total=policy.retries,
+                read=0,
+                status_forcelist=RETRY_STATUS,
+                backoff_factor=policy.backoff,
+                raise_on_status=False,
+                respect_retry_after_header=False,
+            ),
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def session(self, host: str) -> requests.Session:
+        """域名对应的常驻 Session"""
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._sessions[host] = self._create_session(host)
+            return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        发送请求（未指定 timeout 时使用域名策略的超时）
+
+        Args:
+            method: HTTP 方法
+            url: 完整 URL
+            **kwargs: 透传给 requests.Session.request
+
+        Returns:
+            requests.Response
+        """
+        host = _host_of(url)
+        kwargs.setdefault("timeout", policy_for(host).timeout)
+        session = self.session(host)
+        with self._lock:
+            self._requests[host] = self._requests.get(host, 0) + 1
+        try:
+            return session.request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self._errors[host] = self._errors.get(host, 0) + 1
+            raise
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """各域名的请求数与网络错误数"""
+        with self._lock:
+            return {
+                host: {"requests": count, "errors": self._errors.get(host, 0)}
+                for host, count in sorted(self._requests.items())
+            }
+
+    def close(self) -> None:
+        """关闭全部连接"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions = {}
+        for session in sessions:
+            session.close()
+
+
+# 全局单例
+http_client = HttpClient()
+
+
+_installed = False
+_original_session_init = requests.Session.__init__
+_original_session_request = requests.Session.request
+
+
+def _patched_session_init(self, *args, **kwargs):
+    _original_session_init(self, *args, **kwargs)
+    self.headers.update({"User-Agent": USER_AGENT})
+    # 彻底禁用代理，防止本地环境代理干扰
+    self.trust_env = False
+    self.proxies = {"http": None, "https": None}
+
+
+def _patched_session_request(self, method, url, **kwargs):
+    if "timeout" not in kwargs:
+        kwargs["timeout"] = policy_for(_host_of(url)).timeout
+    return _original_session_request(self, method, url, **kwargs)
+
+
+def install_requests_defaults() -> None:
+    """
+    为 requests 安装全局默认值（幂等）
+
+    所有 Session（含 AkShare 内部的 requests.get）：默认 User-Agent、禁用代理、按域名补充默认超时
+    """
+    global _installed
+    if _installed:
+        return
+    requests.Session.__init__ = _patched_session_init
+    requests.Session.request = _patched_session_request
+    _installed = True
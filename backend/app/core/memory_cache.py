@@ -0,0 +1,188 @@
+"""
+进程内内存缓存层
+
+在 DiskCache（SQLite + pickle）与历史行情列式存储之前加一层按字节数限额的 LRU：
+- 同一请求内 metrics / trend / temperature 多次读取同一 code 时免去反序列化
+- 条目过期时间与磁盘条目对齐（DiskCache expire_time / 存储 mtime + TTL）
+- 写入、删除时失效对应条目，下次读取重新从磁盘加载
+
+TieredCache 每次读取返回缓存值的深拷贝：调用方修改返回的 dict / DataFrame
+不会影响其他请求读到的结果（拷贝仍远快于 SQLite 读取 + 反序列化）。
+MemoryLRU 本身不拷贝，直接使用它的调用方（如 HistoryStore）自行返回独立副本。
+"""
+
+import copy
+import logging
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+    """估算对象占用的字节数（DataFrame / ndarray 精确计算，其余按 pickle 长度）"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, str)):
+        return sys.getsizeof(value)
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+class MemoryLRU:
+    """按字节数限额、支持过期时间的线程安全 LRU"""
+
+    def __init__(self, max_bytes: int) -> None:
+        self._max_bytes = max_bytes
+        # key -> (value, size, expires_at)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取条目，过期或不存在时返回 default"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            value, size, expires_at = entry
+            if expires_at is not None and time.time() >= expires_at:
+                self._remove(key)
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        expires_at: Optional[float] = None,
+        size: Optional[int] = None,
+    ) -> None:
+        """
+        写入条目
+
+        Args:
+            expires_at: 绝对过期时间戳，None 表示不过期
+            size: 条目字节数，默认按 estimate_size 估算
+        """
+        if size is None:
+            size = estimate_size(value)
+        # 单个条目超过总额度时不缓存，避免把其他热点全部挤出
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while self._bytes > self._max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率与容量统计"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0,
+            }
+
+
+class TieredCache:
+    """
+    DiskCache 包装：内存 LRU 在前，DiskCache 在后
+
+    与 diskcache.Cache 的 get / set / delete 调用方式兼容；读取未命中时把磁盘值
+    连同其过期时间一起放入内存层，set / delete 时失效内存层对应条目。
+    读取返回的对象不与缓存共享，调用方可以修改。
+    """
+
+    def __init__(self, disk: Any, memory: MemoryLRU) -> None:
+        self._disk = disk
+        self._memory = memory
+
+    @property
+    def disk(self) -> Any:
+        """底层 diskcache.Cache 实例"""
+        return self._disk
+
+    @staticmethod
+    def _memory_key(key: Hashable) -> Tuple[str, Hashable]:
+        return ("disk", key)
+
+    def get(self, key: Hashable, default: Any = None, **kwargs: Any) -> Any:
+        # expire_time / tag 等附加参数直接透传磁盘层
+        if kwargs:
+            return self._disk.get(key, default, **kwargs)
+
+        mem_key = self._memory_key(key)
+        value = self._memory.get(mem_key, _MISSING)
+        if value is not _MISSING:
+            return copy.deepcopy(value)
+
+        value, expire_time = self._disk.get(key, _MISSING, expire_time=True)
+        if value is _MISSING:
+            return default
+        # 内存层保存独立副本，返回给调用方的对象可以任意修改
+        self._memory.set(mem_key, copy.deepcopy(value), expires_at=expire_time)
+        return value
+
+    def set(self, key: Hashable, value: Any, expire: Optional[float] = None, **kwargs: Any) -> bool:
+        result = self._disk.set(key, value, expire=expire, **kwargs)
+        self._memory.delete(self._memory_key(key))
+        return result
+
+    def delete(self, key: Hashable, **kwargs: Any) -> bool:
+        result = self._disk.delete(key, **kwargs)
+        self._memory.delete(self._memory_key(key))
+        return result
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._disk
+
+
+# 单例实例（DiskCache 与历史行情存储共享同一额度）
+memory_cache = MemoryLRU(settings.MEMORY_CACHE_MAX_BYTES)
@@ -3,15 +3,20 @@
 
 轻量级内存指标，追踪各数据源的成功率、延迟、状态。
 线程安全（akshare_service 在后台线程中运行）。
+
+延迟另按 (数据源, 操作) 记录直方图：固定分桶，累计计数供 Prometheus 抓取，
+按分钟切片的滑动窗口计数用于 p50 / p90 / p99（平均值会掩盖超时）。
 """
 
+import bisect
 import functools
 import logging
+import math
 import threading
 import time
 from collections import deque
 from datetime import datetime
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
 
 from zoneinfo import ZoneInfo
 
@@ -20,6 +25,140 @@ logger = logging.getLogger(__name__)
 _CHINA_TZ = ZoneInfo("Asia/Shanghai")
 _WINDOW_SIZE = 100  # 滑动窗口大小
 
+# 延迟直方图分桶上界（ms），最后隐含 +Inf 桶；覆盖到 180 秒的上游超时
+LATENCY_BUCKETS_MS: Tuple[float, ...] = (
+    25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000, 180000,
+)
+# 分位数滑动窗口：WINDOW_SLICES 个 SLICE_SECONDS 秒的切片（15 分钟）
+SLICE_SECONDS = 60
+WINDOW_SLICES = 15
+# 上报的分位
+QUANTILES: Tuple[float, ...] = (0.5, 0.9, 0.99)
+
+DEFAULT_OPERATION = "other"
+
+
+def _bucket_quantile(counts: List[int], max_value: float, q: float) -> Optional[float]:
+    """由分桶计数估算分位数（桶内线性插值，+Inf 桶取窗口内最大值）"""
+    total = sum(counts)
+    if total == 0:
+        return None
+    rank = q * total
+    cumulative = 0
+    for i, count in enumerate(counts):
+        if count == 0:
+            continue
+        if cumulative + count >= rank:
+            if i == len(LATENCY_BUCKETS_MS):
+                return max_value
+            lower = LATENCY_BUCKETS_MS[i - 1] if i > 0 else 0.0
+            upper = min(LATENCY_BUCKETS_MS[i], max_value)
+            fraction = (rank - cumulative) / count
+            return lower + (max(upper, lower) - lower) * fraction
+        cumulative += count
+    return max_value
+
+
+def _prom_labels(**values: Any) -> str:
+    """Prometheus 标签集，转义反斜杠、引号与换行"""
+    escaped = []
+    for key, value in values.items():
+        text = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{key}="{text}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _prom_number(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class LatencyHistogram:
+    """单个 (数据源, 操作) 的延迟直方图：累计分桶 + 按分钟切片的滑动窗口"""
+
+    __slots__ = ("counts", "sum_ms", "success_count", "failure_count", "_slices")
+
+    def __init__(self) -> None:
+        size = len(LATENCY_BUCKETS_MS) + 1
+        self.counts: List[int] = [0] * size  # 累计（非 Prometheus 的 le 累加形式）
+        self.sum_ms = 0.0
+        self.success_count = 0
+        self.failure_count = 0
+        # (切片序号, 全部调用分桶计数, 成功调用分桶计数, [全部最大值, 成功最大值])
+        self._slices: Deque[Tuple[int, List[int], List[int], List[float]]] = deque(maxlen=WINDOW_SLICES)
+
+    @property
+    def count(self) -> int:
+        return self.success_count + self.failure_count
+
+    def observe(self, latency_ms: float, ok: bool, now: Optional[float] = None) -> None:
+        index = bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)
+        self.counts[index] += 1
+        self.sum_ms += latency_ms
+        if ok:
+            self.success_count += 1
+        else:
+            self.failure_count += 1
+
+        slice_id = int((time.monotonic() if now is None else now) // SLICE_SECONDS)
+        if not self._slices or self._slices[-1][0] != slice_id:
+            self._slices.append((slice_id, [0] * len(self.counts), [0] * len(self.counts), [0.0, 0.0]))
+        _, counts, ok_counts, max_box = self._slices[-1]
+        counts[index] += 1
+        max_box[0] = max(max_box[0], latency_ms)
+        if ok:
+            ok_counts[index] += 1
+            max_box[1] = max(max_box[1], latency_ms)
+
+    def window(self, now: Optional[float] = None, success_only: bool = False) -> Tuple[List[int], float]:
+        """
+        滑动窗口内的分桶计数与最大值
+
+        Args:
+            now: 当前单调时钟（测试用）
+            success_only: 只统计成功调用（失败多为超时，会抬高延迟分位）
+        """
+        current = int((time.monotonic() if now is None else now) // SLICE_SECONDS)
+        counts = [0] * len(self.counts)
+        max_value = 0.0
+        for slice_id, all_counts, ok_counts, max_box in self._slices:
+            if slice_id > current - WINDOW_SLICES:
+                for i, count in enumerate(ok_counts if success_only else all_counts):
+                    counts[i] += count
+                max_value = max(max_value, max_box[1 if success_only else 0])
+        return counts, max_value
+
+    def outcomes(self, now: Optional[float] = None) -> Tuple[int, int]:
+        """滑动窗口内的 (成功数, 失败数)"""
+        current = int((time.monotonic() if now is None else now) // SLICE_SECONDS)
+        success = failure = 0
+        for slice_id, all_counts, ok_counts, _ in self._slices:
+            if slice_id > current - WINDOW_SLICES:
+                ok = sum(ok_counts)
+                success += ok
+                failure += sum(all_counts) - ok
+        return success, failure
+
+
+def _quantiles(
+    histograms: Iterable[LatencyHistogram],
+    now: Optional[float] = None,
+    success_only: bool = False,
+) -> Dict[str, Optional[float]]:
+    """合并若干直方图的滑动窗口并计算 p50 / p90 / p99（ms）"""
+    merged = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    max_value = 0.0
+    for histogram in histograms:
+        counts, window_max = histogram.window(now, success_only)
+        for i, count in enumerate(counts):
+            merged[i] += count
+        max_value = max(max_value, window_max)
+    result: Dict[str, Optional[float]] = {}
+    for q in QUANTILES:
+        value = _bucket_quantile(merged, max_value, q)
+        result[f"p{round(q * 100)}"] = round(value, 1) if value is not None else None
+    return result
+
 
 class SourceStats:
     """单个数据源的统计数据"""
@@ -34,6 +173,7 @@ class SourceStats:
         "last_failure_at",
         "last_error",
         "circuit_open_until",
+        "histograms",
     )
 
     def __init__(self) -> None:
@@ -46,6 +186,13 @@ class SourceStats:
         self.last_failure_at: Optional[datetime] = None
         self.last_error: Optional[str] = None
         self.circuit_open_until: Optional[float] = None
+        self.histograms: Dict[str, LatencyHistogram] = {}  # 操作 -> 延迟直方图
+
+    def observe(self, operation: str, latency_ms: float, ok: bool) -> None:
+        histogram = self.histograms.get(operation)
+        if histogram is None:
+            histogram = self.histograms[operation] = LatencyHistogram()
+        histogram.observe(latency_ms, ok)
 
 
 class DataSourceMetrics:
@@ -60,7 +207,9 @@ class DataSourceMetrics:
             self._sources[source] = SourceStats()
         return self._sources[source]
 
-    def record_success(self, source: str, latency_ms: float) -> bool:
+    def record_success(
+        self, source: str, latency_ms: float, operation: str = DEFAULT_OPERATION
+    ) -> bool:
         """记录成功调用。返回 True 表示从 error 恢复（可用于触发恢复告警）。"""
         now = datetime.now(_CHINA_TZ)
         with self._lock:
@@ -68,17 +217,21 @@ class DataSourceMetrics:
             was_error = stats.last_status == "error"
             stats.success_count += 1
             stats.latencies.append(latency_ms)
+            stats.observe(operation, latency_ms, ok=True)
             stats.results.append(True)
             stats.last_status = "ok"
             stats.last_success_at = now
             return was_error
 
-    def record_failure(self, source: str, error: str, latency_ms: float) -> None:
+    def record_failure(
+        self, source: str, error: str, latency_ms: float, operation: str = DEFAULT_OPERATION
+    ) -> None:
         now = datetime.now(_CHINA_TZ)
         with self._lock:
             stats = self._get_or_create(source)
             stats.failure_count += 1
             stats.latencies.append(latency_ms)
+            stats.observe(operation, latency_ms, ok=False)
             stats.results.append(False)
             stats.last_status = "error"
             stats.last_failure_at = now
@@ -100,6 +253,50 @@ class DataSourceMetrics:
                 return None
             return sum(stats.latencies) / len(stats.latencies)
 
+    def get_latency_quantiles(
+        self, source: str, operation: Optional[str] = None, success_only: bool = False
+    ) -> Dict[str, Optional[float]]:
+        """
+        滑动时间窗口内的延迟分位数
+
+        Args:
+            source: 数据源名称
+            operation: 操作标签（list / history / shares 等），None 表示合并全部操作
+            success_only: 只统计成功调用（对冲等待、数据源排序使用）
+
+        Returns:
+            {"p50", "p90", "p99"}（ms），无数据时各项为 None
+        """
+        with self._lock:
+            stats = self._sources.get(source)
+            histograms = list(stats.histograms.items()) if stats else []
+            return _quantiles(
+                (h for op, h in histograms if operation is None or op == operation),
+                success_only=success_only,
+            )
+
+    def get_window_outcomes(self, source: str, operation: Optional[str] = None) -> Tuple[int, int]:
+        """
+        滑动时间窗口内的调用结果
+
+        Args:
+            source: 数据源名称
+            operation: 操作标签，None 表示合并全部操作
+
+        Returns:
+            (成功数, 失败数)
+        """
+        with self._lock:
+            stats = self._sources.get(source)
+            histograms = list(stats.histograms.items()) if stats else []
+            success = failure = 0
+            for op, histogram in histograms:
+                if operation is None or op == operation:
+                    ok, failed = histogram.outcomes()
+                    success += ok
+                    failure += failed
+            return success, failure
+
     def get_source_status(self, source: str) -> Dict[str, Any]:
         """单个数据源的完整状态"""
         with self._lock:
@@ -203,21 +400,119 @@ class DataSourceMetrics:
             result["last_failure_at"] = _fmt_time(stats.last_failure_at)
         if stats.last_error:
             result["last_error"] = stats.last_error
+        if stats.histograms:
+            result["latency_ms"] = _quantiles(stats.histograms.values())
+            result["operations"] = {
+                operation: {
+                    "success_count": histogram.success_count,
+                    "failure_count": histogram.failure_count,
+                    **_quantiles([histogram]),
+                }
+                for operation, histogram in sorted(stats.histograms.items())
+            }
         return result
 
+    def render_prometheus(self, prefix: str = "etftool_datasource") -> str:
+        """
+        Prometheus 文本格式（0.0.4）的指标导出
+
+        - {prefix}_requests_total：按结果计数的调用次数（counter）
+        - {prefix}_latency_seconds：延迟直方图（histogram，累计）
+        - {prefix}_latency_window_seconds：滑动窗口分位数（summary 的 quantile 样本）
+        - {prefix}_up：最近一次调用是否成功（gauge）
+        """
+        with self._lock:
+            sources = [
+                (
+                    source,
+                    stats.last_status,
+                    [
+                        (operation, list(h.counts), h.sum_ms, h.success_count,
+                         h.failure_count, _quantiles([h]))
+                        for operation, h in sorted(stats.histograms.items())
+                    ],
+                )
+                for source, stats in sorted(self._sources.items())
+            ]
+
+        lines = [
+            f"# HELP {prefix}_requests_total Data source calls by outcome.",
+            f"# TYPE {prefix}_requests_total counter",
+        ]
+        for source, _, operations in sources:
+            for operation, _, _, success, failure, _ in operations:
+                for outcome, value in (("success", success), ("failure", failure)):
+                    lines.append(
+                        f"{prefix}_requests_total"
+                        f"{_prom_labels(source=source, operation=operation, outcome=outcome)} {value}"
+                    )
+
+        lines += [
+            f"# HELP {prefix}_latency_seconds Data source call latency.",
+            f"# TYPE {prefix}_latency_seconds histogram",
+        ]
+        for source, _, operations in sources:
+            for operation, counts, sum_ms, success, failure, _ in operations:
+                cumulative = 0
+                for bound, count in zip((*LATENCY_BUCKETS_MS, math.inf), counts):
+                    cumulative += count
+                    le = "+Inf" if math.isinf(bound) else _prom_number(bound / 1000)
+                    lines.append(
+                        f"{prefix}_latency_seconds_bucket"
+                        f"{_prom_labels(source=source, operation=operation, le=le)} {cumulative}"
+                    )
+                lines.append(
+                    f"{prefix}_latency_seconds_sum{_prom_labels(source=source, operation=operation)} "
+                    f"{_prom_number(round(sum_ms / 1000, 6))}"
+                )
+                lines.append(
+                    f"{prefix}_latency_seconds_count{_prom_labels(source=source, operation=operation)} "
+                    f"{success + failure}"
+                )
+
+        lines += [
+            f"# HELP {prefix}_latency_window_seconds Data source latency quantiles over the last "
+            f"{WINDOW_SLICES * SLICE_SECONDS // 60} minutes.",
+            f"# TYPE {prefix}_latency_window_seconds gauge",
+        ]
+        for source, _, operations in sources:
+            for operation, _, _, _, _, quantiles in operations:
+                for q in QUANTILES:
+                    value = quantiles[f"p{round(q * 100)}"]
+                    if value is None:
+                        continue
+                    lines.append(
+                        f"{prefix}_latency_window_seconds"
+                        f"{_prom_labels(source=source, operation=operation, quantile=_prom_number(q))} "
+                        f"{_prom_number(round(value / 1000, 6))}"
+                    )
+
+        lines += [
+            f"# HELP {prefix}_up Whether the last call to the data source succeeded.",
+            f"# TYPE {prefix}_up gauge",
+        ]
+        for source, status, _ in sources:
+            lines.append(f"{prefix}_up{_prom_labels(source=source)} {1 if status == 'ok' else 0}")
+
+        return "\n".join(lines) + "\n"
+
 
 # 模块级单例
 datasource_metrics = DataSourceMetrics()
 
 
-def track_datasource(source_name: str) -> Callable:
+def track_datasource(source_name: str, operation: str = DEFAULT_OPERATION) -> Callable:
     """
     装饰器：自动追踪数据源调用的成功/失败/耗时。
 
     只包裹单次调用，重试逻辑应留在外层。
 
+    Args:
+        source_name: 数据源名称
+        operation: 操作标签（list / history / shares），用于分操作的延迟直方图
+
     用法:
-        @track_datasource("eastmoney")
+        @track_datasource("eastmoney", operation="list")
         def _fetch_etfs_eastmoney():
             ...
     """
@@ -229,7 +524,7 @@ def track_datasource(source_name: str) -> Callable:
             try:
                 result = func(*args, **kwargs)
                 latency = (time.monotonic() - start) * 1000
-                recovered = datasource_metrics.record_success(source_name, latency)
+                recovered = datasource_metrics.record_success(source_name, latency, operation)
                 logger.info(
                     "[%s] %s succeeded (%.0fms)", source_name, func.__name__, latency
                 )
@@ -246,7 +541,7 @@ def track_datasource(source_name: str) -> Callable:
                 return result
             except Exception as e:
                 latency = (time.monotonic() - start) * 1000
-                datasource_metrics.record_failure(source_name, str(e), latency)
+                datasource_metrics.record_failure(source_name, str(e), latency, operation)
                 logger.warning(
                     "[%s] %s failed (%.0fms): %s",
                     source_name,
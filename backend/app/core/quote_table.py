@@ -0,0 +1,439 @@
+"""
+QuoteTable - 全市场 ETF 行情的列式快照
+
+把 [{"code", "name", "price", "change_pct", "volume", "tags"}, ...] 拆成列存储：
+- code / name：驻留（sys.intern）字符串列表，另存小写名称供搜索
+- price / change_pct / volume：float64 NumPy 数组，缺失值为 NaN
+- tags：标签词表 + 每行标签 ID 元组（相同组合共享同一元组）+ 每行位图（uint64 分段）；
+  首次按标签查询时展开为倒排掩码矩阵（标签 -> 行掩码），多标签 AND / OR / NOT 与
+  分面计数都是向量化布尔运算
+- 其他字段（如客户端同步带来的额外键）稀疏存放在 extras
+
+行情刷新时先与当前表逐行比较（diff_numeric）：只有报价变化时以新的数值列构建新表
+（with_numeric，与原表共享代码、名称、标签与索引）；代码集合、名称或标签变化时全量重建。
+单只更新同理：已有代码的数值 / 额外字段更新复制三列数值数组构建新表（with_row_update，
+按代码定位仍为 O(1)），新增代码或名称、标签变化时全量重建（with_record）。
+
+保证：已发布的 QuoteTable 不会被修改。读方取一次快照后，整个请求内看到的每一行
+（价格、涨跌幅、成交量与额外字段）都来自同一次更新；写方以一次赋值发布新表。
+"""
+
+import math
+import sys
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.search_index import SearchIndex
+
+# 列式存储的字段；其余字段进入 extras
+NUMERIC_FIELDS = ("price", "change_pct", "volume")
+CORE_FIELDS = frozenset(("code", "name", "tags") + NUMERIC_FIELDS)
+
+_TagKey = Tuple[Tuple[str, Any], ...]
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _from_float(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+class QuoteTable:
+    """ETF 行情列式快照"""
+
+    __slots__ = (
+        "codes", "names", "names_lower", "index",
+        "price", "change_pct", "volume",
+        "tag_vocab", "tag_lookup", "tag_ids", "tag_bits", "extras",
+        "_search_index", "_tag_matrix", "_label_ids", "_group_ids",
+    )
+
+    def __init__(
+        self,
+        codes: List[str],
+        names: List[str],
+        price: np.ndarray,
+        change_pct: np.ndarray,
+        volume: np.ndarray,
+        tag_vocab: List[Dict[str, Any]],
+        tag_ids: List[Tuple[int, ...]],
+        extras: Dict[int, Dict[str, Any]],
+    ) -> None:
+        self.codes = codes
+        self.names = names
+        self.names_lower = [name.lower() for name in names]
+        self.index: Dict[str, int] = {code: i for i, code in enumerate(codes)}
+        self.price = price
+        self.change_pct = change_pct
+        self.volume = volume
+        self.tag_vocab = tag_vocab
+        self.tag_lookup: Dict[_TagKey, int] = {
+            tuple(sorted(tag.items())): i for i, tag in enumerate(tag_vocab)
+        }
+        self.tag_ids = tag_ids
+        self.extras = extras
+        self._search_index: Optional[SearchIndex] = None
+        self._tag_matrix: Optional[np.ndarray] = None
+        self._label_ids: Dict[str, List[int]] = {}
+        self._group_ids: Dict[str, List[int]] = {}
+        for tag_id, tag in enumerate(tag_vocab):
+            self._label_ids.setdefault(tag.get("label"), []).append(tag_id)
+            self._group_ids.setdefault(tag.get("group"), []).append(tag_id)
+
+        words = max(1, (len(tag_vocab) + 63) // 64)
+        self.tag_bits = np.zeros((len(codes), words), dtype=np.uint64)
+        for row, ids in enumerate(tag_ids):
+            for tag_id in ids:
+                self.tag_bits[row, tag_id >> 6] |= np.uint64(1 << (tag_id & 63))
+
+    @classmethod
+    def from_records(cls, records: Iterable[Mapping[str, Any]]) -> "QuoteTable":
+        """
+        由行情字典列表构建（同一代码出现多次时后者覆盖前者）
+
+        Args:
+            records: [{"code", "name", "price", "change_pct", "volume", "tags", ...}]
+
+        Returns:
+            新的 QuoteTable
+        """
+        merged: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            code = record.get("code")
+            if code:
+                merged.setdefault(str(code), {}).update(record)
+
+        codes: List[str] = []
+        names: List[str] = []
+        columns: Dict[str, List[float]] = {field: [] for field in NUMERIC_FIELDS}
+        tag_vocab: List[Dict[str, Any]] = []
+        tag_lookup: Dict[_TagKey, int] = {}
+        combos: Dict[Tuple[int, ...], Tuple[int, ...]] = {}
+        tag_ids: List[Tuple[int, ...]] = []
+        extras: Dict[int, Dict[str, Any]] = {}
+
+        for row, (code, record) in enumerate(merged.items()):
+            codes.append(sys.intern(code))
+            names.append(sys.intern(str(record.get("name") or "")))
+            for field in NUMERIC_FIELDS:
+                columns[field].append(_to_float(record.get(field)))
+
+            ids = []
+            for tag in record.get("tags") or []:
+                key = tuple(sorted(tag.items()))
+                tag_id = tag_lookup.get(key)
+                if tag_id is None:
+                    tag_id = tag_lookup[key] = len(tag_vocab)
+                    tag_vocab.append(dict(tag))
+                ids.append(tag_id)
+            ids_tuple = tuple(ids)
+            tag_ids.append(combos.setdefault(ids_tuple, ids_tuple))
+
+            extra = {k: v for k, v in record.items() if k not in CORE_FIELDS}
+            if extra:
+                extras[row] = extra
+
+        return cls(
+            codes,
+            names,
+            np.array(columns["price"], dtype=np.float64),
+            np.array(columns["change_pct"], dtype=np.float64),
+            np.array(columns["volume"], dtype=np.float64),
+            tag_vocab,
+            tag_ids,
+            extras,
+        )
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def search_index(self) -> SearchIndex:
+        """代码 / 名称 / 拼音首字母搜索索引（首次访问时构建）"""
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.codes, self.names_lower)
+        return self._search_index
+
+    def position(self, code: str) -> Optional[int]:
+        return self.index.get(code)
+
+    def tags(self, row: int) -> List[Dict[str, Any]]:
+        """某行的标签（副本）"""
+        return [dict(self.tag_vocab[tag_id]) for tag_id in self.tag_ids[row]]
+
+    def row(self, row: int) -> Dict[str, Any]:
+        """物化一行为字典（新对象，调用方可随意修改）"""
+        record: Dict[str, Any] = {
+            "code": self.codes[row],
+            "name": self.names[row],
+            "price": _from_float(float(self.price[row])),
+            "change_pct": _from_float(float(self.change_pct[row])),
+            "volume": _from_float(float(self.volume[row])),
+            "tags": self.tags(row),
+        }
+        extra = self.extras.get(row)
+        if extra:
+            record.update(extra)
+        return record
+
+    def rows(self, positions: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """物化多行，positions 为 None 时物化全部"""
+        if positions is None:
+            positions = range(len(self.codes))
+        return [self.row(int(i)) for i in positions]
+
+    def quotes(self, codes: Sequence[str]) -> List[Dict[str, Any]]:
+        """
+        批量取轻量行情（code / name / price / change_pct / tags）
+
+        数值列按位置数组一次性 gather，不物化整行。未知代码跳过，重复代码保留。
+        """
+        positions = [self.index[code] for code in codes if code in self.index]
+        if not positions:
+            return []
+        idx = np.fromiter(positions, dtype=np.intp, count=len(positions))
+        prices = np.nan_to_num(self.price[idx], nan=0.0).tolist()
+        changes = np.nan_to_num(self.change_pct[idx], nan=0.0).tolist()
+        return [
+            {
+                "code": self.codes[row],
+                "name": self.names[row],
+                "price": prices[k],
+                "change_pct": changes[k],
+                "tags": self.tags(row),
+            }
+            for k, row in enumerate(positions)
+        ]
+
+    @property
+    def tag_matrix(self) -> np.ndarray:
+        """标签倒排掩码矩阵：tag_matrix[tag_id] 为带该标签的行掩码（首次访问时由位图展开）"""
+        if self._tag_matrix is None:
+            matrix = np.zeros((len(self.tag_vocab), len(self.codes)), dtype=bool)
+            for tag_id in range(len(self.tag_vocab)):
+                bit = np.uint64(1 << (tag_id & 63))
+                matrix[tag_id] = (self.tag_bits[:, tag_id >> 6] & bit) != 0
+            self._tag_matrix = matrix
+        return self._tag_matrix
+
+    def _mask_of(self, tag_ids: List[int]) -> np.ndarray:
+        if not tag_ids:
+            return np.zeros(len(self.codes), dtype=bool)
+        return self.tag_matrix[tag_ids].any(axis=0)
+
+    def label_mask(self, label: str) -> np.ndarray:
+        """带有指定标签（任意 group）的行掩码"""
+        return self._mask_of(self._label_ids.get(label, []))
+
+    def group_mask(self, group: str) -> np.ndarray:
+        """带有指定 group 下任一标签的行掩码"""
+        return self._mask_of(self._group_ids.get(group, []))
+
+    def tag_positions(self, label: str) -> np.ndarray:
+        """带有指定标签（任意 group）的行位置，按表内顺序"""
+        return np.flatnonzero(self.label_mask(label))
+
+    def select(
+        self,
+        all_of: Sequence[str] = (),
+        any_of: Sequence[str] = (),
+        none_of: Sequence[str] = (),
+        group: Optional[str] = None,
+    ) -> np.ndarray:
+        """
+        多标签组合筛选
+
+        Args:
+            all_of: 必须全部带有的标签（AND）
+            any_of: 至少带有其一的标签（OR）
+            none_of: 不能带有的标签（NOT）
+            group: 必须带有该 group 下的标签
+
+        Returns:
+            行掩码
+        """
+        mask = np.ones(len(self.codes), dtype=bool)
+        for label in all_of:
+            mask &= self.label_mask(label)
+        if any_of:
+            mask &= self._mask_of([i for label in any_of for i in self._label_ids.get(label, [])])
+        if none_of:
+            mask &= ~self._mask_of([i for label in none_of for i in self._label_ids.get(label, [])])
+        if group:
+            mask &= self.group_mask(group)
+        return mask
+
+    def order(
+        self, mask: np.ndarray, sort_by: Optional[str] = None, descending: bool = True
+    ) -> np.ndarray:
+        """
+        掩码命中的行位置，可按数值列排序（缺失值排在最后，相等时保持表内顺序）
+
+        Args:
+            mask: 行掩码
+            sort_by: price / change_pct / volume，None 时按表内顺序
+            descending: 是否降序
+        """
+        positions = np.flatnonzero(mask)
+        if sort_by is None:
+            return positions
+        if sort_by not in NUMERIC_FIELDS:
+            raise ValueError(f"Unsupported sort field: {sort_by}")
+        values = getattr(self, sort_by)[positions]
+        keys = np.where(np.isnan(values), np.inf, -values if descending else values)
+        return positions[np.argsort(keys, kind="stable")]
+
+    def facets(self, mask: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        掩码命中行内各标签的数量
+
+        Returns:
+            [{"label", "group", "count"}]，按数量降序，不含数量为 0 的标签
+        """
+        if not self.tag_vocab:
+            return []
+        counts = np.count_nonzero(self.tag_matrix & mask, axis=1)
+        order = np.argsort(-counts, kind="stable")
+        return [
+            {
+                "label": self.tag_vocab[tag_id].get("label"),
+                "group": self.tag_vocab[tag_id].get("group"),
+                "count": int(counts[tag_id]),
+            }
+            for tag_id in order
+            if counts[tag_id] > 0
+        ]
+
+    def _tag_ids_of(self, tags: Optional[Iterable[Mapping[str, Any]]]) -> Optional[Tuple[int, ...]]:
+        """标签列表在本表词表中的 ID 元组，含词表外标签时返回 None"""
+        ids = []
+        for tag in tags or ():
+            tag_id = self.tag_lookup.get(tuple(sorted(tag.items())))
+            if tag_id is None:
+                return None
+            ids.append(tag_id)
+        return tuple(ids)
+
+    def diff_numeric(
+        self, records: Iterable[Mapping[str, Any]]
+    ) -> Optional[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """
+        与新一轮行情逐行比较（替换语义：缺失的数值字段视为 NaN）
+
+        Returns:
+            代码集合、名称、标签与额外字段都未变时返回 (数值变化的行位置, 新数值列)，
+            否则返回 None，表示需要用 from_records 全量重建
+        """
+        seen = np.zeros(len(self.codes), dtype=bool)
+        columns = {field: getattr(self, field).copy() for field in NUMERIC_FIELDS}
+        for record in records:
+            code = record.get("code")
+            if not code:
+                continue
+            row = self.index.get(str(code))
+            if row is None:
+                return None
+            if str(record.get("name") or "") != self.names[row]:
+                return None
+            if self._tag_ids_of(record.get("tags")) != self.tag_ids[row]:
+                return None
+            extra = {k: v for k, v in record.items() if k not in CORE_FIELDS}
+            if extra != self.extras.get(row, {}):
+                return None
+            seen[row] = True
+            for field in NUMERIC_FIELDS:
+                columns[field][row] = _to_float(record.get(field))
+        if not seen.all():
+            return None
+
+        changed = np.zeros(len(self.codes), dtype=bool)
+        for field in NUMERIC_FIELDS:
+            old, new = getattr(self, field), columns[field]
+            changed |= ~((old == new) | (np.isnan(old) & np.isnan(new)))
+        return np.flatnonzero(changed), columns
+
+    def with_numeric(
+        self,
+        columns: Mapping[str, np.ndarray],
+        extras: Optional[Dict[int, Dict[str, Any]]] = None,
+    ) -> "QuoteTable":
+        """
+        以新的数值列构建新表，原表不变
+
+        代码、名称、标签位图、搜索索引与倒排掩码与原表共享（均不会被修改），不重新构建。
+
+        Args:
+            columns: price / change_pct / volume 的新数组（调用方不应再修改）
+            extras: 新的额外字段，None 时沿用原表
+
+        Returns:
+            新的 QuoteTable
+        """
+        table = QuoteTable.__new__(QuoteTable)
+        for slot in QuoteTable.__slots__:
+            setattr(table, slot, getattr(self, slot))
+        for field in NUMERIC_FIELDS:
+            setattr(table, field, columns[field])
+        if extras is not None:
+            table.extras = extras
+        return table
+
+    def changed_codes(self, new: "QuoteTable") -> Tuple[List[str], List[str]]:
+        """
+        与新表比较
+
+        Returns:
+            (新增或任一字段变化的代码, 被移除的代码)
+        """
+        changed = [
+            code for j, code in enumerate(new.codes)
+            if code not in self.index or self.row(self.index[code]) != new.row(j)
+        ]
+        removed = [code for code in self.codes if code not in new.index]
+        return changed, removed
+
+    def with_row_update(self, row: int, info: Mapping[str, Any]) -> Optional["QuoteTable"]:
+        """
+        写时复制更新一行（merge 语义），原表不变
+
+        复制三列数值数组与 extras 映射（各行的额外字段字典不修改、按需替换），其余结构共享。
+        涉及标签、名称变化时（二者分别影响标签位图与搜索索引）不处理。
+
+        Returns:
+            新表；None 表示需要调用 with_record 全量重建
+        """
+        if "tags" in info and self.tags(row) != list(info.get("tags") or []):
+            return None
+        if info.get("name") is not None and str(info["name"]) != self.names[row]:
+            return None
+        columns = {field: getattr(self, field).copy() for field in NUMERIC_FIELDS}
+        for field in NUMERIC_FIELDS:
+            if field in info:
+                columns[field][row] = _to_float(info[field])
+        extras = None
+        extra = {k: v for k, v in info.items() if k not in CORE_FIELDS}
+        if extra:
+            extras = dict(self.extras)
+            extras[row] = {**self.extras.get(row, {}), **extra}
+        return self.with_numeric(columns, extras)
+
+    def with_record(self, info: Mapping[str, Any]) -> "QuoteTable":
+        """写时复制：返回合并了 info（merge 语义）的新表，原表不变"""
+        code = str(info["code"])
+        row = self.index.get(code)
+        records = self.rows()
+        if row is None:
+            records.append(dict(info))
+        else:
+            records[row].update(info)
+        return QuoteTable.from_records(records)
+
+
+# 空表
+EMPTY_QUOTE_TABLE = QuoteTable.from_records([])
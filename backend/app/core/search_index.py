@@ -0,0 +1,192 @@
+"""
+SearchIndex - ETF 代码 / 名称 / 拼音首字母搜索索引
+
+随行情快照（QuoteTable）构建一次，查询不再线性扫描全表：
+- 代码：排序后的代码数组，前缀匹配为两次二分
+- 名称：小写名称的字符 n-gram 倒排索引（单字 + 二元组），候选集求交后校验子串
+- 拼音首字母：名称逐字转为首字母（"沪深300ETF" -> "hs300etf"），同样建 n-gram 倒排
+
+首字母取自 GB2312 一级汉字（按拼音排序）的区位边界表，不依赖拼音库；
+二级汉字与多音字通过 _INITIAL_OVERRIDES 补充常见于基金名称的部分。
+
+结果按相关度排序：代码完全匹配 > 代码前缀 > 名称完全匹配 > 名称前缀 > 首字母前缀
+> 名称包含 > 首字母包含；同档内匹配位置越靠前、名称越短越优先，最后按表内顺序。
+"""
+
+import bisect
+import heapq
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# GB2312 一级汉字各首字母的起始区位码（一级汉字按拼音排序，无 i / u / v 开头）
+_GB2312_INITIALS: List[Tuple[int, str]] = [
+    (0xB0A1, "a"), (0xB0C5, "b"), (0xB2C1, "c"), (0xB4EE, "d"), (0xB6EA, "e"),
+    (0xB7A2, "f"), (0xB8C1, "g"), (0xB9FE, "h"), (0xBBF7, "j"), (0xBFA6, "k"),
+    (0xC0AC, "l"), (0xC2E8, "m"), (0xC4C3, "n"), (0xC5B6, "o"), (0xC5BE, "p"),
+    (0xC6DA, "q"), (0xC8BB, "r"), (0xC8F6, "s"), (0xCBFA, "t"), (0xCDDA, "w"),
+    (0xCEF4, "x"), (0xD1B9, "y"), (0xD4D1, "z"),
+]
+_GB2312_STARTS = [start for start, _ in _GB2312_INITIALS]
+_GB2312_LEVEL1_END = 0xD7F9
+
+# 多音字（按基金名称中的常见读音）与常见二级汉字
+_INITIAL_OVERRIDES: Dict[str, str] = {
+    "行": "h",  # 银行、行业
+    "重": "c",  # 重庆
+    "圳": "z",
+    "锂": "l",
+    "钴": "g",
+    "钯": "b",
+    "钛": "t",
+    "鑫": "x",
+    "晟": "s",
+    "昊": "h",
+    "睿": "r",
+    "泓": "h",
+    "恺": "k",
+    "禧": "x",
+    "骐": "q",
+}
+
+# 倒排索引的最大 n-gram 长度
+NGRAM = 2
+
+# 相关度档位
+_TIER_CODE_EXACT = 0
+_TIER_CODE_PREFIX = 1
+_TIER_NAME_EXACT = 2
+_TIER_NAME_PREFIX = 3
+_TIER_INITIALS_PREFIX = 4
+_TIER_NAME_CONTAINS = 5
+_TIER_INITIALS_CONTAINS = 6
+
+
+def pinyin_initial(ch: str) -> str:
+    """
+    单个字符的拼音首字母
+
+    Returns:
+        汉字返回小写首字母，ASCII 字符返回其小写，无法识别的字符返回空串
+    """
+    if ch.isascii():
+        return ch.lower() if ch.isalnum() else ""
+    override = _INITIAL_OVERRIDES.get(ch)
+    if override:
+        return override
+    try:
+        encoded = ch.encode("gb2312")
+    except UnicodeEncodeError:
+        return ""
+    if len(encoded) != 2:
+        return ""
+    code = encoded[0] << 8 | encoded[1]
+    if code < _GB2312_STARTS[0] or code > _GB2312_LEVEL1_END:
+        return ""
+    return _GB2312_INITIALS[bisect.bisect_right(_GB2312_STARTS, code) - 1][1]
+
+
+def pinyin_initials(text: str) -> str:
+    """名称的拼音首字母串，如 "沪深300ETF" -> "hs300etf" """
+    return "".join(pinyin_initial(ch) for ch in text)
+
+
+class _NgramIndex:
+    """字符串集合的 n-gram 倒排索引（n = 1..NGRAM）"""
+
+    def __init__(self, texts: List[str]) -> None:
+        self.texts = texts
+        postings: Dict[str, Set[int]] = {}
+        for pos, text in enumerate(texts):
+            for n in range(1, NGRAM + 1):
+                for i in range(len(text) - n + 1):
+                    postings.setdefault(text[i:i + n], set()).add(pos)
+        self._postings = postings
+
+    def candidates(self, query: str) -> Set[int]:
+        """包含 query 的位置（已校验子串）"""
+        if not query:
+            return set()
+        if len(query) <= NGRAM:
+            return set(self._postings.get(query, ()))
+        grams = sorted(
+            {query[i:i + NGRAM] for i in range(len(query) - NGRAM + 1)},
+            key=lambda gram: len(self._postings.get(gram, ())),
+        )
+        result: Optional[Set[int]] = None
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if not posting:
+                return set()
+            result = set(posting) if result is None else result & posting
+            if not result:
+                return set()
+        return {pos for pos in result or () if query in self.texts[pos]}
+
+
+class SearchIndex:
+    """ETF 搜索索引（构建后只读）"""
+
+    def __init__(self, codes: List[str], names_lower: List[str]) -> None:
+        """
+        Args:
+            codes: 表内各行的代码
+            names_lower: 表内各行的小写名称
+        """
+        self._codes = codes
+        self._names = names_lower
+        order = sorted(range(len(codes)), key=codes.__getitem__)
+        self._sorted_codes = [codes[i] for i in order]
+        self._sorted_positions = order
+        self._initials = [pinyin_initials(name) for name in names_lower]
+        self._name_index = _NgramIndex(names_lower)
+        self._initials_index = _NgramIndex(self._initials)
+
+    def _code_prefix(self, query: str) -> Iterable[int]:
+        lo = bisect.bisect_left(self._sorted_codes, query)
+        hi = bisect.bisect_left(self._sorted_codes, query + "\uffff")
+        return self._sorted_positions[lo:hi]
+
+    def search(self, query: str, limit: int = 20) -> List[int]:
+        """
+        搜索并按相关度排序
+
+        Args:
+            query: 代码、名称片段或拼音首字母（大小写不敏感）
+            limit: 返回数量上限
+
+        Returns:
+            命中行在表内的位置
+        """
+        query = query.strip().lower()
+        if not query or limit <= 0:
+            return []
+
+        ranked: Dict[int, Tuple[int, int, int, int]] = {}
+
+        def offer(pos: int, tier: int, offset: int, length: int) -> None:
+            key = (tier, offset, length, pos)
+            if pos not in ranked or key < ranked[pos]:
+                ranked[pos] = key
+
+        for pos in self._code_prefix(query):
+            offer(pos, _TIER_CODE_EXACT if self._codes[pos] == query else _TIER_CODE_PREFIX, 0, 0)
+
+        for pos in self._name_index.candidates(query):
+            name = self._names[pos]
+            if name == query:
+                offer(pos, _TIER_NAME_EXACT, 0, len(name))
+            else:
+                offset = name.find(query)
+                offer(pos, _TIER_NAME_PREFIX if offset == 0 else _TIER_NAME_CONTAINS, offset, len(name))
+
+        if query.isascii():
+            for pos in self._initials_index.candidates(query):
+                initials = self._initials[pos]
+                offset = initials.find(query)
+                offer(
+                    pos,
+                    _TIER_INITIALS_PREFIX if offset == 0 else _TIER_INITIALS_CONTAINS,
+                    offset,
+                    len(initials),
+                )
+
+        return [key[3] for key in heapq.nsmallest(limit, ranked.values())]
@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 import threading
 import logging
@@ -11,11 +12,14 @@ setup_logging()
 
 from app.core.config import settings
 from app.core.cache import etf_cache
+from app.core.executors import api_executor
+from app.core.http_client import http_client
 from app.core.database import create_db_and_tables
 from app.core.share_history_database import create_share_history_tables
 from app.core.init_admin import init_admin_from_env
 from app.services.akshare_service import ak_service, _enrich_with_tags
 from app.services.alert_scheduler import alert_scheduler
+from app.services.notification_service import telegram_bot_pool
 from app.services.fund_flow_collector import fund_flow_collector
 from app.api.v1.api import api_router
 from app.middleware.rate_limit import limiter, rate_limit_handler
@@ -26,10 +30,10 @@ logger = logging.getLogger(__name__)
 def load_initial_data():
     """后台任务：加载全量 ETF 数据"""
     logger.info("Starting background data loading...")
-    data = ak_service.fetch_all_etfs()
+    data, live = ak_service.fetch_all_etfs_with_origin()
     if data:
         _enrich_with_tags(data)
-        etf_cache.set_etf_list(data)
+        etf_cache.set_etf_list(data, live=live)
         logger.info("Initial data loaded into cache.")
     else:
         logger.warning("Failed to load initial data.")
@@ -59,8 +63,11 @@ async def lifespan(app: FastAPI):
     # Shutdown
     alert_scheduler.stop()
     logger.info("Alert scheduler stopped.")
+    await telegram_bot_pool.close()
     fund_flow_collector.stop()
     logger.info("Fund flow collector scheduler stopped.")
+    api_executor.shutdown()
+    http_client.close()
     logger.info("Application shutting down...")
 
 app = FastAPI(
@@ -117,11 +124,36 @@ async def health_check():
 @app.get("/api/v1/health/datasources")
 async def datasource_health():
     from app.core.metrics import datasource_metrics
+    from app.services.akshare_service import (
+        history_fetch_flight, _get_history_manager, etf_list_scheduler,
+    )
+    from app.services.notification_dispatcher import notification_dispatcher
+    from app.services.quote_stream import quote_stream_hub
     return {
         "status": datasource_metrics.get_overall_status(),
         "sources": datasource_metrics.get_summary(),
+        "history_fetch": history_fetch_flight.stats(),
+        "history_hedge": _get_history_manager().stats(),
+        "source_order": {
+            "etf_list": etf_list_scheduler.stats() if etf_list_scheduler else None,
+            "history": _get_history_manager().scheduler_stats(),
+        },
+        "alert_batch": alert_scheduler.last_batch_stats,
+        "notifications": notification_dispatcher.stats(),
+        "quote_stream": quote_stream_hub.stats(),
+        "executors": api_executor.stats(),
+        "http_pool": http_client.stats(),
     }
 
+@app.get("/api/v1/health/datasources/metrics", response_class=PlainTextResponse)
+async def datasource_metrics_prometheus():
+    """数据源指标（Prometheus 文本格式）"""
+    from app.core.metrics import datasource_metrics
+    return PlainTextResponse(
+        datasource_metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app", 
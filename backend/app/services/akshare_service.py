@@ -1,6 +1,7 @@
 import akshare as ak
 import pandas as pd
-from typing import List, Dict, Optional, Any, cast
+import numpy as np
+from typing import List, Dict, Optional, Any, Tuple, cast
 import logging
 from diskcache import Cache
 from datetime import datetime
@@ -9,60 +10,64 @@ import os
 import time
 import threading
 import urllib.request
-import requests
 import json
 
 # 强制禁用代理，防止本地环境代理干扰
 urllib.request.getproxies = lambda: {}
 
-# 补丁 requests 增加默认 User-Agent、超时时间并彻底禁用代理
-_original_session_init = requests.Session.__init__
-_original_session_request = requests.Session.request
-
-def _patched_session_init(self, *args, **kwargs):
-    _original_session_init(self, *args, **kwargs)
-    self.headers.update({
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    })
-    self.trust_env = False
-    self.proxies = {"http": None, "https": None}
-
-def _patched_session_request(self, method, url, **kwargs):
-    # 为国外服务器设置更长的超时时间（默认 180 秒）
-    if 'timeout' not in kwargs:
-        kwargs['timeout'] = 180
-    return _original_session_request(self, method, url, **kwargs)
-
-requests.Session.__init__ = _patched_session_init
-requests.Session.request = _patched_session_request
+# requests 默认 User-Agent、按域名超时、禁用代理，模块级请求复用按域名的连接池
+from app.core.http_client import install_requests_defaults
+install_requests_defaults()
 
 from app.core.cache import etf_cache
 from app.core.config import settings
+from app.core.history_store import history_store
+from app.core.memory_cache import TieredCache, memory_cache
+from app.core.singleflight import SingleFlight
 from app.core.metrics import track_datasource
-from app.services.datasource_manager import DataSourceManager
-from app.services.etf_classifier import ETFClassifier
-
-_classifier = ETFClassifier()
+from app.services.datasource_manager import HISTORY_OPERATION, DataSourceManager
+from app.services.source_scheduler import SourceScheduler
+from app.services.etf_classifier import etf_classifier as _classifier
 
 
 def _enrich_with_tags(etf_list: List[Dict]) -> List[Dict]:
-    """为 ETF 列表中的每个 ETF 添加分类标签（原地修改）"""
-    for etf in etf_list:
-        try:
-            tags = _classifier.classify(etf.get("name", ""), etf.get("code", ""))
-            etf["tags"] = [t.to_dict() for t in tags]
-        except Exception:
-            logger.warning(f"Classification failed for {etf.get('code')}, skipping tags")
-            etf["tags"] = []
+    """为 ETF 列表中的每个 ETF 添加分类标签（原地修改，名称未变的 ETF 命中分类缓存）"""
+    tag_lists = _classifier.classify_batch(
+        [etf.get("name", "") for etf in etf_list],
+        [etf.get("code", "") for etf in etf_list],
+    )
+    for etf, tags in zip(etf_list, tag_lists):
+        etf["tags"] = [t.to_dict() for t in tags]
     return etf_list
 
 logger = logging.getLogger(__name__)
 
-# DiskCache setup
+# DiskCache setup（前置进程内 LRU；读取返回独立副本）
 CACHE_DIR = settings.CACHE_DIR
-disk_cache = Cache(CACHE_DIR)
+disk_cache = TieredCache(Cache(CACHE_DIR), memory_cache)
 ETF_LIST_CACHE_KEY = "etf_list_all"
 
+# 历史数据上游拉取的单飞合并：同一 (code, period, adjust) 并发未命中只请求一次
+history_fetch_flight = SingleFlight()
+
+# 实时 ETF 列表数据源（名称与 track_datasource 一致），默认按此优先级
+ETF_LIST_SOURCES = ("sina", "eastmoney", "ths")
+# 列表接口在指标中的操作标签（eastmoney 同时提供列表与历史数据，按操作分开统计）
+ETF_LIST_OPERATION = "list"
+
+
+def _build_source_scheduler(operation: str) -> Optional[SourceScheduler]:
+    if not settings.SOURCE_ADAPTIVE_ORDER:
+        return None
+    return SourceScheduler(
+        min_samples=settings.SOURCE_MIN_SAMPLES,
+        explore_every=settings.SOURCE_EXPLORE_EVERY,
+        operation=operation,
+    )
+
+
+etf_list_scheduler = _build_source_scheduler(ETF_LIST_OPERATION)
+
 def _build_history_manager() -> DataSourceManager:
     """构建历史数据源管理器（延迟初始化，避免循环导入）"""
     sources = []
@@ -81,6 +86,11 @@ def _build_history_manager() -> DataSourceManager:
         cb_threshold=settings.CIRCUIT_BREAKER_THRESHOLD,
         cb_window=settings.CIRCUIT_BREAKER_WINDOW,
         cb_cooldown=settings.CIRCUIT_BREAKER_COOLDOWN,
+        hedge=settings.HISTORY_HEDGE_ENABLED,
+        hedge_min_delay=settings.HISTORY_HEDGE_MIN_DELAY,
+        hedge_default_delay=settings.HISTORY_HEDGE_DEFAULT_DELAY,
+        hedge_workers=settings.HISTORY_HEDGE_WORKERS,
+        scheduler=_build_source_scheduler(HISTORY_OPERATION),
     )
 
 _history_manager: Optional[DataSourceManager] = None
@@ -98,6 +108,9 @@ def _get_history_manager() -> DataSourceManager:
 class AkShareService:
     _refresh_lock = threading.Lock()
     _is_refreshing = False
+    # 后台刷新中的历史数据 key（stale-while-revalidate 去重）
+    _revalidating: set = set()
+    _revalidate_lock = threading.Lock()
 
     @staticmethod
     def load_fallback_data() -> List[Dict]:
@@ -114,7 +127,7 @@ class AkShareService:
         return []
 
     @staticmethod
-    @track_datasource("eastmoney")
+    @track_datasource("eastmoney", operation=ETF_LIST_OPERATION)
     def _fetch_etfs_eastmoney() -> List[Dict[str, Any]]:
         """从东方财富获取 ETF 列表（单次尝试）"""
         df = ak.fund_etf_spot_em()
@@ -132,7 +145,7 @@ class AkShareService:
         return cast(List[Dict[str, Any]], df[["code", "name", "price", "change_pct", "volume"]].to_dict(orient="records"))
 
     @staticmethod
-    @track_datasource("sina")
+    @track_datasource("sina", operation=ETF_LIST_OPERATION)
     def _fetch_etfs_sina() -> List[Dict[str, Any]]:
         """从新浪获取 ETF 列表"""
         sina_categories = ["ETF基金", "QDII基金", "封闭式基金"]
@@ -168,7 +181,7 @@ class AkShareService:
         return deduped
 
     @staticmethod
-    @track_datasource("ths")
+    @track_datasource("ths", operation=ETF_LIST_OPERATION)
     def _fetch_etfs_ths() -> List[Dict[str, Any]]:
         """从同花顺获取 ETF 列表"""
         df = ak.fund_etf_spot_ths()
@@ -187,31 +200,34 @@ class AkShareService:
     @staticmethod
     def fetch_all_etfs() -> List[Dict]:
         """获取全市场 ETF 实时行情（5 级降级链）"""
-        # --- Attempt 1: Sina（成功率最高） ---
-        try:
-            records = AkShareService._fetch_etfs_sina()
-            disk_cache.set(ETF_LIST_CACHE_KEY, records, expire=86400)
-            return records
-        except Exception:
-            pass
-
-        # --- Attempt 2: EastMoney（单次尝试，不等待） ---
-        logger.warning("Sina failed, trying EastMoney fallback...")
-        try:
-            records = AkShareService._fetch_etfs_eastmoney()
-            disk_cache.set(ETF_LIST_CACHE_KEY, records, expire=86400)
-            return records
-        except Exception:
-            pass
-
-        # --- Attempt 3: THS ---
-        logger.warning("EastMoney failed, trying THS fallback...")
-        try:
-            records = AkShareService._fetch_etfs_ths()
-            disk_cache.set(ETF_LIST_CACHE_KEY, records, expire=86400)
-            return records
-        except Exception:
-            pass
+        return AkShareService.fetch_all_etfs_with_origin()[0]
+
+    @staticmethod
+    def fetch_all_etfs_with_origin() -> Tuple[List[Dict], bool]:
+        """
+        获取全市场 ETF 实时行情，并标明数据是否来自在线数据源
+
+        Returns:
+            (行情列表, 是否在线获取)；磁盘缓存与兜底 JSON 中的价格可能已过时，标记为 False
+        """
+        # --- Attempt 1-3: 在线数据源（Sina → EastMoney → THS，启用动态排序时按近期表现调整） ---
+        fetchers = {
+            "sina": AkShareService._fetch_etfs_sina,
+            "eastmoney": AkShareService._fetch_etfs_eastmoney,
+            "ths": AkShareService._fetch_etfs_ths,
+        }
+        order = (
+            etf_list_scheduler.order(ETF_LIST_SOURCES)
+            if etf_list_scheduler is not None
+            else list(ETF_LIST_SOURCES)
+        )
+        for name in order:
+            try:
+                records = fetchers[name]()
+                disk_cache.set(ETF_LIST_CACHE_KEY, records, expire=86400)
+                return records, True
+            except Exception:
+                logger.warning(f"ETF list source {name} failed, trying next...")
 
         # --- Attempt 4: Disk Cache ---
         logger.warning("All online sources failed. Attempting disk cache...")
@@ -228,11 +244,11 @@ class AkShareService:
         cached_list = cast(List[Dict[str, Any]], disk_cache.get(ETF_LIST_CACHE_KEY))
         if cached_list and len(cached_list) > 20:
             logger.info(f"Restored {len(cached_list)} ETFs from disk cache.")
-            return cached_list
+            return cached_list, False
 
         # --- Attempt 5: Fallback JSON ---
         logger.warning("Disk cache empty or stale. Loading fallback JSON...")
-        return AkShareService.load_fallback_data()
+        return AkShareService.load_fallback_data(), False
 
     @staticmethod
     def _refresh_task():
@@ -244,10 +260,10 @@ class AkShareService:
                 AkShareService._is_refreshing = True
 
             logger.info("Starting background refresh of ETF list...")
-            data = AkShareService.fetch_all_etfs()
+            data, live = AkShareService.fetch_all_etfs_with_origin()
             if data:
                 _enrich_with_tags(data)
-                etf_cache.set_etf_list(data)
+                etf_cache.set_etf_list(data, live=live)
                 logger.info("Background refresh complete.")
         except Exception as e:
             logger.error(f"Error in background refresh: {e}")
@@ -285,47 +301,234 @@ class AkShareService:
         return info
 
     @staticmethod
-    def fetch_history_raw(code: str, period: str, adjust: str) -> pd.DataFrame:
-        """历史数据获取（DataSourceManager + DiskCache 兜底）"""
+    def _migrate_legacy_history(code: str, period: str, adjust: str) -> None:
+        """将旧版 DiskCache 中 pickle 的历史 DataFrame 迁移到列式存储（一次性）"""
         cache_key = f"hist_{code}_{period}_{adjust}"
         fallback_key = f"hist_fallback_{code}_{period}_{adjust}"
 
-        # 1. DiskCache 命中 → 直接返回
-        cached_data = disk_cache.get(cache_key)
-        if cached_data is not None:
-            return cast(pd.DataFrame, cached_data)
+        cached_data, expire_time = disk_cache.get(cache_key, expire_time=True)
+        if cached_data is None:
+            cached_data, expire_time = disk_cache.get(fallback_key), None
+        if cached_data is None or cast(pd.DataFrame, cached_data).empty:
+            return
+
+        # 按原 7 天过期时间还原拉取时间；只有永久兜底时视为已过期
+        fetched_at = expire_time - 604800 if expire_time else 0.0
+        history_store.write(code, period, adjust, cast(pd.DataFrame, cached_data), fetched_at=fetched_at)
+        disk_cache.delete(cache_key)
+        disk_cache.delete(fallback_key)
+        logger.info("Migrated legacy pickled history for %s into history store", code)
 
-        # 2. DataSourceManager 按优先级尝试各在线源
+    @staticmethod
+    def _incremental_update(code: str, period: str, adjust: str) -> Optional[bool]:
+        """
+        增量更新列式存储：仅拉取最后日期之前若干天起的尾部数据
+
+        通过重叠区间的收盘价比对检测前复权因子变化（分红、拆分等），
+        不一致时需要整段重新拉取。
+
+        Returns:
+            True  - 已追加新数据（或确认无新数据）
+            False - 重叠区间不一致 / 无重叠，需要全量拉取
+            None  - 在线源全部失败
+        """
+        last_date = history_store.last_date(code, period, adjust)
+        if last_date is None:
+            return False
+
+        overlap_start = pd.Timestamp(last_date) - pd.Timedelta(days=settings.HISTORY_INCREMENTAL_OVERLAP_DAYS)
         manager = _get_history_manager()
-        df = manager.fetch_history(code, "20000101", "20500101", adjust)
-        if df is not None and not df.empty:
-            disk_cache.set(cache_key, df, expire=604800)  # 7 天缓存
-            disk_cache.set(fallback_key, df)  # 永不过期兜底
-            return df
-
-        # 3. 所有在线源失败 → 过期缓存兜底
-        fallback_data = disk_cache.get(fallback_key)
-        if fallback_data is not None:
-            logger.warning("Using stale fallback cache for %s", code)
-            return cast(pd.DataFrame, fallback_data)
+        df = manager.fetch_history(code, overlap_start.strftime("%Y%m%d"), "20500101", adjust)
+        if df is None or df.empty:
+            return None
+
+        fetched = df.assign(date=pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d"))
+        stored = history_store.read(code, period, adjust, start_date=overlap_start.strftime("%Y-%m-%d"))
+        if stored is None:
+            return False
+        overlap = stored[["date", "close"]].merge(
+            fetched[["date", "close"]], on="date", suffixes=("_stored", "_fetched")
+        )
+        if overlap.empty:
+            logger.info("No overlap between stored and fetched history for %s, full refetch", code)
+            return False
+
+        close_stored = pd.to_numeric(overlap["close_stored"], errors="coerce").to_numpy(dtype=float)
+        close_fetched = pd.to_numeric(overlap["close_fetched"], errors="coerce").to_numpy(dtype=float)
+        if not np.allclose(close_stored, close_fetched, rtol=1e-4, atol=1e-6, equal_nan=True):
+            logger.info("Adjustment factor changed for %s (overlap closes differ), full refetch", code)
+            return False
+
+        appended = history_store.append(code, period, adjust, fetched)
+        logger.info("Incremental history update for %s: %d new bars", code, appended)
+        return True
+
+    @staticmethod
+    def _refresh_history(code: str, period: str, adjust: str) -> bool:
+        """
+        刷新列式存储：已有存储时增量拉取尾部，复权变化或无存储时全量拉取
+
+        Returns:
+            存储是否已是最新
+        """
+        # 排队期间可能已被前一个调用刷新
+        if history_store.is_fresh(code, period, adjust, settings.HISTORY_CACHE_TTL):
+            return True
+
+        updated = AkShareService._incremental_update(code, period, adjust)
+        if updated is False:
+            manager = _get_history_manager()
+            df = manager.fetch_history(code, "20000101", "20500101", adjust)
+            if df is not None and not df.empty:
+                history_store.write(code, period, adjust, df)
+                updated = True
+        return bool(updated)
+
+    @staticmethod
+    def _revalidate_history_task(code: str, period: str, adjust: str) -> None:
+        """后台任务：刷新过期的历史数据"""
+        key = (code, period, adjust)
+        try:
+            history_fetch_flight.do(key, lambda: AkShareService._refresh_history(code, period, adjust))
+        except Exception as e:
+            logger.error(f"Error revalidating history for {code}: {e}")
+        finally:
+            with AkShareService._revalidate_lock:
+                AkShareService._revalidating.discard(key)
+
+    @staticmethod
+    def _schedule_history_revalidate(code: str, period: str, adjust: str) -> None:
+        """调度后台刷新（同一 key 同时只有一个后台任务）"""
+        key = (code, period, adjust)
+        with AkShareService._revalidate_lock:
+            if key in AkShareService._revalidating:
+                return
+            AkShareService._revalidating.add(key)
+
+        logger.info(f"Serving stale history for {code}, revalidating in background")
+        t = threading.Thread(
+            target=AkShareService._revalidate_history_task, args=(code, period, adjust)
+        )
+        t.daemon = True
+        t.start()
+
+    @staticmethod
+    def refresh_history(code: str, period: str = "daily", adjust: str = "qfq") -> bool:
+        """
+        同步刷新过期的本地历史数据（未过期时不请求上游，并发调用合并为一次上游请求）
+
+        供基于历史数据的派生结果（如网格参数）在重新计算前使用，
+        避免从 stale-while-revalidate 返回的旧数据重新计算。
+
+        Returns:
+            本地历史数据是否为最新
+        """
+        if history_store.fetched_at(code, period, adjust) is None:
+            AkShareService._migrate_legacy_history(code, period, adjust)
+        return bool(history_fetch_flight.do(
+            (code, period, adjust),
+            lambda: AkShareService._refresh_history(code, period, adjust),
+        ))
+
+    @staticmethod
+    def get_history_fetched_at(code: str, period: str = "daily", adjust: str = "qfq") -> Optional[float]:
+        """本地历史数据上次拉取的时间戳，无本地数据时返回 None"""
+        return history_store.fetched_at(code, period, adjust)
+
+    @staticmethod
+    def get_history_age(code: str, period: str = "daily", adjust: str = "qfq") -> Optional[float]:
+        """本地历史数据距离上次拉取的秒数，无本地数据时返回 None"""
+        fetched_at = history_store.fetched_at(code, period, adjust)
+        if fetched_at is None:
+            return None
+        return max(0.0, time.time() - fetched_at)
+
+    @staticmethod
+    def fetch_history_raw(
+        code: str,
+        period: str,
+        adjust: str,
+        start_date: Optional[str] = None,
+        tail: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        历史数据获取（列式存储 + DataSourceManager 在线源）
+
+        本地数据过期时默认先返回旧数据并后台刷新（HISTORY_STALE_WHILE_REVALIDATE），
+        仅在本地无数据时同步请求上游。
+
+        Args:
+            start_date: 仅读取该日期（含）之后的数据
+            tail: 仅读取最后 N 行
+
+        Returns:
+            DataFrame（columns: date, open, high, low, close, volume），失败时为空
+        """
+        if history_store.fetched_at(code, period, adjust) is None:
+            AkShareService._migrate_legacy_history(code, period, adjust)
+
+        # 1. 列式存储未过期 → 直接按需读取切片
+        if history_store.is_fresh(code, period, adjust, settings.HISTORY_CACHE_TTL):
+            stored = history_store.read(code, period, adjust, start_date=start_date, tail=tail)
+            if stored is not None:
+                return stored
+
+        # 1b. stale-while-revalidate：已过期但有本地数据 → 立即返回，后台刷新
+        if settings.HISTORY_STALE_WHILE_REVALIDATE:
+            stale = history_store.read(code, period, adjust, start_date=start_date, tail=tail)
+            if stale is not None:
+                AkShareService._schedule_history_revalidate(code, period, adjust)
+                return stale
+
+        # 2. 在线拉取（并发调用合并为一次上游请求）
+        updated = history_fetch_flight.do(
+            (code, period, adjust),
+            lambda: AkShareService._refresh_history(code, period, adjust),
+        )
+        if updated:
+            stored = history_store.read(code, period, adjust, start_date=start_date, tail=tail)
+            if stored is not None:
+                return stored
+
+        # 3. 所有在线源失败 → 过期存储兜底
+        stale = history_store.read(code, period, adjust, start_date=start_date, tail=tail)
+        if stale is not None:
+            logger.warning("Using stale history store for %s", code)
+            return stale
 
         return pd.DataFrame()
 
     @staticmethod
-    def get_etf_history(code: str, period: str = "daily", adjust: str = "qfq") -> List[Dict]:
+    def get_etf_history_frame(code: str, period: str = "daily", adjust: str = "qfq") -> pd.DataFrame:
+        """
+        历史行情 DataFrame（拼接实时价格点）
+
+        与 get_etf_history 相同的数据，但直接返回 DataFrame，
+        供需要向量计算的调用方避免 list[dict] 往返转换。
+        """
         df_hist = AkShareService.fetch_history_raw(code, period, adjust)
-        if df_hist.empty: return []
+        if df_hist.empty:
+            return df_hist
         realtime_info = AkShareService.get_etf_info(code)
-        records = df_hist.to_dict(orient="records")
         if realtime_info and realtime_info.get("price"):
+            price = realtime_info["price"]
             # 使用中国时区判断"今天"的日期
             today_str = datetime.now(ZoneInfo("Asia/Shanghai")).strftime("%Y-%m-%d")
-            if records:
-                last_record = records[-1]
-                if last_record["date"] == today_str:
-                    last_record["close"] = realtime_info["price"]
-                else:
-                    records.append({"date": today_str, "open": realtime_info["price"], "close": realtime_info["price"], "high": realtime_info["price"], "low": realtime_info["price"], "volume": 0})
-        return records
+            if df_hist["date"].iloc[-1] == today_str:
+                df_hist.loc[df_hist.index[-1], "close"] = price
+            else:
+                today_row = pd.DataFrame([{
+                    "date": today_str, "open": price, "close": price,
+                    "high": price, "low": price, "volume": 0,
+                }])
+                df_hist = pd.concat([df_hist, today_row], ignore_index=True)
+        return df_hist
+
+    @staticmethod
+    def get_etf_history(code: str, period: str = "daily", adjust: str = "qfq") -> List[Dict]:
+        df_hist = AkShareService.get_etf_history_frame(code, period, adjust)
+        if df_hist.empty: return []
+        # 实时价格点等行缺少的列（如成交额）为 NaN，转为 None 以便 JSON 序列化
+        return df_hist.astype(object).where(df_hist.notna(), None).to_dict(orient="records")
 
 ak_service = AkShareService()
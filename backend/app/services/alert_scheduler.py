@@ -6,14 +6,19 @@
 
 import asyncio
 import logging
-from datetime import datetime
-from typing import List, Optional, Dict, Any
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, time as dt_time
+from typing import Any, Dict, Iterable, List, Optional
 from zoneinfo import ZoneInfo
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from sqlmodel import Session, select
 
+from app.core.cache import etf_cache
+from app.core.change_feed import ChangeEvent
 from app.core.database import engine
 from app.models.user import User, Watchlist
 from app.models.alert_config import UserAlertPreferences, SignalItem
@@ -21,6 +26,10 @@ from app.services.alert_service import alert_service
 from app.services.alert_state_service import alert_state_service
 from app.services.notification_service import TelegramNotificationService
 from app.services.akshare_service import ak_service
+from app.services.metrics_snapshot_service import metrics_snapshot_service
+from app.services.notification_dispatcher import notification_dispatcher
+from app.services.panel_service import panel_service
+from app.services.price_alert_index import price_alert_index
 from app.services.temperature_service import temperature_service
 from app.services.trend_service import trend_service
 from app.core.encryption import decrypt_token
@@ -28,12 +37,57 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# A 股连续竞价时段（北京时间）；集合竞价的撮合前报价不用于触发到价提醒
+TRADING_SESSIONS = ((dt_time(9, 30), dt_time(11, 30)), (dt_time(13, 0), dt_time(15, 0)))
+
+
+def is_trading_hours(now: Optional[datetime] = None) -> bool:
+    """当前是否处于 A 股连续竞价时段（周一至周五，北京时间）"""
+    now = now or datetime.now(ZoneInfo("Asia/Shanghai"))
+    if now.weekday() >= 5:
+        return False
+    current = now.time()
+    return any(start <= current <= end for start, end in TRADING_SESSIONS)
+
+
+def _compute_batch_metrics(frames: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """批量计算温度、日趋势与周趋势
+
+    模块级函数，便于提交到进程池（需可 pickle）。
+
+    Args:
+        frames: ETF 代码 -> 日线 DataFrame
+
+    Returns:
+        ETF 代码 -> {"temperature", "daily_trend", "weekly_trend", "data_date"}
+    """
+    batch = panel_service.compute(frames)
+    results = {}
+    for etf_code, computed in batch.items():
+        try:
+            weekly_trend = trend_service.get_weekly_trend(frames[etf_code])
+        except Exception as e:
+            logger.error(f"Error computing weekly trend for ETF {etf_code}: {e}")
+            continue
+        results[etf_code] = {
+            "temperature": computed["temperature"],
+            "daily_trend": computed["daily_trend"],
+            "weekly_trend": weekly_trend,
+            "data_date": computed["last_date"],
+        }
+    return results
+
 
 class AlertScheduler:
     """告警调度器"""
 
     def __init__(self):
         self._scheduler: Optional[AsyncIOScheduler] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        # 调度器所在事件循环，行情刷新线程通过它投递到价提醒触发任务
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 最近一次批量指标计算的统计（ETF 数、成功 / 失败 / 超时数、各阶段耗时）
+        self.last_batch_stats: Dict[str, Any] = {}
 
     def start(self) -> None:
         """启动调度器（支持盘中和收盘检查）"""
@@ -105,12 +159,25 @@ class AlertScheduler:
         self._scheduler.start()
         logger.info("Alert scheduler started with intraday and daily checks")
 
+        # 到价提醒索引：启动时从数据库构建，之后每次行情刷新即时求值
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+        self._load_price_alert_index()
+        etf_cache.changes.subscribe(self._on_quotes_changed)
+
     def stop(self) -> None:
         """停止调度器"""
         if self._scheduler:
             self._scheduler.shutdown(wait=False)
             self._scheduler = None
             logger.info("Alert scheduler stopped")
+        etf_cache.changes.unsubscribe(self._on_quotes_changed)
+        self._loop = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
 
     async def _fetch_summary_etf_data(
         self, etf_codes: List[str]
@@ -119,7 +186,10 @@ class AlertScheduler:
 
         直接从数据源获取最新行情，绕过内存缓存，确保使用收盘数据。
         仅在数据源完全不可用时 fallback 到内存缓存。
+        指标优先使用当日收盘快照（通常已由 15:30 告警检查写入），缺失时再计算并写入快照；
+        最多 ALERT_FETCH_CONCURRENCY 只同时计算，单只超过 ALERT_FETCH_TIMEOUT 秒时指标记为 None。
         """
+        trading_date = metrics_snapshot_service.current_trading_date()
         try:
             fresh_list = await asyncio.to_thread(ak_service.fetch_all_etfs)
         except Exception as e:
@@ -132,29 +202,47 @@ class AlertScheduler:
         else:
             logger.warning("Summary: fresh fetch failed, falling back to cache")
 
+        semaphore = asyncio.Semaphore(max(1, settings.ALERT_FETCH_CONCURRENCY))
+        timeout = settings.ALERT_FETCH_TIMEOUT
         etf_data: Dict[str, Dict[str, Any]] = {}
-        for etf_code in etf_codes:
-            try:
-                info = fresh_map.get(etf_code)
-                if info is None:
-                    # ETF 不在全市场列表（退市/停牌）或数据源完全失败，fallback 到缓存
-                    info = await asyncio.to_thread(
-                        ak_service.get_etf_info, etf_code
-                    )
-                    if info is not None:
-                        logger.info(
-                            f"Summary: {etf_code} not in fresh data, used cache fallback"
-                        )
-                    else:
-                        logger.warning(
-                            f"Summary: {etf_code} not available from any source"
+
+        async def fetch_one(etf_code: str) -> None:
+            async with semaphore:
+                try:
+                    info = fresh_map.get(etf_code)
+                    if info is None:
+                        # ETF 不在全市场列表（退市/停牌）或数据源完全失败，fallback 到缓存
+                        info = await asyncio.to_thread(
+                            ak_service.get_etf_info, etf_code
                         )
-                metrics = await self._fetch_and_compute_etf_metrics(etf_code)
-                etf_data[etf_code] = {"info": info, "metrics": metrics}
-            except Exception as e:
-                logger.error(f"Failed to fetch data for {etf_code}: {e}")
+                        if info is not None:
+                            logger.info(
+                                f"Summary: {etf_code} not in fresh data, used cache fallback"
+                            )
+                        else:
+                            logger.warning(
+                                f"Summary: {etf_code} not available from any source"
+                            )
+                    metrics = metrics_snapshot_service.get(etf_code, trading_date)
+                    if metrics is None:
+                        try:
+                            metrics = await asyncio.wait_for(
+                                self._fetch_and_compute_etf_metrics(etf_code), timeout=timeout
+                            )
+                        except asyncio.TimeoutError:
+                            logger.warning(
+                                f"Summary: computing metrics for {etf_code} timed out after {timeout}s"
+                            )
+                        if metrics is not None and trading_date is not None:
+                            metrics_snapshot_service.put(etf_code, metrics, trading_date)
+                    etf_data[etf_code] = {"info": info, "metrics": metrics}
+                except Exception as e:
+                    logger.error(f"Failed to fetch data for {etf_code}: {e}")
 
-        return etf_data
+        # 快照未命中的 ETF 与 _fetch_histories 一样并发拉取（同样的并发上限与单只超时）
+        await asyncio.gather(*(fetch_one(code) for code in etf_codes))
+        # 保持与输入相同的顺序
+        return {code: etf_data[code] for code in etf_codes if code in etf_data}
 
     async def _fetch_and_compute_etf_metrics(self, etf_code: str) -> Optional[Dict[str, Any]]:
         """获取 ETF 数据并计算指标
@@ -163,7 +251,8 @@ class AlertScheduler:
             etf_code: ETF 代码
 
         Returns:
-            包含 temperature, daily_trend, weekly_trend 的字典，如果获取失败则返回 None
+            包含 temperature, daily_trend, weekly_trend, data_date（最后一根 K 线日期）的字典，
+            如果获取失败则返回 None
         """
         df = await asyncio.to_thread(ak_service.fetch_history_raw, etf_code, "daily", "qfq")
         if df is None or df.empty:
@@ -175,9 +264,165 @@ class AlertScheduler:
                 "temperature": temperature_service.calculate_temperature(df),
                 "daily_trend": trend_service.get_daily_trend(df),
                 "weekly_trend": trend_service.get_weekly_trend(df),
+                "data_date": str(df["date"].iloc[-1]),
             }
         return await asyncio.to_thread(compute_metrics)
 
+    async def _fetch_histories(self, etf_codes: List[str]) -> Dict[str, Any]:
+        """并发获取多只 ETF 的日线历史
+
+        最多 ALERT_FETCH_CONCURRENCY 只同时拉取，单只超过 ALERT_FETCH_TIMEOUT 秒
+        即放弃等待并跳过（已提交的线程会继续执行完毕，结果写入历史存储供下次使用）。
+
+        Args:
+            etf_codes: ETF 代码列表
+
+        Returns:
+            ETF 代码 -> DataFrame，获取失败 / 超时 / 无数据的 ETF 不出现在结果中
+        """
+        semaphore = asyncio.Semaphore(max(1, settings.ALERT_FETCH_CONCURRENCY))
+        timeout = settings.ALERT_FETCH_TIMEOUT
+        total = len(etf_codes)
+        progress = {"done": 0, "failed": 0, "timed_out": 0}
+        log_every = max(1, total // 10)
+        frames: Dict[str, Any] = {}
+
+        async def fetch_one(etf_code: str) -> None:
+            async with semaphore:
+                try:
+                    df = await asyncio.wait_for(
+                        asyncio.to_thread(ak_service.fetch_history_raw, etf_code, "daily", "qfq"),
+                        timeout=timeout,
+                    )
+                    if df is None or df.empty:
+                        logger.warning(f"No data for ETF {etf_code}")
+                        progress["failed"] += 1
+                    else:
+                        frames[etf_code] = df
+                except asyncio.TimeoutError:
+                    logger.warning(f"Fetching history for ETF {etf_code} timed out after {timeout}s")
+                    progress["timed_out"] += 1
+                except Exception as e:
+                    logger.error(f"Failed to fetch history for ETF {etf_code}: {e}")
+                    progress["failed"] += 1
+                progress["done"] += 1
+                if progress["done"] % log_every == 0 or progress["done"] == total:
+                    logger.info(
+                        f"Fetched {progress['done']}/{total} ETFs "
+                        f"({progress['failed']} failed, {progress['timed_out']} timed out)"
+                    )
+
+        await asyncio.gather(*(fetch_one(code) for code in etf_codes))
+        self.last_batch_stats.update(
+            total=total,
+            fetched=len(frames),
+            failed=progress["failed"],
+            timed_out=progress["timed_out"],
+        )
+        # 保持与输入相同的顺序
+        return {code: frames[code] for code in etf_codes if code in frames}
+
+    def _get_process_pool(self) -> Optional[ProcessPoolExecutor]:
+        """按需创建指标计算进程池（ALERT_COMPUTE_PROCESSES 为 0 时不使用）"""
+        workers = settings.ALERT_COMPUTE_PROCESSES
+        if workers <= 0:
+            return None
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(max_workers=workers)
+        return self._process_pool
+
+    async def _compute_metrics(self, frames: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """计算批量指标：配置了进程池时按 ETF 分片并行，否则在线程中整体计算"""
+        pool = self._get_process_pool()
+        if pool is None or len(frames) <= 1:
+            return await asyncio.to_thread(_compute_batch_metrics, frames)
+
+        codes = list(frames)
+        chunk_size = -(-len(codes) // settings.ALERT_COMPUTE_PROCESSES)
+        chunks = [
+            {code: frames[code] for code in codes[i:i + chunk_size]}
+            for i in range(0, len(codes), chunk_size)
+        ]
+        loop = asyncio.get_running_loop()
+        try:
+            parts = await asyncio.gather(
+                *(loop.run_in_executor(pool, _compute_batch_metrics, chunk) for chunk in chunks)
+            )
+        except BrokenProcessPool as e:
+            logger.error(f"Metrics process pool broken, computing in thread: {e}")
+            self._process_pool = None
+            return await asyncio.to_thread(_compute_batch_metrics, frames)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for part in parts:
+            results.update(part)
+        return results
+
+    async def _fetch_and_compute_batch_metrics(
+        self, etf_codes: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """批量获取多只 ETF 数据并计算指标
+
+        历史数据按 ALERT_FETCH_CONCURRENCY 并发拉取；温度与日趋势由 panel_service
+        对全部 ETF 做一次矩阵计算，周趋势依赖周线重采样，仍逐只计算。
+        各阶段耗时与成功数记录在 last_batch_stats 中。
+
+        Args:
+            etf_codes: ETF 代码列表
+
+        Returns:
+            ETF 代码 -> 与 _fetch_and_compute_etf_metrics 结构相同的指标字典，
+            获取数据失败的 ETF 不出现在结果中
+        """
+        self.last_batch_stats = {"started_at": datetime.now().isoformat()}
+
+        started = time.perf_counter()
+        frames = await self._fetch_histories(etf_codes)
+        fetch_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = await self._compute_metrics(frames)
+        compute_seconds = time.perf_counter() - started
+
+        self.last_batch_stats.update(
+            computed=len(results),
+            fetch_seconds=round(fetch_seconds, 3),
+            compute_seconds=round(compute_seconds, 3),
+        )
+        logger.info(
+            f"Batch metrics: {len(results)}/{len(etf_codes)} ETFs, "
+            f"fetch {fetch_seconds:.1f}s, compute {compute_seconds:.1f}s"
+        )
+        return results
+
+    async def _get_metrics(self, etf_codes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """获取多只 ETF 的指标，收盘后优先复用当日快照
+
+        交易时段内（盘中检查）总是重新计算且不写快照；收盘后只计算快照缺失的 ETF，
+        并把结果写入快照供摘要和接口复用。
+
+        Args:
+            etf_codes: ETF 代码列表
+
+        Returns:
+            ETF 代码 -> 指标字典，获取数据失败的 ETF 不出现在结果中
+        """
+        trading_date = metrics_snapshot_service.current_trading_date()
+        metrics = metrics_snapshot_service.get_many(etf_codes, trading_date) if trading_date else {}
+        missing = [code for code in etf_codes if code not in metrics]
+        if metrics:
+            logger.info(
+                f"Metrics snapshot {trading_date}: reused {len(metrics)}, computing {len(missing)}"
+            )
+
+        if missing:
+            computed = await self._fetch_and_compute_batch_metrics(missing)
+            if trading_date:
+                metrics_snapshot_service.put_many(computed, trading_date)
+            metrics.update(computed)
+
+        return {code: metrics[code] for code in etf_codes if code in metrics}
+
     def _process_user_signals(
         self,
         user_id: int,
@@ -234,6 +479,9 @@ class AlertScheduler:
             # 收集信号
             signals: List[SignalItem] = []
 
+            # 获取 ETF 指标（收盘后复用当日快照，缺失的批量计算）
+            batch_metrics = await self._get_metrics(list(etf_users_map))
+
             for etf_code, users_data in etf_users_map.items():
                 try:
                     # 防御性检查：确保 users_data 不为空
@@ -241,8 +489,7 @@ class AlertScheduler:
                         logger.error(f"No user data found for ETF {etf_code}, user {user_id}")
                         continue
 
-                    # 获取 ETF 数据并计算指标
-                    metrics = await self._fetch_and_compute_etf_metrics(etf_code)
+                    metrics = batch_metrics.get(etf_code)
                     if metrics is None:
                         continue
 
@@ -313,13 +560,15 @@ class AlertScheduler:
 
             logger.info(f"Checking {len(etf_users_map)} unique ETFs for alerts")
 
-            # 步骤 2: 为每个用户收集信号
+            # 步骤 2: 获取全部 ETF 指标（收盘后复用当日快照，缺失的一次矩阵计算）
+            batch_metrics = await self._get_metrics(list(etf_users_map))
+
+            # 步骤 3: 为每个用户收集信号
             user_signals_map: Dict[int, List[SignalItem]] = {}
 
             for etf_code, users_data in etf_users_map.items():
                 try:
-                    # 获取 ETF 数据并计算指标（每个 ETF 只计算一次）
-                    metrics = await self._fetch_and_compute_etf_metrics(etf_code)
+                    metrics = batch_metrics.get(etf_code)
                     if metrics is None:
                         continue
 
@@ -343,7 +592,8 @@ class AlertScheduler:
                     logger.error(f"Error processing ETF {etf_code}: {e}", exc_info=True)
                     continue
 
-            # 步骤 3: 为每个用户发送合并消息
+            # 步骤 4: 为每个用户发送合并消息（经 notification_dispatcher 并发发送）
+            sends = []
             for user_id, signals in user_signals_map.items():
                 try:
                     # 从 etf_users_map 中找到用户信息
@@ -365,19 +615,21 @@ class AlertScheduler:
                     if len(signals) > remaining:
                         logger.info(f"User {user_id}: truncated {len(signals)} signals to {remaining}")
 
-                    await self._send_alert_message(
+                    sends.append(self._send_alert_message(
                         user_info["user"],
                         user_info["telegram_config"],
                         signals_to_send,
-                    )
-                    logger.info(f"Sent {len(signals_to_send)} alerts to user {user_id}")
+                    ))
                 except Exception as e:
                     logger.error(f"Error sending message to user {user_id}: {e}")
 
-        # 步骤 4: 检查到价提醒（使用独立 session，避免与上方 session 嵌套导致 SQLite 锁定）
+            if sends:
+                await asyncio.gather(*sends)
+
+        # 步骤 5: 检查到价提醒（使用独立 session，避免与上方 session 嵌套导致 SQLite 锁定）
         await self._check_price_alerts()
 
-        # 步骤 5: 清理过期的已触发到价提醒（30 天）
+        # 步骤 6: 清理过期的已触发到价提醒（30 天）
         try:
             from app.services.price_alert_service import PriceAlertService
             with Session(engine) as cleanup_session:
@@ -420,9 +672,20 @@ class AlertScheduler:
                         "etf_name": ud["etf_name"],
                     })
 
-            # 为每个用户生成并发送摘要
-            for uid, udata in user_map.items():
-                await self._send_user_summary(uid, udata, etf_data)
+            # 为每个用户生成并发送摘要（并发发送，受 Telegram 限速约束）
+            started = time.perf_counter()
+            results = await asyncio.gather(
+                *(self._send_user_summary(uid, udata, etf_data) for uid, udata in user_map.items()),
+                return_exceptions=True,
+            )
+            for uid, result in zip(user_map, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Summary failed for user {uid}: {result}")
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"Daily summary processed {len(user_map)} users in {elapsed:.1f}s "
+                f"({notification_dispatcher.stats()})"
+            )
 
     def _collect_etf_users(
         self, session: Session, user_id: Optional[int] = None,
@@ -530,7 +793,7 @@ class AlertScheduler:
         message = TelegramNotificationService.format_alert_message(signals, now)
 
         try:
-            await TelegramNotificationService.send_message(bot_token, chat_id, message)
+            await notification_dispatcher.send(bot_token, chat_id, message)
             logger.info(f"Sent {len(signals)} alerts to user {user.id}")
         except Exception as e:
             logger.error(f"Failed to send alert to user {user.id}: {e}")
@@ -589,36 +852,19 @@ class AlertScheduler:
         if failed_count > 0:
             message += f"\n\n⚠️ {failed_count} 只 ETF 数据获取失败"
 
-        # 发送（含重试）
+        # 发送（失败由 notification_dispatcher 退避重试，不阻塞其他用户）
         bot_token = decrypt_token(
             udata["telegram_config"]["botToken"], settings.SECRET_KEY
         )
         chat_id = udata["telegram_config"]["chatId"]
 
         try:
-            await TelegramNotificationService.send_message(
-                bot_token, chat_id, message
-            )
+            await notification_dispatcher.send(bot_token, chat_id, message)
             alert_state_service.mark_summary_sent(user_id)
             logger.info(f"Daily summary sent to user {user_id}")
-            return True
         except Exception as e:
-            logger.warning(
-                f"Summary send failed for user {user_id}, retrying: {e}"
-            )
-            await asyncio.sleep(30)
-            try:
-                await TelegramNotificationService.send_message(
-                    bot_token, chat_id, message
-                )
-                alert_state_service.mark_summary_sent(user_id)
-                logger.info(f"Daily summary sent to user {user_id} (retry)")
-                return True
-            except Exception as e2:
-                logger.error(
-                    f"Summary retry failed for user {user_id}: {e2}"
-                )
-                return True  # 发送失败也视为已处理，非去重
+            logger.error(f"Summary send failed for user {user_id}: {e}")
+        return True  # 发送失败也视为已处理，非去重
 
     async def trigger_check(
         self, user_id: Optional[int] = None, summary: bool = False
@@ -671,55 +917,124 @@ class AlertScheduler:
             }
             return await self._send_user_summary(user_id, udata, etf_data)
 
-    async def _check_price_alerts(self) -> None:
-        """检查所有活跃的到价提醒并触发通知
+    def _load_price_alert_index(self) -> bool:
+        """从数据库全量构建到价提醒索引"""
+        from app.services.price_alert_service import PriceAlertService
+
+        try:
+            with Session(engine) as session:
+                price_alert_index.load(PriceAlertService.get_all_active_alerts(session))
+            return True
+        except Exception as e:
+            logger.error(f"Failed to load price alert index: {e}")
+            return False
+
+    def _on_quotes_changed(self, event: ChangeEvent) -> None:
+        """行情变更回调（运行在刷新线程中）：只对报价变化且有提醒的代码求值，命中的提醒投递到事件循环触发
+
+        只处理交易时段内在线数据源成功刷新的增量事件：全量替换（含启动时的首次加载）、
+        磁盘缓存 / 兜底 JSON 中的过时价格以及客户端同步的报价都不触发提醒，
+        这些情况由定时补检与 15:01 收盘补检覆盖。
+        """
+        if event.full or not event.live or not is_trading_hours():
+            return
+        loop = self._loop
+        if loop is None or loop.is_closed() or not price_alert_index.is_loaded:
+            return
+
+        codes = set(event.codes).intersection(price_alert_index.codes())
+        if not codes:
+            return
+        prices = {quote["code"]: quote["price"] for quote in etf_cache.get_quotes(list(codes))}
+        alert_ids = price_alert_index.pop_matches(prices)
+        if alert_ids:
+            asyncio.run_coroutine_threadsafe(
+                self._fire_price_alerts(alert_ids, prices), loop
+            )
 
-        TODO: 盘中检查时应复用 _run_daily_check 已获取的 ETF 价格数据，
-        并将提醒中的 ETF 代码合并到初始价格获取列表中，避免冗余 API 调用。
-        当前实现为独立获取价格，在提醒 ETF 数量少时性能可接受。
+    async def _fire_price_alerts(
+        self, alert_ids: Iterable[int], etf_prices: Dict[str, float]
+    ) -> None:
+        """触发索引命中的到价提醒并按用户发送通知
+
+        索引只负责筛选，是否触发以数据库中的记录为准；未触发或处理失败的提醒放回索引。
         """
         from app.services.price_alert_service import PriceAlertService
 
-        with Session(engine) as session:
-            active_alerts = PriceAlertService.get_all_active_alerts(session)
-            if not active_alerts:
-                return
+        alert_ids = set(alert_ids)
+        try:
+            with Session(engine) as session:
+                alerts = PriceAlertService.get_active_alerts_by_ids(session, alert_ids)
+                triggered = PriceAlertService.trigger_alerts(session, alerts, etf_prices)
 
-            # 获取涉及的 ETF 代码
-            etf_codes = set(a.etf_code for a in active_alerts)
-            logger.info(f"Checking {len(active_alerts)} active price alerts for {len(etf_codes)} ETFs")
+                triggered_ids = {alert.id for alert in triggered}
+                for alert in alerts:
+                    if alert.id not in triggered_ids:
+                        price_alert_index.add(alert)
 
-            # 获取实时价格
-            etf_prices: Dict[str, float] = {}
-            for code in etf_codes:
-                try:
-                    info = await asyncio.to_thread(ak_service.get_etf_info, code)
-                    if info and "price" in info:
-                        etf_prices[code] = info["price"]
-                except Exception as e:
-                    logger.error(f"Failed to get price for {code}: {e}")
+                if not triggered:
+                    return
 
-            if not etf_prices:
-                logger.warning("No prices fetched for price alert check")
-                return
+                logger.info(f"Triggered {len(triggered)} price alerts")
 
-            # 触发匹配的提醒
-            triggered = PriceAlertService.trigger_alerts(
-                session, active_alerts, etf_prices
-            )
+                # 按用户分组发送通知
+                user_alerts: Dict[int, list] = {}
+                for alert in triggered:
+                    user_alerts.setdefault(alert.user_id, []).append(alert)
 
-            if not triggered:
+                await asyncio.gather(*(
+                    self._send_price_alert_notification(session, user_id, alerts)
+                    for user_id, alerts in user_alerts.items()
+                ))
+        except Exception as e:
+            logger.error(f"Failed to fire price alerts {sorted(alert_ids)}: {e}", exc_info=True)
+            # 触发未完成：从数据库放回仍活跃的提醒
+            try:
+                with Session(engine) as session:
+                    for alert in PriceAlertService.get_active_alerts_by_ids(session, alert_ids):
+                        price_alert_index.add(alert)
+            except Exception as restore_error:
+                logger.error(f"Failed to restore price alert index: {restore_error}")
+
+    async def _check_price_alerts(self, reload_index: bool = False) -> None:
+        """检查所有活跃的到价提醒并触发通知
+
+        报价变化时已经通过 _on_quotes_changed 即时求值；这里是定时补检，
+        只为索引中有提醒的 ETF 获取实时价格。当前行情不是在线刷新所得时跳过。
+
+        Args:
+            reload_index: 先从数据库重建索引（收盘补检时对账，纠正进程外的数据变更）
+        """
+        if reload_index or not price_alert_index.is_loaded:
+            if not self._load_price_alert_index():
                 return
 
-            logger.info(f"Triggered {len(triggered)} price alerts")
+        etf_codes = price_alert_index.codes()
+        if not etf_codes:
+            return
+        logger.info(f"Checking {len(price_alert_index)} active price alerts for {len(etf_codes)} ETFs")
 
-            # 按用户分组发送通知
-            user_alerts: Dict[int, list] = {}
-            for alert in triggered:
-                user_alerts.setdefault(alert.user_id, []).append(alert)
+        # 获取实时价格
+        etf_prices: Dict[str, float] = {}
+        for code in etf_codes:
+            try:
+                info = await asyncio.to_thread(ak_service.get_etf_info, code)
+                if info and "price" in info:
+                    etf_prices[code] = info["price"]
+            except Exception as e:
+                logger.error(f"Failed to get price for {code}: {e}")
 
-            for user_id, alerts in user_alerts.items():
-                await self._send_price_alert_notification(session, user_id, alerts)
+        if not etf_prices:
+            logger.warning("No prices fetched for price alert check")
+            return
+        # get_etf_info 在缓存过期时会触发后台刷新；刷新成功之前的价格不用于触发
+        if not etf_cache.is_live:
+            logger.warning("Quotes are not from a live refresh, skipping price alert check")
+            return
+
+        alert_ids = price_alert_index.pop_matches(etf_prices)
+        if alert_ids:
+            await self._fire_price_alerts(alert_ids, etf_prices)
 
     async def _send_price_alert_notification(
         self, session: Session, user_id: int, alerts: list
@@ -741,7 +1056,7 @@ class AlertScheduler:
         message = TelegramNotificationService.format_price_alert_message(alerts, check_time)
 
         try:
-            await TelegramNotificationService.send_message(bot_token, chat_id, message)
+            await notification_dispatcher.send(bot_token, chat_id, message)
             logger.info(f"Sent price alert notification to user {user_id} ({len(alerts)} alerts)")
         except Exception as e:
             logger.error(f"Failed to send price alert to user {user_id}: {e}")
@@ -749,7 +1064,7 @@ class AlertScheduler:
     async def _run_closing_price_check(self) -> None:
         """15:01 收盘补检 - 仅检查到价提醒"""
         logger.info("Running closing price check for price alerts...")
-        await self._check_price_alerts()
+        await self._check_price_alerts(reload_index=True)
 
 
 # 全局单例
@@ -1,22 +1,40 @@
 """
 数据源管理器
 
-按配置优先级编排历史数据源，集成熔断逻辑。
+按配置优先级（或 SourceScheduler 的动态排序）编排历史数据源，集成熔断逻辑。
 所有在线源失败后返回 None，由调用方走缓存兜底。
+
+对冲模式（hedge=True）：先请求主数据源，若超过其近期历史数据请求成功延迟的 p90 仍未返回，
+并行请求下一个源，取最先返回的有效结果；某个源失败时立即启动下一个源。
+同步数据源无法中断，落选的请求在后台线程中完成（仍计入指标），结果被丢弃。
+线程池中在途请求（含落选后仍在执行的）达到 hedge_workers 时不再发起对冲，
+剩余的源在调用线程中依次尝试，避免故障期间慢源占满线程池后新请求排队。
 """
 import logging
+import threading
 import time
-from typing import TYPE_CHECKING, List, Optional
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
 
 if TYPE_CHECKING:
     from app.services.datasource_protocol import HistoryDataSource
+    from app.services.source_scheduler import SourceScheduler
 
 import pandas as pd
 
+from app.core.executors import api_executor
 from app.core.metrics import DataSourceMetrics, datasource_metrics
 
 logger = logging.getLogger(__name__)
 
+# 对冲等待所用的延迟分位
+HEDGE_QUANTILE = "p90"
+# 滑动窗口内少于该成功样本数时使用默认对冲等待
+HEDGE_MIN_SAMPLES = 5
+
+# 指标中的操作标签
+HISTORY_OPERATION = "history"
+
 
 class DataSourceManager:
     """历史数据源编排器"""
@@ -28,21 +46,36 @@ class DataSourceManager:
         cb_threshold: float = 0.1,
         cb_window: int = 10,
         cb_cooldown: int = 300,
+        hedge: bool = False,
+        hedge_min_delay: float = 0.5,
+        hedge_default_delay: float = 3.0,
+        hedge_workers: int = 16,
+        scheduler: "Optional[SourceScheduler]" = None,
     ) -> None:
         self._sources = sources
         self._metrics = metrics or datasource_metrics
         self._cb_threshold = cb_threshold
         self._cb_window = cb_window
         self._cb_cooldown = cb_cooldown
+        self._hedge = hedge
+        self._hedge_min_delay = hedge_min_delay
+        self._hedge_default_delay = hedge_default_delay
+        self._hedge_workers = hedge_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        # 已提交到对冲线程池、尚未结束的请求数
+        self._in_flight = 0
+        self._hedge_stats = {"hedged": 0, "hedge_wins": 0, "saturated": 0}
+        self._scheduler = scheduler
 
-    def fetch_history(
-        self,
-        code: str,
-        start_date: str,
-        end_date: str,
-        adjust: str = "qfq",
-    ) -> Optional[pd.DataFrame]:
-        for source in self._sources:
+    def _eligible_sources(self) -> "Iterator[HistoryDataSource]":
+        """按优先级依次产出可用且未熔断的数据源（惰性检查，熔断半开探测只在真正尝试时触发）"""
+        sources = self._sources
+        if self._scheduler is not None:
+            # 按近期成功率与延迟动态排序
+            by_name = {source.name: source for source in sources}
+            sources = [by_name[name] for name in self._scheduler.order(list(by_name))]
+        for source in sources:
             # 可用性检查
             if not source.is_available():
                 logger.info("[%s] not available, skipping", source.name)
@@ -58,22 +91,196 @@ class DataSourceManager:
                 logger.info("[%s] circuit open, skipping", source.name)
                 continue
 
-            start = time.monotonic()
-            try:
-                df = source.fetch_history(code, start_date, end_date, adjust)
-                if df is not None and not df.empty:
-                    latency = (time.monotonic() - start) * 1000
-                    self._metrics.record_success(source.name, latency)
-                    logger.info("[%s] fetch_history succeeded for %s (%.0fms)", source.name, code, latency)
-                    return df
-                # 返回 None 或空 → 视为失败
-                latency = (time.monotonic() - start) * 1000
-                self._metrics.record_failure(source.name, f"empty result for {code}", latency)
-                logger.warning("[%s] returned empty for %s", source.name, code)
-            except Exception as e:
+            yield source
+
+    def _attempt(
+        self,
+        source: "HistoryDataSource",
+        code: str,
+        start_date: str,
+        end_date: str,
+        adjust: str,
+    ) -> Optional[pd.DataFrame]:
+        """单个数据源的一次尝试并记录指标，失败或空结果返回 None"""
+        start = time.monotonic()
+        try:
+            df = source.fetch_history(code, start_date, end_date, adjust)
+            if df is not None and not df.empty:
                 latency = (time.monotonic() - start) * 1000
-                self._metrics.record_failure(source.name, str(e), latency)
-                logger.warning("[%s] failed for %s: %s", source.name, code, e)
+                self._metrics.record_success(source.name, latency, HISTORY_OPERATION)
+                logger.info("[%s] fetch_history succeeded for %s (%.0fms)", source.name, code, latency)
+                return df
+            # 返回 None 或空 → 视为失败
+            latency = (time.monotonic() - start) * 1000
+            self._metrics.record_failure(
+                source.name, f"empty result for {code}", latency, HISTORY_OPERATION
+            )
+            logger.warning("[%s] returned empty for %s", source.name, code)
+        except Exception as e:
+            latency = (time.monotonic() - start) * 1000
+            self._metrics.record_failure(source.name, str(e), latency, HISTORY_OPERATION)
+            logger.warning("[%s] failed for %s: %s", source.name, code, e)
+        return None
+
+    def fetch_history(
+        self,
+        code: str,
+        start_date: str,
+        end_date: str,
+        adjust: str = "qfq",
+    ) -> Optional[pd.DataFrame]:
+        if self._hedge:
+            if not self._saturated():
+                return self._fetch_hedged(code, start_date, end_date, adjust)
+            self._count("saturated")
+            logger.warning("History hedge pool saturated, fetching %s without hedging", code)
 
+        df = self._fetch_sequential(self._eligible_sources(), code, start_date, end_date, adjust)
+        if df is None:
+            logger.error("All history sources failed for %s", code)
+        return df
+
+    def _fetch_sequential(
+        self,
+        sources: "Iterator[HistoryDataSource]",
+        code: str,
+        start_date: str,
+        end_date: str,
+        adjust: str,
+    ) -> Optional[pd.DataFrame]:
+        """在调用线程中依次尝试数据源，返回首个有效结果"""
+        for source in sources:
+            df = self._attempt(source, code, start_date, end_date, adjust)
+            if df is not None:
+                return df
+        return None
+
+    def hedge_delay(self, source_name: str) -> float:
+        """对冲等待（秒）：该源近期历史数据请求成功延迟的 p90，不低于下限；样本不足时取默认值"""
+        success, _ = self._metrics.get_window_outcomes(source_name, HISTORY_OPERATION)
+        if success < HEDGE_MIN_SAMPLES:
+            return self._hedge_default_delay
+        p90 = self._metrics.get_latency_quantiles(
+            source_name, HISTORY_OPERATION, success_only=True
+        )[HEDGE_QUANTILE]
+        if p90 is None:
+            return self._hedge_default_delay
+        return max(self._hedge_min_delay, p90 / 1000)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self._hedge_workers, thread_name_prefix="history-hedge")
+                # 随应用关闭一并关闭（关闭后下次使用时重建并重新注册）
+                api_executor.register_shutdown(self.shutdown)
+            return self._pool
+
+    def _saturated(self) -> bool:
+        """对冲线程池是否已无空闲线程（在途请求数达到 hedge_workers）"""
+        with self._pool_lock:
+            return self._in_flight >= self._hedge_workers
+
+    def _submit(self, pool: ThreadPoolExecutor, *args) -> Future:
+        """提交一次尝试并计入在途请求数，请求结束（完成 / 失败 / 取消）时扣减"""
+        with self._pool_lock:
+            self._in_flight += 1
+        try:
+            future = pool.submit(self._attempt, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future: Optional[Future] = None) -> None:
+        with self._pool_lock:
+            self._in_flight -= 1
+
+    def shutdown(self) -> None:
+        """关闭对冲线程池（取消排队中的请求，不等待执行中的请求）"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _fetch_hedged(
+        self,
+        code: str,
+        start_date: str,
+        end_date: str,
+        adjust: str,
+    ) -> Optional[pd.DataFrame]:
+        pool = self._get_pool()
+        sources = self._eligible_sources()
+        pending: Dict[Future, str] = {}
+        launched: List[Future] = []
+        hedge_at: Optional[float] = None
+
+        def launch() -> bool:
+            nonlocal hedge_at
+            hedge_at = None
+            if self._saturated():
+                # 线程池已满：有在途请求时只等待它，否则剩余的源稍后在调用线程中尝试
+                if pending:
+                    self._count("saturated")
+                return False
+            source = next(sources, None)
+            if source is None:
+                return False
+            if pending:
+                self._count("hedged")
+                logger.info("[%s] hedging history fetch for %s", source.name, code)
+            future = self._submit(pool, source, code, start_date, end_date, adjust)
+            pending[future] = source.name
+            launched.append(future)
+            hedge_at = time.monotonic() + self.hedge_delay(source.name)
+            return True
+
+        launch()
+        try:
+            while pending:
+                timeout = None if hedge_at is None else max(0.0, hedge_at - time.monotonic())
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    # 当前源超过 p90 仍未返回 → 并行请求下一个源
+                    launch()
+                    continue
+                for future in done:
+                    name = pending.pop(future)
+                    df = future.result()
+                    if df is not None:
+                        if future is not launched[0]:
+                            self._count("hedge_wins")
+                            logger.info("[%s] won hedged history fetch for %s", name, code)
+                        return df
+                # 失败 → 不再等待对冲时机，立即启动下一个源
+                launch()
+        finally:
+            for future in pending:
+                future.cancel()
+
+        # 因线程池饱和未发起的源在调用线程中依次尝试
+        df = self._fetch_sequential(sources, code, start_date, end_date, adjust)
+        if df is not None:
+            return df
         logger.error("All history sources failed for %s", code)
         return None
+
+    def _count(self, key: str) -> None:
+        with self._pool_lock:
+            self._hedge_stats[key] += 1
+
+    def scheduler_stats(self) -> Optional[Dict]:
+        """动态排序的最近结果（未启用时返回 None）"""
+        return self._scheduler.stats() if self._scheduler is not None else None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        对冲统计
+
+        Returns:
+            hedged 为对冲发起的请求数，hedge_wins 为非首个发起的源胜出的次数，
+            saturated 为因线程池饱和放弃对冲的次数，in_flight 为当前在途请求数
+        """
+        with self._pool_lock:
+            return {**self._hedge_stats, "in_flight": self._in_flight}
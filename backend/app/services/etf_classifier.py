@@ -9,8 +9,10 @@ ETF 自动分类器服务
 
 import logging
 import re
-from dataclasses import dataclass, asdict
-from typing import Dict, List, Optional, Set
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -22,12 +24,72 @@ class ETFTag:
     group: str   # 分组: "type" | "industry" | "strategy" | "special"
 
     def to_dict(self) -> Dict[str, str]:
-        return asdict(self)
+        return {"label": self.label, "group": self.group}
 
 
 # 标签 group 排序权重：type > industry > strategy > special
 GROUP_ORDER = {"type": 0, "industry": 1, "strategy": 2, "special": 3}
 
+# 分类结果缓存条目上限（全市场 ETF 约 1500 只，名称很少变化）
+CLASSIFY_CACHE_SIZE = 8192
+
+
+class _KeywordAutomaton:
+    """
+    Aho-Corasick 多模式匹配
+
+    一次扫描找出名称中出现的全部关键词（含重叠，如 "新能源车" 同时命中 "新能源"、"能源"），
+    结果与逐个 `keyword in name` 判断一致。
+    """
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        goto: List[Dict[str, int]] = [{}]
+        fail: List[int] = [0]
+        output: List[Set[str]] = [set()]
+        for keyword in keywords:
+            if not keyword:
+                continue
+            state = 0
+            for ch in keyword:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    fail.append(0)
+                    output.append(set())
+                    goto[state][ch] = nxt
+                state = nxt
+            output[state].add(keyword)
+
+        # 按深度广度优先计算失败指针，并把后缀状态的输出并入
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                output[nxt] |= output[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._output: List[FrozenSet[str]] = [frozenset(o) for o in output]
+
+    def find_all(self, text: str) -> Set[str]:
+        """text 中出现的全部关键词"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found: Set[str] = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
 
 class ETFClassifier:
     """
@@ -260,41 +322,121 @@ class ETFClassifier:
         "矿业": ["资源"],
     }
 
-    def __init__(self) -> None:
-        pass
+    def __init__(self, cache_size: int = CLASSIFY_CACHE_SIZE) -> None:
+        """
+        编译关键词表（排序、集合化、构建自动机），之后每次分类只需扫描名称一次
+
+        Args:
+            cache_size: 分类结果缓存条目上限，0 表示不缓存
+        """
+        # 长关键词优先的匹配顺序，只排序一次
+        self._broad_keywords: List[Tuple[str, str]] = sorted(
+            self.BROAD_BASE_KEYWORDS.items(),
+            key=lambda x: len(x[0]),
+            reverse=True,
+        )
+        self._industries: List[Tuple[str, FrozenSet[str]]] = [
+            (label, frozenset(keywords))
+            for label, keywords in sorted(
+                self.INDUSTRY_KEYWORDS.items(),
+                key=lambda x: max(len(k) for k in x[1]),
+                reverse=True,
+            )
+        ]
+        self._strategies: List[Tuple[str, FrozenSet[str]]] = [
+            (label, frozenset(keywords)) for label, keywords in self.STRATEGY_KEYWORDS.items()
+        ]
+        self._cross_border = frozenset(self.CROSS_BORDER_KEYWORDS)
+        self._commodity = frozenset(self.COMMODITY_KEYWORDS)
+        self._currency = frozenset(self.CURRENCY_KEYWORDS)
+        self._bond = frozenset(self.BOND_KEYWORDS)
+        self._reits = frozenset(self.REITS_KEYWORDS)
+
+        keywords: Set[str] = set(self.BROAD_BASE_KEYWORDS)
+        keywords |= self._cross_border | self._commodity | self._currency | self._bond | self._reits
+        keywords.update(self.SPECIAL_KEYWORDS)
+        for _, group in self._industries + self._strategies:
+            keywords |= group
+        self._automaton = _KeywordAutomaton(keywords)
+
+        # (名称, 代码) -> 标签元组，LRU 淘汰
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[ETFTag, ...]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
 
     def classify(self, etf_name: str, etf_code: str = "") -> List[ETFTag]:
         """
-        对 ETF 进行分类，返回标签列表
+        对 ETF 进行分类，返回标签列表（按名称和代码缓存）
 
         Args:
             etf_name: ETF 名称（如 "沪深300ETF"）
             etf_code: ETF 代码（如 "510300"），可选
 
         Returns:
-            排序后的标签列表
+            排序后的标签列表（新列表，调用方可修改）
         """
         if not etf_name:
             return []
 
+        key = (etf_name, etf_code or "")
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return list(cached)
+
+        tags = tuple(self._classify(etf_name, etf_code))
+        if self._cache_size > 0:
+            with self._cache_lock:
+                self._cache[key] = tags
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return list(tags)
+
+    def classify_batch(
+        self, names: Sequence[str], codes: Optional[Sequence[str]] = None
+    ) -> List[List[ETFTag]]:
+        """
+        批量分类（行情刷新时全市场调用，名称未变的 ETF 直接命中缓存）
+
+        Args:
+            names: ETF 名称列表
+            codes: 与 names 一一对应的代码列表，可选
+
+        Returns:
+            与 names 一一对应的标签列表；单个分类失败时该项为空列表
+        """
+        codes = codes if codes is not None else [""] * len(names)
+        results: List[List[ETFTag]] = []
+        for name, code in zip(names, codes):
+            try:
+                results.append(self.classify(name, code))
+            except Exception:
+                logger.warning(f"Classification failed for {code}, skipping tags")
+                results.append([])
+        return results
+
+    def _classify(self, etf_name: str, etf_code: str) -> List[ETFTag]:
         # 预处理：去除常见基金公司后缀和份额标识
         name = self._preprocess_name(etf_name)
+        # 一次扫描找出名称中的全部关键词
+        found = self._automaton.find_all(name)
         tags: List[ETFTag] = []
 
         # Step 1: 扫描大类关键词
-        tags.extend(self._match_broad_base(name))
-        tags.extend(self._match_cross_border(name))
-        tags.extend(self._match_commodity(name))
-        tags.extend(self._match_currency(name))
-        tags.extend(self._match_bond(name))
-        tags.extend(self._match_reits(name, etf_code))
+        tags.extend(self._match_broad_base(name, found))
+        tags.extend(self._match_cross_border(name, found))
+        tags.extend(self._match_commodity(found))
+        tags.extend(self._match_currency(found))
+        tags.extend(self._match_bond(found))
+        tags.extend(self._match_reits(found, etf_code))
 
         # Step 2: 扫描细分关键词
-        tags.extend(self._match_industry(name))
-        tags.extend(self._match_strategy(name))
+        tags.extend(self._match_industry(found))
+        tags.extend(self._match_strategy(found))
 
         # Step 3: 扫描特殊属性
-        tags.extend(self._match_special(name))
+        tags.extend(self._match_special(found))
 
         # Step 4: 去冗余 + 排序
         tags = self._apply_exclusion_rules(name, tags)
@@ -332,19 +474,14 @@ class ETFClassifier:
 
     # ========== Step 1: 大类匹配 ==========
 
-    def _match_broad_base(self, name: str) -> List[ETFTag]:
+    def _match_broad_base(self, name: str, found: Set[str]) -> List[ETFTag]:
         """匹配宽基指数"""
         tags: List[ETFTag] = []
         matched_index: Optional[str] = None
 
         # 1. 精确匹配完整宽基关键词（长关键词优先）
-        sorted_keywords = sorted(
-            self.BROAD_BASE_KEYWORDS.items(),
-            key=lambda x: len(x[0]),
-            reverse=True,
-        )
-        for keyword, index_name in sorted_keywords:
-            if keyword in name:
+        for keyword, index_name in self._broad_keywords:
+            if keyword in found:
                 matched_index = index_name
                 break
 
@@ -379,11 +516,10 @@ class ETFClassifier:
 
         return tags
 
-    def _match_cross_border(self, name: str) -> List[ETFTag]:
+    def _match_cross_border(self, name: str, found: Set[str]) -> List[ETFTag]:
         """匹配跨境指数"""
-        for keyword in self.CROSS_BORDER_KEYWORDS:
-            if keyword in name:
-                return [ETFTag(label="跨境", group="type")]
+        if not found.isdisjoint(self._cross_border):
+            return [ETFTag(label="跨境", group="type")]
 
         # 特殊模式匹配（如 A50 需排除 A500/中证A50）
         for keyword, rules in self.CROSS_BORDER_SPECIAL_PATTERNS.items():
@@ -404,28 +540,25 @@ class ETFClassifier:
 
         return []
 
-    def _match_commodity(self, name: str) -> List[ETFTag]:
+    def _match_commodity(self, found: Set[str]) -> List[ETFTag]:
         """匹配商品"""
-        for keyword in self.COMMODITY_KEYWORDS:
-            if keyword in name:
-                return [ETFTag(label="商品", group="type")]
+        if not found.isdisjoint(self._commodity):
+            return [ETFTag(label="商品", group="type")]
         return []
 
-    def _match_currency(self, name: str) -> List[ETFTag]:
+    def _match_currency(self, found: Set[str]) -> List[ETFTag]:
         """匹配货币基金"""
-        for keyword in self.CURRENCY_KEYWORDS:
-            if keyword in name:
-                return [ETFTag(label="货币", group="type")]
+        if not found.isdisjoint(self._currency):
+            return [ETFTag(label="货币", group="type")]
         return []
 
-    def _match_bond(self, name: str) -> List[ETFTag]:
+    def _match_bond(self, found: Set[str]) -> List[ETFTag]:
         """匹配债券类"""
-        for keyword in self.BOND_KEYWORDS:
-            if keyword in name:
-                return [ETFTag(label="债券", group="type")]
+        if not found.isdisjoint(self._bond):
+            return [ETFTag(label="债券", group="type")]
         return []
 
-    def _match_reits(self, name: str, etf_code: str) -> List[ETFTag]:
+    def _match_reits(self, found: Set[str], etf_code: str) -> List[ETFTag]:
         """匹配 REITs（基于代码前缀或名称关键词）"""
         # 代码前缀匹配
         if etf_code:
@@ -433,57 +566,37 @@ class ETFClassifier:
                 if etf_code.startswith(prefix):
                     return [ETFTag(label="REITs", group="type")]
         # 名称关键词匹配
-        for keyword in self.REITS_KEYWORDS:
-            if keyword in name:
-                return [ETFTag(label="REITs", group="type")]
+        if not found.isdisjoint(self._reits):
+            return [ETFTag(label="REITs", group="type")]
         return []
 
     # ========== Step 2: 细分匹配 ==========
 
-    def _match_industry(self, name: str) -> List[ETFTag]:
-        """匹配行业分类，长关键词优先"""
-        tags: List[ETFTag] = []
-        matched_labels: Set[str] = set()
+    def _match_industry(self, found: Set[str]) -> List[ETFTag]:
+        """匹配行业分类（标签按关键词最大长度降序排列，长关键词优先）"""
+        return [
+            ETFTag(label=label, group="industry")
+            for label, keywords in self._industries
+            if not found.isdisjoint(keywords)
+        ]
 
-        # 按关键词最大长度降序排序，确保长关键词优先匹配
-        sorted_industries = sorted(
-            self.INDUSTRY_KEYWORDS.items(),
-            key=lambda x: max(len(k) for k in x[1]),
-            reverse=True,
-        )
-
-        for label, keywords in sorted_industries:
-            if label in matched_labels:
-                continue
-            # 按关键词长度降序排序
-            sorted_kws = sorted(keywords, key=len, reverse=True)
-            for keyword in sorted_kws:
-                if keyword in name:
-                    tags.append(ETFTag(label=label, group="industry"))
-                    matched_labels.add(label)
-                    break
-
-        return tags
-
-    def _match_strategy(self, name: str) -> List[ETFTag]:
+    def _match_strategy(self, found: Set[str]) -> List[ETFTag]:
         """匹配策略关键词"""
-        tags: List[ETFTag] = []
-        for label, keywords in self.STRATEGY_KEYWORDS.items():
-            for keyword in keywords:
-                if keyword in name:
-                    tags.append(ETFTag(label=label, group="strategy"))
-                    break
-        return tags
+        return [
+            ETFTag(label=label, group="strategy")
+            for label, keywords in self._strategies
+            if not found.isdisjoint(keywords)
+        ]
 
     # ========== Step 3: 特殊属性匹配 ==========
 
-    def _match_special(self, name: str) -> List[ETFTag]:
+    def _match_special(self, found: Set[str]) -> List[ETFTag]:
         """匹配特殊属性"""
-        tags: List[ETFTag] = []
-        for keyword in self.SPECIAL_KEYWORDS:
-            if keyword in name:
-                tags.append(ETFTag(label=keyword, group="special"))
-        return tags
+        return [
+            ETFTag(label=keyword, group="special")
+            for keyword in self.SPECIAL_KEYWORDS
+            if keyword in found
+        ]
 
     # ========== Step 4: 去冗余 + 排序 ==========
 
@@ -525,3 +638,7 @@ class ETFClassifier:
     def _sort_tags(self, tags: List[ETFTag]) -> List[ETFTag]:
         """按 group 排序：type > industry > strategy > special"""
         return sorted(tags, key=lambda t: GROUP_ORDER.get(t.group, 99))
+
+
+# 全局单例
+etf_classifier = ETFClassifier()
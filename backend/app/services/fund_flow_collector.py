@@ -13,12 +13,13 @@ from typing import Dict, Any, Optional
 from zoneinfo import ZoneInfo
 
 import pandas as pd
-import requests
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from sqlmodel import Session
 from sqlalchemy.exc import IntegrityError
 
+from app.core.http_client import http_client
+from app.core.metrics import track_datasource
 from app.core.share_history_database import share_history_engine
 from app.models.etf_share_history import ETFShareHistory
 
@@ -64,6 +65,21 @@ class FundFlowCollector:
             logger.error(f"Failed to build ETF whitelist: {e}")
             return None
 
+    @track_datasource("sse", operation="shares")
+    def _request_sse_shares(self, url: str, date_str: str, headers: Dict[str, str]) -> Dict[str, Any]:
+        """单次请求上交所 ETF 规模接口（计入数据源指标）"""
+        resp = http_client.get(
+            url,
+            params={
+                "sqlId": "COMMON_SSE_ZQPZ_ETFZL_XXPL_ETFGM_SEARCH_L",
+                "STAT_DATE": date_str,
+            },
+            headers=headers,
+            timeout=30,
+        )
+        resp.raise_for_status()
+        return resp.json()
+
     def _fetch_sse_shares(self, whitelist: set) -> Optional[pd.DataFrame]:
         """
         从上交所官方 API 获取 ETF 份额数据
@@ -99,17 +115,7 @@ class FundFlowCollector:
             for attempt in range(3):
                 try:
                     logger.info(f"Fetching SSE shares for {date_str} (attempt {attempt + 1}/3)...")
-                    resp = requests.get(
-                        SSE_API_URL,
-                        params={
-                            "sqlId": "COMMON_SSE_ZQPZ_ETFZL_XXPL_ETFGM_SEARCH_L",
-                            "STAT_DATE": date_str,
-                        },
-                        headers=SSE_HEADERS,
-                        timeout=30,
-                    )
-                    resp.raise_for_status()
-                    data = resp.json()
+                    data = self._request_sse_shares(SSE_API_URL, date_str, SSE_HEADERS)
 
                     records = data.get("result", [])
                     if not records:
@@ -193,6 +199,13 @@ class FundFlowCollector:
         logger.error("Failed to fetch EastMoney shares after 3 attempts")
         return None
 
+    @staticmethod
+    @track_datasource("szse", operation="shares")
+    def _request_szse_shares() -> pd.DataFrame:
+        """单次请求深交所 ETF 规模数据（计入数据源指标）"""
+        import akshare as ak
+        return ak.fund_etf_scale_szse()
+
     def _fetch_szse_shares(self, whitelist: Optional[set] = None) -> Optional[pd.DataFrame]:
         """
         获取深交所 ETF 份额数据（最多重试 3 次，间隔 3 秒）
@@ -203,11 +216,10 @@ class FundFlowCollector:
         Returns:
             标准化 DataFrame（columns: code, shares, date, etf_type），失败时返回 None
         """
-        import akshare as ak
         for attempt in range(3):
             try:
                 logger.info(f"Fetching SZSE shares (attempt {attempt + 1}/3)...")
-                df = ak.fund_etf_scale_szse()
+                df = self._request_szse_shares()
                 if df is None or df.empty:
                     logger.warning("SZSE data is empty")
                     continue
@@ -2,11 +2,25 @@ import pandas as pd
 import numpy as np
 from typing import Dict, Any
 import logging
+import threading
+import time
 
+from app.core.config import settings
 from app.services.akshare_service import disk_cache, ak_service
 
 logger = logging.getLogger(__name__)
 
+# 网格参数计算使用的最近交易日数
+GRID_LOOKBACK_DAYS = 60
+
+# 网格参数逻辑有效期（4 小时），过期后仍保留在磁盘上用于 stale-while-revalidate
+GRID_CACHE_TTL = 14400
+GRID_CACHE_RETENTION = 7 * 86400
+
+# 后台重新计算中的 ETF 代码
+_revalidating: set = set()
+_revalidate_lock = threading.Lock()
+
 def _calculate_atr(df: pd.DataFrame, period: int = 14) -> float:
     """
     计算 ATR (Average True Range)
@@ -49,7 +63,7 @@ def calculate_grid_params(df: pd.DataFrame) -> Dict[str, Any]:
         return {}
         
     # 使用最近 60 天数据
-    recent_df = df.tail(60).copy()
+    recent_df = df.tail(GRID_LOOKBACK_DAYS).copy()
     
     # 使用分位数计算上下界
     upper = recent_df['close'].quantile(0.95)
@@ -94,42 +108,109 @@ def calculate_grid_params(df: pd.DataFrame) -> Dict[str, Any]:
     }
 
 
+def _compute_and_cache(code: str, refresh_history: bool = False) -> Dict[str, Any]:
+    """
+    拉取历史数据计算网格参数并写入缓存
+
+    Args:
+        code: ETF 代码
+        refresh_history: 计算前先同步刷新过期的本地历史数据（后台重新计算与强制刷新时使用）
+
+    Returns:
+        网格参数与计算时间戳 computed_at；缓存中同时记录所用历史数据的拉取时间，
+        历史数据刷新后缓存的结果视为过期
+    """
+    if refresh_history and not ak_service.refresh_history(code, period="daily", adjust="qfq"):
+        logger.warning(f"History refresh failed for {code}, computing grid params from stored data")
+
+    history_fetched_at = ak_service.get_history_fetched_at(code, period="daily", adjust="qfq")
+    # 获取历史数据（仅读取计算所需的最近窗口）
+    df = ak_service.fetch_history_raw(code, period="daily", adjust="qfq", tail=GRID_LOOKBACK_DAYS)
+    if history_fetched_at is None:
+        # 本地原本无数据：上面的读取已同步拉取
+        history_fetched_at = ak_service.get_history_fetched_at(code, period="daily", adjust="qfq")
+    
+    if df.empty:
+        logger.warning(f"No history data found for {code}")
+        return {}
+    
+    # 计算网格参数
+    result = calculate_grid_params(df)
+    if not result:
+        return {}
+
+    computed_at = time.time()
+    disk_cache.set(
+        f"grid_params_{code}",
+        {"result": result, "computed_at": computed_at, "history_fetched_at": history_fetched_at},
+        expire=GRID_CACHE_RETENTION,
+    )
+    logger.debug(f"Grid params cached for {code}")
+    return {**result, "computed_at": computed_at}
+
+
+def _revalidate_task(code: str) -> None:
+    """后台任务：刷新历史数据后重新计算过期的网格参数"""
+    try:
+        _compute_and_cache(code, refresh_history=True)
+    except Exception as e:
+        logger.error(f"Error revalidating grid params for {code}: {e}")
+    finally:
+        with _revalidate_lock:
+            _revalidating.discard(code)
+
+
+def _schedule_revalidate(code: str) -> None:
+    with _revalidate_lock:
+        if code in _revalidating:
+            return
+        _revalidating.add(code)
+
+    t = threading.Thread(target=_revalidate_task, args=(code,))
+    t.daemon = True
+    t.start()
+
+
 def calculate_grid_params_cached(code: str, force_refresh: bool = False) -> Dict[str, Any]:
     """
     带缓存的网格参数计算
     
+    缓存超过 GRID_CACHE_TTL，或本地历史数据在计算之后已被刷新时视为过期：
+    仍先返回旧结果，同时后台刷新历史数据并重新计算
+    （HISTORY_STALE_WHILE_REVALIDATE 关闭时同步重新计算）。
+    
     Args:
         code: ETF 代码
-        force_refresh: 是否强制刷新缓存
+        force_refresh: 是否强制刷新缓存（同步刷新过期的历史数据后重新计算）
         
     Returns:
-        网格参数字典，包含 upper, lower, spacing_pct, grid_count 等
+        网格参数字典，包含 upper, lower, spacing_pct, grid_count 等，
+        以及计算时间戳 computed_at
     """
     cache_key = f"grid_params_{code}"
     
     # 如果不强制刷新，先尝试从缓存读取
     if not force_refresh:
         cached = disk_cache.get(cache_key)
-        if cached is not None:
-            logger.debug(f"Grid params cache hit for {code}")
-            return cached
+        if isinstance(cached, dict) and "computed_at" in cached:
+            age = time.time() - cached["computed_at"]
+            history_fetched_at = ak_service.get_history_fetched_at(code, period="daily", adjust="qfq")
+            history_changed = (
+                history_fetched_at is not None
+                and history_fetched_at != cached.get("history_fetched_at")
+            )
+            result = {**cached["result"], "computed_at": cached["computed_at"]}
+            if age <= GRID_CACHE_TTL and not history_changed:
+                logger.debug(f"Grid params cache hit for {code}")
+                return result
+            if settings.HISTORY_STALE_WHILE_REVALIDATE:
+                logger.debug(
+                    f"Grid params stale for {code} ({age:.0f}s, history changed: {history_changed}), "
+                    "revalidating in background"
+                )
+                _schedule_revalidate(code)
+                return result
     
     # 缓存未命中或强制刷新，重新计算
     logger.info(f"Calculating grid params for {code} (force_refresh={force_refresh})")
-    
-    # 获取历史数据
-    df = ak_service.fetch_history_raw(code, period="daily", adjust="qfq")
-    
-    if df.empty:
-        logger.warning(f"No history data found for {code}")
-        return {}
-    
-    # 计算网格参数
-    result = calculate_grid_params(df)
-    
-    # 如果计算成功，写入缓存（4 小时过期）
-    if result:
-        disk_cache.set(cache_key, result, expire=14400)
-        logger.debug(f"Grid params cached for {code}")
-    
-    return result
+    return _compute_and_cache(code, refresh_history=force_refresh)
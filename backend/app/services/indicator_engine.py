@@ -0,0 +1,467 @@
+"""
+IndicatorEngine - 共享技术指标计算
+
+/metrics 接口的 ATR、日趋势、市场温度原本各自对同一收盘价序列重复计算
+滚动均线、pct_change、cummax。compute_indicators 将 close/high/low 一次性
+转为数组，得到的 IndicatorSet 由各服务共享，每个衍生序列至多计算一次：
+- 均线 MA5/10/20/60（以及配置中的其他日线周期）
+- TR / ATR
+- 日收益率、滚动波动率
+- 累计最高价、回撤
+- RSI（Wilder 平滑）
+
+IndicatorState 是上述序列截至某根 K 线的滚动状态，随缓存持久化后，新增一根
+K 线只需推进状态，无需对全部历史重新计算。
+
+所有序列与输入行一一对齐，窗口不足处为 NaN；滚动计算沿用 pandas rolling，
+保证与各服务原有逐项计算的结果完全一致。
+"""
+
+from __future__ import annotations
+
+import logging
+from functools import cached_property
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config_loader import metric_config
+from app.services.rank_index import SortedWindow
+
+logger = logging.getLogger(__name__)
+
+# 波动率滚动窗口
+DEFAULT_VOL_WINDOW = 20
+
+# 增量推进时最多补齐的 K 线数（超过则全量重算）
+MAX_ADVANCE_BARS = 30
+
+# 校验状态与当前历史一致时比对的收盘价个数（复权因子变化会改变全部历史价格）
+STATE_CHECK_BARS = 5
+
+
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    return pd.Series(values).rolling(window=window).mean().to_numpy()
+
+
+def wilder_averages(close: np.ndarray, period: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Wilder 平滑的平均涨幅 / 平均跌幅序列（向量化）
+
+    Wilder 平滑 avg_t = (avg_{t-1} * (period - 1) + x_t) / period 等价于
+    alpha = 1 / period 的 EWM（adjust=False），以前 period 个涨跌幅的 SMA 作为初值。
+    递归由 pandas ewm 的编译实现完成，不再逐行 iloc。
+
+    Args:
+        close: 收盘价数组（不含 NaN）
+        period: RSI 周期
+
+    Returns:
+        (avg_gain, avg_loss)，均与 close 等长，前 period 个位置为 NaN
+    """
+    avg_gain = np.full(len(close), np.nan)
+    avg_loss = np.full(len(close), np.nan)
+    if len(close) < period + 1:
+        return avg_gain, avg_loss
+
+    delta = np.diff(close)
+    gains = np.where(delta > 0, delta, 0.0)
+    losses = np.where(delta < 0, -delta, 0.0)
+
+    def _smooth(values: np.ndarray) -> np.ndarray:
+        # 首元素替换为 SMA 初值，其后按 Wilder 递归
+        seeded = values[period - 1:].copy()
+        seeded[0] = values[:period].mean()
+        return pd.Series(seeded).ewm(alpha=1.0 / period, adjust=False).mean().to_numpy()
+
+    avg_gain[period:] = _smooth(gains)
+    avg_loss[period:] = _smooth(losses)
+    return avg_gain, avg_loss
+
+
+def wilder_step(avg: float, value: float, period: int) -> float:
+    """Wilder 平滑递推一步"""
+    return (avg * (period - 1) + value) / period
+
+
+def rsi_from_averages(avg_gain: Any, avg_loss: Any) -> Any:
+    """
+    平均涨跌幅 → RSI（标量或数组）
+
+    无下跌：有上涨为 100，否则（完全持平）为 50；无上涨为 0
+    """
+    avg_gain = np.asarray(avg_gain, dtype=np.float64)
+    avg_loss = np.asarray(avg_loss, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    values = np.where(avg_loss == 0, np.where(avg_gain > 0, 100.0, 50.0), values)
+    values = np.where((avg_gain == 0) & (avg_loss > 0), 0.0, values)
+    # 初值之前的 NaN 保持为 NaN
+    values = np.where(np.isnan(avg_gain) | np.isnan(avg_loss), np.nan, values)
+    return values if values.ndim else float(values)
+
+
+def wilder_rsi_series(close: np.ndarray, period: int) -> np.ndarray:
+    """
+    Wilder RSI 完整序列（向量化）
+
+    Args:
+        close: 收盘价数组（不含 NaN）
+        period: RSI 周期
+
+    Returns:
+        与 close 等长的 RSI 数组，前 period 个位置为 NaN
+    """
+    avg_gain, avg_loss = wilder_averages(close, period)
+    return rsi_from_averages(avg_gain, avg_loss)
+
+
+def _wilder_rsi(close: np.ndarray, period: int) -> Optional[float]:
+    """Wilder RSI 最新值（NaN 收盘价被剔除），数据不足时返回 None"""
+    valid = close[~np.isnan(close)]
+    if len(valid) < period + 1:
+        return None
+    return float(wilder_rsi_series(valid, period)[-1])
+
+
+class IndicatorSet:
+    """
+    一组 K 线的全部衍生序列（numpy 数组，与输入行对齐）
+
+    各序列在首次访问时计算并缓存，同一请求内的多个服务共享同一实例，
+    既不重复计算，也不为用不到的指标付出代价（如温度、趋势均命中缓存时）。
+    """
+
+    def __init__(
+        self,
+        close: np.ndarray,
+        high: Optional[np.ndarray] = None,
+        low: Optional[np.ndarray] = None,
+        atr_period: int = 14,
+        vol_window: int = DEFAULT_VOL_WINDOW,
+        rsi_period: int = 14,
+    ) -> None:
+        self.close = close
+        self.high = high
+        self.low = low
+        self.atr_period = atr_period
+        self.vol_window = vol_window
+        self.rsi_period = rsi_period
+        self._ma: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    @cached_property
+    def has_nan(self) -> bool:
+        """收盘价中是否含 NaN（含 NaN 时温度各因子需按剔除后的序列计算）"""
+        return bool(np.isnan(self.close).any())
+
+    # ==================== 均线 ====================
+
+    def ma_series(self, period: int) -> np.ndarray:
+        """指定周期的均线序列"""
+        series = self._ma.get(period)
+        if series is None:
+            series = _rolling_mean(self.close, period)
+            self._ma[period] = series
+        return series
+
+    def last_ma(self, period: int) -> Optional[float]:
+        """均线最新值，数据不足时返回 None"""
+        series = self.ma_series(period)
+        if len(series) == 0 or np.isnan(series[-1]):
+            return None
+        return float(series[-1])
+
+    # ==================== 收益率 / 波动率 ====================
+
+    @cached_property
+    def returns(self) -> np.ndarray:
+        """日收益率（首行为 NaN）"""
+        return pd.Series(self.close).pct_change().to_numpy()
+
+    @cached_property
+    def rolling_vol(self) -> np.ndarray:
+        """滚动波动率，与 close.pct_change().dropna().rolling().std() 对齐到原始行"""
+        rolling_vol = np.full(len(self.close), np.nan)
+        if len(self.close) > 1:
+            rolling_vol[1:] = (
+                pd.Series(self.returns[1:]).rolling(window=self.vol_window).std().to_numpy()
+            )
+        return rolling_vol
+
+    # ==================== 回撤 ====================
+
+    @cached_property
+    def cummax(self) -> np.ndarray:
+        """累计最高收盘价（忽略 NaN）"""
+        if len(self.close) == 0:
+            return self.close.copy()
+        return np.fmax.accumulate(self.close)
+
+    @cached_property
+    def drawdown(self) -> np.ndarray:
+        """相对累计最高价的回撤（负数或零）"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (self.close - self.cummax) / self.cummax
+
+    # ==================== TR / ATR ====================
+
+    @cached_property
+    def tr(self) -> Optional[np.ndarray]:
+        """真实波幅，缺少 high / low 时为 None"""
+        if self.high is None or self.low is None:
+            return None
+        close = self.close
+        prev_close = np.concatenate(([np.nan], close[:-1])) if len(close) else close
+        # 与 pd.concat([...], axis=1).max(axis=1) 一致：逐行忽略 NaN 取最大
+        return pd.DataFrame({
+            "hl": self.high - self.low,
+            "hc": np.abs(self.high - prev_close),
+            "lc": np.abs(self.low - prev_close),
+        }).max(axis=1).to_numpy()
+
+    @cached_property
+    def atr(self) -> Optional[np.ndarray]:
+        """TR 的 atr_period 简单移动平均"""
+        if self.tr is None:
+            return None
+        return _rolling_mean(self.tr, self.atr_period)
+
+    def last_atr(self) -> Optional[float]:
+        atr = self.atr
+        if atr is None or len(atr) == 0 or np.isnan(atr[-1]):
+            return None
+        return float(atr[-1])
+
+    # ==================== RSI ====================
+
+    @cached_property
+    def rsi(self) -> Optional[float]:
+        """RSI(rsi_period) 最新值，数据不足时为 None"""
+        return _wilder_rsi(self.close, self.rsi_period)
+
+    @cached_property
+    def rsi_averages(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Wilder 平均涨幅 / 平均跌幅序列（仅在 has_nan 为 False 时与行对齐）"""
+        return wilder_averages(self.close[~np.isnan(self.close)], self.rsi_period)
+
+
+class IndicatorState:
+    """
+    截至某根 K 线的滚动指标状态（可 pickle，随温度缓存持久化）
+
+    只保存新增一根收盘价时更新各温度因子所需的信息：
+    - K 线总数、累计最高价
+    - 最近 tail_size 个收盘价（均线）
+    - 最近 percentile_window - 1 个收盘价的排名索引（历史分位）
+    - RSI 的 Wilder 平均涨跌幅
+    - 最近 vol_window 个日收益率，以及全部历史滚动波动率的排名索引
+
+    advance() 返回推进一根后的新状态，原状态不变（缓存中的对象须视为只读）。
+    """
+
+    def __init__(
+        self,
+        last_date: str,
+        count: int,
+        peak: float,
+        closes: np.ndarray,
+        returns: np.ndarray,
+        price_rank: SortedWindow,
+        vol_rank: SortedWindow,
+        avg_gain: float,
+        avg_loss: float,
+        rsi_period: int,
+        vol_window: int,
+        tail_size: int,
+        percentile_window: int,
+    ) -> None:
+        self.last_date = last_date
+        self.count = count
+        self.peak = peak
+        self.closes = closes
+        self.returns = returns
+        self.price_rank = price_rank
+        self.vol_rank = vol_rank
+        self.avg_gain = avg_gain
+        self.avg_loss = avg_loss
+        self.rsi_period = rsi_period
+        self.vol_window = vol_window
+        self.tail_size = tail_size
+        self.percentile_window = percentile_window
+
+    @property
+    def last_close(self) -> float:
+        return float(self.closes[-1])
+
+    @classmethod
+    def from_indicators(
+        cls,
+        indicators: IndicatorSet,
+        last_date: str,
+        end: int,
+        tail_size: int,
+        percentile_window: int,
+    ) -> Optional["IndicatorState"]:
+        """
+        由 IndicatorSet 的前 end 行构建状态
+
+        Args:
+            indicators: 完整历史的衍生序列
+            last_date: 第 end 行（状态最后一根 K 线）的日期
+            end: 状态包含的行数
+            tail_size: 保留的收盘价个数
+            percentile_window: 历史分位窗口长度（含最新一根）
+
+        Returns:
+            IndicatorState，收盘价含 NaN 或不足以计算 RSI 时返回 None
+        """
+        if indicators.has_nan or end < indicators.rsi_period + 1 or end > len(indicators):
+            return None
+
+        close = indicators.close[:end]
+        avg_gain, avg_loss = indicators.rsi_averages
+        vols = indicators.rolling_vol[:end]
+        return cls(
+            last_date=last_date,
+            count=end,
+            peak=float(indicators.cummax[end - 1]),
+            closes=close[-tail_size:].copy(),
+            returns=indicators.returns[1:end][-indicators.vol_window:].copy(),
+            price_rank=SortedWindow(close, maxlen=percentile_window - 1),
+            vol_rank=SortedWindow(vols[~np.isnan(vols)]),
+            avg_gain=float(avg_gain[end - 1]),
+            avg_loss=float(avg_loss[end - 1]),
+            rsi_period=indicators.rsi_period,
+            vol_window=indicators.vol_window,
+            tail_size=tail_size,
+            percentile_window=percentile_window,
+        )
+
+    def step(self, price: float) -> Tuple[float, float, float]:
+        """
+        收盘价为 price 的下一根 K 线对应的值（不修改状态）
+
+        Returns:
+            (avg_gain, avg_loss, rolling_vol)，收益率不足一个窗口时 rolling_vol 为 NaN
+        """
+        delta = price - self.last_close
+        avg_gain = wilder_step(self.avg_gain, max(delta, 0.0), self.rsi_period)
+        avg_loss = wilder_step(self.avg_loss, max(-delta, 0.0), self.rsi_period)
+
+        recent = self.returns[max(0, len(self.returns) - self.vol_window + 1):]
+        window = np.append(recent, price / self.last_close - 1)
+        vol = float(np.std(window, ddof=1)) if len(window) >= self.vol_window else np.nan
+        return avg_gain, avg_loss, vol
+
+    def advance(self, price: float, date: str) -> "IndicatorState":
+        """推进一根收盘价为 price 的 K 线，返回新状态"""
+        avg_gain, avg_loss, vol = self.step(price)
+        return IndicatorState(
+            last_date=date,
+            count=self.count + 1,
+            peak=max(self.peak, price),
+            closes=np.append(self.closes, price)[-self.tail_size:],
+            returns=np.append(self.returns, price / self.last_close - 1)[-self.vol_window:],
+            price_rank=self.price_rank.push(price),
+            vol_rank=self.vol_rank if np.isnan(vol) else self.vol_rank.push(vol),
+            avg_gain=avg_gain,
+            avg_loss=avg_loss,
+            rsi_period=self.rsi_period,
+            vol_window=self.vol_window,
+            tail_size=self.tail_size,
+            percentile_window=self.percentile_window,
+        )
+
+    def price_percentile(self, price: float) -> float:
+        """price 在“最近 percentile_window - 1 个收盘价 + price”中的分位（O(log n)）"""
+        return self.price_rank.count_below(price) / (len(self.price_rank) + 1)
+
+    def vol_percentile(self, vol: float) -> float:
+        """vol 在“全部历史滚动波动率 + vol”中的分位（O(log n)）"""
+        return self.vol_rank.count_below(vol) / (len(self.vol_rank) + 1)
+
+
+def pending_closes(
+    df: pd.DataFrame,
+    last_date: str,
+    tail: np.ndarray,
+    count: Optional[int] = None,
+    max_bars: int = MAX_ADVANCE_BARS,
+) -> Optional[np.ndarray]:
+    """
+    df 中 last_date 之后、最后一行之前的收盘价（把状态推进到倒数第二根所需的 K 线）
+
+    Args:
+        df: 包含 date / close 列的 DataFrame，行按日期升序
+        last_date: 状态最后一根 K 线的日期（与 str(df["date"]) 同格式）
+        tail: 状态保存的收盘价尾部，末尾若干个须与 df 中对应位置一致
+        count: 状态包含的 K 线总数，提供时须等于 last_date 在 df 中的行号 + 1
+        max_bars: 最多补齐的 K 线数
+
+    Returns:
+        待推进的收盘价数组（可为空），状态与 df 不一致时返回 None
+    """
+    n = len(df)
+    if n < 2 or len(tail) == 0:
+        return None
+
+    dates = df["date"]
+    pos = None
+    for i in range(n - 2, max(-1, n - 3 - max_bars), -1):
+        if str(dates.iloc[i]) == last_date:
+            pos = i
+            break
+    if pos is None or (count is not None and count != pos + 1):
+        return None
+
+    close = df["close"].to_numpy(dtype=np.float64)
+    k = min(len(tail), pos + 1, STATE_CHECK_BARS)
+    if not np.allclose(close[pos + 1 - k:pos + 1], tail[-k:], rtol=1e-9, atol=0.0):
+        return None
+
+    pending = close[pos + 1:n - 1]
+    if np.isnan(pending).any() or np.isnan(close[-1]):
+        return None
+    return pending
+
+
+def compute_indicators(
+    df: pd.DataFrame,
+    atr_period: Optional[int] = None,
+    vol_window: int = DEFAULT_VOL_WINDOW,
+    rsi_period: Optional[int] = None,
+) -> IndicatorSet:
+    """
+    从 DataFrame 构建 IndicatorSet（只做一次列 → 数组转换）
+
+    Args:
+        df: 包含 close 列（可选 high / low）的 OHLCV DataFrame，行按日期升序
+        atr_period: ATR 周期，默认取 metric_config.atr_period
+        vol_window: 滚动波动率窗口
+        rsi_period: RSI 周期，默认取 metric_config.rsi_period
+
+    Returns:
+        IndicatorSet
+    """
+    if atr_period is None:
+        atr_period = metric_config.atr_period
+    if rsi_period is None:
+        rsi_period = metric_config.rsi_period
+
+    high = low = None
+    if "high" in df.columns and "low" in df.columns:
+        high = df["high"].to_numpy(dtype=np.float64)
+        low = df["low"].to_numpy(dtype=np.float64)
+
+    return IndicatorSet(
+        close=df["close"].to_numpy(dtype=np.float64),
+        high=high,
+        low=low,
+        atr_period=atr_period,
+        vol_window=vol_window,
+        rsi_period=rsi_period,
+    )
@@ -7,6 +7,7 @@ from datetime import datetime
 
 from app.services.akshare_service import disk_cache, ak_service
 from app.core.config_loader import metric_config
+from app.services.indicator_engine import compute_indicators
 
 logger = logging.getLogger(__name__)
 
@@ -118,7 +119,10 @@ class MetricsService:
             return None
 
         # Actual synchronous fetch (only for background threads or explicit calls)
-        df = ak_service.fetch_history_raw(code, period="daily", adjust="qfq")
+        # Only the drawdown / ATR windows are needed, so read just the tail slice
+        df = ak_service.fetch_history_raw(
+            code, period="daily", adjust="qfq", tail=max(dd_days, atr_period + 1)
+        )
         if df.empty or len(df) < 2:
             return None
 
@@ -131,11 +135,7 @@ class MetricsService:
         # ATR Calculation
         atr_val = None
         if len(df) > atr_period:
-            prev_close = df["close"].shift(1)
-            tr = pd.concat([df["high"] - df["low"], (df["high"] - prev_close).abs(), (df["low"] - prev_close).abs()], axis=1).max(axis=1)
-            atr_series = tr.rolling(window=atr_period).mean()
-            if not pd.isna(atr_series.iloc[-1]):
-                atr_val = float(atr_series.iloc[-1])
+            atr_val = compute_indicators(df, atr_period=atr_period).last_atr()
 
         result = {
             "hist_peak_price": hist_peak_price,
@@ -0,0 +1,195 @@
+"""
+MetricsSnapshotService - 收盘指标快照
+
+收盘后每只 ETF 的温度、日趋势、周趋势只需计算一次：15:30 告警检查、15:35 每日摘要
+以及自选列表接口共用同一份快照，不再各自拉取历史并重算。
+
+快照以交易日为版本：
+- trading_date：快照对应的已收盘交易日（工作日 15:00 后为当天，否则为前一个工作日），
+  交易时段内没有可用的交易日，快照既不读也不写，盘中检查总是重新计算
+- data_date：计算所用历史数据的最后一根 K 线日期（节假日或数据源滞后时早于 trading_date）
+- version：快照结构版本，指标格式变化时递增，旧快照自动失效
+"""
+
+import logging
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, Iterable, Optional
+from zoneinfo import ZoneInfo
+
+from app.services.akshare_service import disk_cache
+
+logger = logging.getLogger(__name__)
+
+_CHINA_TZ = ZoneInfo("Asia/Shanghai")
+
+# 快照结构版本
+SNAPSHOT_VERSION = 1
+
+# 交易时段（含集合竞价）
+MARKET_OPEN = time(9, 15)
+MARKET_CLOSE = time(15, 0)
+
+# 快照保留时间（秒），覆盖长假
+SNAPSHOT_TTL = 14 * 24 * 3600
+
+
+class MetricsSnapshotService:
+    """收盘指标快照服务类"""
+
+    # 缓存 key 前缀
+    SNAPSHOT_PREFIX = "metrics_snapshot"
+
+    def _get_cache_key(self, code: str) -> str:
+        """
+        生成缓存 key
+
+        Args:
+            code: ETF 代码
+
+        Returns:
+            缓存 key，格式为 "metrics_snapshot:{code}"
+        """
+        return f"{self.SNAPSHOT_PREFIX}:{code}"
+
+    def current_trading_date(self, now: Optional[datetime] = None) -> Optional[str]:
+        """
+        当前可用快照对应的交易日
+
+        不含节假日日历：节假日视为普通工作日，此时 data_date 早于 trading_date。
+
+        Args:
+            now: 当前时间，默认取北京时间
+
+        Returns:
+            YYYY-MM-DD；工作日交易时段内返回 None
+        """
+        now = now.astimezone(_CHINA_TZ) if now is not None else datetime.now(_CHINA_TZ)
+        day = now.date()
+        if now.weekday() < 5:
+            if MARKET_OPEN <= now.time() < MARKET_CLOSE:
+                return None
+            if now.time() >= MARKET_CLOSE:
+                return day.isoformat()
+        day -= timedelta(days=1)
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+        return day.isoformat()
+
+    def get_entry(self, code: str, trading_date: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        读取某只 ETF 当前交易日的快照
+
+        Args:
+            code: ETF 代码
+            trading_date: 交易日，默认 current_trading_date()
+
+        Returns:
+            快照 {"version", "trading_date", "data_date", "metrics", "computed_at"}，
+            不存在、版本不符或不属于该交易日时返回 None
+        """
+        trading_date = trading_date or self.current_trading_date()
+        if trading_date is None:
+            return None
+        try:
+            entry = disk_cache.get(self._get_cache_key(code))
+        except Exception as e:
+            logger.warning(f"[{code}] Failed to read metrics snapshot: {e}")
+            return None
+        if not entry or entry.get("version") != SNAPSHOT_VERSION:
+            return None
+        if entry.get("trading_date") != trading_date:
+            return None
+        return entry
+
+    def get(
+        self,
+        code: str,
+        trading_date: Optional[str] = None,
+        require_data_date: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        读取某只 ETF 当前交易日的指标
+
+        Args:
+            code: ETF 代码
+            trading_date: 交易日，默认 current_trading_date()
+            require_data_date: 要求快照数据包含该交易日的 K 线（接口侧使用，
+                避免以滞后数据代替拼接了收盘价的实时计算）
+
+        Returns:
+            {"temperature", "daily_trend", "weekly_trend", "data_date"}，无可用快照时返回 None
+        """
+        entry = self.get_entry(code, trading_date)
+        if entry is None:
+            return None
+        if require_data_date and entry.get("data_date") != entry["trading_date"]:
+            return None
+        return entry["metrics"]
+
+    def get_many(
+        self, codes: Iterable[str], trading_date: Optional[str] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        批量读取指标快照
+
+        Returns:
+            ETF 代码 -> 指标，没有可用快照的代码不出现
+        """
+        trading_date = trading_date or self.current_trading_date()
+        if trading_date is None:
+            return {}
+        results = {}
+        for code in codes:
+            metrics = self.get(code, trading_date)
+            if metrics is not None:
+                results[code] = metrics
+        return results
+
+    def put(
+        self, code: str, metrics: Dict[str, Any], trading_date: Optional[str] = None
+    ) -> bool:
+        """
+        写入某只 ETF 的指标快照
+
+        Args:
+            code: ETF 代码
+            metrics: 指标字典（含 data_date）
+            trading_date: 交易日，默认 current_trading_date()
+
+        Returns:
+            是否写入（交易时段内或写入失败时为 False）
+        """
+        trading_date = trading_date or self.current_trading_date()
+        if trading_date is None or not metrics:
+            return False
+        entry = {
+            "version": SNAPSHOT_VERSION,
+            "trading_date": trading_date,
+            "data_date": metrics.get("data_date"),
+            "metrics": metrics,
+            "computed_at": datetime.now(_CHINA_TZ).isoformat(),
+        }
+        try:
+            disk_cache.set(self._get_cache_key(code), entry, expire=SNAPSHOT_TTL)
+        except Exception as e:
+            logger.warning(f"[{code}] Failed to write metrics snapshot: {e}")
+            return False
+        return True
+
+    def put_many(
+        self, metrics_map: Dict[str, Dict[str, Any]], trading_date: Optional[str] = None
+    ) -> int:
+        """
+        批量写入指标快照
+
+        Returns:
+            写入的 ETF 数
+        """
+        trading_date = trading_date or self.current_trading_date()
+        if trading_date is None:
+            return 0
+        return sum(self.put(code, metrics, trading_date) for code, metrics in metrics_map.items())
+
+
+# 全局单例
+metrics_snapshot_service = MetricsSnapshotService()
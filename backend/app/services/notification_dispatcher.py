@@ -0,0 +1,195 @@
+"""
+NotificationDispatcher - Telegram 消息并发发送
+
+调度任务一次要给大量用户发消息（15:35 每日摘要、告警检查），逐个 await 会把
+每条消息的网络往返串联起来，失败重试的等待也会阻塞后面的用户。Dispatcher：
+- 并发发送，同时进行的发送数不超过 TELEGRAM_MAX_CONCURRENCY
+- 按 Telegram 限制排队：每个 Bot 每秒不超过 TELEGRAM_BOT_RATE 条，
+  同一会话相邻消息间隔不小于 TELEGRAM_CHAT_INTERVAL 秒
+- 失败按指数退避重试（RetryAfter 按服务端要求的秒数等待），只阻塞该条消息；
+  Token 无效、被用户屏蔽等不可恢复错误不重试
+- 统计发送量、重试次数、延迟与最近一分钟吞吐
+
+实际发送由 sender 完成，默认为 TelegramNotificationService.send_message（经 Bot 池复用连接）。
+"""
+
+import asyncio
+import logging
+import time
+import weakref
+from collections import deque
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional
+
+from telegram.error import BadRequest, ChatMigrated, Forbidden, InvalidToken, RetryAfter
+
+from app.core.config import settings
+from app.services.notification_service import TelegramNotificationService
+
+logger = logging.getLogger(__name__)
+
+# 吞吐统计窗口（秒）
+THROUGHPUT_WINDOW = 60.0
+
+# 不可恢复的错误：重试不会成功
+_PERMANENT_ERRORS = (BadRequest, ChatMigrated, Forbidden, InvalidToken)
+
+Sender = Callable[[str, str, str], Awaitable[Any]]
+
+
+class _IntervalLimiter:
+    """
+    按 key 排队的最小间隔限速
+
+    每次 wait 预约该 key 的下一个可用时刻（不早于上一次预约 + interval），
+    再睡到该时刻。预约在 await 之前完成，同一 key 的并发调用天然按到达顺序排开。
+    """
+
+    def __init__(self) -> None:
+        self._next: Dict[Hashable, float] = {}
+
+    async def wait(self, key: Hashable, interval: float) -> None:
+        if interval <= 0:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next.get(key, 0.0))
+        self._next[key] = slot + interval
+        if len(self._next) > 4096:
+            self._next = {k: t for k, t in self._next.items() if t > now}
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class NotificationDispatcher:
+    """Telegram 消息并发发送器"""
+
+    def __init__(self, sender: Optional[Sender] = None) -> None:
+        """
+        Args:
+            sender: 发送函数 (bot_token, chat_id, message)，失败时抛异常；
+                默认为 TelegramNotificationService.send_message
+        """
+        self._sender = sender
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._bot_limiter = _IntervalLimiter()
+        self._chat_limiter = _IntervalLimiter()
+        self._completed: Deque[float] = deque()
+        self._sent = 0
+        self._failed = 0
+        self._retries = 0
+        self._in_flight = 0
+        self._latency_total = 0.0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        """当前事件循环的并发信号量（信号量不能跨事件循环使用）"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(max(1, settings.TELEGRAM_MAX_CONCURRENCY))
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def _deliver(self, bot_token: str, chat_id: str, message: str) -> Any:
+        sender = self._sender or TelegramNotificationService.send_message
+        return await sender(bot_token, chat_id, message)
+
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+        """
+        计算第 attempt 次失败后的重试等待秒数
+
+        Returns:
+            等待秒数，不可恢复的错误返回 None
+        """
+        cause = error.__cause__ if isinstance(error.__cause__, Exception) else error
+        if isinstance(cause, RetryAfter):
+            retry_after = cause.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            return float(retry_after)
+        if isinstance(cause, _PERMANENT_ERRORS):
+            return None
+        return settings.TELEGRAM_RETRY_BACKOFF * 2 ** (attempt - 1)
+
+    async def send(self, bot_token: str, chat_id: str, message: str) -> bool:
+        """
+        发送一条消息（限速、失败重试）
+
+        Args:
+            bot_token: Telegram Bot Token
+            chat_id: 目标 Chat ID
+            message: 消息内容（HTML）
+
+        Returns:
+            True 表示发送成功
+
+        Raises:
+            Exception: 重试用尽或不可恢复错误时抛出最后一次的异常
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            # 会话间隔可能长达数秒，在占用并发名额之前等待；Bot 间隔很短，在名额内等待
+            await self._chat_limiter.wait((bot_token, chat_id), settings.TELEGRAM_CHAT_INTERVAL)
+            async with self._semaphore():
+                await self._bot_limiter.wait(bot_token, 1.0 / max(settings.TELEGRAM_BOT_RATE, 1e-6))
+                self._in_flight += 1
+                started = time.monotonic()
+                try:
+                    await self._deliver(bot_token, chat_id, message)
+                    error = None
+                except Exception as e:
+                    error = e
+                finally:
+                    self._in_flight -= 1
+
+            if error is None:
+                finished = time.monotonic()
+                self._sent += 1
+                self._latency_total += finished - started
+                self._completed.append(finished)
+                self._prune(finished)
+                return True
+
+            delay = self._retry_delay(error, attempt)
+            if delay is None or attempt > settings.TELEGRAM_MAX_RETRIES:
+                self._failed += 1
+                raise error
+
+            self._retries += 1
+            logger.warning(
+                f"Telegram send to chat {chat_id} failed (attempt {attempt}), "
+                f"retrying in {delay:.1f}s: {error}"
+            )
+            # 退避期间释放并发名额，不影响其他消息
+            await asyncio.sleep(delay)
+
+    def _prune(self, now: float) -> None:
+        """丢弃吞吐统计窗口之外的完成时间"""
+        cutoff = now - THROUGHPUT_WINDOW
+        while self._completed and self._completed[0] < cutoff:
+            self._completed.popleft()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        发送统计
+
+        Returns:
+            sent / failed / retries / in_flight 累计值，平均延迟（毫秒）与最近一分钟吞吐（条/分钟）
+        """
+        self._prune(time.monotonic())
+        return {
+            "sent": self._sent,
+            "failed": self._failed,
+            "retries": self._retries,
+            "in_flight": self._in_flight,
+            "avg_latency_ms": round(self._latency_total / self._sent * 1000, 1) if self._sent else None,
+            "throughput_per_min": len(self._completed),
+        }
+
+
+# 全局单例
+notification_dispatcher = NotificationDispatcher()
@@ -4,14 +4,21 @@
 提供 Telegram 通知功能
 """
 
+import asyncio
+import logging
+from collections import OrderedDict
 from telegram import Bot
 from telegram.error import TelegramError
+from telegram.request import HTTPXRequest
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 
+from app.core.config import settings
 from app.models.alert_config import SignalPriority, SignalItem
 from app.models.price_alert import PriceAlertDirection
 
+logger = logging.getLogger(__name__)
+
 
 def _direction_display(direction: str) -> tuple:
     """返回方向的 (emoji, 文本) 映射"""
@@ -20,6 +27,72 @@ def _direction_display(direction: str) -> tuple:
     return ("⬆️", "突破")
 
 
+class TelegramBotPool:
+    """
+    按 Bot Token 复用已初始化的 Bot（及其 HTTP 连接池）
+
+    Bot 内部的 httpx 客户端绑定创建时的事件循环，因此池中记录所属循环；
+    在其他事件循环中（如后台线程的 asyncio.run）获取时创建新的 Bot 替换。
+    超过 max_size 个 Token 时按最近最少使用淘汰。
+    """
+
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self._bots: "OrderedDict[str, Tuple[asyncio.AbstractEventLoop, Bot]]" = OrderedDict()
+
+    def _create_bot(self, bot_token: str) -> Bot:
+        request = HTTPXRequest(connection_pool_size=max(1, settings.TELEGRAM_MAX_CONCURRENCY))
+        return Bot(token=bot_token, base_url=settings.TELEGRAM_API_BASE_URL, request=request)
+
+    async def get(self, bot_token: str) -> Bot:
+        """
+        获取 Token 对应的 Bot（必要时创建并初始化）
+
+        Raises:
+            TelegramError: Token 无效或初始化请求失败
+        """
+        loop = asyncio.get_running_loop()
+        pooled = self._bots.get(bot_token)
+        if pooled is not None and pooled[0] is loop:
+            self._bots.move_to_end(bot_token)
+            return pooled[1]
+
+        bot = self._create_bot(bot_token)
+        await bot.initialize()
+
+        # 等待初始化期间可能已有其他协程放入同一 Token 的 Bot
+        pooled = self._bots.get(bot_token)
+        if pooled is not None and pooled[0] is loop:
+            await bot.shutdown()
+            return pooled[1]
+
+        self._bots[bot_token] = (loop, bot)
+        while len(self._bots) > self.max_size:
+            _, (old_loop, old_bot) = self._bots.popitem(last=False)
+            if old_loop is loop:
+                await old_bot.shutdown()
+        return bot
+
+    def __len__(self) -> int:
+        return len(self._bots)
+
+    async def close(self) -> None:
+        """关闭当前事件循环中的全部 Bot"""
+        loop = asyncio.get_running_loop()
+        bots, self._bots = self._bots, OrderedDict()
+        for owner, bot in bots.values():
+            if owner is not loop:
+                continue
+            try:
+                await bot.shutdown()
+            except Exception as e:
+                logger.warning(f"Failed to shut down Telegram bot: {e}")
+
+
+# 全局 Bot 池
+telegram_bot_pool = TelegramBotPool()
+
+
 class TelegramNotificationService:
     """Telegram 通知服务"""
 
@@ -37,14 +110,14 @@ class TelegramNotificationService:
             bool: 发送成功返回 True
 
         Raises:
-            ValueError: Telegram API 调用失败时抛出
+            ValueError: Telegram API 调用失败时抛出（原始 TelegramError 为 __cause__）
         """
         try:
-            async with Bot(token=bot_token) as bot:
-                await bot.send_message(chat_id=chat_id, text=message, parse_mode='HTML')
+            bot = await telegram_bot_pool.get(bot_token)
+            await bot.send_message(chat_id=chat_id, text=message, parse_mode='HTML')
             return True
         except TelegramError as e:
-            raise ValueError(f"Telegram API 错误: {str(e)}")
+            raise ValueError(f"Telegram API 错误: {str(e)}") from e
 
     @staticmethod
     async def test_connection(bot_token: str, chat_id: str) -> Dict[str, Any]:
@@ -0,0 +1,273 @@
+"""
+PanelService - 多只 ETF 的批量温度 / 日趋势计算
+
+把多只 ETF 的收盘价拼成 codes × bars 的二维数组（ClosePanel），温度五因子与日线
+均线排列沿时间轴对所有 ETF 一次性向量化计算，替代逐只调用
+temperature_service.calculate_temperature / trend_service.get_daily_trend。
+
+对齐方式：每行按该 ETF 自身的 K 线右对齐（最后一列为各自最新一根），行首不足部分
+以 NaN 填充。各 ETF 的上市日、停牌日不同，按日期对齐会在序列中间插入 NaN，改变
+RSI、波动率等因子；按位置右对齐则与逐只计算等价。收盘价中的 NaN 先剔除，
+与 temperature_service 对含 NaN 序列的处理一致。
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.config_loader import metric_config
+from app.services.indicator_engine import DEFAULT_VOL_WINDOW, rsi_from_averages
+from app.services.temperature_service import TRADING_DAYS_PER_YEAR, temperature_service
+from app.services.trend_service import trend_service
+
+logger = logging.getLogger(__name__)
+
+# 趋势得分使用的均线周期
+TREND_SCORE_PERIODS = (5, 10, 20, 60)
+
+
+class ClosePanel:
+    """
+    右对齐的收盘价面板
+
+    Attributes:
+        codes: 行对应的 ETF 代码
+        closes: (len(codes), width) 收盘价矩阵，行首以 NaN 填充
+        lengths: 各行有效 K 线数
+        last_dates: 各行最后一根 K 线的日期
+    """
+
+    def __init__(
+        self,
+        codes: List[str],
+        closes: np.ndarray,
+        lengths: np.ndarray,
+        last_dates: List[Optional[str]],
+    ) -> None:
+        self.codes = codes
+        self.closes = closes
+        self.lengths = lengths
+        self.last_dates = last_dates
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @classmethod
+    def from_frames(cls, frames: Mapping[str, pd.DataFrame]) -> "ClosePanel":
+        """
+        由各 ETF 的 OHLCV DataFrame 构建面板
+
+        Args:
+            frames: ETF 代码 -> 按日期升序的 DataFrame（需含 close 列）
+
+        Returns:
+            ClosePanel，空数据或缺少 close 列的 ETF 被跳过
+        """
+        codes: List[str] = []
+        series: List[np.ndarray] = []
+        last_dates: List[Optional[str]] = []
+        for code, df in frames.items():
+            if df is None or df.empty or "close" not in df.columns:
+                continue
+            close = df["close"].to_numpy(dtype=np.float64)
+            close = close[~np.isnan(close)]
+            if len(close) == 0:
+                continue
+            codes.append(code)
+            series.append(close)
+            last_dates.append(str(df["date"].iloc[-1]) if "date" in df.columns else None)
+
+        width = max((len(s) for s in series), default=0)
+        closes = np.full((len(series), width), np.nan)
+        for i, close in enumerate(series):
+            closes[i, width - len(close):] = close
+
+        return cls(codes, closes, np.array([len(s) for s in series], dtype=np.int64), last_dates)
+
+
+# ==================== 向量化因子 ====================
+
+def _panel_mean_tail(closes: np.ndarray, period: int, offset: int = 0) -> np.ndarray:
+    """各行倒数 offset 根之前 period 根收盘价的均值，不足 period 根为 NaN"""
+    width = closes.shape[1]
+    if width < period + offset:
+        return np.full(len(closes), np.nan)
+    end = width - offset
+    return closes[:, end - period:end].mean(axis=1)
+
+
+def _panel_rsi(closes: np.ndarray, lengths: np.ndarray, period: int) -> np.ndarray:
+    """各行最新 Wilder RSI（与 wilder_averages 相同的 SMA 初值 + EWM 递推）"""
+    count, width = closes.shape
+    rsi = np.full(count, np.nan)
+    valid = lengths >= period + 1
+    if not valid.any():
+        return rsi
+
+    delta = np.diff(closes, axis=1)
+    gains = np.where(delta > 0, delta, 0.0)
+    losses = np.where(delta < 0, -delta, 0.0)
+
+    # 第一个有效涨跌幅所在列、SMA 初值所在列
+    start = (width - lengths)[valid]
+    seed_col = start + period - 1
+    rows = np.flatnonzero(valid)
+    window = start[:, None] + np.arange(period)
+
+    def _smooth(values: np.ndarray) -> np.ndarray:
+        seeded = np.full((len(rows), width - 1), np.nan)
+        seeded[:, :] = values[rows]
+        # 初值之前置 NaN，ewm 从第一个有效值开始递推
+        seeded[np.arange(width - 1)[None, :] < seed_col[:, None]] = np.nan
+        seeded[np.arange(len(rows)), seed_col] = values[rows[:, None], window].mean(axis=1)
+        averaged = pd.DataFrame(seeded.T).ewm(alpha=1.0 / period, adjust=False).mean()
+        return averaged.to_numpy()[-1]
+
+    rsi[rows] = rsi_from_averages(_smooth(gains), _smooth(losses))
+    return rsi
+
+
+def _panel_rolling_vol(closes: np.ndarray, window: int) -> np.ndarray:
+    """
+    滚动波动率矩阵（bars × codes），与逐只 close.pct_change().dropna().rolling().std() 一致
+    """
+    returns = closes[:, 1:] / closes[:, :-1] - 1
+    return pd.DataFrame(returns.T).rolling(window=window).std().to_numpy()
+
+
+class PanelService:
+    """批量温度 / 日趋势计算服务类"""
+
+    def compute_temperatures(self, panel: ClosePanel) -> List[Optional[Dict[str, Any]]]:
+        """
+        面板中每只 ETF 的市场温度
+
+        Args:
+            panel: 收盘价面板
+
+        Returns:
+            与 panel.codes 对齐的温度结果列表（格式同 calculate_temperature），
+            K 线不足 15 根的为 None
+        """
+        closes = panel.closes
+        lengths = panel.lengths
+        if len(panel) == 0:
+            return []
+
+        current = closes[:, -1]
+
+        # 1. 回撤得分
+        peak = np.nanmax(closes, axis=1)
+
+        # 2. RSI
+        rsi = _panel_rsi(closes, lengths, metric_config.rsi_period)
+
+        # 3. 历史分位
+        target_days = int(metric_config.percentile_years * TRADING_DAYS_PER_YEAR)
+        recent = closes[:, -target_days:]
+        below = (recent < current[:, None]).sum(axis=1)
+        window_size = np.minimum(lengths, recent.shape[1])
+        percentile = below / window_size
+
+        # 4. 波动率得分
+        vol_score = np.full(len(panel), 50.0)
+        vol_ready = lengths >= DEFAULT_VOL_WINDOW + 1
+        if vol_ready.any():
+            rolling_vol = _panel_rolling_vol(closes, DEFAULT_VOL_WINDOW)
+            current_vol = rolling_vol[-1]
+            observed = ~np.isnan(rolling_vol)
+            vol_below = ((rolling_vol < current_vol[None, :]) & observed).sum(axis=0)
+            vol_count = observed.sum(axis=0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                vol_score = np.where(
+                    vol_ready & (vol_count > 0), vol_below / vol_count * 100, 50.0
+                )
+
+        # 5. 趋势得分
+        mas = [_panel_mean_tail(closes, p) for p in TREND_SCORE_PERIODS]
+
+        results: List[Optional[Dict[str, Any]]] = []
+        for i in range(len(panel)):
+            n = int(lengths[i])
+            if n < 15:
+                results.append(None)
+                continue
+            trend_score = (
+                temperature_service._trend_score(*(ma[i] for ma in mas)) if n >= 60 else 50
+            )
+            results.append(temperature_service._build_result(
+                temperature_service._drawdown_score(float(current[i]), float(peak[i])),
+                None if np.isnan(rsi[i]) else float(rsi[i]),
+                temperature_service._percentile_payload(float(percentile[i]), n),
+                float(vol_score[i]),
+                trend_score,
+            ))
+        return results
+
+    def compute_daily_trends(self, panel: ClosePanel) -> List[Optional[Dict[str, Any]]]:
+        """
+        面板中每只 ETF 的日趋势（均线值、位置关系、均线排列）
+
+        Returns:
+            与 panel.codes 对齐的日趋势结果列表（格式同 get_daily_trend）
+        """
+        closes = panel.closes
+        if len(panel) == 0:
+            return []
+
+        periods = metric_config.daily_ma_periods
+        today = {p: _panel_mean_tail(closes, p) for p in periods}
+        yesterday = {p: _panel_mean_tail(closes, p, offset=1) for p in periods}
+        price_today = closes[:, -1]
+        price_yesterday = closes[:, -2] if closes.shape[1] >= 2 else np.full(len(panel), np.nan)
+
+        results: List[Optional[Dict[str, Any]]] = []
+        for i in range(len(panel)):
+            ma_values: Dict[str, Optional[float]] = {}
+            positions: Dict[str, Optional[str]] = {}
+            for p in periods:
+                ma_today = today[p][i]
+                ma_yesterday = yesterday[p][i]
+                ma_values[f"ma{p}"] = None if np.isnan(ma_today) else float(ma_today)
+                positions[f"ma{p}_position"] = (
+                    None if np.isnan(ma_today) or np.isnan(ma_yesterday)
+                    else trend_service._determine_position(
+                        price_today[i], ma_today, price_yesterday[i], ma_yesterday
+                    )
+                )
+            if panel.lengths[i] < 5 or ma_values.get("ma5") is None:
+                results.append(None)
+                continue
+            results.append(trend_service._build_daily_result(ma_values, positions))
+        return results
+
+    def compute(self, frames: Mapping[str, pd.DataFrame]) -> Dict[str, Dict[str, Any]]:
+        """
+        批量计算多只 ETF 的温度与日趋势
+
+        Args:
+            frames: ETF 代码 -> 按日期升序的 OHLCV DataFrame
+
+        Returns:
+            ETF 代码 -> {"temperature", "daily_trend", "last_date"}，无有效数据的代码不出现
+        """
+        panel = ClosePanel.from_frames(frames)
+        temperatures = self.compute_temperatures(panel)
+        daily_trends = self.compute_daily_trends(panel)
+        logger.debug(f"Panel computed for {len(panel)} ETFs ({panel.closes.shape[1]} bars)")
+        return {
+            code: {
+                "temperature": temperatures[i],
+                "daily_trend": daily_trends[i],
+                "last_date": panel.last_dates[i],
+            }
+            for i, code in enumerate(panel.codes)
+        }
+
+
+# 全局单例
+panel_service = PanelService()
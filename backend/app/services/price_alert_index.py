@@ -0,0 +1,161 @@
+"""
+PriceAlertIndex - 活跃到价提醒的常驻索引
+
+按 ETF 代码把活跃提醒分成 "above" / "below" 两个按目标价升序的数组：
+- above（突破）：价格 >= 目标价 - EPSILON 触发，命中的是目标价 <= 价格 + EPSILON 的前缀
+- below（跌破）：价格 <= 目标价 + EPSILON 触发，命中的是目标价 >= 价格 - EPSILON 的后缀
+每次行情刷新对每个代码做两次二分查找即可找出全部触发的提醒，无需查询数据库。
+
+索引只是加速结构，触发时仍以数据库中的记录为准（PriceAlertService.trigger_alerts）。
+提醒创建 / 删除 / 触发时由 PriceAlertService 同步写入索引（write-through）；
+load 之前索引视为未就绪，写入被忽略，首次 load 从数据库全量构建。
+"""
+
+import bisect
+import logging
+import threading
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from app.models.price_alert import PriceAlert, PriceAlertDirection
+
+logger = logging.getLogger(__name__)
+
+# 浮点比较容差 (ETF 价格最多 3 位小数，第 4 位容差)，price_alert_service 共用
+EPSILON = 0.0001
+
+
+class _CodeAlerts:
+    """单个 ETF 的提醒：两个 (目标价, 提醒 ID) 升序数组"""
+
+    __slots__ = ("above", "below")
+
+    def __init__(self) -> None:
+        self.above: List[Tuple[float, int]] = []
+        self.below: List[Tuple[float, int]] = []
+
+    def side(self, direction: str) -> List[Tuple[float, int]]:
+        return self.below if direction == PriceAlertDirection.BELOW else self.above
+
+    def __len__(self) -> int:
+        return len(self.above) + len(self.below)
+
+
+class PriceAlertIndex:
+    """活跃到价提醒索引（线程安全）"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._by_code: Dict[str, _CodeAlerts] = {}
+        # 提醒 ID -> (代码, 方向, 目标价)，用于按 ID 删除
+        self._entries: Dict[int, Tuple[str, str, float]] = {}
+        self._loaded = False
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, alert_id: int) -> bool:
+        return alert_id in self._entries
+
+    def load(self, alerts: Iterable[PriceAlert]) -> None:
+        """以数据库中的活跃提醒全量重建索引"""
+        with self._lock:
+            self._by_code = {}
+            self._entries = {}
+            for alert in alerts:
+                self._insert(alert.id, alert.etf_code, alert.direction, alert.target_price)
+            self._loaded = True
+        logger.info(f"Price alert index loaded with {len(self._entries)} active alerts")
+
+    def codes(self) -> List[str]:
+        """有活跃提醒的 ETF 代码"""
+        with self._lock:
+            return list(self._by_code)
+
+    def _insert(self, alert_id: int, code: str, direction: str, target: float) -> None:
+        if alert_id in self._entries:
+            self._remove(alert_id)
+        direction = str(PriceAlertDirection(direction).value)
+        bisect.insort(self._by_code.setdefault(code, _CodeAlerts()).side(direction), (target, alert_id))
+        self._entries[alert_id] = (code, direction, target)
+
+    def _remove(self, alert_id: int) -> bool:
+        entry = self._entries.pop(alert_id, None)
+        if entry is None:
+            return False
+        code, direction, target = entry
+        alerts = self._by_code[code]
+        side = alerts.side(direction)
+        i = bisect.bisect_left(side, (target, alert_id))
+        if i < len(side) and side[i] == (target, alert_id):
+            del side[i]
+        if not alerts:
+            del self._by_code[code]
+        return True
+
+    def add(self, alert: PriceAlert) -> None:
+        """写入一条活跃提醒（索引未加载或提醒已触发时忽略）"""
+        if alert.id is None or alert.is_triggered:
+            return
+        with self._lock:
+            if self._loaded:
+                self._insert(alert.id, alert.etf_code, alert.direction, alert.target_price)
+
+    def remove(self, alert_ids: Iterable[int]) -> int:
+        """
+        移除提醒
+
+        Returns:
+            实际移除的数量
+        """
+        with self._lock:
+            return sum(self._remove(alert_id) for alert_id in alert_ids)
+
+    def _match(self, prices: Mapping[str, Optional[float]]) -> Set[int]:
+        matched: Set[int] = set()
+        if len(prices) > len(self._by_code):
+            items = ((code, prices.get(code), alerts) for code, alerts in self._by_code.items())
+        else:
+            items = ((code, price, self._by_code.get(code)) for code, price in prices.items())
+        for code, price, alerts in items:
+            if alerts is None or price is None or not price > 0:
+                continue
+            # above：目标价 <= price + EPSILON 的前缀
+            end = bisect.bisect_right(alerts.above, (price + EPSILON, float("inf")))
+            matched.update(alert_id for _, alert_id in alerts.above[:end])
+            # below：目标价 >= price - EPSILON 的后缀
+            start = bisect.bisect_left(alerts.below, (price - EPSILON, float("-inf")))
+            matched.update(alert_id for _, alert_id in alerts.below[start:])
+        return matched
+
+    def match(self, prices: Mapping[str, Optional[float]]) -> Set[int]:
+        """
+        找出在给定价格下应触发的提醒
+
+        Args:
+            prices: ETF 代码 -> 最新价格（可包含没有提醒的代码）
+
+        Returns:
+            应触发的提醒 ID 集合
+        """
+        with self._lock:
+            return self._match(prices)
+
+    def pop_matches(self, prices: Mapping[str, Optional[float]]) -> Set[int]:
+        """
+        找出应触发的提醒并在同一临界区内从索引移除，避免并发刷新重复触发
+
+        触发处理失败时调用方应以 add 放回。
+        """
+        with self._lock:
+            matched = self._match(prices)
+            for alert_id in matched:
+                self._remove(alert_id)
+        return matched
+
+
+# 全局单例
+price_alert_index = PriceAlertIndex()
@@ -1,19 +1,18 @@
 """到价提醒业务服务"""
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 
 from sqlmodel import Session, select, col
 from sqlalchemy import delete
 
 from app.models.price_alert import PriceAlert, PriceAlertCreate, PriceAlertDirection
+from app.services.price_alert_index import EPSILON, price_alert_index
 
 logger = logging.getLogger(__name__)
 
 # 每用户最大活跃提醒数
 MAX_ACTIVE_ALERTS = 20
-# 浮点比较容差 (ETF 价格最多 3 位小数，第 4 位容差)
-EPSILON = 0.0001
 
 
 class PriceAlertService:
@@ -118,6 +117,7 @@ class PriceAlertService:
         session.add(alert)
         session.commit()
         session.refresh(alert)
+        price_alert_index.add(alert)
         return alert
 
     @staticmethod
@@ -132,6 +132,7 @@ class PriceAlertService:
             return False
         session.delete(alert)
         session.commit()
+        price_alert_index.remove([alert_id])
         return True
 
     @staticmethod
@@ -145,6 +146,21 @@ class PriceAlertService:
             ).all()
         )
 
+    @staticmethod
+    def get_active_alerts_by_ids(session: Session, alert_ids: Iterable[int]) -> List[PriceAlert]:
+        """按 ID 获取仍处于活跃状态的提醒（索引命中后以数据库记录为准）"""
+        alert_ids = list(alert_ids)
+        if not alert_ids:
+            return []
+        return list(
+            session.exec(
+                select(PriceAlert).where(
+                    col(PriceAlert.id).in_(alert_ids),
+                    PriceAlert.is_triggered == False,  # noqa: E712
+                )
+            ).all()
+        )
+
     @staticmethod
     def trigger_alerts(
         session: Session,
@@ -169,6 +185,7 @@ class PriceAlertService:
 
         if triggered:
             session.commit()
+            price_alert_index.remove(alert.id for alert in triggered)
 
         return triggered
 
@@ -0,0 +1,195 @@
+"""
+QuoteStreamHub - 实时行情推送（Server-Sent Events）
+
+客户端通过 /etf/stream 建立长连接并订阅一组代码，取代对 /etf/batch-price 的轮询：
+- Hub 订阅 etf_cache.changes，每次行情刷新只处理有订阅者的变化代码
+- 每个代码的 SSE 帧只序列化一次，同一帧分发给该代码的全部订阅者
+- 刷新线程中把每个连接本次的帧拼接后，用 call_soon_threadsafe 一次投递到连接所在的事件循环
+- 连接消费过慢（队列积压）时丢弃积压并发送 resync 事件，客户端应重新拉取快照
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from app.core.cache import ETFCacheManager, etf_cache
+from app.core.change_feed import ChangeEvent
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 推送帧中的字段（不含 tags，减少帧大小）
+STREAM_FIELDS = ("code", "name", "price", "change_pct")
+
+HEARTBEAT_FRAME = b": keep-alive\n\n"
+
+
+def encode_event(event: str, data, event_id: Optional[int] = None) -> bytes:
+    """
+    编码一个 SSE 事件
+
+    Args:
+        event: 事件类型
+        data: 可 JSON 序列化的数据
+        event_id: 事件 ID（变更流序号），客户端重连时通过 Last-Event-ID 带回
+
+    Returns:
+        UTF-8 编码的事件帧
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+def _quote_payload(quote: Dict) -> Dict:
+    return {field: quote.get(field) for field in STREAM_FIELDS}
+
+
+class QuoteSubscription:
+    """单个推送连接：订阅的代码与待发送帧队列"""
+
+    def __init__(self, codes: Iterable[str], loop: asyncio.AbstractEventLoop, queue_size: int) -> None:
+        self.codes: Set[str] = set(codes)
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def _put(self, frame: bytes) -> None:
+        """在连接的事件循环中入队；积压时丢弃旧帧改为 resync"""
+        if self.queue.full():
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            frame = encode_event("resync", {"reason": "slow consumer"})
+        self.queue.put_nowait(frame)
+
+    def push(self, frame: bytes) -> bool:
+        """从任意线程投递一帧，连接的事件循环已关闭时返回 False"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, frame)
+            return True
+        except RuntimeError:
+            return False
+
+    async def next_frame(self, timeout: float) -> Optional[bytes]:
+        """等待下一帧，超时返回 None"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class QuoteStreamHub:
+    """行情推送分发中心（线程安全）"""
+
+    def __init__(self, cache: ETFCacheManager = etf_cache) -> None:
+        self._cache = cache
+        self._lock = threading.Lock()
+        self._by_code: Dict[str, Set[QuoteSubscription]] = {}
+        self._subscriptions: Set[QuoteSubscription] = set()
+        self._started = False
+        self._frames_encoded = 0
+        self._frames_delivered = 0
+
+    def _ensure_started(self) -> None:
+        if not self._started:
+            self._cache.changes.subscribe(self._on_change)
+            self._started = True
+
+    def stop(self) -> None:
+        """取消订阅变更流并清空连接"""
+        with self._lock:
+            if self._started:
+                self._cache.changes.unsubscribe(self._on_change)
+                self._started = False
+            self._by_code = {}
+            self._subscriptions = set()
+
+    def subscribe(self, codes: Iterable[str], queue_size: Optional[int] = None) -> QuoteSubscription:
+        """
+        注册一个推送连接（须在连接所在的事件循环中调用）
+
+        Args:
+            codes: 订阅的 ETF 代码
+            queue_size: 待发送帧上限，默认取 QUOTE_STREAM_QUEUE_SIZE
+
+        Returns:
+            订阅对象，连接结束时应调用 unsubscribe
+        """
+        subscription = QuoteSubscription(
+            codes,
+            asyncio.get_running_loop(),
+            queue_size or settings.QUOTE_STREAM_QUEUE_SIZE,
+        )
+        with self._lock:
+            self._ensure_started()
+            self._subscriptions.add(subscription)
+            for code in subscription.codes:
+                self._by_code.setdefault(code, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: QuoteSubscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+            for code in subscription.codes:
+                subscribers = self._by_code.get(code)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_code[code]
+
+    def snapshot_frame(self, codes: List[str]) -> bytes:
+        """连接建立时的全量快照帧"""
+        quotes = [_quote_payload(quote) for quote in self._cache.get_quotes(codes)]
+        return encode_event("snapshot", {"items": quotes}, self._cache.changes.seq)
+
+    def _on_change(self, event: ChangeEvent) -> None:
+        """变更流回调（在刷新线程中执行）：每个代码编码一次，按连接合并投递"""
+        with self._lock:
+            targets = {
+                code: list(self._by_code[code])
+                for code in (*event.codes, *event.removed)
+                if code in self._by_code
+            }
+        if not targets:
+            return
+
+        frames: Dict[str, bytes] = {}
+        for quote in self._cache.get_quotes([code for code in event.codes if code in targets]):
+            frames[quote["code"]] = encode_event("quote", _quote_payload(quote), event.seq)
+        for code in event.removed:
+            if code in targets:
+                frames[code] = encode_event("removed", {"code": code}, event.seq)
+
+        batches: Dict[QuoteSubscription, List[bytes]] = {}
+        for code, frame in frames.items():
+            for subscription in targets[code]:
+                batches.setdefault(subscription, []).append(frame)
+
+        delivered = 0
+        for subscription, batch in batches.items():
+            if subscription.push(b"".join(batch)):
+                delivered += len(batch)
+        self._frames_encoded += len(frames)
+        self._frames_delivered += delivered
+
+    def stats(self) -> Dict:
+        """推送统计"""
+        with self._lock:
+            return {
+                "connections": len(self._subscriptions),
+                "codes": len(self._by_code),
+                "frames_encoded": self._frames_encoded,
+                "frames_delivered": self._frames_delivered,
+                "frames_dropped": sum(s.dropped for s in self._subscriptions),
+            }
+
+
+# 全局单例
+quote_stream_hub = QuoteStreamHub()
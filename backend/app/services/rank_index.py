@@ -0,0 +1,74 @@
+"""
+RankIndex - 滑动窗口排名索引
+
+温度的历史分位、波动率分位因子都是“当前值在一组历史值中排第几”。原实现每次
+对整段窗口做 (values < current).sum()；SortedWindow 维护窗口值的升序副本，
+排名查询为一次二分查找（O(log n)），新增一个值时二分定位插入 / 淘汰位置。
+
+SortedWindow 是不可变对象：push 返回新窗口，原窗口不变，可安全地放入缓存共享。
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+
+class SortedWindow:
+    """
+    最近 maxlen 个值的有序索引
+
+    _values 按插入顺序保存（用于淘汰最旧的值），_sorted 为同一组值的升序数组。
+    maxlen 为 None 时不淘汰（如全部历史滚动波动率）。
+    """
+
+    def __init__(self, values: np.ndarray, maxlen: Optional[int] = None) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        if maxlen is not None and len(values) > maxlen:
+            values = values[len(values) - maxlen:]
+        self.maxlen = maxlen
+        self._values = values.copy()
+        self._sorted = np.sort(values)
+
+    @classmethod
+    def _from_arrays(
+        cls, values: np.ndarray, sorted_values: np.ndarray, maxlen: Optional[int]
+    ) -> "SortedWindow":
+        window = cls.__new__(cls)
+        window.maxlen = maxlen
+        window._values = values
+        window._sorted = sorted_values
+        return window
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @property
+    def values(self) -> np.ndarray:
+        """按插入顺序排列的窗口值（只读视图）"""
+        view = self._values.view()
+        view.flags.writeable = False
+        return view
+
+    def count_below(self, value: float) -> int:
+        """窗口中严格小于 value 的个数"""
+        return int(np.searchsorted(self._sorted, value, side="left"))
+
+    def push(self, value: float) -> "SortedWindow":
+        """加入一个值（窗口已满时淘汰最旧的值），返回新窗口"""
+        sorted_values = self._sorted
+        values = self._values
+        if self.maxlen is not None and len(values) >= self.maxlen:
+            if self.maxlen == 0:
+                return self
+            oldest = values[0]
+            idx = int(np.searchsorted(sorted_values, oldest, side="left"))
+            sorted_values = np.delete(sorted_values, idx)
+            values = values[1:]
+        idx = int(np.searchsorted(sorted_values, value, side="left"))
+        return SortedWindow._from_arrays(
+            np.append(values, value),
+            np.insert(sorted_values, idx, value),
+            self.maxlen,
+        )
@@ -0,0 +1,121 @@
+"""
+SourceScheduler - 按近期表现动态排序数据源
+
+静态优先级在某个源被区域性封锁时，每次冷启动都要先耗尽它的超时。这里按
+DataSourceMetrics 中指定操作（history / list）近 15 分钟的表现为数据源打分（越小越优先）：
+- 近期全部失败的源排在最后
+- 其余按 成功延迟 p90 / 成功率，即“取得一次成功的预期耗时”
+- 样本不足（少于 min_samples 次调用）的源取中性先验：已打分且未全部失败的源得分的中位数（偶数个取较大者）
+  （没有这样的源时为 0），既不会越过已测得的快源，也不会排在全部失败的源之后
+得分相同时保持配置顺序。
+
+探索：每 explore_every 次排序把一个被降级的源（轮流）提到最前，
+使恢复的源能重新被发现；熔断中的源仍由调用方的熔断检查跳过。
+"""
+
+import logging
+import math
+import threading
+from typing import Dict, List, Optional, Sequence
+
+from app.core.metrics import DataSourceMetrics, datasource_metrics
+
+logger = logging.getLogger(__name__)
+
+# 打分使用的延迟分位
+SCORE_QUANTILE = "p90"
+
+
+class SourceScheduler:
+    """数据源排序器（线程安全）"""
+
+    def __init__(
+        self,
+        metrics: Optional[DataSourceMetrics] = None,
+        min_samples: int = 5,
+        explore_every: int = 20,
+        operation: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            metrics: 指标来源，默认全局 datasource_metrics
+            min_samples: 参与打分所需的最少调用次数
+            explore_every: 每多少次排序探索一次被降级的源，0 表示不探索
+            operation: 打分使用的操作标签（history / list），同名数据源的其他操作不参与
+        """
+        self._metrics = metrics or datasource_metrics
+        self._operation = operation
+        self._min_samples = min_samples
+        self._explore_every = explore_every
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._explored = 0
+        self._last_order: List[str] = []
+
+    def score(self, name: str) -> Optional[float]:
+        """数据源得分（预期耗时 ms，越小越优先），样本不足时返回 None"""
+        success, failure = self._metrics.get_window_outcomes(name, self._operation)
+        if success + failure < self._min_samples:
+            return None
+        if not success:
+            return math.inf
+        p90 = self._metrics.get_latency_quantiles(name, self._operation, success_only=True)[SCORE_QUANTILE]
+        if p90 is None:
+            return math.inf
+        return p90 / (success / (success + failure))
+
+    def order(self, names: Sequence[str]) -> List[str]:
+        """
+        按得分排序
+
+        Args:
+            names: 按配置优先级排列的数据源名称
+
+        Returns:
+            本次应尝试的顺序
+        """
+        scores = {name: self.score(name) for name in names}
+        finite = sorted(score for score in scores.values() if score is not None and not math.isinf(score))
+        prior = finite[len(finite) // 2] if finite else 0.0
+        # 稳定排序，同分保持配置顺序
+        ranked = sorted(names, key=lambda name: prior if scores[name] is None else scores[name])
+
+        with self._lock:
+            self._calls += 1
+            explore = (
+                self._explore_every > 0
+                and len(ranked) > 1
+                and self._calls % self._explore_every == 0
+            )
+            if explore:
+                demoted = ranked[1 + self._explored % (len(ranked) - 1)]
+                self._explored += 1
+                ranked.remove(demoted)
+                ranked.insert(0, demoted)
+                logger.info("Exploring demoted source %s", demoted)
+            if ranked != self._last_order:
+                logger.info(
+                    "Source order changed: %s",
+                    ", ".join(f"{name}({_format_score(scores[name])})" for name in ranked),
+                )
+            self._last_order = list(ranked)
+        return ranked
+
+    def stats(self) -> Dict:
+        """最近一次排序结果、各源得分（近期全部失败为 None）与样本不足的源"""
+        with self._lock:
+            order = list(self._last_order)
+        scores = {name: self.score(name) for name in order}
+        return {
+            "order": order,
+            "scores": {
+                name: (None if math.isinf(score) else round(score, 1))
+                for name, score in scores.items()
+                if score is not None
+            },
+            "unsampled": [name for name, score in scores.items() if score is None],
+        }
+
+
+def _format_score(score: Optional[float]) -> str:
+    return "-" if score is None else f"{score:.0f}"
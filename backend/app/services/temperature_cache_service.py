@@ -3,6 +3,8 @@ TemperatureCacheService - 温度缓存服务
 
 包装 temperature_service，提供缓存和增量计算功能：
 - 温度缓存：缓存各因子得分和综合温度
+- 增量计算：缓存同时保存截至倒数第二根 K 线的滚动状态（IndicatorState），
+  新增 K 线或盘中价格变化时在状态上推进，无需遍历完整历史
 - 盘中保护：盘中数据不写入缓存
 - 强制刷新：支持跳过缓存重新计算
 """
@@ -10,11 +12,18 @@ TemperatureCacheService - 温度缓存服务
 from __future__ import annotations
 
 import logging
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, Tuple
 
 import pandas as pd
 
+from app.core.config_loader import metric_config
 from app.services.akshare_service import disk_cache
+from app.services.indicator_engine import (
+    IndicatorSet,
+    IndicatorState,
+    compute_indicators,
+    pending_closes,
+)
 from app.services.temperature_service import temperature_service
 
 logger = logging.getLogger(__name__)
@@ -61,7 +70,10 @@ class TemperatureCacheService:
     # ==================== 缓存数据构建 ====================
 
     def _build_cache_data(
-        self, df: pd.DataFrame, result: Dict[str, Any]
+        self,
+        df: pd.DataFrame,
+        result: Dict[str, Any],
+        state: Optional[IndicatorState] = None,
     ) -> Dict[str, Any]:
         """
         构建温度缓存数据结构
@@ -69,6 +81,7 @@ class TemperatureCacheService:
         Args:
             df: OHLCV DataFrame
             result: 计算结果
+            state: 截至倒数第二根 K 线的滚动状态
 
         Returns:
             缓存数据字典
@@ -78,8 +91,48 @@ class TemperatureCacheService:
         return {
             "last_date": last_date,
             "result": result,
+            "state": state,
         }
 
+    # ==================== 增量计算 ====================
+
+    def _calculate_incremental(
+        self, code: str, df: pd.DataFrame, cached: Dict[str, Any]
+    ) -> Optional[Tuple[Dict[str, Any], IndicatorState]]:
+        """
+        基于缓存的滚动状态增量计算温度
+
+        状态推进到 df 的倒数第二根 K 线，再以最后一根收盘价计算温度。
+
+        Args:
+            code: ETF 代码
+            df: 历史 OHLCV 数据
+            cached: 缓存数据
+
+        Returns:
+            (温度结果, 推进后的状态)，状态缺失、配置变更或与 df 不一致时返回 None
+        """
+        state = cached.get("state")
+        if not temperature_service.state_compatible(state):
+            return None
+
+        pending = pending_closes(df, state.last_date, state.closes, count=state.count)
+        if pending is None:
+            logger.debug(f"[{code}] Temperature state does not match history, recomputing")
+            return None
+
+        dates = df["date"]
+        first = len(df) - 1 - len(pending)
+        for offset, price in enumerate(pending):
+            state = state.advance(float(price), str(dates.iloc[first + offset]))
+
+        result = temperature_service.calculate_temperature_from_state(
+            state, float(df["close"].iloc[-1])
+        )
+        if result is None:
+            return None
+        return result, state
+
     # ==================== 温度计算主函数 ====================
 
     def calculate_temperature(
@@ -88,6 +141,7 @@ class TemperatureCacheService:
         df: pd.DataFrame,
         realtime_price: Optional[float] = None,
         force_refresh: bool = False,
+        indicators: Optional[IndicatorSet] = None,
     ) -> Optional[Dict[str, Any]]:
         """
         计算市场温度（带缓存）
@@ -97,6 +151,7 @@ class TemperatureCacheService:
             df: 历史 OHLCV 数据
             realtime_price: 可选的实时价格（盘中使用）
             force_refresh: 强制刷新，跳过缓存
+            indicators: 调用方已计算的衍生序列（与 df 行对齐），缓存未命中时复用
 
         Returns:
             温度计算结果
@@ -120,18 +175,32 @@ class TemperatureCacheService:
                     logger.debug(f"[{code}] Temperature cache hit")
                     return cached.get("result")
 
+                incremental = self._calculate_incremental(code, df, cached)
+
                 # 盘中模式：有实时价格且日期相同
                 if realtime_price is not None and cached_date == current_date:
                     # 盘中计算，但不写入缓存
                     logger.debug(
                         f"[{code}] Intraday mode, computing without cache write"
                     )
-                    result = temperature_service.calculate_temperature(df)
+                    if incremental is not None:
+                        return incremental[0]
+                    result = temperature_service.calculate_temperature(df, indicators=indicators)
+                    return result
+
+                # 新增 K 线：在缓存状态上推进
+                if incremental is not None:
+                    result, state = incremental
+                    logger.debug(f"[{code}] Temperature advanced incrementally to {current_date}")
+                    if realtime_price is None:
+                        disk_cache.set(cache_key, self._build_cache_data(df, result, state))
                     return result
 
         # 缓存未命中或强制刷新：重新计算
         logger.info(f"[{code}] Computing temperature (cache miss or force refresh)")
-        result = temperature_service.calculate_temperature(df)
+        if indicators is None:
+            indicators = compute_indicators(df, rsi_period=metric_config.rsi_period)
+        result = temperature_service.calculate_temperature(df, indicators=indicators)
 
         if result is None:
             return None
@@ -139,9 +208,10 @@ class TemperatureCacheService:
         # 判断是否为盘中（有实时价格表示盘中）
         is_intraday = realtime_price is not None
 
-        # 非盘中时写入缓存
+        # 非盘中时写入缓存（连同滚动状态，供下次增量计算）
         if not is_intraday:
-            cache_data = self._build_cache_data(df, result)
+            state = temperature_service.build_state(df, indicators)
+            cache_data = self._build_cache_data(df, result, state)
             disk_cache.set(cache_key, cache_data)
             logger.debug(f"[{code}] Temperature cached for date {current_date}")
 
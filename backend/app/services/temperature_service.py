@@ -26,12 +26,22 @@ import pandas as pd
 import numpy as np
 
 from app.core.config_loader import metric_config
+from app.services.indicator_engine import (
+    IndicatorSet,
+    IndicatorState,
+    compute_indicators,
+    rsi_from_averages,
+    wilder_rsi_series,
+)
 
 logger = logging.getLogger(__name__)
 
 # 每年交易日数（约 252 天）
 TRADING_DAYS_PER_YEAR = 252
 
+# 滚动状态保留的收盘价个数（趋势因子最长均线 MA60）
+STATE_TAIL_SIZE = 60
+
 
 class TemperatureService:
     """市场温度计算服务类"""
@@ -42,7 +52,9 @@ class TemperatureService:
 
     # ==================== RSI 计算 (Wilder EMA) ====================
 
-    def calculate_rsi(self, df: pd.DataFrame, period: int = 14) -> Optional[float]:
+    def calculate_rsi(
+        self, df: pd.DataFrame, period: int = 14, return_series: bool = False
+    ) -> Optional[Any]:
         """
         使用 Wilder 平滑方法计算 RSI
 
@@ -50,62 +62,28 @@ class TemperatureService:
         1. 首先计算前 period 天的简单移动平均 (SMA) 作为初始值
         2. 然后使用递归公式：avg = (prev_avg * (period - 1) + current_value) / period
 
+        递归等价于 alpha = 1/period 的 EWM，由 indicator_engine 向量化计算。
+
         Args:
             df: 包含 close 列的 OHLCV DataFrame
             period: RSI 周期，默认 14
+            return_series: 为 True 时返回整条 RSI 序列（index 与剔除 NaN 后的 close 一致，
+                前 period 个值为 NaN）
 
         Returns:
-            RSI 值 (0-100)，数据不足时返回 None
+            RSI 值 (0-100) 或 RSI Series，数据不足时返回 None
         """
         if df is None or df.empty or len(df) < period + 1:
             return None
 
-        # 计算价格变动
         close = df["close"].dropna()
         if len(close) < period + 1:
             return None
 
-        delta = close.diff()
-
-        # 分离涨跌
-        gains = delta.where(delta > 0, 0.0).fillna(0.0)
-        losses = (-delta).where(delta < 0, 0.0).fillna(0.0)
-
-        # Wilder 平滑方法：
-        # 1. 首先计算前 period 天的 SMA 作为初始值
-        # 2. 然后使用递归公式
-        
-        # 计算初始 SMA（从索引 1 开始，因为索引 0 是 NaN）
-        first_avg_gain = gains.iloc[1:period + 1].mean()
-        first_avg_loss = losses.iloc[1:period + 1].mean()
-
-        # 如果数据刚好等于 period + 1，直接使用 SMA
-        if len(close) == period + 1:
-            if first_avg_loss == 0:
-                return 100.0 if first_avg_gain > 0 else 50.0
-            rs = first_avg_gain / first_avg_loss
-            return float(100 - (100 / (1 + rs)))
-
-        # 递归计算后续值
-        avg_gain = first_avg_gain
-        avg_loss = first_avg_loss
-
-        for i in range(period + 1, len(close)):
-            avg_gain = (avg_gain * (period - 1) + gains.iloc[i]) / period
-            avg_loss = (avg_loss * (period - 1) + losses.iloc[i]) / period
-
-        # 处理边界情况
-        if avg_loss == 0:
-            return 100.0 if avg_gain > 0 else 50.0
-
-        if avg_gain == 0:
-            return 0.0
-
-        # 计算 RS 和 RSI
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-
-        return float(rsi)
+        rsi = wilder_rsi_series(close.to_numpy(dtype=np.float64), period)
+        if return_series:
+            return pd.Series(rsi, index=close.index, name="rsi")
+        return float(rsi[-1])
 
     # ==================== 回撤得分计算 ====================
 
@@ -131,10 +109,10 @@ class TemperatureService:
         if len(close) == 0:
             return 50
 
-        # 计算当前回撤
-        current_price = close.iloc[-1]
-        peak_price = close.max()
+        return self._drawdown_score(float(close.iloc[-1]), float(close.max()))
 
+    def _drawdown_score(self, current_price: float, peak_price: float) -> int:
+        """当前价与历史最高价 → 回撤得分"""
         if peak_price <= 0:
             return 50
 
@@ -161,9 +139,6 @@ class TemperatureService:
             包含 percentile_value, percentile_score, percentile_years 的字典
             如果数据不足 10 年，还包含 percentile_note
         """
-        target_years = metric_config.percentile_years  # 默认 10 年
-        target_days = target_years * TRADING_DAYS_PER_YEAR
-
         if df is None or df.empty:
             return {
                 "percentile_value": 0.5,
@@ -181,17 +156,31 @@ class TemperatureService:
                 "percentile_note": "无数据",
             }
 
-        # 计算实际数据覆盖年数
-        actual_days = len(close)
-        actual_years = round(actual_days / TRADING_DAYS_PER_YEAR, 1)
+        return self._percentile_result(close.to_numpy(dtype=np.float64))
+
+    def _percentile_window(self) -> int:
+        """历史分位窗口长度（K 线数）"""
+        return int(metric_config.percentile_years * TRADING_DAYS_PER_YEAR)
+
+    def _percentile_result(self, close: np.ndarray) -> Dict[str, Any]:
+        """无 NaN 的收盘价数组 → 历史分位结果"""
+        target_days = self._percentile_window()
 
         # 取最近 N 年的数据
-        if actual_days > target_days:
-            close = close.iloc[-int(target_days):]
+        window = close[-target_days:] if len(close) > target_days else close
 
         # 计算当前价格的分位数
-        current_price = close.iloc[-1]
-        percentile_value = (close < current_price).sum() / len(close)
+        current_price = window[-1]
+        percentile_value = (window < current_price).sum() / len(window)
+
+        return self._percentile_payload(percentile_value, len(close))
+
+    def _percentile_payload(self, percentile_value: float, actual_days: int) -> Dict[str, Any]:
+        """分位值与完整历史 K 线数 → 历史分位结果字典"""
+        target_years = metric_config.percentile_years  # 默认 10 年
+
+        # 计算实际数据覆盖年数
+        actual_years = round(actual_days / TRADING_DAYS_PER_YEAR, 1)
 
         result = {
             "percentile_value": float(percentile_value),
@@ -234,13 +223,16 @@ class TemperatureService:
 
         # 计算滚动波动率（标准差）
         rolling_vol = returns.rolling(window=window).std()
-        rolling_vol = rolling_vol.dropna()
+        return self._volatility_score(rolling_vol.to_numpy())
 
+    def _volatility_score(self, rolling_vol: np.ndarray) -> float:
+        """滚动波动率序列（可含前导 NaN）→ 当前波动率的历史分位得分"""
+        rolling_vol = rolling_vol[~np.isnan(rolling_vol)]
         if len(rolling_vol) == 0:
             return 50.0
 
         # 当前波动率
-        current_vol = rolling_vol.iloc[-1]
+        current_vol = rolling_vol[-1]
 
         # 计算当前波动率在历史中的分位数
         percentile = (rolling_vol < current_vol).sum() / len(rolling_vol)
@@ -277,6 +269,10 @@ class TemperatureService:
         ma20 = close.rolling(window=20, min_periods=20).mean().iloc[-1]
         ma60 = close.rolling(window=60, min_periods=60).mean().iloc[-1]
 
+        return self._trend_score(ma5, ma10, ma20, ma60)
+
+    def _trend_score(self, ma5: Any, ma10: Any, ma20: Any, ma60: Any) -> int:
+        """MA5/10/20/60 最新值 → 趋势得分"""
         # 检查是否有 NaN
         if any(pd.isna([ma5, ma10, ma20, ma60])):
             return 50
@@ -321,7 +317,9 @@ class TemperatureService:
 
     # ==================== 温度计算主函数 ====================
 
-    def calculate_temperature(self, df: pd.DataFrame) -> Optional[Dict[str, Any]]:
+    def calculate_temperature(
+        self, df: pd.DataFrame, indicators: Optional[IndicatorSet] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         计算市场温度
 
@@ -334,6 +332,8 @@ class TemperatureService:
 
         Args:
             df: OHLCV DataFrame
+            indicators: 已由 indicator_engine 计算好的衍生序列（与 df 行对齐），
+                为 None 时内部计算
 
         Returns:
             温度计算结果字典，包含:
@@ -354,30 +354,58 @@ class TemperatureService:
         if len(df) < 15:  # 至少需要 RSI 周期 + 1 天的数据
             return None
 
-        # 获取权重配置
-        weights = metric_config.temperature_weights
         rsi_period = metric_config.rsi_period
 
+        if indicators is None:
+            indicators = compute_indicators(df, rsi_period=rsi_period)
+
         # 计算各因子得分
-        # 1. 回撤得分 (30%)
-        drawdown_score = self.calculate_drawdown_score(df)
+        if indicators.has_nan or indicators.rsi_period != rsi_period:
+            # 收盘价含 NaN 时各因子需按剔除后的序列逐项计算
+            drawdown_score = self.calculate_drawdown_score(df)
+            rsi_value = self.calculate_rsi(df, period=rsi_period)
+            percentile_result = self.calculate_percentile(df)
+            volatility_score = self.calculate_volatility_score(df)
+            trend_score = self.calculate_trend_score(df)
+        else:
+            close = indicators.close
+            # 1. 回撤得分 (30%)
+            drawdown_score = self._drawdown_score(float(close[-1]), float(indicators.cummax[-1]))
+            # 2. RSI (20%)
+            rsi_value = indicators.rsi
+            # 3. 历史分位得分 (20%)
+            percentile_result = self._percentile_result(close)
+            # 4. 波动率得分 (15%)
+            volatility_score = (
+                self._volatility_score(indicators.rolling_vol)
+                if len(close) >= indicators.vol_window + 1 else 50.0
+            )
+            # 5. 趋势得分 (15%)
+            trend_score = (
+                self._trend_score(*(indicators.last_ma(p) for p in (5, 10, 20, 60)))
+                if len(close) >= 60 else 50
+            )
+
+        return self._build_result(
+            drawdown_score, rsi_value, percentile_result, volatility_score, trend_score
+        )
+
+    def _build_result(
+        self,
+        drawdown_score: int,
+        rsi_value: Optional[float],
+        percentile_result: Dict[str, Any],
+        volatility_score: float,
+        trend_score: int,
+    ) -> Dict[str, Any]:
+        """各因子得分 → 加权温度结果"""
+        weights = metric_config.temperature_weights
 
-        # 2. RSI 得分 (20%)
-        rsi_value = self.calculate_rsi(df, period=rsi_period)
         if rsi_value is None:
             rsi_value = 50.0  # 默认中间值
         rsi_score = rsi_value  # RSI 直接作为得分
-
-        # 3. 历史分位得分 (20%)
-        percentile_result = self.calculate_percentile(df)
         percentile_score = percentile_result["percentile_score"]
 
-        # 4. 波动率得分 (15%)
-        volatility_score = self.calculate_volatility_score(df)
-
-        # 5. 趋势得分 (15%)
-        trend_score = self.calculate_trend_score(df)
-
         # 加权计算综合得分
         weighted_score = (
             drawdown_score * weights.get("drawdown", 0.30) +
@@ -415,6 +443,88 @@ class TemperatureService:
 
         return result
 
+    # ==================== 增量计算 ====================
+
+    def build_state(
+        self, df: pd.DataFrame, indicators: Optional[IndicatorSet] = None
+    ) -> Optional[IndicatorState]:
+        """
+        由 df 除最后一行外的历史构建滚动状态
+
+        最后一行可能是盘中实时价，不进入状态；下次计算时以新的最后一行作为
+        待定价格，在状态上增量得出温度。
+
+        Args:
+            df: 包含 date / close 列的 OHLCV DataFrame
+            indicators: 与 df 行对齐的衍生序列，为 None 时内部计算
+
+        Returns:
+            IndicatorState，收盘价含 NaN 或数据不足时返回 None
+        """
+        if df is None or len(df) < 2:
+            return None
+
+        rsi_period = metric_config.rsi_period
+        if indicators is None or indicators.rsi_period != rsi_period:
+            indicators = compute_indicators(df, rsi_period=rsi_period)
+
+        return IndicatorState.from_indicators(
+            indicators,
+            last_date=str(df["date"].iloc[-2]),
+            end=len(df) - 1,
+            tail_size=STATE_TAIL_SIZE,
+            percentile_window=self._percentile_window(),
+        )
+
+    def state_compatible(self, state: Any) -> bool:
+        """缓存中的状态是否仍适用于当前配置（周期、窗口变更后须重建）"""
+        return (
+            isinstance(state, IndicatorState)
+            and state.rsi_period == metric_config.rsi_period
+            and state.tail_size == STATE_TAIL_SIZE
+            and state.percentile_window == self._percentile_window()
+        )
+
+    def calculate_temperature_from_state(
+        self, state: IndicatorState, price: float
+    ) -> Optional[Dict[str, Any]]:
+        """
+        在滚动状态之后追加一根收盘价为 price 的 K 线，计算市场温度
+
+        各因子只用到状态中的窗口数据，不遍历完整历史：分位类因子是排名索引上的
+        一次二分查找，其余因子为常数或 MA60 窗口级计算。结果与对完整历史调用
+        calculate_temperature 一致（浮点求和顺序不同带来的误差除外）。
+
+        Args:
+            state: 截至上一根 K 线的滚动状态
+            price: 最新收盘价（或盘中实时价）
+
+        Returns:
+            温度计算结果字典，数据不足时返回 None
+        """
+        count = state.count + 1
+        if count < 15:
+            return None
+
+        avg_gain, avg_loss, vol = state.step(price)
+        closes = np.append(state.closes, price)
+
+        drawdown_score = self._drawdown_score(price, max(state.peak, price))
+        rsi_value = rsi_from_averages(avg_gain, avg_loss)
+        percentile_result = self._percentile_payload(state.price_percentile(price), count)
+        volatility_score = (
+            float(state.vol_percentile(vol) * 100)
+            if count >= state.vol_window + 1 else 50.0
+        )
+        trend_score = (
+            self._trend_score(*(closes[-p:].mean() for p in (5, 10, 20, 60)))
+            if count >= 60 else 50
+        )
+
+        return self._build_result(
+            drawdown_score, rsi_value, percentile_result, volatility_score, trend_score
+        )
+
 
 # 全局单例
 temperature_service = TemperatureService()
@@ -2,17 +2,22 @@
 同花顺历史数据源
 
 直接调用 d.10jqka.com.cn JSONP 接口，无需认证。
-URL 中 01 = 日K前复权，返回上市至今全部数据。
+URL 中 01 = 日K前复权，lastN.js 返回最近 N 根 K 线（N 按 start_date 推算，
+增量更新时只拉取尾部）。
 """
 import json
 import logging
 from typing import Optional
 
 import pandas as pd
-import requests
+
+from app.core.http_client import http_client
 
 logger = logging.getLogger(__name__)
 
+# 接口单次可返回的最大 K 线数（覆盖上市至今全部数据）
+_MAX_BARS = 36000
+
 _HEADERS = {
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
     "Referer": "http://stockpage.10jqka.com.cn/",
@@ -45,6 +50,16 @@ def _parse_ths_response(text: str) -> Optional[pd.DataFrame]:
         return None
 
 
+def _bars_since(start_date: str) -> int:
+    """按起始日期估算需要请求的 K 线数（自然日数为上界，多留余量）"""
+    try:
+        start = pd.Timestamp(start_date.replace("-", ""))
+    except (ValueError, TypeError):
+        return _MAX_BARS
+    days = (pd.Timestamp.now().normalize() - start).days + 10
+    return max(1, min(_MAX_BARS, days))
+
+
 class ThsHistorySource:
     """同花顺历史数据源，实现 HistoryDataSource 协议"""
 
@@ -60,9 +75,11 @@ class ThsHistorySource:
         # 01=日K前复权, 00=不复权, 02=后复权
         fq_map = {"qfq": "01", "hfq": "02", "": "00"}
         fq = fq_map.get(adjust, "01")
-        url = f"https://d.10jqka.com.cn/v6/line/hs_{code}/{fq}/last36000.js"
+        bars = _bars_since(start_date)
+        url = f"https://d.10jqka.com.cn/v6/line/hs_{code}/{fq}/last{bars}.js"
 
-        resp = requests.get(url, headers=_HEADERS, timeout=10)
+        # 复用同花顺域名的常驻连接，超时与重试按 HOST_POLICIES 配置
+        resp = http_client.get(url, headers=_HEADERS)
         if resp.status_code != 200:
             logger.warning("[ths_history] HTTP %d for %s", resp.status_code, code)
             return None
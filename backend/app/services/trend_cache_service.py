@@ -2,7 +2,8 @@
 TrendCacheService - 趋势缓存服务
 
 包装 trend_service，提供缓存和增量计算功能：
-- 日趋势缓存：缓存均线值和位置关系
+- 日趋势缓存：缓存均线值和位置关系，以及截至倒数第二根 K 线的收盘价尾部，
+  新增 K 线或盘中价格变化时只用尾部计算，无需遍历完整历史
 - 周趋势缓存：缓存周线数据和连续涨跌周数
 - 盘中保护：盘中数据不写入缓存
 - 强制刷新：支持跳过缓存重新计算
@@ -13,9 +14,12 @@ from __future__ import annotations
 import logging
 from typing import Dict, Optional, Any
 
+import numpy as np
 import pandas as pd
 
+from app.core.config_loader import metric_config
 from app.services.akshare_service import disk_cache
+from app.services.indicator_engine import IndicatorSet, pending_closes
 from app.services.trend_service import trend_service
 
 logger = logging.getLogger(__name__)
@@ -108,19 +112,66 @@ class TrendCacheService:
         # 从结果中提取均线值
         ma_values = result.get("ma_values", {})
 
+        # 增量状态：截至倒数第二根 K 线的最近 max 周期个收盘价
+        state_date = None
+        state_closes = None
+        if len(df) >= 2:
+            tail = df["close"].to_numpy(dtype=np.float64)[:-1][-self._trend_tail_size():]
+            if not np.isnan(tail).any():
+                state_date = str(df["date"].iloc[-2])
+                state_closes = tail.copy()
+
         return {
             "last_date": last_date,
             "yesterday_close": yesterday_close,
             "yesterday_ma": ma_values,  # 当前均线值将成为下次的"昨日均线"
+            "state_date": state_date,
+            "state_closes": state_closes,
             "result": result,
         }
 
+    def _trend_tail_size(self) -> int:
+        """日趋势增量状态保留的收盘价个数（最长均线周期）"""
+        return max(metric_config.daily_ma_periods)
+
+    def _daily_trend_incremental(
+        self, df: pd.DataFrame, cached: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        基于缓存的收盘价尾部增量计算日趋势
+
+        Args:
+            df: 历史 OHLCV 数据
+            cached: 缓存数据
+
+        Returns:
+            日趋势结果，状态缺失或与 df 不一致时返回 None
+        """
+        tail_size = self._trend_tail_size()
+        state_date = cached.get("state_date")
+        state_closes = cached.get("state_closes")
+        # 历史不足 max 周期 + 1 根时直接全量计算（数据量很小）
+        if state_date is None or state_closes is None or len(df) <= tail_size + 1:
+            return None
+        if len(state_closes) < tail_size:
+            return None
+
+        pending = pending_closes(df, state_date, state_closes)
+        if pending is None:
+            return None
+
+        window = np.concatenate(
+            (state_closes, pending, [float(df["close"].iloc[-1])])
+        )[-(tail_size + 1):]
+        return trend_service.get_daily_trend_from_closes(window)
+
     def get_daily_trend(
         self,
         code: str,
         df: pd.DataFrame,
         realtime_price: Optional[float] = None,
         force_refresh: bool = False,
+        indicators: Optional[IndicatorSet] = None,
     ) -> Optional[Dict[str, Any]]:
         """
         获取日趋势（带缓存）
@@ -130,6 +181,7 @@ class TrendCacheService:
             df: 历史 OHLCV 数据
             realtime_price: 可选的实时价格（盘中使用）
             force_refresh: 强制刷新，跳过缓存
+            indicators: 调用方已计算的衍生序列（与 df 行对齐），缓存未命中时复用
 
         Returns:
             日趋势分析结果
@@ -153,16 +205,27 @@ class TrendCacheService:
                     logger.debug(f"[{code}] Daily trend cache hit")
                     return cached.get("result")
 
+                incremental = self._daily_trend_incremental(df, cached)
+
                 # 盘中模式：有实时价格且日期相同
                 if realtime_price is not None and cached_date == current_date:
                     # 盘中计算，但不写入缓存
                     logger.debug(f"[{code}] Intraday mode, computing without cache write")
-                    result = trend_service.get_daily_trend(df)
+                    if incremental is not None:
+                        return incremental
+                    result = trend_service.get_daily_trend(df, indicators=indicators)
                     return result
 
+                # 新增 K 线：只用收盘价尾部计算
+                if incremental is not None:
+                    logger.debug(f"[{code}] Daily trend advanced incrementally to {current_date}")
+                    if realtime_price is None:
+                        disk_cache.set(cache_key, self._build_daily_cache_data(df, incremental))
+                    return incremental
+
         # 缓存未命中或强制刷新：重新计算
         logger.info(f"[{code}] Computing daily trend (cache miss or force refresh)")
-        result = trend_service.get_daily_trend(df)
+        result = trend_service.get_daily_trend(df, indicators=indicators)
 
         if result is None:
             return None
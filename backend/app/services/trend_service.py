@@ -17,6 +17,7 @@ import pandas as pd
 import numpy as np
 
 from app.core.config_loader import metric_config
+from app.services.indicator_engine import IndicatorSet
 
 logger = logging.getLogger(__name__)
 
@@ -46,12 +47,15 @@ class TrendService:
 
         return df["close"].rolling(window=period).mean()
 
-    def calculate_ma_values(self, df: pd.DataFrame) -> Dict[str, Optional[float]]:
+    def calculate_ma_values(
+        self, df: pd.DataFrame, indicators: Optional[IndicatorSet] = None
+    ) -> Dict[str, Optional[float]]:
         """
         计算所有均线的当前值
 
         Args:
             df: OHLCV DataFrame
+            indicators: 已计算的衍生序列（与 df 行对齐），提供时直接取均线
 
         Returns:
             包含 ma5, ma20, ma60 当前值的字典
@@ -59,6 +63,11 @@ class TrendService:
         periods = metric_config.daily_ma_periods  # [5, 20, 60]
         result = {}
 
+        if indicators is not None:
+            for period in periods:
+                result[f"ma{period}"] = indicators.last_ma(period) if len(df) >= period else None
+            return result
+
         for period in periods:
             ma_series = self._calculate_ma(df, period)
             key = f"ma{period}"
@@ -105,13 +114,19 @@ class TrendService:
         # 在均线下方
         return "below"
 
-    def determine_position(self, df: pd.DataFrame, ma_period: int) -> Optional[str]:
+    def determine_position(
+        self,
+        df: pd.DataFrame,
+        ma_period: int,
+        indicators: Optional[IndicatorSet] = None,
+    ) -> Optional[str]:
         """
         判断当前价格与指定均线的位置关系
 
         Args:
             df: OHLCV DataFrame
             ma_period: 均线周期
+            indicators: 已计算的衍生序列（与 df 行对齐），提供时直接取均线
 
         Returns:
             位置关系字符串，数据不足时返回 None
@@ -119,15 +134,21 @@ class TrendService:
         if df is None or df.empty or len(df) < ma_period + 1:
             return None
 
-        ma_series = self._calculate_ma(df, ma_period)
-        if ma_series is None:
-            return None
+        if indicators is not None:
+            ma_series = indicators.ma_series(ma_period)
+            close = indicators.close
+        else:
+            ma_series = self._calculate_ma(df, ma_period)
+            if ma_series is None:
+                return None
+            ma_series = ma_series.to_numpy()
+            close = df["close"].to_numpy()
 
         # 获取今日和昨日数据
-        price_today = df["close"].iloc[-1]
-        price_yesterday = df["close"].iloc[-2]
-        ma_today = ma_series.iloc[-1]
-        ma_yesterday = ma_series.iloc[-2]
+        price_today = close[-1]
+        price_yesterday = close[-2]
+        ma_today = ma_series[-1]
+        ma_yesterday = ma_series[-2]
 
         if pd.isna(ma_today) or pd.isna(ma_yesterday):
             return None
@@ -206,12 +227,16 @@ class TrendService:
 
     # ==================== 日趋势主函数 ====================
 
-    def get_daily_trend(self, df: pd.DataFrame) -> Optional[Dict[str, Any]]:
+    def get_daily_trend(
+        self, df: pd.DataFrame, indicators: Optional[IndicatorSet] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         日趋势分析主函数
 
         Args:
             df: OHLCV DataFrame
+            indicators: 已由 indicator_engine 计算好的衍生序列（与 df 行对齐），
+                为 None 时按 df 逐条计算均线
 
         Returns:
             日趋势分析结果字典，包含:
@@ -230,7 +255,7 @@ class TrendService:
             return None
 
         # 计算均线值
-        ma_values = self.calculate_ma_values(df)
+        ma_values = self.calculate_ma_values(df, indicators)
 
         # 如果连 MA5 都无法计算，返回 None
         if ma_values.get("ma5") is None:
@@ -240,9 +265,55 @@ class TrendService:
         periods = metric_config.daily_ma_periods  # [5, 20, 60]
         positions = {}
         for period in periods:
-            position = self.determine_position(df, period)
+            position = self.determine_position(df, period, indicators)
             positions[f"ma{period}_position"] = position
 
+        return self._build_daily_result(ma_values, positions)
+
+    def get_daily_trend_from_closes(self, closes: np.ndarray) -> Optional[Dict[str, Any]]:
+        """
+        由最近的收盘价计算日趋势（增量路径）
+
+        日趋势只依赖最后 max(daily_ma_periods) + 1 个收盘价，调用方只需保留这段
+        尾部即可，结果与对完整历史调用 get_daily_trend 一致。
+
+        Args:
+            closes: 最近的收盘价数组，长度不少于 max(daily_ma_periods) + 1，
+                历史更短时须传入完整历史
+
+        Returns:
+            日趋势分析结果字典，格式同 get_daily_trend
+        """
+        if len(closes) < 5:
+            return None
+
+        periods = metric_config.daily_ma_periods  # [5, 20, 60]
+        ma_values: Dict[str, Optional[float]] = {}
+        positions: Dict[str, Optional[str]] = {}
+        for period in periods:
+            ma_today = float(closes[-period:].mean()) if len(closes) >= period else np.nan
+            ma_values[f"ma{period}"] = None if np.isnan(ma_today) else ma_today
+
+            position = None
+            if len(closes) >= period + 1:
+                ma_yesterday = float(closes[-period - 1:-1].mean())
+                if not (np.isnan(ma_today) or np.isnan(ma_yesterday)):
+                    position = self._determine_position(
+                        closes[-1], ma_today, closes[-2], ma_yesterday
+                    )
+            positions[f"ma{period}_position"] = position
+
+        if ma_values.get("ma5") is None:
+            return None
+
+        return self._build_daily_result(ma_values, positions)
+
+    def _build_daily_result(
+        self,
+        ma_values: Dict[str, Optional[float]],
+        positions: Dict[str, Optional[str]],
+    ) -> Dict[str, Any]:
+        """均线值与位置关系 → 日趋势结果"""
         # 判断均线排列
         alignment = self._determine_alignment(ma_values)
 
@@ -8,6 +8,15 @@ import pytest
 from unittest.mock import patch, PropertyMock
 from fastapi.testclient import TestClient
 
+from app.core.cache import ETFCacheManager
+
+
+def _use_quotes(mock_cache, etf_map):
+    """以真实的 ETFCacheManager 提供 get_quotes"""
+    cache = ETFCacheManager()
+    cache.set_etf_list(list(etf_map.values()))
+    mock_cache.get_quotes.side_effect = cache.get_quotes
+
 
 class TestBatchPriceEndpoint:
     """Tests for /etf/batch-price endpoint."""
@@ -35,7 +44,7 @@ class TestBatchPriceEndpoint:
         """正常请求返回多个 ETF 价格。"""
         from app.main import app
 
-        mock_cache.etf_map = self._make_etf_map()
+        _use_quotes(mock_cache, self._make_etf_map())
 
         client = TestClient(app)
         response = client.get("/api/v1/etf/batch-price?codes=510300,510500")
@@ -55,7 +64,7 @@ class TestBatchPriceEndpoint:
         """已收盘时 market_status 正确返回。"""
         from app.main import app
 
-        mock_cache.etf_map = self._make_etf_map()
+        _use_quotes(mock_cache, self._make_etf_map())
 
         client = TestClient(app)
         response = client.get("/api/v1/etf/batch-price?codes=510300")
@@ -69,7 +78,7 @@ class TestBatchPriceEndpoint:
         """未知代码被静默跳过，不报错。"""
         from app.main import app
 
-        mock_cache.etf_map = self._make_etf_map()
+        _use_quotes(mock_cache, self._make_etf_map())
 
         client = TestClient(app)
         response = client.get("/api/v1/etf/batch-price?codes=999999")
@@ -103,7 +112,7 @@ class TestBatchPriceEndpoint:
         """代码间有多余空格时仍能正常解析。"""
         from app.main import app
 
-        mock_cache.etf_map = self._make_etf_map()
+        _use_quotes(mock_cache, self._make_etf_map())
 
         client = TestClient(app)
         response = client.get("/api/v1/etf/batch-price?codes= 510300 , 510500 ")
@@ -118,7 +127,7 @@ class TestBatchPriceEndpoint:
         """重复代码返回重复条目（不去重）。"""
         from app.main import app
 
-        mock_cache.etf_map = self._make_etf_map()
+        _use_quotes(mock_cache, self._make_etf_map())
 
         client = TestClient(app)
         response = client.get("/api/v1/etf/batch-price?codes=510300,510300")
@@ -142,13 +151,13 @@ class TestBatchPriceEndpoint:
         """batch-price 响应应包含 tags 字段"""
         from app.main import app
 
-        mock_cache.etf_map = {
+        _use_quotes(mock_cache, {
             "510300": {
                 "code": "510300", "name": "沪深300ETF",
                 "price": 3.85, "change_pct": 1.2,
                 "tags": [{"label": "宽基", "group": "type"}, {"label": "沪深300", "group": "type"}],
             },
-        }
+        })
         mock_cache.last_updated = 1700000000.0
 
         client = TestClient(app)
@@ -164,12 +173,88 @@ class TestBatchPriceEndpoint:
         """ETF 无 tags 字段时应返回空列表"""
         from app.main import app
 
-        mock_cache.etf_map = {
+        _use_quotes(mock_cache, {
             "510300": {"code": "510300", "name": "沪深300ETF", "price": 3.85, "change_pct": 1.2},
-        }
+        })
         mock_cache.last_updated = 1700000000.0
 
         client = TestClient(app)
         resp = client.get("/api/v1/etf/batch-price?codes=510300")
         item = resp.json()["items"][0]
         assert item["tags"] == []
+
+
+class TestChangesEndpoint:
+    """Tests for /etf/changes endpoint."""
+
+    @patch("app.api.v1.endpoints.etf.etf_cache", new_callable=ETFCacheManager)
+    def test_changes_since(self, cache):
+        from app.main import app
+
+        cache.set_etf_list([
+            {"code": "510300", "name": "沪深300ETF", "price": 3.85, "change_pct": 0.5},
+            {"code": "510500", "name": "中证500ETF", "price": 5.12, "change_pct": -0.4},
+        ])
+        cache.set_etf_list([
+            {"code": "510300", "name": "沪深300ETF", "price": 3.86, "change_pct": 0.8},
+            {"code": "510500", "name": "中证500ETF", "price": 5.12, "change_pct": -0.4},
+        ])
+
+        client = TestClient(app)
+        data = client.get("/api/v1/etf/changes?since=1").json()
+        assert data["seq"] == 2
+        assert data["full"] is False
+        assert [(i["code"], i["price"]) for i in data["items"]] == [("510300", 3.86)]
+
+        data = client.get("/api/v1/etf/changes?since=2").json()
+        assert data["items"] == []
+
+        assert client.get("/api/v1/etf/changes?since=5").json()["full"] is True
+
+
+class TestStreamEndpoint:
+    """Tests for /etf/stream endpoint."""
+
+    def test_too_many_codes(self):
+        from app.main import app
+
+        client = TestClient(app)
+        codes = ",".join(f"{510000 + i}" for i in range(201))
+        assert client.get(f"/api/v1/etf/stream?codes={codes}").status_code == 400
+
+    def test_invalid_codes(self):
+        from app.main import app
+
+        client = TestClient(app)
+        assert client.get("/api/v1/etf/stream?codes=abc,12").status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_event_stream(self):
+        from app.api.v1.endpoints import etf
+        from app.services.quote_stream import QuoteStreamHub, HEARTBEAT_FRAME
+
+        cache = ETFCacheManager()
+        cache.set_etf_list([{"code": "510300", "name": "沪深300ETF", "price": 3.85, "change_pct": 0.5}])
+        hub = QuoteStreamHub(cache)
+
+        class _Request:
+            async def is_disconnected(self):
+                return False
+
+        with patch.object(etf, "quote_stream_hub", hub), \
+                patch.object(etf.settings, "QUOTE_STREAM_HEARTBEAT", 0.01):
+            stream = etf._quote_event_stream(_Request(), ["510300"])
+            snapshot = await stream.__anext__()
+            assert snapshot.startswith(b"id: 1\nevent: snapshot\n")
+            assert hub.stats()["connections"] == 1
+
+            assert await stream.__anext__() == HEARTBEAT_FRAME
+
+            cache.set_etf_list([{"code": "510300", "name": "沪深300ETF", "price": 3.9, "change_pct": 1.8}])
+            frame = await stream.__anext__()
+            assert frame.startswith(b"id: 2\nevent: quote\n")
+            assert b'"price":3.9' in frame
+
+            await stream.aclose()
+            assert hub.stats()["connections"] == 0
+        hub.stop()
@@ -73,7 +73,9 @@ class TestGridSuggestionEndpoint:
         assert response2.status_code == 200
         data2 = response2.json()
         
-        # Data should be identical
+        # Data should be identical (data age advances between requests)
+        data1.pop("data_age_seconds")
+        data2.pop("data_age_seconds")
         assert data1 == data2
 
     @patch("app.services.grid_service.ak_service")
@@ -91,6 +93,7 @@ class TestGridSuggestionEndpoint:
         })
         
         mock_ak_service.fetch_history_raw.return_value = mock_data
+        mock_ak_service.get_history_fetched_at.return_value = None
         
         # Clear cache
         disk_cache.delete("grid_params_510300")
@@ -111,6 +114,23 @@ class TestGridSuggestionEndpoint:
         response3 = client.get("/api/v1/etf/510300/grid-suggestion?force_refresh=true")
         assert response3.status_code == 200
         assert mock_ak_service.fetch_history_raw.call_count == 2
+        # 强制刷新先同步刷新历史数据
+        mock_ak_service.refresh_history.assert_called_once_with("510300", period="daily", adjust="qfq")
+
+    @patch("app.api.v1.endpoints.etf.ak_service")
+    @patch("app.api.v1.endpoints.etf.calculate_grid_params_cached")
+    def test_grid_suggestion_age_from_history(self, mock_grid, mock_ak_service):
+        """数据年龄取自历史数据的拉取时间，而非网格的计算时间"""
+        from app.main import app
+        from app.core.config import settings
+        import time
+
+        mock_grid.return_value = {"upper": 4.0, "lower": 3.0, "computed_at": time.time()}
+        mock_ak_service.get_history_age.return_value = settings.HISTORY_CACHE_TTL + 100
+
+        data = TestClient(app).get("/api/v1/etf/510300/grid-suggestion").json()
+        assert data["data_age_seconds"] == settings.HISTORY_CACHE_TTL + 100
+        assert data["is_stale"] is True
 
 
 class TestMetricsEndpointRegression:
@@ -130,7 +150,7 @@ class TestMetricsEndpointRegression:
              "low": 2.9 + i * 0.01, "volume": 10000}
             for i, d in enumerate(dates)
         ]
-        mock_ak.get_etf_history.return_value = history
+        mock_ak.get_etf_history_frame.return_value = pd.DataFrame(history)
         mock_ff.get_fund_flow.return_value = None
         mock_trend.get_weekly_trend.return_value = None
         mock_trend.get_daily_trend.return_value = None
@@ -155,3 +175,67 @@ class TestMetricsEndpointRegression:
 
         # mdd_end 可以为 None 或字符串
         assert "mdd_end" in data
+
+
+class TestBlockingCallsOffloaded:
+    """阻塞的数据获取在执行器线程池中运行，不阻塞事件循环"""
+
+    @pytest.mark.asyncio
+    @patch("app.api.v1.endpoints.etf.ak_service")
+    async def test_slow_upstream_does_not_block_health(self, mock_ak):
+        import asyncio
+        import time
+        import httpx
+        from app.main import app
+
+        def slow_info(code):
+            time.sleep(0.5)
+            return {"code": code, "name": "沪深300ETF", "price": 3.85, "tags": [{"label": "宽基"}]}
+
+        mock_ak.get_etf_info.side_effect = slow_info
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            info_task = asyncio.create_task(client.get("/api/v1/etf/510300/info"))
+            await asyncio.sleep(0.05)
+
+            started = time.monotonic()
+            health = await client.get("/api/v1/health")
+            assert health.status_code == 200
+            assert time.monotonic() - started < 0.4
+            assert not info_task.done()
+
+            info = await info_task
+            assert info.status_code == 200
+            assert info.json()["code"] == "510300"
+
+    @patch("app.api.v1.endpoints.etf.temperature_cache_service")
+    @patch("app.api.v1.endpoints.etf.trend_cache_service")
+    @patch("app.api.v1.endpoints.etf.ak_service")
+    def test_metrics_computed_in_executor(self, mock_ak, mock_trend, mock_temp):
+        from app.main import app
+        from app.core.executors import api_executor
+
+        dates = pd.bdate_range("2020-01-02", periods=500)
+        mock_ak.get_etf_history_frame.return_value = pd.DataFrame([
+            {"date": d.strftime("%Y-%m-%d"), "open": 3.0 + i * 0.01,
+             "close": 3.0 + i * 0.01, "high": 3.1 + i * 0.01,
+             "low": 2.9 + i * 0.01, "volume": 10000}
+            for i, d in enumerate(dates)
+        ])
+        mock_ak.get_history_age.return_value = 10
+        mock_trend.get_daily_trend.return_value = {"direction": "up"}
+        mock_trend.get_weekly_trend.return_value = None
+        mock_temp.calculate_temperature.return_value = None
+
+        completed = api_executor.stats()["pools"]["compute"]["completed"]
+        resp = TestClient(app).get("/api/v1/etf/510300/metrics?period=1y")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["daily_trend"] == {"direction": "up"}
+        assert data["atr"] is not None
+        assert data["data_age_seconds"] == 10
+        assert data["period"].endswith(dates[-1].strftime("%Y-%m-%d"))
+        # 价格指标与趋势各在计算线程池中执行一次
+        assert api_executor.stats()["pools"]["compute"]["completed"] == completed + 2
+        assert api_executor.stats()["endpoints"]["metrics"]["active"] == 0
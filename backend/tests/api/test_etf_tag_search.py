@@ -136,3 +136,46 @@ class TestTagSearchAPI:
         data = resp.json()
         assert len(data) == 1
         assert data[0]["code"] == "512480"
+
+
+class TestBrowseAPI:
+    """Tests for GET /etf/browse (多标签组合浏览)."""
+
+    def setup_method(self):
+        from app.main import app
+        from app.core.cache import etf_cache
+
+        self.client = TestClient(app)
+        broad = {"label": "宽基", "group": "type"}
+        chip = {"label": "半导体", "group": "industry"}
+        dividend = {"label": "红利", "group": "strategy"}
+        etf_cache.set_etf_list([
+            {"code": "510300", "name": "沪深300ETF", "price": 3.85, "change_pct": 1.0, "volume": 5e9, "tags": [broad]},
+            {"code": "512480", "name": "半导体ETF", "price": 1.20, "change_pct": -0.5, "volume": 2e9, "tags": [chip]},
+            {"code": "515080", "name": "中证红利ETF", "price": 1.50, "change_pct": 0.3, "volume": 3e8, "tags": [broad, dividend]},
+            {"code": "159915", "name": "创业板ETF", "price": 2.10, "change_pct": 2.1, "volume": 4e9, "tags": [broad]},
+        ])
+
+    def test_and_sorted_by_volume(self):
+        resp = self.client.get("/api/v1/etf/browse?tags=宽基&sort=volume")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["total"] == 3
+        assert [i["code"] for i in data["items"]] == ["510300", "159915", "515080"]
+
+    def test_or_not_and_pagination(self):
+        resp = self.client.get(
+            "/api/v1/etf/browse?any_tags=半导体,宽基&exclude=红利&sort=change_pct&order=asc&offset=1&limit=1"
+        )
+        data = resp.json()
+        assert data["total"] == 3
+        assert [i["code"] for i in data["items"]] == ["510300"]
+
+    def test_facets(self):
+        data = self.client.get("/api/v1/etf/browse?group=type").json()
+        facets = {f["label"]: f["count"] for f in data["facets"]}
+        assert facets == {"宽基": 3, "红利": 1}
+
+    def test_invalid_sort(self):
+        resp = self.client.get("/api/v1/etf/browse?sort=name")
+        assert resp.status_code == 400
@@ -28,9 +28,8 @@ class TestMetricsEndpointCache:
         from app.main import app
         
         # Mock akshare service to return sample data
-        mock_ak_service.get_etf_history.return_value = sample_daily_data.to_dict(
-            orient="records"
-        )
+        mock_ak_service.get_etf_history_frame.return_value = sample_daily_data.copy()
+        mock_ak_service.get_history_age.return_value = 60.0
         
         # Mock cache to return None (cache miss)
         mock_trend_cache.get.return_value = None
@@ -47,6 +46,8 @@ class TestMetricsEndpointCache:
         assert "daily_trend" in data
         assert "weekly_trend" in data
         assert "temperature" in data
+        assert data["data_age_seconds"] == 60
+        assert data["is_stale"] is False
         
         # Cache should have been written (cache miss -> write)
         assert mock_trend_cache.set.called
@@ -66,9 +67,8 @@ class TestMetricsEndpointCache:
         from app.main import app
         
         # Mock akshare service to return sample data
-        mock_ak_service.get_etf_history.return_value = sample_daily_data.to_dict(
-            orient="records"
-        )
+        mock_ak_service.get_etf_history_frame.return_value = sample_daily_data.copy()
+        mock_ak_service.get_history_age.return_value = 60.0
         
         # Mock cache with existing data
         last_date = sample_daily_data["date"].iloc[-1]
@@ -113,9 +113,8 @@ class TestMetricsEndpointCache:
         import pandas as pd
         
         # Mock akshare service to return sample data
-        mock_ak_service.get_etf_history.return_value = sample_daily_data.to_dict(
-            orient="records"
-        )
+        mock_ak_service.get_etf_history_frame.return_value = sample_daily_data.copy()
+        mock_ak_service.get_history_age.return_value = 60.0
         
         # Get the last date in the format that will be used after pd.to_datetime conversion
         # The etf.py code does: df["date"] = pd.to_datetime(df["date"]) then reset_index()
@@ -0,0 +1,90 @@
+"""
+Tests for GET /etf/temperature-heatmap endpoint.
+"""
+
+from __future__ import annotations
+
+import threading
+from unittest.mock import patch
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+
+class TestTemperatureHeatmapEndpoint:
+    """Tests for /etf/temperature-heatmap endpoint."""
+
+    def _history(self, frames):
+        return lambda code, period="daily", adjust="qfq": frames.get(code, pd.DataFrame())
+
+    @patch("app.api.v1.endpoints.etf.etf_cache")
+    @patch("app.api.v1.endpoints.etf.ak_service")
+    def test_heatmap_by_codes(self, mock_ak, mock_cache, sample_daily_data, bullish_trend_data):
+        from app.main import app
+
+        mock_ak.get_etf_history_frame.side_effect = self._history({
+            "510300": sample_daily_data, "510500": bullish_trend_data,
+        })
+        mock_cache.get_etf_info.side_effect = lambda code: {"name": f"ETF{code}", "change_pct": 1.0}
+
+        client = TestClient(app)
+        response = client.get("/api/v1/etf/temperature-heatmap?codes=510300,510500,159999")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [item["code"] for item in data["items"]] == ["510300", "510500"]
+        assert data["missing"] == ["159999"]
+        item = data["items"][1]
+        assert item["name"] == "ETF510500"
+        assert 0 <= item["score"] <= 100
+        assert item["level"] in ("freezing", "cool", "warm", "hot")
+        assert item["ma_alignment"] == "bullish"
+
+    @patch("app.api.v1.endpoints.etf.etf_cache")
+    @patch("app.api.v1.endpoints.etf.ak_service")
+    def test_heatmap_by_tag(self, mock_ak, mock_cache, sample_daily_data):
+        from app.main import app
+
+        mock_cache.filter_by_tag.return_value = [{"code": "510300"}]
+        mock_cache.get_etf_info.return_value = None
+        mock_ak.get_etf_history_frame.side_effect = self._history({"510300": sample_daily_data})
+
+        client = TestClient(app)
+        response = client.get("/api/v1/etf/temperature-heatmap?tag=宽基")
+
+        assert response.status_code == 200
+        assert [item["code"] for item in response.json()["items"]] == ["510300"]
+        mock_cache.filter_by_tag.assert_called_once_with("宽基", limit=100)
+
+    @patch("app.api.v1.endpoints.etf.etf_cache")
+    @patch("app.api.v1.endpoints.etf.ak_service")
+    def test_heatmap_loads_through_io_pool(self, mock_ak, mock_cache, sample_daily_data):
+        """历史行情经共享 IO 池读取，单只失败不影响其他"""
+        from app.main import app
+
+        threads = []
+
+        def history(code, period="daily", adjust="qfq"):
+            threads.append(threading.current_thread().name)
+            if code == "510500":
+                raise RuntimeError("boom")
+            return sample_daily_data
+
+        mock_ak.get_etf_history_frame.side_effect = history
+        mock_cache.get_etf_info.return_value = None
+
+        client = TestClient(app)
+        response = client.get("/api/v1/etf/temperature-heatmap?codes=510300,510500")
+
+        assert response.status_code == 200
+        assert response.json()["missing"] == ["510500"]
+        assert len(threads) == 2
+        assert all(name.startswith("api-io") for name in threads)
+
+    def test_heatmap_rejects_invalid_params(self):
+        from app.main import app
+
+        client = TestClient(app)
+        assert client.get("/api/v1/etf/temperature-heatmap").status_code == 400
+        too_many = ",".join(f"{i:06d}" for i in range(101))
+        assert client.get(f"/api/v1/etf/temperature-heatmap?codes={too_many}").status_code == 400
@@ -0,0 +1,31 @@
+"""
+测试共用断言：增量 / 批量计算与逐只全量计算的结果一致性
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+import pytest
+
+
+def assert_same_temperature(result: Dict[str, Any], expected: Dict[str, Any]) -> None:
+    """温度结果一致（浮点字段容许舍入误差）"""
+    assert result["score"] == expected["score"]
+    assert result["level"] == expected["level"]
+    assert result["percentile_years"] == expected["percentile_years"]
+    assert result["percentile_value"] == pytest.approx(expected["percentile_value"])
+    assert result.get("percentile_note") == expected.get("percentile_note")
+    assert result["rsi_value"] == pytest.approx(expected["rsi_value"], abs=1e-9)
+    assert result["factors"].keys() == expected["factors"].keys()
+    for name, value in expected["factors"].items():
+        assert result["factors"][name] == pytest.approx(value, abs=1e-9)
+
+
+def assert_same_trend(result: Dict[str, Any], expected: Dict[str, Any]) -> None:
+    """趋势结果一致（均线值容许舍入误差）"""
+    assert {k: v for k, v in result.items() if k != "ma_values"} == \
+        {k: v for k, v in expected.items() if k != "ma_values"}
+    assert result["ma_values"].keys() == expected["ma_values"].keys()
+    for key, value in expected["ma_values"].items():
+        assert result["ma_values"][key] == pytest.approx(value, rel=1e-12)
@@ -13,6 +13,7 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Optional
+from unittest.mock import patch
 from sqlmodel import Session, SQLModel, create_engine
 from sqlalchemy.pool import StaticPool
 from fastapi.testclient import TestClient
@@ -208,6 +209,41 @@ def single_day_data() -> pd.DataFrame:
     })
 
 
+# ============================================================================
+# Fake Disk Cache
+# ============================================================================
+
+class DictDiskCache(dict):
+    """以 dict 模拟 disk_cache 的 get / set，set_calls 记录写入次数"""
+
+    def __init__(self):
+        super().__init__()
+        self.set_calls = 0
+
+    def set(self, key, value, expire=None):
+        self.set_calls += 1
+        self[key] = value
+        return True
+
+
+@pytest.fixture
+def dict_disk_cache() -> DictDiskCache:
+    """独立的内存 disk_cache 替身（配合 patch("<module>.disk_cache", dict_disk_cache) 使用）"""
+    return DictDiskCache()
+
+
+# ============================================================================
+# Metrics Snapshot Isolation
+# ============================================================================
+
+@pytest.fixture(autouse=True)
+def isolated_metrics_snapshot():
+    """每个测试使用独立的收盘指标快照，避免经磁盘缓存互相影响"""
+    cache = DictDiskCache()
+    with patch("app.services.metrics_snapshot_service.disk_cache", cache):
+        yield cache
+
+
 # ============================================================================
 # Admin System Test Fixtures
 # ============================================================================
@@ -56,3 +56,48 @@ class TestUpdateEtfInfoMerge:
         original_len = len(self.cache.etf_list)
         self.cache.update_etf_info({"name": "无代码"})
         assert len(self.cache.etf_list) == original_len
+
+
+
+class TestChangeFeed:
+    def test_quote_refresh_publishes_changed_codes(self):
+        cache = ETFCacheManager()
+        events = []
+        cache.changes.subscribe(events.append)
+        data = [
+            {"code": "510300", "name": "沪深300ETF", "price": 3.85},
+            {"code": "510500", "name": "中证500ETF", "price": 5.10},
+        ]
+        cache.set_etf_list(data)
+        snapshot = cache.snapshot()
+        cache.set_etf_list([dict(data[0], price=3.90), dict(data[1])])
+
+        assert [e.seq for e in events] == [1, 2]
+        assert events[0].full and set(events[0].codes) == {"510300", "510500"}
+        assert not events[1].full and events[1].codes == ("510300",)
+        # 仅报价变化：以新数值列替换快照，结构与旧快照共享，旧快照不变
+        assert cache.snapshot() is not snapshot
+        assert cache.snapshot().index is snapshot.index
+        assert snapshot.row(0)["price"] == 3.85
+        assert cache.get_etf_info("510300")["price"] == 3.90
+
+    def test_structure_change_rebuilds(self):
+        cache = ETFCacheManager()
+        cache.set_etf_list([{"code": "510300", "name": "沪深300ETF", "price": 3.85}])
+        snapshot = cache.snapshot()
+        cache.set_etf_list([{"code": "510500", "name": "中证500ETF", "price": 5.10}])
+
+        assert cache.snapshot() is not snapshot
+        assert cache.changes.changes_since(1) == {
+            "seq": 2, "full": False, "codes": ["510500"], "removed": ["510300"],
+        }
+
+    def test_listener_error_does_not_break_update(self):
+        cache = ETFCacheManager()
+
+        def broken(_):
+            raise RuntimeError("boom")
+
+        cache.changes.subscribe(broken)
+        cache.set_etf_list([{"code": "510300", "price": 3.85}])
+        assert cache.get_etf_info("510300")["price"] == 3.85
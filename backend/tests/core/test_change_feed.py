@@ -0,0 +1,46 @@
+"""
+Tests for ChangeFeed (行情变更流)
+"""
+
+from app.core.change_feed import ChangeFeed
+
+
+def test_changes_since_merges_events():
+    feed = ChangeFeed()
+    feed.publish(["510300", "510500"])
+    feed.publish(["510300"], removed=["159915"])
+    feed.publish(["159915"])
+
+    assert feed.changes_since(0) == {
+        "seq": 3, "full": False, "codes": ["510300", "510500", "159915"], "removed": [],
+    }
+    assert feed.changes_since(1) == {
+        "seq": 3, "full": False, "codes": ["510300", "159915"], "removed": [],
+    }
+    assert feed.changes_since(3)["codes"] == []
+
+
+def test_removed_after_change():
+    feed = ChangeFeed()
+    feed.publish(["510300"])
+    feed.publish([], removed=["510300"])
+    assert feed.changes_since(0) == {"seq": 2, "full": False, "codes": [], "removed": ["510300"]}
+
+
+def test_expired_or_future_seq_requires_full_reload():
+    feed = ChangeFeed(max_events=2)
+    for _ in range(4):
+        feed.publish(["510300"])
+    assert feed.changes_since(1)["full"] is True
+    assert feed.changes_since(2)["full"] is False
+    assert feed.changes_since(99)["full"] is True
+
+
+def test_subscribe_and_unsubscribe():
+    feed = ChangeFeed()
+    events = []
+    feed.subscribe(events.append)
+    feed.publish(["510300"])
+    feed.unsubscribe(events.append)
+    feed.publish(["510500"])
+    assert [e.codes for e in events] == [("510300",)]
@@ -0,0 +1,171 @@
+"""
+ApiExecutor 单元测试
+"""
+
+import asyncio
+import os
+import threading
+
+import pytest
+
+from app.core.config import settings
+from app.core.executors import ApiExecutor, ExecutorBusyError
+
+
+def _pid() -> int:
+    return os.getpid()
+
+
+@pytest.fixture
+def executor():
+    executor = ApiExecutor(io_workers=2, compute_workers=1, compute_processes=0)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_io_off_event_loop(executor):
+    loop_thread = threading.get_ident()
+    worker_thread = await executor.run_io(threading.get_ident)
+    assert worker_thread != loop_thread
+
+    stats = executor.stats()["pools"]["io"]
+    assert stats == {"workers": 2, "queued": 0, "running": 0, "completed": 1}
+
+
+@pytest.mark.asyncio
+async def test_run_io_kwargs_and_errors(executor):
+    assert await executor.run_io(int, "ff", base=16) == 255
+    with pytest.raises(ValueError):
+        await executor.run_compute(int, "x")
+    assert executor.stats()["pools"]["compute"]["completed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_queue_depth(executor):
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    tasks = [asyncio.create_task(executor.run_compute(block)) for _ in range(3)]
+    await asyncio.to_thread(started.wait, 5)
+    await asyncio.sleep(0.01)
+    stats = executor.stats()["pools"]["compute"]
+    assert stats["running"] == 1
+    assert stats["queued"] == 2
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert executor.stats()["pools"]["compute"]["completed"] == 3
+
+
+@pytest.mark.asyncio
+async def test_cancelled_before_start_leaves_queue(executor):
+    """排队中的调用被取消后不再计入 queued"""
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    running = asyncio.create_task(executor.run_compute(block))
+    await asyncio.to_thread(started.wait, 5)
+    waiting = [asyncio.create_task(executor.run_compute(block)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    assert executor.stats()["pools"]["compute"]["queued"] == 2
+
+    for task in waiting:
+        task.cancel()
+    await asyncio.gather(*waiting, return_exceptions=True)
+    assert executor.stats()["pools"]["compute"]["queued"] == 0
+
+    release.set()
+    await running
+    stats = executor.stats()["pools"]["compute"]
+    assert stats["queued"] == 0
+    assert stats["running"] == 0
+    assert stats["completed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_run_process_without_pool_uses_threads(executor):
+    assert await executor.run_process(_pid) == os.getpid()
+
+
+@pytest.mark.asyncio
+async def test_run_process_with_pool():
+    executor = ApiExecutor(io_workers=1, compute_workers=1, compute_processes=1)
+    try:
+        assert await executor.run_process(_pid) != os.getpid()
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_slot_limits_concurrency(executor):
+    active = 0
+    peak = 0
+
+    async def handler():
+        nonlocal active, peak
+        async with executor.slot("metrics", limit=2):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*(handler() for _ in range(6)))
+    assert peak == 2
+
+    stats = executor.stats()["endpoints"]["metrics"]
+    assert stats["limit"] == 2
+    assert stats["completed"] == 6
+    assert stats["max_waiting"] >= 4
+    assert stats["active"] == 0
+    assert stats["waiting"] == 0
+
+
+@pytest.mark.asyncio
+async def test_slot_rejects_when_queue_full(executor, monkeypatch):
+    monkeypatch.setattr(settings, "API_ENDPOINT_QUEUE", 1)
+    hold = asyncio.Event()
+
+    async def handler():
+        async with executor.slot("history", limit=1):
+            await hold.wait()
+
+    first = asyncio.create_task(handler())
+    second = asyncio.create_task(handler())
+    await asyncio.sleep(0)
+
+    with pytest.raises(ExecutorBusyError):
+        async with executor.slot("history", limit=1):
+            pass
+
+    hold.set()
+    await asyncio.gather(first, second)
+    stats = executor.stats()["endpoints"]["history"]
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+
+
+def test_shutdown_runs_registered_hooks_once():
+    executor = ApiExecutor()
+    calls = []
+
+    def hook():
+        calls.append(1)
+
+    def broken():
+        raise RuntimeError("boom")
+
+    executor.register_shutdown(hook)
+    executor.register_shutdown(hook)
+    executor.register_shutdown(broken)
+    executor.shutdown()
+    executor.shutdown()
+    assert calls == [1]
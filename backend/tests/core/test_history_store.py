@@ -0,0 +1,319 @@
+"""
+Tests for HistoryStore (columnar OHLCV storage) and its use in fetch_history_raw.
+"""
+
+import time
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.config import settings
+from app.core.history_store import HistoryStore
+from app.core.memory_cache import MemoryLRU
+
+
+def _make_df(n: int = 10, start: str = "2024-01-01") -> pd.DataFrame:
+    dates = pd.date_range(start=start, periods=n, freq="D")
+    return pd.DataFrame({
+        "date": dates.strftime("%Y-%m-%d"),
+        "open": [1.0 + i * 0.01 for i in range(n)],
+        "high": [1.1 + i * 0.01 for i in range(n)],
+        "low": [0.9 + i * 0.01 for i in range(n)],
+        "close": [1.05 + i * 0.01 for i in range(n)],
+        "volume": [1000.0 + i for i in range(n)],
+    })
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(str(tmp_path))
+
+
+class TestHistoryStore:
+    def test_roundtrip(self, store):
+        """写入后完整读取应与原数据一致"""
+        df = _make_df()
+        store.write("510300", "daily", "qfq", df)
+        result = store.read("510300", "daily", "qfq")
+        pd.testing.assert_frame_equal(result, df)
+
+    def test_missing_returns_none(self, store):
+        assert store.read("510300", "daily", "qfq") is None
+        assert store.last_date("510300", "daily", "qfq") is None
+        assert store.fetched_at("510300", "daily", "qfq") is None
+
+    def test_read_tail(self, store):
+        """tail 只返回最后 N 行"""
+        store.write("510300", "daily", "qfq", _make_df(10))
+        result = store.read("510300", "daily", "qfq", tail=3)
+        assert list(result["date"]) == ["2024-01-08", "2024-01-09", "2024-01-10"]
+
+    def test_read_date_range(self, store):
+        """start_date / end_date 按日期二分定位（支持 YYYYMMDD）"""
+        store.write("510300", "daily", "qfq", _make_df(10))
+        result = store.read("510300", "daily", "qfq", start_date="20240103", end_date="2024-01-05")
+        assert list(result["date"]) == ["2024-01-03", "2024-01-04", "2024-01-05"]
+
+    def test_write_sorts_and_dedups(self, store):
+        """乱序且重复日期的数据应排序并保留最后一条"""
+        df = _make_df(3)
+        dup = df.iloc[[1]].copy()
+        dup["close"] = 9.9
+        store.write("510300", "daily", "qfq", pd.concat([df.iloc[::-1], dup]))
+        result = store.read("510300", "daily", "qfq")
+        assert list(result["date"]) == ["2024-01-01", "2024-01-02", "2024-01-03"]
+        assert result["close"].iloc[1] == 9.9
+
+    def test_missing_columns_filled_with_nan(self, store):
+        df = _make_df(3).drop(columns=["volume"])
+        store.write("510300", "daily", "qfq", df)
+        result = store.read("510300", "daily", "qfq")
+        assert result["volume"].isna().all()
+
+    def test_extra_numeric_columns_kept(self, store):
+        """上游返回的其他数值列（含中文列名）原样保存，非数值列丢弃"""
+        df = _make_df(3).assign(amount=[1e6, 2e6, 3e6], 换手率=[0.1, 0.2, 0.3], note=["a", "b", "c"])
+        store.write("510300", "daily", "qfq", df)
+        result = store.read("510300", "daily", "qfq", tail=2)
+        assert list(result.columns) == ["date", "open", "high", "low", "close", "volume", "amount", "换手率"]
+        assert list(result["amount"]) == [2e6, 3e6]
+        assert list(result["换手率"]) == [0.2, 0.3]
+
+    def test_append_merges_columns(self, store):
+        """追加数据的列与已存数据不同时取并集，缺失值为 NaN"""
+        store.write("510300", "daily", "qfq", _make_df(3).assign(amount=1.0))
+        store.append("510300", "daily", "qfq", _make_df(5).assign(turnover=2.0))
+        result = store.read("510300", "daily", "qfq")
+        assert list(result.columns)[-2:] == ["amount", "turnover"]
+        assert result["amount"].iloc[:3].eq(1.0).all() and result["amount"].iloc[3:].isna().all()
+        assert result["turnover"].iloc[:3].isna().all() and result["turnover"].iloc[3:].eq(2.0).all()
+
+    def test_reads_legacy_matrix_file(self, store, tmp_path):
+        """旧版不带列名的 (6, 行数) 矩阵文件仍可读取"""
+        df = _make_df(4)
+        matrix = np.vstack([
+            pd.to_datetime(df["date"]).values.astype("datetime64[D]").astype(np.int64),
+            *(df[col].to_numpy(dtype=np.float64) for col in ["open", "high", "low", "close", "volume"]),
+        ]).astype(np.float64)
+        np.save(tmp_path / "510300_daily_qfq.npy", matrix)
+        pd.testing.assert_frame_equal(store.read("510300", "daily", "qfq"), df)
+        assert store.last_date("510300", "daily", "qfq") == "2024-01-04"
+
+    def test_freshness(self, store):
+        """fetched_at 写入为文件 mtime，用于判断是否过期"""
+        store.write("510300", "daily", "qfq", _make_df(), fetched_at=time.time() - 100)
+        assert store.is_fresh("510300", "daily", "qfq", ttl=200)
+        assert not store.is_fresh("510300", "daily", "qfq", ttl=50)
+
+    def test_last_date(self, store):
+        store.write("510300", "daily", "qfq", _make_df(5))
+        assert store.last_date("510300", "daily", "qfq") == "2024-01-05"
+
+    def test_append_only_new_rows(self, store):
+        """append 忽略已有日期，只追加之后的 K 线并刷新拉取时间"""
+        store.write("510300", "daily", "qfq", _make_df(5), fetched_at=0)
+        appended = store.append("510300", "daily", "qfq", _make_df(8))
+        assert appended == 3
+        assert store.last_date("510300", "daily", "qfq") == "2024-01-08"
+        assert store.is_fresh("510300", "daily", "qfq", ttl=60)
+        pd.testing.assert_frame_equal(store.read("510300", "daily", "qfq"), _make_df(8))
+
+    def test_append_without_new_rows_touches(self, store):
+        store.write("510300", "daily", "qfq", _make_df(5), fetched_at=0)
+        assert store.append("510300", "daily", "qfq", _make_df(5)) == 0
+        assert store.is_fresh("510300", "daily", "qfq", ttl=60)
+
+
+class TestHistoryStoreMemoryTier:
+    @pytest.fixture
+    def lru(self):
+        return MemoryLRU(max_bytes=10 * 1024 * 1024)
+
+    @pytest.fixture
+    def store(self, tmp_path, lru):
+        return HistoryStore(str(tmp_path), memory=lru, ttl=3600)
+
+    def test_repeated_reads_hit_memory(self, store, lru):
+        store.write("510300", "daily", "qfq", _make_df(10))
+        store.read("510300", "daily", "qfq")
+        result = store.read("510300", "daily", "qfq", tail=3)
+        assert list(result["date"]) == ["2024-01-08", "2024-01-09", "2024-01-10"]
+        assert lru.stats()["hits"] == 1
+
+    def test_write_invalidates_memory(self, store):
+        store.write("510300", "daily", "qfq", _make_df(5), fetched_at=0)
+        store.read("510300", "daily", "qfq")
+        store.write("510300", "daily", "qfq", _make_df(8), fetched_at=0)
+        assert len(store.read("510300", "daily", "qfq")) == 8
+
+    def test_returned_frame_is_independent(self, store):
+        """调用方修改返回的 DataFrame 不应影响缓存"""
+        store.write("510300", "daily", "qfq", _make_df(5))
+        first = store.read("510300", "daily", "qfq")
+        first["close"] = 0.0
+        first.loc[0, "open"] = -1.0
+        pd.testing.assert_frame_equal(store.read("510300", "daily", "qfq"), _make_df(5))
+
+
+class TestFetchHistoryRawWithStore:
+    def setup_method(self):
+        self.manager = MagicMock()
+
+    @contextmanager
+    def _patch(self, store, stale_while_revalidate=False):
+        with patch("app.services.akshare_service.history_store", store), \
+                patch("app.services.akshare_service._get_history_manager", return_value=self.manager), \
+                patch.object(settings, "HISTORY_STALE_WHILE_REVALIDATE", stale_while_revalidate):
+            yield
+
+    def test_fresh_store_skips_online_fetch(self, store):
+        from app.services.akshare_service import AkShareService
+
+        store.write("510300", "daily", "qfq", _make_df(10))
+        with self._patch(store):
+            result = AkShareService.fetch_history_raw("510300", "daily", "qfq", tail=5)
+        assert len(result) == 5
+        self.manager.fetch_history.assert_not_called()
+
+    def test_missing_store_fetches_full_history(self, store):
+        from app.services.akshare_service import AkShareService
+
+        self.manager.fetch_history.return_value = _make_df(10)
+        with self._patch(store):
+            result = AkShareService.fetch_history_raw("510300", "daily", "qfq")
+        assert len(result) == 10
+        assert self.manager.fetch_history.call_args[0][1] == "20000101"
+
+    def test_expired_store_fetches_incrementally(self, store):
+        """过期存储只拉取重叠窗口起的尾部并追加"""
+        from app.services.akshare_service import AkShareService
+
+        store.write("510300", "daily", "qfq", _make_df(30), fetched_at=0)
+        self.manager.fetch_history.return_value = _make_df(35).iloc[-15:]
+        with self._patch(store):
+            result = AkShareService.fetch_history_raw("510300", "daily", "qfq")
+        assert len(result) == 35
+        assert self.manager.fetch_history.call_count == 1
+        # 2024-01-30 - 20 天
+        assert self.manager.fetch_history.call_args[0][1] == "20240110"
+        assert store.is_fresh("510300", "daily", "qfq", ttl=60)
+
+    def test_adjustment_change_triggers_full_refetch(self, store):
+        """重叠区间收盘价不一致（复权因子变化）时全量重新拉取"""
+        from app.services.akshare_service import AkShareService
+
+        store.write("510300", "daily", "qfq", _make_df(30), fetched_at=0)
+        readjusted = _make_df(35)
+        readjusted[["open", "high", "low", "close"]] *= 0.95
+        self.manager.fetch_history.side_effect = [readjusted.iloc[-15:], readjusted]
+        with self._patch(store):
+            result = AkShareService.fetch_history_raw("510300", "daily", "qfq")
+        assert self.manager.fetch_history.call_count == 2
+        assert self.manager.fetch_history.call_args[0][1] == "20000101"
+        assert len(result) == 35
+        assert result["close"].iloc[0] == pytest.approx(1.05 * 0.95)
+
+    def test_incremental_failure_skips_full_refetch(self, store):
+        """在线源全部失败时不再尝试全量拉取，直接使用过期存储"""
+        from app.services.akshare_service import AkShareService
+
+        store.write("510300", "daily", "qfq", _make_df(5), fetched_at=0)
+        self.manager.fetch_history.return_value = None
+        with self._patch(store):
+            result = AkShareService.fetch_history_raw("510300", "daily", "qfq")
+        assert len(result) == 5
+        assert self.manager.fetch_history.call_count == 1
+
+    def test_concurrent_misses_fetch_once(self, store):
+        """并发未命中只触发一次上游拉取"""
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        from app.services.akshare_service import AkShareService
+
+        started = threading.Event()
+
+        def slow_fetch(*args, **kwargs):
+            started.set()
+            time.sleep(0.2)
+            return _make_df(10)
+
+        self.manager.fetch_history.side_effect = slow_fetch
+        with self._patch(store), ThreadPoolExecutor(max_workers=4) as pool:
+            first = pool.submit(AkShareService.fetch_history_raw, "510300", "daily", "qfq")
+            started.wait()
+            others = [pool.submit(AkShareService.fetch_history_raw, "510300", "daily", "qfq") for _ in range(3)]
+            results = [first.result()] + [f.result() for f in others]
+
+        assert self.manager.fetch_history.call_count == 1
+        assert all(len(r) == 10 for r in results)
+
+    def test_online_failure_falls_back_to_stale_store(self, store):
+        from app.services.akshare_service import AkShareService
+
+        store.write("510300", "daily", "qfq", _make_df(5), fetched_at=0)
+        self.manager.fetch_history.return_value = None
+        with self._patch(store):
+            result = AkShareService.fetch_history_raw("510300", "daily", "qfq")
+        assert len(result) == 5
+
+    def test_nothing_available_returns_empty(self, store):
+        from app.services.akshare_service import AkShareService
+
+        self.manager.fetch_history.return_value = None
+        with self._patch(store):
+            result = AkShareService.fetch_history_raw("510300", "daily", "qfq")
+        assert result.empty
+
+    def test_stale_while_revalidate_serves_stale_and_refreshes(self, store):
+        """过期数据立即返回，后台刷新完成后存储更新"""
+        import threading
+        from app.services.akshare_service import AkShareService
+
+        store.write("510300", "daily", "qfq", _make_df(30), fetched_at=0)
+        release = threading.Event()
+
+        def slow_fetch(*args, **kwargs):
+            release.wait(5)
+            return _make_df(35).iloc[-15:]
+
+        self.manager.fetch_history.side_effect = slow_fetch
+        with self._patch(store, stale_while_revalidate=True):
+            result = AkShareService.fetch_history_raw("510300", "daily", "qfq")
+            assert len(result) == 30
+            assert AkShareService.get_history_age("510300") > settings.HISTORY_CACHE_TTL
+
+            # 刷新进行中再次请求不会重复调度
+            AkShareService.fetch_history_raw("510300", "daily", "qfq")
+            release.set()
+            for _ in range(100):
+                if store.last_date("510300", "daily", "qfq") == "2024-02-04":
+                    break
+                time.sleep(0.02)
+            assert AkShareService.get_history_age("510300") < 60
+
+        assert self.manager.fetch_history.call_count == 1
+        assert store.last_date("510300", "daily", "qfq") == "2024-02-04"
+
+    def test_stale_while_revalidate_without_store_fetches_sync(self, store):
+        from app.services.akshare_service import AkShareService
+
+        self.manager.fetch_history.return_value = _make_df(10)
+        with self._patch(store, stale_while_revalidate=True):
+            result = AkShareService.fetch_history_raw("510300", "daily", "qfq")
+            assert AkShareService.get_history_age("510300") < 60
+        assert len(result) == 10
+
+    def test_upstream_columns_reach_history_records(self, store):
+        """上游的成交额等列经存储保留到 get_etf_history，实时价格点缺失的列为 None"""
+        from app.services.akshare_service import AkShareService
+
+        self.manager.fetch_history.return_value = _make_df(3).assign(成交额=[1e6, 2e6, 3e6])
+        with self._patch(store), \
+                patch.object(AkShareService, "get_etf_info", return_value={"price": 1.5}):
+            records = AkShareService.get_etf_history("510300", "daily", "qfq")
+        assert records[0]["成交额"] == 1e6
+        assert records[-1]["close"] == 1.5
+        assert records[-1]["成交额"] is None
@@ -0,0 +1,138 @@
+"""
+HttpClient 单元测试（本地 HTTP 服务）
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from app.core import http_client as http_client_module
+from app.core.config import settings
+from app.core.http_client import HOST_POLICIES, HostPolicy, HttpClient, policy_for
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    connections = set()
+    statuses = []
+    user_agents = []
+    cookies = []
+
+    def do_GET(self):
+        type(self).connections.add(self.client_address)
+        type(self).user_agents.append(self.headers.get("User-Agent"))
+        type(self).cookies.append(self.headers.get("Cookie"))
+        status = type(self).statuses.pop(0) if type(self).statuses else 200
+        body = b"ok"
+        self.send_response(status)
+        if self.path == "/login":
+            self.send_header("Set-Cookie", "sid=secret; Path=/")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.connections = set()
+    _Handler.statuses = []
+    _Handler.user_agents = []
+    _Handler.cookies = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def client():
+    client = HttpClient(pool_maxsize=2)
+    yield client
+    client.close()
+
+
+def test_policy_for_host_suffix():
+    assert policy_for("d.10jqka.com.cn").timeout == (5, 10)
+    assert policy_for("push2his.eastmoney.com").retries == 1
+    assert policy_for("push2his.eastmoney.com").read_timeout == 180
+    assert policy_for("query.sse.com.cn").retries == 0
+    assert policy_for("example.com").timeout == (10, settings.HTTP_DEFAULT_TIMEOUT)
+    # 仅匹配完整的域名段
+    assert policy_for("notszse.cn").read_timeout == settings.HTTP_DEFAULT_TIMEOUT
+
+
+def test_reuses_connection(server, client):
+    for _ in range(5):
+        assert client.get(server + "/data").text == "ok"
+
+    assert len(_Handler.connections) == 1
+    assert client.stats() == {"127.0.0.1": {"requests": 5, "errors": 0}}
+    assert _Handler.user_agents[0] == http_client_module.USER_AGENT
+
+
+def test_retries_server_errors(server, client, monkeypatch):
+    monkeypatch.setitem(HOST_POLICIES, "127.0.0.1", HostPolicy(1, 5, retries=2, backoff=0))
+    _Handler.statuses = [503, 502]
+
+    assert client.get(server + "/data").status_code == 200
+    assert len(_Handler.user_agents) == 3
+
+
+def test_no_retry_by_default(server, client):
+    _Handler.statuses = [503]
+
+    assert client.get(server + "/data").status_code == 503
+    assert len(_Handler.user_agents) == 1
+
+
+def test_counts_network_errors(client):
+    with pytest.raises(requests.ConnectionError):
+        client.get("http://127.0.0.1:1/unreachable", timeout=1)
+    assert client.stats()["127.0.0.1"] == {"requests": 1, "errors": 1}
+
+
+def test_post_not_retried(server, client, monkeypatch):
+    """非幂等方法不重试"""
+    monkeypatch.setitem(HOST_POLICIES, "127.0.0.1", HostPolicy(1, 5, retries=2, backoff=0))
+    _Handler.statuses = [503]
+
+    assert client.post(server + "/data", data=b"x").status_code == 503
+    assert len(_Handler.user_agents) == 1
+
+
+def test_cookies_not_shared_between_callers(server, client):
+    """共享 Session 不保存响应 Cookie，显式传入的 cookies 照常发送"""
+    client.get(server + "/login")
+    client.get(server + "/data")
+    client.get(server + "/data", cookies={"token": "abc"})
+
+    assert _Handler.cookies[1] is None
+    assert _Handler.cookies[2] == "token=abc"
+
+
+def test_install_keeps_module_level_requests(server, monkeypatch):
+    """安装后 requests.get 不经由共享连接池，但使用默认 User-Agent"""
+    original = requests.request
+    pooled = HttpClient()
+    monkeypatch.setattr(http_client_module, "http_client", pooled)
+    http_client_module.install_requests_defaults()
+    try:
+        assert requests.request is original
+        assert requests.get(server + "/data").text == "ok"
+        assert pooled.stats() == {}
+        assert _Handler.user_agents[-1] == http_client_module.USER_AGENT
+    finally:
+        pooled.close()
@@ -0,0 +1,118 @@
+"""
+Tests for MemoryLRU and the TieredCache wrapper around DiskCache.
+"""
+
+import time
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+from diskcache import Cache
+
+from app.core.memory_cache import MemoryLRU, TieredCache
+
+
+class TestMemoryLRU:
+    def test_get_set(self):
+        lru = MemoryLRU(max_bytes=1024)
+        lru.set("a", 1, size=10)
+        assert lru.get("a") == 1
+        assert lru.get("missing", "default") == "default"
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        """超出字节额度时淘汰最久未使用的条目"""
+        lru = MemoryLRU(max_bytes=100)
+        lru.set("a", "A", size=40)
+        lru.set("b", "B", size=40)
+        lru.get("a")  # a 变为最近使用
+        lru.set("c", "C", size=40)
+        assert lru.get("b") is None
+        assert lru.get("a") == "A"
+        assert lru.get("c") == "C"
+        assert lru.stats()["evictions"] == 1
+        assert lru.stats()["bytes"] == 80
+
+    def test_oversized_entry_not_cached(self):
+        lru = MemoryLRU(max_bytes=100)
+        lru.set("a", "A", size=10)
+        lru.set("big", "X", size=1000)
+        assert lru.get("big") is None
+        assert lru.get("a") == "A"
+
+    def test_expiry(self):
+        lru = MemoryLRU(max_bytes=1024)
+        lru.set("a", 1, expires_at=time.time() - 1, size=10)
+        assert lru.get("a") is None
+        assert lru.stats()["entries"] == 0
+
+    def test_size_estimation_for_ndarray(self):
+        lru = MemoryLRU(max_bytes=1024 * 1024)
+        lru.set("arr", np.zeros(1000))
+        assert lru.stats()["bytes"] == 8000
+
+    def test_hit_rate(self):
+        lru = MemoryLRU(max_bytes=1024)
+        lru.set("a", 1, size=10)
+        lru.get("a")
+        lru.get("b")
+        assert lru.stats()["hit_rate"] == 0.5
+
+
+class TestTieredCache:
+    @pytest.fixture
+    def cache(self, tmp_path):
+        disk = Cache(str(tmp_path))
+        yield TieredCache(disk, MemoryLRU(max_bytes=1024 * 1024))
+        disk.close()
+
+    def test_second_read_served_from_memory(self, cache):
+        cache.set("k", {"v": 1}, expire=60)
+        first = cache.get("k")
+        with patch.object(cache.disk, "get", side_effect=AssertionError("disk read")):
+            second = cache.get("k")
+        assert first == second == {"v": 1}
+
+    def test_returned_values_are_independent_copies(self, cache):
+        """调用方修改返回值不影响后续读取"""
+        cache.set("dict", {"result": {"score": 1}, "items": [1, 2]}, expire=60)
+        miss = cache.get("dict")
+        miss["result"]["score"] = 99
+        hit = cache.get("dict")
+        assert hit == {"result": {"score": 1}, "items": [1, 2]}
+        hit["items"].append(3)
+        assert cache.get("dict")["items"] == [1, 2]
+
+        cache.set("frame", pd.DataFrame({"close": [1.0, 2.0]}), expire=60)
+        cache.get("frame")
+        frame = cache.get("frame")
+        frame["close"] *= 10
+        frame["extra"] = 1
+        assert cache.get("frame").columns.tolist() == ["close"]
+        assert cache.get("frame")["close"].tolist() == [1.0, 2.0]
+
+    def test_set_invalidates_memory(self, cache):
+        cache.set("k", 1)
+        assert cache.get("k") == 1
+        cache.set("k", 2)
+        assert cache.get("k") == 2
+
+    def test_delete_invalidates_memory(self, cache):
+        cache.set("k", 1)
+        cache.get("k")
+        cache.delete("k")
+        assert cache.get("k") is None
+        assert cache.get("k", "default") == "default"
+
+    def test_memory_expiry_aligned_with_disk(self, cache):
+        """内存条目的过期时间取自磁盘条目"""
+        cache.set("k", 1, expire=0.05)
+        assert cache.get("k") == 1
+        time.sleep(0.1)
+        assert cache.get("k") is None
+
+    def test_extra_kwargs_pass_through(self, cache):
+        cache.set("k", 1, expire=60)
+        value, expire_time = cache.get("k", expire_time=True)
+        assert value == 1
+        assert expire_time is not None
@@ -274,3 +274,108 @@ class TestCircuitBreaker:
         for _ in range(2):
             metrics.record_failure("src", "err", 10.0)
         assert metrics.is_circuit_open("src", threshold=0.1, window=10) is False
+
+
+class TestLatencyHistogram:
+    def test_quantiles_expose_timeouts(self, metrics):
+        """少量超时不影响 p50，但体现在 p99（平均值会掩盖）"""
+        for _ in range(90):
+            metrics.record_success("ths", 80.0, operation="history")
+        for _ in range(10):
+            metrics.record_failure("ths", "timeout", 20000.0, operation="history")
+
+        quantiles = metrics.get_latency_quantiles("ths", "history")
+        assert 50 < quantiles["p50"] <= 100
+        assert 50 < quantiles["p90"] <= 100
+        assert 10000 < quantiles["p99"] <= 20000
+
+    def test_per_operation(self, metrics):
+        metrics.record_success("eastmoney", 300.0, operation="list")
+        metrics.record_success("eastmoney", 3000.0, operation="history")
+
+        assert metrics.get_latency_quantiles("eastmoney", "list")["p99"] <= 300
+        assert metrics.get_latency_quantiles("eastmoney", "history")["p50"] > 2500
+        assert metrics.get_latency_quantiles("eastmoney", "shares")["p50"] is None
+        assert metrics.get_latency_quantiles("unknown") == {"p50": None, "p90": None, "p99": None}
+
+        status = metrics.get_source_status("eastmoney")
+        assert set(status["operations"]) == {"history", "list"}
+        assert status["operations"]["list"]["success_count"] == 1
+        assert status["latency_ms"]["p99"] > 2500
+
+    def test_success_only(self, metrics):
+        """对冲与排序只看成功延迟，超时失败不抬高分位"""
+        for _ in range(5):
+            metrics.record_success("ths", 100.0, operation="history")
+        for _ in range(5):
+            metrics.record_failure("ths", "timeout", 30000.0, operation="history")
+
+        assert metrics.get_latency_quantiles("ths", "history")["p90"] > 10000
+        assert metrics.get_latency_quantiles("ths", "history", success_only=True)["p90"] <= 100
+        assert metrics.get_window_outcomes("ths", "history") == (5, 5)
+        assert metrics.get_window_outcomes("ths", "list") == (0, 0)
+        assert metrics.get_window_outcomes("unknown") == (0, 0)
+
+    def test_sliding_window(self):
+        from app.core.metrics import LatencyHistogram, SLICE_SECONDS, WINDOW_SLICES, _quantiles
+
+        histogram = LatencyHistogram()
+        histogram.observe(60000.0, ok=False, now=0.0)
+        histogram.observe(100.0, ok=True, now=SLICE_SECONDS * WINDOW_SLICES)
+
+        # 旧切片移出窗口，累计计数保留
+        assert _quantiles([histogram], now=SLICE_SECONDS * WINDOW_SLICES)["p99"] <= 100
+        assert _quantiles([histogram], now=SLICE_SECONDS)["p99"] > 30000
+        assert histogram.outcomes(now=SLICE_SECONDS * WINDOW_SLICES) == (1, 0)
+        assert histogram.outcomes(now=SLICE_SECONDS) == (1, 1)
+        assert histogram.count == 2
+
+    def test_track_datasource_operation(self, metrics, monkeypatch):
+        import app.core.metrics as metrics_module
+        monkeypatch.setattr(metrics_module, "datasource_metrics", metrics)
+
+        @track_datasource("sina", operation="list")
+        def fetch():
+            return 1
+
+        fetch()
+        assert metrics.get_source_status("sina")["operations"]["list"]["success_count"] == 1
+
+
+class TestPrometheusExposition:
+    def test_render(self, metrics):
+        metrics.record_success("sina", 120.0, operation="list")
+        metrics.record_failure("sina", "timeout", 40000.0, operation="list")
+        metrics.record_success("ths_history", 30.0, operation="history")
+
+        text = metrics.render_prometheus()
+        lines = text.splitlines()
+        assert "# TYPE etftool_datasource_latency_seconds histogram" in lines
+        assert 'etftool_datasource_requests_total{source="sina",operation="list",outcome="failure"} 1' in lines
+        assert 'etftool_datasource_latency_seconds_bucket{source="sina",operation="list",le="0.25"} 1' in lines
+        assert 'etftool_datasource_latency_seconds_bucket{source="sina",operation="list",le="+Inf"} 2' in lines
+        assert 'etftool_datasource_latency_seconds_count{source="sina",operation="list"} 2' in lines
+        assert 'etftool_datasource_latency_seconds_sum{source="sina",operation="list"} 40.12' in lines
+        assert 'etftool_datasource_up{source="sina"} 0' in lines
+        assert 'etftool_datasource_up{source="ths_history"} 1' in lines
+        assert any(line.startswith(
+            'etftool_datasource_latency_window_seconds{source="ths_history",operation="history",quantile="0.5"}'
+        ) for line in lines)
+        assert text.endswith("\n")
+
+    def test_label_escaping(self):
+        from app.core.metrics import _prom_labels
+        assert _prom_labels(source='a"b\\c') == '{source="a\\"b\\\\c"}'
+
+    def test_endpoint(self, metrics, monkeypatch):
+        from fastapi.testclient import TestClient
+        import app.core.metrics as metrics_module
+        from app.main import app
+
+        metrics.record_success("sina", 120.0, operation="list")
+        monkeypatch.setattr(metrics_module, "datasource_metrics", metrics)
+
+        resp = TestClient(app).get("/api/v1/health/datasources/metrics")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'etftool_datasource_up{source="sina"} 1' in resp.text
@@ -0,0 +1,163 @@
+"""
+Tests for QuoteTable (列式行情快照) 与 ETFCacheManager 的快照语义
+"""
+
+import math
+
+from app.core.cache import ETFCacheManager
+from app.core.quote_table import QuoteTable
+
+BROAD = {"label": "宽基", "group": "type"}
+CHIP = {"label": "半导体", "group": "industry"}
+
+
+def _records():
+    return [
+        {"code": "510300", "name": "沪深300ETF", "price": 3.85, "change_pct": 1.2, "volume": 1e8, "tags": [BROAD]},
+        {"code": "512480", "name": "半导体ETF", "price": 1.20, "change_pct": -0.5, "volume": 2e7, "tags": [CHIP]},
+        {"code": "159915", "name": "创业板ETF", "price": float("nan"), "change_pct": 0.8, "tags": [BROAD]},
+    ]
+
+
+class TestQuoteTable:
+    def test_row_roundtrip(self):
+        table = QuoteTable.from_records(_records())
+        row = table.row(table.position("510300"))
+        assert row == {
+            "code": "510300", "name": "沪深300ETF", "price": 3.85,
+            "change_pct": 1.2, "volume": 1e8, "tags": [BROAD],
+        }
+
+    def test_missing_numbers_are_none(self):
+        table = QuoteTable.from_records(_records())
+        row = table.row(table.position("159915"))
+        assert row["price"] is None
+        assert row["volume"] is None
+
+    def test_identical_tag_sets_shared(self):
+        table = QuoteTable.from_records(_records())
+        assert len(table.tag_vocab) == 2
+        assert table.tag_ids[0] is table.tag_ids[2]
+
+    def test_tag_positions(self):
+        table = QuoteTable.from_records(_records())
+        assert table.tag_positions("宽基").tolist() == [0, 2]
+        assert table.tag_positions("不存在").tolist() == []
+
+    def test_tag_bitset_beyond_64_tags(self):
+        records = [
+            {"code": f"{i:06d}", "name": f"ETF{i}", "tags": [{"label": f"t{i}", "group": "industry"}]}
+            for i in range(100)
+        ]
+        table = QuoteTable.from_records(records)
+        assert table.tag_positions("t99").tolist() == [99]
+
+    def test_quotes_gather(self):
+        table = QuoteTable.from_records(_records())
+        quotes = table.quotes(["512480", "999999", "159915", "512480"])
+        assert [q["code"] for q in quotes] == ["512480", "159915", "512480"]
+        assert quotes[0]["price"] == 1.20
+        assert quotes[1]["price"] == 0.0
+        assert quotes[0]["tags"] == [CHIP]
+
+    def test_extra_fields_preserved(self):
+        table = QuoteTable.from_records([{"code": "510300", "name": "沪深300ETF", "source": "client"}])
+        assert table.row(0)["source"] == "client"
+
+
+class TestCacheSnapshot:
+    def test_update_existing_copies_on_write(self):
+        """单只更新构建新表替换，读方持有的旧快照（含额外字段）不变"""
+        cache = ETFCacheManager()
+        cache.set_etf_list(_records())
+        cache.update_etf_info({"code": "510300", "source": "client"})
+        snapshot = cache.snapshot()
+        before = snapshot.rows()
+        cache.update_etf_info({"code": "510300", "price": 3.90, "change_pct": 2.5, "source": "sync"})
+
+        assert snapshot.rows() == before
+        assert cache.snapshot() is not snapshot
+        assert cache.snapshot().index is snapshot.index
+        info = cache.get_etf_info("510300")
+        assert (info["price"], info["change_pct"], info["source"]) == (3.90, 2.5, "sync")
+        assert info["tags"] == [BROAD]
+
+    def test_refresh_keeps_old_snapshot_intact(self):
+        """报价刷新不修改读方持有的旧快照（同一行的价格、涨跌幅、成交量不会新旧混杂）"""
+        cache = ETFCacheManager()
+        cache.set_etf_list(_records())
+        old = cache.snapshot()
+        before = old.rows()
+        refreshed = [dict(r, price=(r["price"] or 0) + 1, change_pct=r["change_pct"] + 1, volume=5e8) for r in _records()]
+        cache.set_etf_list(refreshed)
+
+        assert old.rows() == before
+        new = cache.snapshot()
+        assert new is not old
+        assert new.search_index is old.search_index
+        assert new.tag_bits is old.tag_bits
+        assert new.row(0)["price"] == 4.85
+        assert new.row(0)["change_pct"] == 2.2
+        assert new.row(0)["volume"] == 5e8
+        assert [e["code"] for e in cache.filter_by_tag("宽基")] == ["510300", "159915"]
+
+    def test_insert_copies_on_write(self):
+        cache = ETFCacheManager()
+        cache.set_etf_list(_records())
+        snapshot = cache.snapshot()
+        cache.update_etf_info({"code": "588000", "name": "科创50ETF", "price": 1.0})
+        assert len(snapshot) == 3
+        assert len(cache.snapshot()) == 4
+        assert cache.get_etf_info("588000")["name"] == "科创50ETF"
+
+    def test_tag_change_rebuilds_index(self):
+        cache = ETFCacheManager()
+        cache.set_etf_list(_records())
+        cache.update_etf_info({"code": "510300", "tags": [CHIP]})
+        assert [e["code"] for e in cache.filter_by_tag("半导体")] == ["510300", "512480"]
+        assert [e["code"] for e in cache.filter_by_tag("宽基")] == ["159915"]
+
+    def test_returned_dicts_are_copies(self):
+        cache = ETFCacheManager()
+        cache.set_etf_list(_records())
+        cache.get_etf_info("510300")["price"] = 99.0
+        cache.search("沪深")[0]["tags"].append(CHIP)
+        info = cache.get_etf_info("510300")
+        assert info["price"] == 3.85
+        assert info["tags"] == [BROAD]
+
+    def test_search_code_before_name(self):
+        cache = ETFCacheManager()
+        cache.set_etf_list(_records() + [{"code": "159001", "name": "货币ETF"}])
+        assert [e["code"] for e in cache.search("159")] == ["159915", "159001"]
+        assert [e["code"] for e in cache.search("沪深")] == ["510300"]
+
+    def test_clear(self):
+        cache = ETFCacheManager()
+        cache.set_etf_list(_records())
+        cache.clear()
+        assert not cache.is_initialized
+        assert cache.get_etf_info("510300") is None
+        assert math.isclose(cache.last_updated, 0)
+
+
+class TestTagIndex:
+    def test_select_combinations(self):
+        table = QuoteTable.from_records(_records())
+        assert table.select(all_of=["宽基"]).tolist() == [True, False, True]
+        assert table.select(any_of=["宽基", "半导体"]).all()
+        assert table.select(none_of=["宽基"]).tolist() == [False, True, False]
+        assert table.select(all_of=["宽基", "半导体"]).sum() == 0
+        assert table.select(group="industry").tolist() == [False, True, False]
+
+    def test_order_puts_missing_last(self):
+        table = QuoteTable.from_records(_records())
+        mask = table.select()
+        assert table.order(mask, "price").tolist() == [0, 1, 2]
+        assert table.order(mask, "price", descending=False).tolist() == [1, 0, 2]
+
+    def test_facets(self):
+        table = QuoteTable.from_records(_records())
+        assert table.facets(table.select(any_of=["宽基"])) == [
+            {"label": "宽基", "group": "type", "count": 2},
+        ]
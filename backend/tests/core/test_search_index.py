@@ -0,0 +1,83 @@
+"""
+Tests for SearchIndex (代码前缀 / 名称 n-gram / 拼音首字母搜索)
+"""
+
+import pytest
+
+from app.core.cache import ETFCacheManager
+from app.core.search_index import SearchIndex, pinyin_initials
+
+
+def _index(rows):
+    codes = [code for code, _ in rows]
+    names = [name.lower() for _, name in rows]
+    return SearchIndex(codes, names)
+
+
+ROWS = [
+    ("510300", "沪深300ETF"),
+    ("159919", "沪深300ETF易方达"),
+    ("512800", "银行ETF"),
+    ("512000", "券商ETF"),
+    ("510500", "中证500ETF"),
+    ("159915", "创业板ETF"),
+    ("300001", "测试"),
+]
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("沪深300ETF", "hs300etf"),
+        ("银行ETF", "yhetf"),
+        ("深圳100", "sz100"),
+        ("创业板-ETF", "cybetf"),
+    ],
+)
+def test_pinyin_initials(name, expected):
+    assert pinyin_initials(name.lower()) == expected
+
+
+class TestSearchIndex:
+    def test_code_prefix(self):
+        index = _index(ROWS)
+        assert index.search("512") == [2, 3]
+        assert index.search("5128") == [2]
+
+    def test_exact_code_first(self):
+        index = _index(ROWS)
+        assert index.search("159915")[0] == 5
+
+    def test_code_prefix_before_name(self):
+        """代码前缀命中排在名称包含之前"""
+        index = _index(ROWS)
+        assert index.search("300") == [6, 0, 1]
+
+    def test_name_substring(self):
+        index = _index(ROWS)
+        assert index.search("证500") == [4]
+        assert index.search("易方达") == [1]
+        assert index.search("不存在的") == []
+
+    def test_shorter_name_ranks_first(self):
+        index = _index(ROWS)
+        assert index.search("沪深") == [0, 1]
+
+    def test_pinyin_initials(self):
+        index = _index(ROWS)
+        assert index.search("hs300") == [0, 1]
+        assert index.search("YH") == [2]
+        assert index.search("cyb") == [5]
+
+    def test_limit(self):
+        index = _index(ROWS)
+        assert len(index.search("etf", limit=3)) == 3
+        assert index.search("etf", limit=0) == []
+
+
+def test_cache_search_rebuilt_on_update():
+    cache = ETFCacheManager()
+    cache.set_etf_list([{"code": "510300", "name": "Unknown"}])
+    assert cache.search("hs300") == []
+    cache.update_etf_info({"code": "510300", "name": "沪深300ETF"})
+    assert [e["code"] for e in cache.search("hs300")] == ["510300"]
@@ -0,0 +1,71 @@
+"""
+Tests for SingleFlight request coalescing.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_execute_once(self):
+        """同一 key 的并发调用只执行一次，全部拿到同一结果"""
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def slow():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return object()
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            leader = pool.submit(flight.do, "510300", slow)
+            started.wait()
+            waiters = [pool.submit(flight.do, "510300", slow) for _ in range(4)]
+            results = [leader.result()] + [f.result() for f in waiters]
+
+        assert len(calls) == 1
+        assert all(r is results[0] for r in results)
+        stats = flight.stats()
+        assert stats["executions"] == 1
+        assert stats["coalesced"] == 4
+        assert stats["in_flight"] == 0
+
+    def test_different_keys_run_independently(self):
+        flight = SingleFlight()
+        assert flight.do("a", lambda: 1) == 1
+        assert flight.do("b", lambda: 2) == 2
+        assert flight.stats()["executions"] == 2
+
+    def test_sequential_calls_not_coalesced(self):
+        flight = SingleFlight()
+        flight.do("a", lambda: 1)
+        flight.do("a", lambda: 1)
+        assert flight.stats() == {"executions": 2, "coalesced": 0, "in_flight": 0}
+
+    def test_error_propagates_to_waiters(self):
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def failing():
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError("upstream down")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, "a", failing)
+            started.wait()
+            waiter = pool.submit(flight.do, "a", failing)
+            with pytest.raises(RuntimeError):
+                leader.result()
+            with pytest.raises(RuntimeError):
+                waiter.result()
+
+        # 失败后 key 被释放，后续调用可以重新执行
+        assert flight.do("a", lambda: "ok") == "ok"
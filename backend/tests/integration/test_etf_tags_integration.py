@@ -13,9 +13,7 @@ class TestTagsIntegration:
     def teardown_method(self):
         """每个测试结束后重置全局 cache，避免状态泄漏"""
         from app.core.cache import etf_cache
-        etf_cache.etf_list = []
-        etf_cache.etf_map = {}
-        etf_cache.last_updated = 0
+        etf_cache.clear()
 
     def _setup_cache_with_tags(self):
         """辅助：用带 tags 的数据初始化 cache"""
@@ -6,6 +6,7 @@ import pandas as pd
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from app.services.alert_scheduler import AlertScheduler
+from app.core.config import settings
 
 
 @pytest.mark.anyio
@@ -215,3 +216,208 @@ async def test_fetch_summary_etf_data_individual_exception():
         # 510300 因异常被跳过，159201 正常
         assert "510300" not in result
         assert "159201" in result
+
+
+@pytest.mark.asyncio
+async def test_fetch_summary_etf_data_concurrent_with_timeout(monkeypatch):
+    """快照未命中的 ETF 并发计算（受并发上限约束），单只超时时指标为 None"""
+    import asyncio
+
+    monkeypatch.setattr(settings, "ALERT_FETCH_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "ALERT_FETCH_TIMEOUT", 0.2)
+    codes = ["510300", "510500", "159915", "588000"]
+    state = {"active": 0, "peak": 0}
+
+    async def compute(self, etf_code):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(1.0 if etf_code == "588000" else 0.05)
+        finally:
+            state["active"] -= 1
+        return _make_metrics()
+
+    with patch('app.services.alert_scheduler.ak_service') as mock_ak, \
+         patch('app.services.alert_scheduler.metrics_snapshot_service') as mock_snapshots, \
+         patch.object(AlertScheduler, '_fetch_and_compute_etf_metrics', compute):
+        mock_ak.fetch_all_etfs.return_value = [_make_etf_info(code, 0.1) for code in codes]
+        mock_snapshots.get.return_value = None
+
+        scheduler = AlertScheduler()
+        result = await scheduler._fetch_summary_etf_data(codes)
+
+    assert list(result) == codes
+    assert state["peak"] == 2
+    assert result["510300"]["metrics"] is not None
+    assert result["588000"]["info"]["code"] == "588000"
+    assert result["588000"]["metrics"] is None
+
+
+@pytest.mark.anyio
+async def test_fetch_and_compute_batch_metrics():
+    """批量计算：温度与日趋势一次面板计算，无数据的 ETF 跳过"""
+    test_df = pd.DataFrame({
+        'date': pd.date_range(start='2023-01-01', periods=100).strftime('%Y-%m-%d'),
+        'close': [3.0 + i * 0.01 for i in range(100)],
+        'open': [3.0 + i * 0.01 for i in range(100)],
+    })
+    histories = {"510300": test_df, "510500": pd.DataFrame()}
+
+    with patch('app.services.alert_scheduler.ak_service') as mock_ak_service, \
+         patch('app.services.alert_scheduler.trend_service') as mock_trend_service:
+        mock_ak_service.fetch_history_raw.side_effect = lambda code, *args: histories[code]
+        mock_trend_service.get_weekly_trend.return_value = "震荡"
+
+        scheduler = AlertScheduler()
+        result = await scheduler._fetch_and_compute_batch_metrics(["510300", "510500"])
+
+    assert list(result) == ["510300"]
+    assert result["510300"]["temperature"]["score"] is not None
+    assert result["510300"]["daily_trend"]["ma_alignment"] == "bullish"
+    assert result["510300"]["weekly_trend"] == "震荡"
+
+
+def _rising_history(periods: int = 100) -> pd.DataFrame:
+    return pd.DataFrame({
+        'date': pd.date_range(start='2023-01-01', periods=periods).strftime('%Y-%m-%d'),
+        'close': [3.0 + i * 0.01 for i in range(periods)],
+        'open': [3.0 + i * 0.01 for i in range(periods)],
+        'high': [3.05 + i * 0.01 for i in range(periods)],
+        'low': [2.95 + i * 0.01 for i in range(periods)],
+        'volume': [1000000 for _ in range(periods)],
+    })
+
+
+@pytest.mark.anyio
+async def test_fetch_histories_bounded_concurrency():
+    """并发拉取数不超过 ALERT_FETCH_CONCURRENCY，结果保持输入顺序"""
+    import threading
+    import time
+
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def slow_fetch(code, *args):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.05)
+        with lock:
+            state["running"] -= 1
+        return _rising_history(20)
+
+    codes = [f"5103{i:02d}" for i in range(10)]
+    with patch('app.services.alert_scheduler.ak_service') as mock_ak_service, \
+         patch.object(settings, "ALERT_FETCH_CONCURRENCY", 3):
+        mock_ak_service.fetch_history_raw.side_effect = slow_fetch
+        scheduler = AlertScheduler()
+        frames = await scheduler._fetch_histories(codes)
+
+    assert list(frames) == codes
+    assert 1 < state["peak"] <= 3
+    assert scheduler.last_batch_stats["fetched"] == 10
+
+
+@pytest.mark.anyio
+async def test_fetch_histories_timeout_skips_etf():
+    """单只 ETF 超时被跳过并计入统计，不影响其他 ETF"""
+    import time
+
+    def fetch(code, *args):
+        if code == "510500":
+            time.sleep(0.5)
+        return _rising_history(20)
+
+    with patch('app.services.alert_scheduler.ak_service') as mock_ak_service, \
+         patch.object(settings, "ALERT_FETCH_TIMEOUT", 0.1):
+        mock_ak_service.fetch_history_raw.side_effect = fetch
+        scheduler = AlertScheduler()
+        result = await scheduler._fetch_and_compute_batch_metrics(["510300", "510500"])
+
+    assert list(result) == ["510300"]
+    stats = scheduler.last_batch_stats
+    assert stats["total"] == 2
+    assert stats["timed_out"] == 1
+    assert stats["computed"] == 1
+    assert stats["fetch_seconds"] >= 0.1
+
+
+@pytest.mark.anyio
+async def test_compute_metrics_in_pool_chunks():
+    """配置计算进程数时按分片提交到池中，合并结果与单次计算一致"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    frames = {f"5103{i:02d}": _rising_history(80 + i) for i in range(5)}
+    scheduler = AlertScheduler()
+    expected = await scheduler._compute_metrics(frames)
+
+    with patch.object(settings, "ALERT_COMPUTE_PROCESSES", 2):
+        # 用线程池代替进程池，run_in_executor 接口相同
+        scheduler._process_pool = ThreadPoolExecutor(max_workers=2)
+        try:
+            result = await scheduler._compute_metrics(frames)
+        finally:
+            scheduler._process_pool.shutdown()
+
+    assert result == expected
+
+
+# ---- 收盘指标快照复用 ----
+
+@pytest.mark.anyio
+async def test_get_metrics_reuses_snapshot_after_close():
+    """收盘后只计算快照中缺失的 ETF，并写入快照"""
+    computed = {
+        "510300": {**_make_metrics(), "data_date": "2024-06-07"},
+        "510500": {**_make_metrics(), "data_date": "2024-06-07"},
+    }
+
+    async def fake_batch(codes):
+        return {code: computed[code] for code in codes}
+
+    scheduler = AlertScheduler()
+    with patch('app.services.alert_scheduler.metrics_snapshot_service.current_trading_date',
+               return_value="2024-06-07"), \
+         patch.object(scheduler, '_fetch_and_compute_batch_metrics', side_effect=fake_batch) as mock_batch:
+        first = await scheduler._get_metrics(["510300"])
+        second = await scheduler._get_metrics(["510300", "510500"])
+
+    assert first == {"510300": computed["510300"]}
+    assert second == computed
+    assert mock_batch.call_args_list[0].args == (["510300"],)
+    assert mock_batch.call_args_list[1].args == (["510500"],)
+
+
+@pytest.mark.anyio
+async def test_get_metrics_intraday_always_computes():
+    """交易时段内不读写快照"""
+    async def fake_batch(codes):
+        return {code: _make_metrics() for code in codes}
+
+    scheduler = AlertScheduler()
+    with patch('app.services.alert_scheduler.metrics_snapshot_service.current_trading_date',
+               return_value=None), \
+         patch.object(scheduler, '_fetch_and_compute_batch_metrics', side_effect=fake_batch) as mock_batch:
+        await scheduler._get_metrics(["510300"])
+        await scheduler._get_metrics(["510300"])
+
+    assert mock_batch.call_count == 2
+
+
+@pytest.mark.anyio
+async def test_fetch_summary_etf_data_uses_snapshot():
+    """摘要复用告警检查写入的快照，不再重新计算"""
+    from app.services.metrics_snapshot_service import metrics_snapshot_service
+
+    metrics_snapshot_service.put("510300", _make_metrics(), "2024-06-07")
+    with patch('app.services.alert_scheduler.ak_service') as mock_ak, \
+         patch('app.services.alert_scheduler.metrics_snapshot_service.current_trading_date',
+               return_value="2024-06-07"), \
+         patch.object(AlertScheduler, '_fetch_and_compute_etf_metrics', new_callable=AsyncMock) as mock_metrics:
+        mock_ak.fetch_all_etfs.return_value = [_make_etf_info("510300", -0.5)]
+        mock_metrics.return_value = _make_metrics()
+
+        result = await AlertScheduler()._fetch_summary_etf_data(["510300"])
+
+    assert result["510300"]["metrics"] == _make_metrics()
+    mock_metrics.assert_not_called()
@@ -257,7 +257,7 @@ async def test_daily_summary_retry_logic(
          patch('app.services.alert_scheduler.TelegramNotificationService.send_message') as mock_send, \
          patch('app.services.alert_scheduler.Session') as mock_session_cls, \
          patch('app.services.alert_scheduler.alert_state_service') as mock_state_service, \
-         patch('app.services.alert_scheduler.asyncio.sleep') as mock_sleep:
+         patch('app.services.notification_dispatcher.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
 
         mock_session_cls.return_value.__enter__.return_value = test_session
 
@@ -298,8 +298,8 @@ async def test_daily_summary_retry_logic(
         # 验证：应该调用了两次 Telegram 发送（第一次失败，重试成功）
         assert mock_send.call_count == 2, "应该重试一次"
 
-        # 验证：应该等待 30 秒后重试
-        mock_sleep.assert_called_once_with(30)
+        # 验证：按退避基数等待后重试（由 notification_dispatcher 执行，不阻塞其他用户）
+        mock_sleep.assert_any_await(settings.TELEGRAM_RETRY_BACKOFF)
 
         # 验证：重试成功后标记摘要已发送
         mock_state_service.mark_summary_sent.assert_called_once_with(test_user_with_watchlist.id)
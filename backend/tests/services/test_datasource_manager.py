@@ -1,5 +1,7 @@
 # backend/tests/services/test_datasource_manager.py
 """DataSourceManager 单元测试"""
+import threading
+import time
 from typing import Optional
 from unittest.mock import patch, MagicMock
 
@@ -7,7 +9,7 @@ import pandas as pd
 import pytest
 
 from app.core.metrics import DataSourceMetrics
-from app.services.datasource_manager import DataSourceManager
+from app.services.datasource_manager import HISTORY_OPERATION, DataSourceManager
 
 
 class _MockSource:
@@ -105,3 +107,187 @@ class TestDataSourceManagerCircuitBreaker:
         assert df is not None
         assert src1.call_count == 0  # 被跳过
         assert src2.call_count == 1
+
+
+class _SlowSource(_MockSource):
+    """先等待再返回的 mock 数据源"""
+    def __init__(self, name: str, delay: float, **kwargs):
+        super().__init__(name, **kwargs)
+        self._delay = delay
+
+    def fetch_history(self, code, start_date, end_date, adjust="qfq"):
+        time.sleep(self._delay)
+        return super().fetch_history(code, start_date, end_date, adjust)
+
+
+def _hedged(sources, metrics=None, **kwargs):
+    kwargs.setdefault("hedge_min_delay", 0.05)
+    kwargs.setdefault("hedge_default_delay", 0.05)
+    return DataSourceManager(
+        sources=sources, metrics=metrics or DataSourceMetrics(), hedge=True, **kwargs
+    )
+
+
+def _hedge_counts(mgr):
+    stats = mgr.stats()
+    return {"hedged": stats["hedged"], "hedge_wins": stats["hedge_wins"]}
+
+
+class TestDataSourceManagerHedging:
+    def test_fast_primary_not_hedged(self):
+        """主源在对冲等待内返回，不请求第二个源"""
+        src1 = _MockSource("src1", data=_SAMPLE_DF)
+        src2 = _MockSource("src2", data=_SAMPLE_DF)
+        mgr = _hedged([src1, src2])
+
+        assert mgr.fetch_history("510300", "2024-01-01", "2024-12-31") is not None
+        assert src1.call_count == 1
+        assert src2.call_count == 0
+        assert _hedge_counts(mgr) == {"hedged": 0, "hedge_wins": 0}
+
+    def test_slow_primary_hedged(self):
+        """主源超过对冲等待，并行请求第二个源并取先返回的结果"""
+        fast_df = _SAMPLE_DF.iloc[:1]
+        src1 = _SlowSource("src1", delay=0.5, data=_SAMPLE_DF)
+        src2 = _MockSource("src2", data=fast_df)
+        mgr = _hedged([src1, src2])
+
+        start = time.monotonic()
+        df = mgr.fetch_history("510300", "2024-01-01", "2024-12-31")
+        assert time.monotonic() - start < 0.4
+        assert len(df) == 1
+        assert src2.call_count == 1
+        assert _hedge_counts(mgr) == {"hedged": 1, "hedge_wins": 1}
+
+    def test_failure_falls_over_immediately(self):
+        """主源失败时不等对冲时机，立即请求下一个源"""
+        src1 = _MockSource("src1", fail=True)
+        src2 = _MockSource("src2", data=_SAMPLE_DF)
+        mgr = _hedged([src1, src2], hedge_default_delay=5.0)
+
+        start = time.monotonic()
+        assert mgr.fetch_history("510300", "2024-01-01", "2024-12-31") is not None
+        assert time.monotonic() - start < 1.0
+
+    def test_primary_wins_when_hedge_fails(self):
+        """对冲的源失败，继续等待主源"""
+        src1 = _SlowSource("src1", delay=0.2, data=_SAMPLE_DF)
+        src2 = _MockSource("src2", fail=True)
+        mgr = _hedged([src1, src2])
+
+        assert len(mgr.fetch_history("510300", "2024-01-01", "2024-12-31")) == 2
+        assert _hedge_counts(mgr) == {"hedged": 1, "hedge_wins": 0}
+
+    def test_all_fail_returns_none(self):
+        src1 = _MockSource("src1", fail=True)
+        src2 = _SlowSource("src2", delay=0.1, data=None)
+        mgr = _hedged([src1, src2])
+
+        assert mgr.fetch_history("510300", "2024-01-01", "2024-12-31") is None
+
+    def test_hedge_delay_uses_p90(self):
+        metrics = DataSourceMetrics()
+        for latency in range(100, 1100, 100):
+            metrics.record_success("src1", float(latency), HISTORY_OPERATION)
+        mgr = _hedged([], metrics=metrics, hedge_default_delay=3.0)
+
+        assert mgr.hedge_delay("src1") == pytest.approx(0.9)
+        assert mgr.hedge_delay("unknown") == 3.0
+
+    def test_hedge_delay_ignores_other_operations_and_failures(self):
+        """同名的列表接口延迟与超时失败不影响历史数据的对冲等待"""
+        metrics = DataSourceMetrics()
+        for _ in range(10):
+            metrics.record_success("eastmoney", 400.0, HISTORY_OPERATION)
+            metrics.record_success("eastmoney", 60000.0, "list")
+            metrics.record_failure("eastmoney", "timeout", 30000.0, HISTORY_OPERATION)
+        mgr = _hedged([], metrics=metrics, hedge_default_delay=3.0)
+
+        assert mgr.hedge_delay("eastmoney") <= 0.5
+
+    def test_loser_still_recorded(self):
+        """落选的请求完成后仍计入指标"""
+        metrics = DataSourceMetrics()
+        src1 = _SlowSource("src1", delay=0.2, data=_SAMPLE_DF)
+        src2 = _MockSource("src2", data=_SAMPLE_DF)
+        mgr = _hedged([src1, src2], metrics=metrics)
+
+        mgr.fetch_history("510300", "2024-01-01", "2024-12-31")
+        time.sleep(0.3)
+        assert metrics.get_source_status("src1")["success_count"] == 1
+
+
+class TestDataSourceManagerHedgeSaturation:
+    def test_no_hedge_when_pool_full(self):
+        """在途请求占满线程池时不发起对冲，等待已发起的请求"""
+        src1 = _SlowSource("src1", delay=0.2, data=_SAMPLE_DF)
+        src2 = _MockSource("src2", data=_SAMPLE_DF.iloc[:1])
+        mgr = _hedged([src1, src2], hedge_workers=1)
+
+        assert len(mgr.fetch_history("510300", "2024-01-01", "2024-12-31")) == 2
+        assert src2.call_count == 0
+        stats = mgr.stats()
+        assert stats["hedged"] == 0
+        assert stats["saturated"] == 1
+
+    def test_saturated_pool_fetches_inline(self):
+        """线程池饱和时新请求不排队，在调用线程中依次尝试"""
+        threads = []
+
+        class _RecordingSource(_MockSource):
+            def fetch_history(self, *args, **kwargs):
+                threads.append(threading.current_thread().name)
+                return super().fetch_history(*args, **kwargs)
+
+        src1 = _RecordingSource("src1", fail=True)
+        src2 = _RecordingSource("src2", data=_SAMPLE_DF)
+        mgr = _hedged([src1, src2])
+
+        with patch.object(mgr, "_saturated", return_value=True):
+            assert mgr.fetch_history("510300", "2024-01-01", "2024-12-31") is not None
+        assert threads == [threading.current_thread().name] * 2
+        assert mgr.stats()["saturated"] == 1
+
+    def test_remaining_sources_inline_after_failure_when_full(self):
+        """唯一线程被落选请求占用时，后续失败转移在调用线程中完成"""
+        src1 = _MockSource("src1", fail=True)
+        src2 = _MockSource("src2", data=_SAMPLE_DF)
+        mgr = _hedged([src1, src2], hedge_workers=1)
+        blocker = mgr._submit(mgr._get_pool(), _SlowSource("slow", delay=0.3, data=None),
+                              "510300", "2024-01-01", "2024-12-31", "qfq")
+
+        # 线程池已满：直接走调用线程
+        start = time.monotonic()
+        assert mgr.fetch_history("510300", "2024-01-01", "2024-12-31") is not None
+        assert time.monotonic() - start < 0.25
+        assert src1.call_count == 1 and src2.call_count == 1
+        blocker.result()
+
+    def test_in_flight_released(self):
+        """请求结束后在途计数归零（含落选请求）"""
+        src1 = _SlowSource("src1", delay=0.2, data=_SAMPLE_DF)
+        src2 = _MockSource("src2", data=_SAMPLE_DF)
+        mgr = _hedged([src1, src2])
+
+        mgr.fetch_history("510300", "2024-01-01", "2024-12-31")
+        time.sleep(0.3)
+        assert mgr.stats()["in_flight"] == 0
+
+
+class TestDataSourceManagerShutdown:
+    def test_api_executor_shutdown_closes_hedge_pool(self):
+        """api_executor.shutdown() 一并关闭对冲线程池，之后按需重建"""
+        from app.core.executors import api_executor
+
+        mgr = _hedged([_MockSource("src1", data=_SAMPLE_DF)])
+        assert mgr.fetch_history("510300", "2024-01-01", "2024-12-31") is not None
+        pool = mgr._pool
+        assert pool is not None
+
+        api_executor.shutdown()
+        assert mgr._pool is None
+        assert pool._shutdown
+
+        assert mgr.fetch_history("510300", "2024-01-01", "2024-12-31") is not None
+        assert mgr._pool is not None and mgr._pool is not pool
+        mgr.shutdown()
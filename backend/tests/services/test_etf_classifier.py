@@ -17,7 +17,7 @@ import time
 
 import pytest
 
-from app.services.etf_classifier import ETFClassifier, ETFTag
+from app.services.etf_classifier import ETFClassifier, ETFTag, _KeywordAutomaton
 
 
 @pytest.fixture
@@ -503,6 +503,64 @@ class TestEdgeCases:
         assert len(labels) == len(set(labels))
 
 
+class TestKeywordAutomaton:
+    """Aho-Corasick 关键词匹配"""
+
+    def test_overlapping_keywords(self):
+        automaton = _KeywordAutomaton(["新能源车", "新能源", "能源", "车"])
+        assert automaton.find_all("中证新能源车ETF") == {"新能源车", "新能源", "能源", "车"}
+
+    def test_matches_substring_semantics(self):
+        keywords = ["he", "she", "his", "hers", "A50", "A500"]
+        automaton = _KeywordAutomaton(keywords)
+        for text in ["ushers", "ahishers", "富时A500", "A5A50", ""]:
+            assert automaton.find_all(text) == {k for k in keywords if k in text}
+
+
+class TestMemoizeAndBatch:
+    """缓存与批量分类"""
+
+    def test_cached_result_is_copy(self, classifier: ETFClassifier):
+        first = classifier.classify("半导体ETF", "512480")
+        first.clear()
+        assert [t.label for t in classifier.classify("半导体ETF", "512480")] == ["半导体"]
+
+    def test_cache_hit_skips_classification(self, classifier: ETFClassifier, monkeypatch):
+        classifier.classify("沪深300ETF", "510300")
+        monkeypatch.setattr(classifier, "_classify", lambda *a: pytest.fail("cache miss"))
+        assert classifier.classify("沪深300ETF", "510300")[0].label == "宽基"
+
+    def test_cache_keyed_by_code(self, classifier: ETFClassifier):
+        """REITs 依赖代码前缀，同名不同代码分别缓存"""
+        assert classifier.classify("测试基金", "508001")[0].label == "REITs"
+        assert classifier.classify("测试基金", "510001") == []
+
+    def test_cache_bounded(self):
+        classifier = ETFClassifier(cache_size=2)
+        for name in ["半导体ETF", "银行ETF", "券商ETF"]:
+            classifier.classify(name)
+        assert len(classifier._cache) == 2
+
+    def test_classify_batch(self, classifier: ETFClassifier):
+        results = classifier.classify_batch(["沪深300ETF", "", "508001"], ["510300", "000000", "508001"])
+        assert [t.label for t in results[0]] == ["宽基", "沪深300"]
+        assert results[1] == []
+        assert results[2][0].label == "REITs"
+
+    def test_classify_batch_isolates_failures(self, classifier: ETFClassifier, monkeypatch):
+        original = classifier._classify
+
+        def flaky(name, code):
+            if code == "bad":
+                raise RuntimeError("boom")
+            return original(name, code)
+
+        monkeypatch.setattr(classifier, "_classify", flaky)
+        results = classifier.classify_batch(["银行ETF", "银行ETF"], ["bad", "512800"])
+        assert results[0] == []
+        assert [t.label for t in results[1]] == ["银行"]
+
+
 class TestPerformance:
     """性能测试"""
 
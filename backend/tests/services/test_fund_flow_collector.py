@@ -362,7 +362,7 @@ def test_fetch_sse_shares_success(sample_sse_api_response):
     collector = FundFlowCollector()
     whitelist = {"510300", "510500", "159915", "511260"}
 
-    with patch("app.services.fund_flow_collector.requests.get",
+    with patch("app.services.fund_flow_collector.http_client.get",
                return_value=_mock_sse_response(sample_sse_api_response)):
         result = collector._fetch_sse_shares(whitelist)
 
@@ -379,7 +379,7 @@ def test_fetch_sse_shares_unit_conversion(sample_sse_api_response):
     collector = FundFlowCollector()
     whitelist = {"510300", "510500", "159915", "511260"}
 
-    with patch("app.services.fund_flow_collector.requests.get",
+    with patch("app.services.fund_flow_collector.http_client.get",
                return_value=_mock_sse_response(sample_sse_api_response)):
         result = collector._fetch_sse_shares(whitelist)
 
@@ -392,7 +392,7 @@ def test_fetch_sse_shares_uses_stat_date(sample_sse_api_response):
     collector = FundFlowCollector()
     whitelist = {"510300"}
 
-    with patch("app.services.fund_flow_collector.requests.get",
+    with patch("app.services.fund_flow_collector.http_client.get",
                return_value=_mock_sse_response(sample_sse_api_response)):
         result = collector._fetch_sse_shares(whitelist)
 
@@ -404,7 +404,7 @@ def test_fetch_sse_shares_whitelist_filter(sample_sse_api_response):
     collector = FundFlowCollector()
     whitelist = {"510300", "510500"}  # 只保留 2 个
 
-    with patch("app.services.fund_flow_collector.requests.get",
+    with patch("app.services.fund_flow_collector.http_client.get",
                return_value=_mock_sse_response(sample_sse_api_response)):
         result = collector._fetch_sse_shares(whitelist)
 
@@ -427,7 +427,7 @@ def test_fetch_sse_shares_date_fallback():
     }
 
     # 第一次调用（今天）返回空，第二次（昨天）返回数据
-    with patch("app.services.fund_flow_collector.requests.get",
+    with patch("app.services.fund_flow_collector.http_client.get",
                side_effect=[
                    _mock_sse_response(empty_response),
                    _mock_sse_response(data_response),
@@ -444,7 +444,7 @@ def test_fetch_sse_shares_retry_on_failure():
     collector = FundFlowCollector()
     whitelist = {"510300"}
 
-    with patch("app.services.fund_flow_collector.requests.get",
+    with patch("app.services.fund_flow_collector.http_client.get",
                side_effect=Exception("Connection error")) as mock_get, \
          patch("app.services.fund_flow_collector.time.sleep"):
         result = collector._fetch_sse_shares(whitelist)
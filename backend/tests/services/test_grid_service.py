@@ -137,8 +137,11 @@ def test_calculate_grid_params_cached_force_refresh():
     
     from unittest.mock import patch, MagicMock
     mock_fetch = MagicMock(return_value=df)
+    mock_refresh = MagicMock(return_value=True)
     
-    with patch('app.services.grid_service.ak_service.fetch_history_raw', mock_fetch):
+    with patch('app.services.grid_service.ak_service.fetch_history_raw', mock_fetch), \
+            patch('app.services.grid_service.ak_service.refresh_history', mock_refresh), \
+            patch('app.services.grid_service.ak_service.get_history_fetched_at', return_value=None):
         code = "510300"
         disk_cache.delete(f"grid_params_{code}")
         
@@ -153,3 +156,79 @@ def test_calculate_grid_params_cached_force_refresh():
         # 强制刷新
         result3 = calculate_grid_params_cached(code, force_refresh=True)
         assert mock_fetch.call_count == 2  # 应该有新的调用
+        mock_refresh.assert_called_once_with(code, period="daily", adjust="qfq")
+
+
+def test_calculate_grid_params_cached_stale_while_revalidate():
+    """逻辑过期的网格参数先返回旧结果，并在后台刷新历史数据后重新计算"""
+    from app.services import grid_service
+    from app.services.grid_service import calculate_grid_params_cached, GRID_CACHE_TTL
+
+    data = {
+        'date': pd.date_range(start='2023-01-01', periods=100),
+        'close': [3.0 + (i % 10) * 0.05 for i in range(100)],
+        'high': [3.0 + (i % 10) * 0.05 + 0.02 for i in range(100)],
+        'low': [3.0 + (i % 10) * 0.05 - 0.02 for i in range(100)],
+    }
+    df = pd.DataFrame(data)
+
+    from unittest.mock import patch, MagicMock
+    calls = []
+    mock_refresh = MagicMock(side_effect=lambda *a, **k: calls.append("refresh") or True)
+    mock_fetch = MagicMock(side_effect=lambda *a, **k: calls.append("fetch") or df)
+    code = "510300"
+    stale_at = time.time() - GRID_CACHE_TTL - 10
+    disk_cache.set(f"grid_params_{code}", {"result": {"upper": 1.0}, "computed_at": stale_at})
+
+    with patch('app.services.grid_service.ak_service.fetch_history_raw', mock_fetch), \
+            patch('app.services.grid_service.ak_service.refresh_history', mock_refresh), \
+            patch('app.services.grid_service.ak_service.get_history_fetched_at', return_value=None), \
+            patch.object(grid_service.settings, "HISTORY_STALE_WHILE_REVALIDATE", True):
+        result = calculate_grid_params_cached(code)
+        assert result == {"upper": 1.0, "computed_at": stale_at}
+
+        for _ in range(100):
+            if mock_fetch.call_count and not grid_service._revalidating:
+                break
+            time.sleep(0.02)
+
+        assert calls == ["refresh", "fetch"]
+        refreshed = calculate_grid_params_cached(code)
+    assert refreshed["computed_at"] > stale_at
+    assert "upper" in refreshed and "grid_count" in refreshed
+    disk_cache.delete(f"grid_params_{code}")
+
+
+def test_grid_params_revalidated_after_history_refresh():
+    """历史数据在网格计算之后被刷新时，即使未超过 GRID_CACHE_TTL 也重新计算"""
+    from app.services import grid_service
+    from app.services.grid_service import calculate_grid_params_cached
+
+    df = pd.DataFrame({
+        'date': pd.date_range(start='2023-01-01', periods=100),
+        'close': [3.0 + (i % 10) * 0.05 for i in range(100)],
+        'high': [3.0 + (i % 10) * 0.05 + 0.02 for i in range(100)],
+        'low': [3.0 + (i % 10) * 0.05 - 0.02 for i in range(100)],
+    })
+
+    from unittest.mock import patch, MagicMock
+    mock_fetch = MagicMock(return_value=df)
+    fetched_at = MagicMock(return_value=1000.0)
+    code = "510300"
+    disk_cache.delete(f"grid_params_{code}")
+
+    with patch('app.services.grid_service.ak_service.fetch_history_raw', mock_fetch), \
+            patch('app.services.grid_service.ak_service.refresh_history', return_value=True), \
+            patch('app.services.grid_service.ak_service.get_history_fetched_at', fetched_at), \
+            patch.object(grid_service.settings, "HISTORY_STALE_WHILE_REVALIDATE", False):
+        calculate_grid_params_cached(code)
+        calculate_grid_params_cached(code)
+        assert mock_fetch.call_count == 1
+
+        # 后台刷新了历史数据
+        fetched_at.return_value = 2000.0
+        calculate_grid_params_cached(code)
+        assert mock_fetch.call_count == 2
+        calculate_grid_params_cached(code)
+        assert mock_fetch.call_count == 2
+    disk_cache.delete(f"grid_params_{code}")
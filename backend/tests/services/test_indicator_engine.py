@@ -0,0 +1,188 @@
+"""
+Tests for indicator_engine - 共享指标计算与各服务原有逐项计算的一致性
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.indicator_engine import IndicatorState, compute_indicators, pending_closes
+from app.services.temperature_service import TemperatureService
+from app.services.trend_service import TrendService
+
+
+class TestIndicatorSeries:
+    def test_moving_averages_match_pandas(self, sample_long_history):
+        ind = compute_indicators(sample_long_history)
+        for period in (5, 10, 20, 60):
+            expected = sample_long_history["close"].rolling(window=period).mean().to_numpy()
+            np.testing.assert_array_equal(ind.ma_series(period), expected)
+
+    def test_atr_matches_endpoint_formula(self, sample_daily_data):
+        df = sample_daily_data
+        prev_close = df["close"].shift(1)
+        tr = pd.concat(
+            [df["high"] - df["low"], (df["high"] - prev_close).abs(), (df["low"] - prev_close).abs()],
+            axis=1,
+        ).max(axis=1)
+        expected = tr.rolling(window=14).mean()
+
+        ind = compute_indicators(df, atr_period=14)
+        np.testing.assert_array_equal(ind.tr, tr.to_numpy())
+        assert ind.last_atr() == float(expected.iloc[-1])
+
+    def test_rolling_vol_aligned_to_rows(self, sample_daily_data):
+        close = sample_daily_data["close"]
+        expected = close.pct_change().dropna().rolling(window=20).std().to_numpy()
+
+        ind = compute_indicators(sample_daily_data)
+        assert len(ind.rolling_vol) == len(close)
+        assert np.isnan(ind.rolling_vol[0])
+        np.testing.assert_array_equal(ind.rolling_vol[1:], expected)
+
+    def test_cummax_and_drawdown(self):
+        df = pd.DataFrame({"close": [1.0, 2.0, 1.5, 3.0, 2.4]})
+        ind = compute_indicators(df)
+        np.testing.assert_array_equal(ind.cummax, [1.0, 2.0, 2.0, 3.0, 3.0])
+        assert ind.drawdown[-1] == pytest.approx(-0.2)
+
+    def test_missing_high_low(self):
+        ind = compute_indicators(pd.DataFrame({"close": [1.0, 2.0, 3.0]}))
+        assert ind.tr is None
+        assert ind.last_atr() is None
+
+    def test_insufficient_data(self):
+        ind = compute_indicators(pd.DataFrame({"close": [1.0, 2.0]}))
+        assert ind.last_ma(5) is None
+        assert ind.rsi is None
+
+    def test_series_computed_once(self, sample_daily_data):
+        ind = compute_indicators(sample_daily_data)
+        assert ind.ma_series(20) is ind.ma_series(20)
+        assert ind.rolling_vol is ind.rolling_vol
+
+
+class TestServicesWithIndicators:
+    def test_temperature_identical(self, sample_long_history):
+        service = TemperatureService()
+        expected = service.calculate_temperature(sample_long_history)
+        result = service.calculate_temperature(
+            sample_long_history, indicators=compute_indicators(sample_long_history)
+        )
+        assert result == expected
+
+    def test_temperature_rsi_matches_service(self, sample_long_history):
+        ind = compute_indicators(sample_long_history)
+        assert ind.rsi == pytest.approx(TemperatureService().calculate_rsi(sample_long_history), abs=1e-9)
+
+    def test_temperature_with_nan_falls_back(self, sample_long_history):
+        df = sample_long_history.copy()
+        df.loc[df.index[100], "close"] = np.nan
+        service = TemperatureService()
+        assert service.calculate_temperature(df, indicators=compute_indicators(df)) == \
+            service.calculate_temperature(df)
+
+    def test_daily_trend_identical(self, bullish_trend_data, bearish_trend_data, sample_daily_data):
+        service = TrendService()
+        for df in (bullish_trend_data, bearish_trend_data, sample_daily_data):
+            expected = service.get_daily_trend(df)
+            assert service.get_daily_trend(df, indicators=compute_indicators(df)) == expected
+
+
+def _reference_wilder_rsi(close: pd.Series, period: int) -> float:
+    """逐行递归的 Wilder RSI（原实现），作为向量化版本的对照"""
+    delta = close.diff()
+    gains = delta.where(delta > 0, 0.0).fillna(0.0)
+    losses = (-delta).where(delta < 0, 0.0).fillna(0.0)
+    avg_gain = gains.iloc[1:period + 1].mean()
+    avg_loss = losses.iloc[1:period + 1].mean()
+    for i in range(period + 1, len(close)):
+        avg_gain = (avg_gain * (period - 1) + gains.iloc[i]) / period
+        avg_loss = (avg_loss * (period - 1) + losses.iloc[i]) / period
+    if avg_loss == 0:
+        return 100.0 if avg_gain > 0 else 50.0
+    if avg_gain == 0:
+        return 0.0
+    return float(100 - 100 / (1 + avg_gain / avg_loss))
+
+
+class TestVectorizedRsi:
+    @pytest.mark.parametrize("period", [6, 14, 24])
+    def test_matches_loop_recurrence(self, sample_long_history, period):
+        close = sample_long_history["close"]
+        rsi = TemperatureService().calculate_rsi(sample_long_history, period=period)
+        assert rsi == pytest.approx(_reference_wilder_rsi(close, period), abs=1e-9)
+
+    def test_series_matches_prefix_values(self, sample_daily_data):
+        """整条序列的每个值等于截至该行的单值 RSI"""
+        service = TemperatureService()
+        series = service.calculate_rsi(sample_daily_data, period=14, return_series=True)
+        assert isinstance(series, pd.Series)
+        assert len(series) == len(sample_daily_data)
+        assert series.iloc[:14].isna().all()
+        for end in (15, 16, 40, len(sample_daily_data)):
+            expected = _reference_wilder_rsi(sample_daily_data["close"].iloc[:end], 14)
+            assert series.iloc[end - 1] == pytest.approx(expected, abs=1e-9)
+
+    def test_flat_and_monotonic_edges(self):
+        service = TemperatureService()
+        flat = pd.DataFrame({"close": [1.0] * 30})
+        rising = pd.DataFrame({"close": [1.0 + i * 0.01 for i in range(30)]})
+        falling = pd.DataFrame({"close": [2.0 - i * 0.01 for i in range(30)]})
+        assert service.calculate_rsi(flat) == 50.0
+        assert service.calculate_rsi(rising) == 100.0
+        assert service.calculate_rsi(falling) == 0.0
+
+
+class TestIndicatorState:
+    def test_advance_matches_rebuild(self, sample_daily_data):
+        """逐根推进的状态与直接由更长历史构建的状态一致"""
+        ind = compute_indicators(sample_daily_data)
+        dates = sample_daily_data["date"].astype(str).tolist()
+        state = IndicatorState.from_indicators(
+            ind, dates[79], end=80, tail_size=60, percentile_window=50
+        )
+        for i in range(80, 100):
+            state = state.advance(float(ind.close[i]), dates[i])
+
+        expected = IndicatorState.from_indicators(
+            ind, dates[99], end=100, tail_size=60, percentile_window=50
+        )
+        assert state.last_date == expected.last_date
+        assert state.count == expected.count
+        assert state.peak == expected.peak
+        np.testing.assert_array_equal(state.closes, expected.closes)
+        np.testing.assert_allclose(state.returns, expected.returns, rtol=1e-12)
+        np.testing.assert_array_equal(state.price_rank.values, expected.price_rank.values)
+        np.testing.assert_allclose(state.vol_rank.values, expected.vol_rank.values, rtol=1e-9)
+        assert state.avg_gain == pytest.approx(expected.avg_gain, rel=1e-9)
+        assert state.avg_loss == pytest.approx(expected.avg_loss, rel=1e-9)
+
+    def test_advance_keeps_original(self, sample_daily_data):
+        ind = compute_indicators(sample_daily_data)
+        state = IndicatorState.from_indicators(ind, "d", end=50, tail_size=60, percentile_window=2520)
+        state.advance(99.0, "next")
+        assert state.count == 50
+        assert state.last_close == float(ind.close[49])
+
+    def test_nan_history_has_no_state(self, sample_daily_data):
+        df = sample_daily_data.copy()
+        df.loc[df.index[10], "close"] = np.nan
+        state = IndicatorState.from_indicators(
+            compute_indicators(df), "d", end=50, tail_size=60, percentile_window=2520
+        )
+        assert state is None
+
+    def test_pending_closes(self, sample_daily_data):
+        df = sample_daily_data
+        close = df["close"].to_numpy()
+        last_date = str(df["date"].iloc[-4])
+        pending = pending_closes(df, last_date, close[:-3], count=len(df) - 3)
+        np.testing.assert_array_equal(pending, close[-3:-1])
+
+    def test_pending_closes_rejects_adjusted_history(self, sample_daily_data):
+        df = sample_daily_data.copy()
+        tail = df["close"].to_numpy()[:-2].copy()
+        df["close"] *= 0.95
+        assert pending_closes(df, str(df["date"].iloc[-3]), tail) is None
+        assert pending_closes(df, "1900-01-01", tail) is None
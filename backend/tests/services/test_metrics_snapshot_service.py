@@ -0,0 +1,78 @@
+"""
+Tests for MetricsSnapshotService - 按交易日版本化的收盘指标快照
+"""
+
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.services import metrics_snapshot_service as snapshot_module
+from app.services.metrics_snapshot_service import MetricsSnapshotService
+
+_TZ = ZoneInfo("Asia/Shanghai")
+
+
+def _metrics(data_date="2024-06-07"):
+    return {
+        "temperature": {"score": 55},
+        "daily_trend": {"ma_alignment": "bullish"},
+        "weekly_trend": {"direction": "up"},
+        "data_date": data_date,
+    }
+
+
+@pytest.fixture
+def service():
+    return MetricsSnapshotService()
+
+
+class TestCurrentTradingDate:
+    @pytest.mark.parametrize("now, expected", [
+        (datetime(2024, 6, 7, 15, 30, tzinfo=_TZ), "2024-06-07"),   # 周五收盘后
+        (datetime(2024, 6, 7, 10, 0, tzinfo=_TZ), None),            # 交易时段
+        (datetime(2024, 6, 7, 9, 0, tzinfo=_TZ), "2024-06-06"),     # 开盘前
+        (datetime(2024, 6, 10, 8, 0, tzinfo=_TZ), "2024-06-07"),    # 周一开盘前
+        (datetime(2024, 6, 9, 12, 0, tzinfo=_TZ), "2024-06-07"),    # 周日
+    ])
+    def test_trading_date(self, service, now, expected):
+        assert service.current_trading_date(now) == expected
+
+    def test_converts_timezone(self, service):
+        # UTC 07:30 = 北京时间 15:30
+        now = datetime(2024, 6, 7, 7, 30, tzinfo=ZoneInfo("UTC"))
+        assert service.current_trading_date(now) == "2024-06-07"
+
+
+class TestSnapshot:
+    def test_roundtrip(self, service, isolated_metrics_snapshot):
+        assert service.put("510300", _metrics(), "2024-06-07")
+        assert service.get("510300", "2024-06-07") == _metrics()
+        entry = service.get_entry("510300", "2024-06-07")
+        assert entry["data_date"] == "2024-06-07"
+        assert entry["version"] == snapshot_module.SNAPSHOT_VERSION
+
+    def test_other_trading_date_is_stale(self, service):
+        service.put("510300", _metrics(), "2024-06-06")
+        assert service.get("510300", "2024-06-07") is None
+
+    def test_version_change_invalidates(self, service, monkeypatch):
+        service.put("510300", _metrics(), "2024-06-07")
+        monkeypatch.setattr(snapshot_module, "SNAPSHOT_VERSION", snapshot_module.SNAPSHOT_VERSION + 1)
+        assert service.get("510300", "2024-06-07") is None
+
+    def test_require_data_date(self, service):
+        """数据滞后（data_date 早于交易日）的快照不供接口使用"""
+        service.put("510300", _metrics("2024-06-06"), "2024-06-07")
+        assert service.get("510300", "2024-06-07") is not None
+        assert service.get("510300", "2024-06-07", require_data_date=True) is None
+
+    def test_no_snapshot_during_session(self, service, monkeypatch):
+        monkeypatch.setattr(service, "current_trading_date", lambda now=None: None)
+        assert not service.put("510300", _metrics())
+        assert service.get_many(["510300"]) == {}
+
+    def test_get_many_and_put_many(self, service):
+        written = service.put_many({"510300": _metrics(), "510500": _metrics()}, "2024-06-07")
+        assert written == 2
+        assert set(service.get_many(["510300", "510500", "159915"], "2024-06-07")) == {"510300", "510500"}
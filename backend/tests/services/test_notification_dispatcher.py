@@ -0,0 +1,194 @@
+"""
+Tests for NotificationDispatcher (限速并发发送) 与 TelegramBotPool（Bot 连接复用）
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+from telegram.error import Forbidden, RetryAfter
+
+from app.core.config import settings
+from app.services.notification_dispatcher import NotificationDispatcher
+from app.services.notification_service import TelegramBotPool, TelegramNotificationService
+
+
+@pytest.fixture
+def fast_limits():
+    """缩短限速与退避，保持测试快速"""
+    with patch.object(settings, "TELEGRAM_CHAT_INTERVAL", 0.05), \
+         patch.object(settings, "TELEGRAM_BOT_RATE", 1000.0), \
+         patch.object(settings, "TELEGRAM_RETRY_BACKOFF", 0.01), \
+         patch.object(settings, "TELEGRAM_MAX_RETRIES", 3), \
+         patch.object(settings, "TELEGRAM_MAX_CONCURRENCY", 4):
+        yield
+
+
+class _RecordingSender:
+    """记录每次发送的时间与并发数，可按 chat_id 注入失败"""
+
+    def __init__(self, delay: float = 0.02, failures=None):
+        self.delay = delay
+        self.failures = failures or {}
+        self.calls = []
+        self.running = 0
+        self.peak = 0
+
+    async def __call__(self, bot_token, chat_id, message):
+        self.calls.append((chat_id, time.monotonic()))
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            pending = self.failures.get(chat_id)
+            if pending:
+                raise pending.pop(0)
+        finally:
+            self.running -= 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_sends_bounded(fast_limits):
+    sender = _RecordingSender()
+    dispatcher = NotificationDispatcher(sender=sender)
+    results = await asyncio.gather(
+        *(dispatcher.send("token", str(chat), "hi") for chat in range(20))
+    )
+    assert all(results)
+    assert 1 < sender.peak <= 4
+    assert dispatcher.stats()["sent"] == 20
+    assert dispatcher.stats()["throughput_per_min"] == 20
+
+
+@pytest.mark.asyncio
+async def test_same_chat_spaced_by_interval(fast_limits):
+    sender = _RecordingSender(delay=0)
+    dispatcher = NotificationDispatcher(sender=sender)
+    await asyncio.gather(*(dispatcher.send("token", "chat", str(i)) for i in range(4)))
+    times = [t for _, t in sender.calls]
+    assert all(b - a >= 0.045 for a, b in zip(times, times[1:]))
+
+
+@pytest.mark.asyncio
+async def test_retry_does_not_block_other_chats(fast_limits):
+    """失败消息退避重试期间，其他会话的消息照常发送"""
+    sender = _RecordingSender(failures={"bad": [ConnectionError("reset"), ConnectionError("reset")]})
+    dispatcher = NotificationDispatcher(sender=sender)
+
+    with patch.object(settings, "TELEGRAM_RETRY_BACKOFF", 0.2):
+        results = await asyncio.gather(
+            dispatcher.send("token", "bad", "x"),
+            *(dispatcher.send("token", f"ok{i}", "x") for i in range(3)),
+        )
+
+    assert all(results)
+    bad_calls = [t for chat, t in sender.calls if chat == "bad"]
+    ok_calls = [t for chat, t in sender.calls if chat != "bad"]
+    assert len(bad_calls) == 3
+    assert max(ok_calls) < bad_calls[1]
+    assert dispatcher.stats()["retries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_retries_exhausted_raises(fast_limits):
+    sender = _RecordingSender(failures={"bad": [ConnectionError("down")] * 10})
+    dispatcher = NotificationDispatcher(sender=sender)
+    with patch.object(settings, "TELEGRAM_MAX_RETRIES", 2), pytest.raises(ConnectionError):
+        await dispatcher.send("token", "bad", "x")
+    assert len(sender.calls) == 3
+    assert dispatcher.stats()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_permanent_error_not_retried(fast_limits):
+    """被用户屏蔽（Forbidden，包装为 ValueError 的 __cause__）不重试"""
+    async def blocked(bot_token, chat_id, message):
+        try:
+            raise Forbidden("bot was blocked by the user")
+        except Forbidden as e:
+            raise ValueError(f"Telegram API 错误: {e}") from e
+
+    dispatcher = NotificationDispatcher(sender=blocked)
+    with pytest.raises(ValueError):
+        await dispatcher.send("token", "chat", "x")
+    assert dispatcher.stats()["retries"] == 0
+
+
+def test_retry_after_delay():
+    assert NotificationDispatcher._retry_delay(RetryAfter(7), attempt=1) == 7.0
+    with patch.object(settings, "TELEGRAM_RETRY_BACKOFF", 2.0):
+        assert NotificationDispatcher._retry_delay(ConnectionError(), attempt=3) == 8.0
+
+
+# ---- 本地模拟 Telegram Bot API ----
+
+class _FakeTelegramHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        method = self.path.rsplit("/", 1)[-1]
+        type(self).requests.append(method)
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "fake", "username": "fake_bot"}
+        else:
+            result = {
+                "message_id": len(type(self).requests),
+                "date": int(time.time()),
+                "chat": {"id": 42, "type": "private"},
+            }
+        body = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_telegram():
+    _FakeTelegramHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeTelegramHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/bot", _FakeTelegramHandler.requests
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.asyncio
+async def test_bot_pool_reuses_initialized_bot(fake_telegram):
+    base_url, requests = fake_telegram
+    pool = TelegramBotPool()
+    with patch.object(settings, "TELEGRAM_API_BASE_URL", base_url), \
+         patch("app.services.notification_service.telegram_bot_pool", pool):
+        for i in range(3):
+            await TelegramNotificationService.send_message("123:abc", "42", f"msg {i}")
+        await pool.close()
+
+    assert requests.count("getMe") == 1
+    assert requests.count("sendMessage") == 3
+
+
+@pytest.mark.asyncio
+async def test_bot_pool_evicts_least_recent(fake_telegram):
+    base_url, _ = fake_telegram
+    pool = TelegramBotPool(max_size=2)
+    with patch.object(settings, "TELEGRAM_API_BASE_URL", base_url):
+        first = await pool.get("1:a")
+        await pool.get("2:b")
+        assert await pool.get("1:a") is first
+        await pool.get("3:c")
+        assert len(pool) == 2
+        assert await pool.get("1:a") is first
+        await pool.close()
@@ -0,0 +1,70 @@
+"""
+Tests for panel_service - 多只 ETF 批量温度 / 日趋势与逐只计算的一致性
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.panel_service import ClosePanel, panel_service
+from app.services.temperature_service import temperature_service
+from app.services.trend_service import trend_service
+from tests.assertions import assert_same_temperature, assert_same_trend
+
+
+@pytest.fixture
+def frames(sample_long_history, sample_daily_data, bullish_trend_data, bearish_trend_data):
+    return {
+        "510300": sample_long_history,
+        "159915": sample_daily_data,
+        "512880": bullish_trend_data,
+        "512000": bearish_trend_data,
+        "588000": sample_daily_data.iloc[:30].reset_index(drop=True),
+    }
+
+
+class TestClosePanel:
+    def test_right_aligned_with_nan_padding(self):
+        panel = ClosePanel.from_frames({
+            "A": pd.DataFrame({"date": ["d1", "d2", "d3"], "close": [1.0, 2.0, 3.0]}),
+            "B": pd.DataFrame({"date": ["d2", "d3"], "close": [5.0, np.nan]}),
+            "C": pd.DataFrame(),
+        })
+        assert panel.codes == ["A", "B"]
+        assert panel.last_dates == ["d3", "d3"]
+        np.testing.assert_array_equal(panel.lengths, [3, 1])
+        np.testing.assert_array_equal(panel.closes[1], [np.nan, np.nan, 5.0])
+
+
+class TestPanelService:
+    def test_temperature_matches_per_code(self, frames):
+        computed = panel_service.compute(frames)
+        for code, df in frames.items():
+            assert_same_temperature(
+                computed[code]["temperature"], temperature_service.calculate_temperature(df)
+            )
+
+    def test_daily_trend_matches_per_code(self, frames):
+        computed = panel_service.compute(frames)
+        for code, df in frames.items():
+            assert_same_trend(computed[code]["daily_trend"], trend_service.get_daily_trend(df))
+
+    def test_nan_closes_match_per_code(self, sample_daily_data):
+        df = sample_daily_data.copy()
+        df.loc[df.index[50], "close"] = np.nan
+        computed = panel_service.compute({"510300": df, "159915": sample_daily_data})
+        assert_same_temperature(
+            computed["510300"]["temperature"], temperature_service.calculate_temperature(df)
+        )
+
+    def test_short_history(self, sample_daily_data):
+        computed = panel_service.compute({
+            "510300": sample_daily_data.iloc[:10],
+            "159915": sample_daily_data.iloc[:3],
+        })
+        assert computed["510300"]["temperature"] is None
+        assert computed["510300"]["daily_trend"] is not None
+        assert computed["159915"]["daily_trend"] is None
+
+    def test_empty(self):
+        assert panel_service.compute({}) == {}
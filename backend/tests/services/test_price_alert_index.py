@@ -0,0 +1,81 @@
+"""
+Tests for PriceAlertIndex（到价提醒常驻索引）
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.price_alert_index import PriceAlertIndex
+
+
+def _alert(alert_id, code, direction, target, is_triggered=False):
+    return SimpleNamespace(
+        id=alert_id, etf_code=code, direction=direction,
+        target_price=target, is_triggered=is_triggered,
+    )
+
+
+@pytest.fixture
+def index():
+    idx = PriceAlertIndex()
+    idx.load([
+        _alert(1, "510300", "above", 4.00),
+        _alert(2, "510300", "above", 4.20),
+        _alert(3, "510300", "below", 3.50),
+        _alert(4, "510300", "below", 3.30),
+        _alert(5, "510500", "above", 6.10),
+    ])
+    return idx
+
+
+class TestMatch:
+    def test_above_matches_prefix(self, index):
+        assert index.match({"510300": 4.10}) == {1}
+        assert index.match({"510300": 4.25}) == {1, 2}
+
+    def test_below_matches_suffix(self, index):
+        assert index.match({"510300": 3.40}) == {3}
+        assert index.match({"510300": 3.20}) == {3, 4}
+
+    def test_epsilon_tolerance(self, index):
+        assert index.match({"510300": 3.99995}) == {1}
+        assert index.match({"510300": 3.50005}) == {3}
+        assert index.match({"510300": 3.9998}) == set()
+
+    def test_ignores_unknown_codes_and_missing_prices(self, index):
+        assert index.match({"159915": 1.0, "510500": None, "510300": 0}) == set()
+
+    def test_many_codes(self, index):
+        prices = {f"{i:06d}": 1.0 for i in range(100)}
+        prices["510500"] = 6.2
+        assert index.match(prices) == {5}
+
+
+class TestMutations:
+    def test_pop_matches_removes(self, index):
+        assert index.pop_matches({"510300": 4.25}) == {1, 2}
+        assert index.pop_matches({"510300": 4.25}) == set()
+        assert 1 not in index
+        assert len(index) == 3
+
+    def test_add_and_remove(self, index):
+        index.add(_alert(6, "159915", "below", 2.0))
+        assert index.match({"159915": 1.9}) == {6}
+        assert index.remove([6, 999]) == 1
+        assert "159915" not in index.codes()
+
+    def test_add_replaces_existing_entry(self, index):
+        index.add(_alert(1, "510300", "above", 5.00))
+        assert index.match({"510300": 4.50}) == {2}
+        assert len(index) == 5
+
+    def test_add_ignores_triggered(self, index):
+        index.add(_alert(7, "510300", "above", 1.0, is_triggered=True))
+        assert 7 not in index
+
+    def test_writes_ignored_before_load(self):
+        idx = PriceAlertIndex()
+        idx.add(_alert(1, "510300", "above", 4.0))
+        assert not idx.is_loaded
+        assert len(idx) == 0
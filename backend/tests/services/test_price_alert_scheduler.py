@@ -1,12 +1,49 @@
 """到价提醒调度器集成测试"""
+import asyncio
 import pytest
 from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from unittest.mock import AsyncMock, patch
 from sqlmodel import Session
 
-from app.models.price_alert import PriceAlert
+from app.core.cache import ETFCacheManager
+from app.models.price_alert import PriceAlert, PriceAlertCreate
+from app.services.akshare_service import AkShareService
+from app.services.alert_scheduler import AlertScheduler, is_trading_hours
+from app.services.price_alert_index import PriceAlertIndex
 from app.services.price_alert_service import PriceAlertService
 
 
+@pytest.fixture
+def trading_hours():
+    with patch("app.services.alert_scheduler.is_trading_hours", return_value=True):
+        yield
+
+
+@pytest.fixture
+def alert_index(test_engine):
+    """独立的索引实例，调度器使用测试数据库"""
+    index = PriceAlertIndex()
+    with patch("app.services.alert_scheduler.price_alert_index", index), \
+         patch("app.services.price_alert_service.price_alert_index", index), \
+         patch("app.services.alert_scheduler.engine", test_engine):
+        yield index
+
+
+def _make_alert(session, user, code, target, direction):
+    alert = PriceAlert(
+        user_id=user.id,
+        etf_code=code,
+        etf_name=code,
+        target_price=target,
+        direction=direction,
+    )
+    session.add(alert)
+    session.commit()
+    session.refresh(alert)
+    return alert
+
+
 class TestPriceAlertSchedulerIntegration:
     """测试到价提醒在调度器中的检查和触发"""
 
@@ -83,3 +120,172 @@ class TestPriceAlertSchedulerIntegration:
         # 近期记录应保留
         remaining = test_session.get(PriceAlert, recent.id)
         assert remaining is not None
+
+
+class TestPriceAlertIndexScheduling:
+    """测试索引驱动的到价提醒触发"""
+
+    @pytest.mark.asyncio
+    async def test_quote_refresh_fires_matched_alerts(self, test_session, regular_user, alert_index, trading_hours):
+        hit = _make_alert(test_session, regular_user, "510300", 3.50, "below")
+        miss = _make_alert(test_session, regular_user, "510300", 4.50, "above")
+
+        scheduler = AlertScheduler()
+        assert scheduler._load_price_alert_index()
+        scheduler._loop = asyncio.get_running_loop()
+
+        cache = ETFCacheManager()
+        cache.set_etf_list([{"code": "510300", "price": 3.60}, {"code": "510500", "price": 6.0}], live=True)
+        cache.changes.subscribe(scheduler._on_quotes_changed)
+
+        with patch("app.services.alert_scheduler.etf_cache", cache), \
+             patch.object(scheduler, "_send_price_alert_notification", new=AsyncMock()) as send:
+            # 在刷新线程中更新行情，变更流回调触发提醒
+            await asyncio.to_thread(
+                cache.set_etf_list,
+                [{"code": "510300", "price": 3.48}, {"code": "510500", "price": 6.0}],
+                True,
+            )
+            for _ in range(50):
+                if send.await_count:
+                    break
+                await asyncio.sleep(0.01)
+
+        send.assert_awaited_once()
+        assert [a.id for a in send.await_args.args[2]] == [hit.id]
+        test_session.refresh(hit)
+        assert hit.is_triggered is True
+        assert hit.id not in alert_index
+        assert miss.id in alert_index
+
+    @pytest.mark.asyncio
+    async def test_fallback_list_load_fires_no_alerts(self, test_session, regular_user, alert_index, trading_hours):
+        """在线数据源全部失败时加载的兜底 JSON 价格（510300 为 3.52）不触发提醒"""
+        alert = _make_alert(test_session, regular_user, "510300", 3.55, "below")
+
+        scheduler = AlertScheduler()
+        assert scheduler._load_price_alert_index()
+        scheduler._loop = asyncio.get_running_loop()
+
+        cache = ETFCacheManager()
+        cache.set_etf_list([{"code": "510300", "name": "沪深300ETF", "price": 3.60}], live=True)
+        cache.changes.subscribe(scheduler._on_quotes_changed)
+
+        down = RuntimeError("source down")
+        with patch("app.services.alert_scheduler.etf_cache", cache), \
+             patch("app.services.akshare_service.etf_cache", cache), \
+             patch("app.services.akshare_service.disk_cache") as disk, \
+             patch.object(AkShareService, "_fetch_etfs_sina", side_effect=down), \
+             patch.object(AkShareService, "_fetch_etfs_eastmoney", side_effect=down), \
+             patch.object(AkShareService, "_fetch_etfs_ths", side_effect=down), \
+             patch("app.services.admin_alert_service.admin_alert_service.send_admin_alert_sync"), \
+             patch.object(scheduler, "_send_price_alert_notification", new=AsyncMock()) as send:
+            disk.get.return_value = None
+            await asyncio.to_thread(AkShareService._refresh_task)
+            await asyncio.sleep(0.05)
+
+        assert cache.get_etf_info("510300")["price"] == 3.52
+        assert cache.is_live is False
+        send.assert_not_awaited()
+        assert alert.id in alert_index
+        test_session.refresh(alert)
+        assert alert.is_triggered is False
+
+    @pytest.mark.asyncio
+    async def test_full_and_off_hours_events_fire_no_alerts(self, test_session, regular_user, alert_index):
+        alert = _make_alert(test_session, regular_user, "510300", 3.50, "below")
+
+        scheduler = AlertScheduler()
+        assert scheduler._load_price_alert_index()
+        scheduler._loop = asyncio.get_running_loop()
+
+        cache = ETFCacheManager()
+        cache.changes.subscribe(scheduler._on_quotes_changed)
+
+        with patch("app.services.alert_scheduler.etf_cache", cache), \
+             patch.object(scheduler, "_send_price_alert_notification", new=AsyncMock()) as send:
+            # 首次加载是全量事件
+            with patch("app.services.alert_scheduler.is_trading_hours", return_value=True):
+                cache.set_etf_list([{"code": "510300", "price": 3.40}], live=True)
+            # 盘后的在线刷新
+            with patch("app.services.alert_scheduler.is_trading_hours", return_value=False):
+                cache.set_etf_list([{"code": "510300", "price": 3.30}], live=True)
+            await asyncio.sleep(0.05)
+
+        send.assert_not_awaited()
+        assert alert.id in alert_index
+
+    def test_is_trading_hours(self):
+        tz = ZoneInfo("Asia/Shanghai")
+        assert is_trading_hours(datetime(2024, 6, 3, 10, 0, tzinfo=tz))
+        assert is_trading_hours(datetime(2024, 6, 3, 14, 59, tzinfo=tz))
+        assert not is_trading_hours(datetime(2024, 6, 3, 9, 20, tzinfo=tz))
+        assert not is_trading_hours(datetime(2024, 6, 3, 12, 0, tzinfo=tz))
+        assert not is_trading_hours(datetime(2024, 6, 3, 15, 30, tzinfo=tz))
+        assert not is_trading_hours(datetime(2024, 6, 1, 10, 0, tzinfo=tz))
+
+    @pytest.mark.asyncio
+    async def test_stale_index_entry_not_triggered(self, test_session, regular_user, alert_index):
+        """索引命中但数据库中已触发的提醒不重复通知"""
+        alert = _make_alert(test_session, regular_user, "510300", 3.50, "below")
+        alert_index.load([alert])
+        alert.is_triggered = True
+        test_session.commit()
+
+        scheduler = AlertScheduler()
+        with patch.object(scheduler, "_send_price_alert_notification", new=AsyncMock()) as send:
+            await scheduler._fire_price_alerts(alert_index.pop_matches({"510300": 3.40}), {"510300": 3.40})
+        send.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_failed_trigger_restores_index(self, test_session, regular_user, alert_index):
+        alert = _make_alert(test_session, regular_user, "510300", 3.50, "below")
+        alert_index.load([alert])
+
+        scheduler = AlertScheduler()
+        with patch.object(PriceAlertService, "trigger_alerts", side_effect=RuntimeError("db locked")):
+            await scheduler._fire_price_alerts(alert_index.pop_matches({"510300": 3.40}), {"510300": 3.40})
+        assert alert.id in alert_index
+
+    @pytest.mark.asyncio
+    async def test_check_fetches_only_indexed_codes(self, test_session, regular_user, alert_index):
+        alert = _make_alert(test_session, regular_user, "510500", 6.10, "above")
+
+        scheduler = AlertScheduler()
+        cache = ETFCacheManager()
+        cache.is_live = True
+        with patch("app.services.alert_scheduler.ak_service") as ak, \
+             patch("app.services.alert_scheduler.etf_cache", cache), \
+             patch.object(scheduler, "_send_price_alert_notification", new=AsyncMock()) as send:
+            ak.get_etf_info.return_value = {"code": "510500", "price": 6.12}
+            await scheduler._check_price_alerts(reload_index=True)
+
+        ak.get_etf_info.assert_called_once_with("510500")
+        send.assert_awaited_once()
+        test_session.refresh(alert)
+        assert alert.triggered_price == 6.12
+
+    @pytest.mark.asyncio
+    async def test_check_skipped_when_quotes_not_live(self, test_session, regular_user, alert_index):
+        alert = _make_alert(test_session, regular_user, "510500", 6.10, "above")
+
+        scheduler = AlertScheduler()
+        with patch("app.services.alert_scheduler.ak_service") as ak, \
+             patch("app.services.alert_scheduler.etf_cache", ETFCacheManager()), \
+             patch.object(scheduler, "_send_price_alert_notification", new=AsyncMock()) as send:
+            ak.get_etf_info.return_value = {"code": "510500", "price": 6.12}
+            await scheduler._check_price_alerts(reload_index=True)
+
+        send.assert_not_awaited()
+        assert alert.id in alert_index
+
+    def test_service_writes_through(self, test_session, regular_user, alert_index):
+        alert_index.load([])
+        alert = PriceAlertService.create_alert(
+            test_session, regular_user.id,
+            PriceAlertCreate(etf_code="510300", etf_name="沪深300ETF", target_price=3.50),
+            current_price=3.80,
+        )
+        assert alert.id in alert_index
+        PriceAlertService.delete_alert(test_session, alert.id, regular_user.id)
+        assert alert.id not in alert_index
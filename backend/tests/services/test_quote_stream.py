@@ -0,0 +1,128 @@
+"""
+QuoteStreamHub 单元测试
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from app.core.cache import ETFCacheManager
+from app.services.quote_stream import QuoteStreamHub, encode_event
+
+
+def _etfs(price_300=3.85, price_500=5.12):
+    return [
+        {"code": "510300", "name": "沪深300ETF", "price": price_300, "change_pct": 0.5, "tags": []},
+        {"code": "510500", "name": "中证500ETF", "price": price_500, "change_pct": -0.4, "tags": []},
+    ]
+
+
+def _parse(frames: bytes):
+    """解析 SSE 帧为 [(event, id, data)]"""
+    events = []
+    for block in frames.decode("utf-8").strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], fields.get("id"), json.loads(fields["data"])))
+    return events
+
+
+@pytest.fixture
+def cache():
+    cache = ETFCacheManager()
+    cache.set_etf_list(_etfs())
+    return cache
+
+
+@pytest.fixture
+def hub(cache):
+    hub = QuoteStreamHub(cache)
+    yield hub
+    hub.stop()
+
+
+async def _drain(subscription) -> bytes:
+    await asyncio.sleep(0)
+    chunks = []
+    while not subscription.queue.empty():
+        chunks.append(subscription.queue.get_nowait())
+    return b"".join(chunks)
+
+
+def test_encode_event():
+    frame = encode_event("quote", {"code": "510300", "name": "沪深300ETF"}, 7)
+    assert frame == 'id: 7\nevent: quote\ndata: {"code":"510300","name":"沪深300ETF"}\n\n'.encode("utf-8")
+
+
+@pytest.mark.asyncio
+async def test_snapshot_frame(hub):
+    events = _parse(hub.snapshot_frame(["510500", "510300"]))
+    assert events[0][0] == "snapshot"
+    assert events[0][1] == "1"
+    assert [item["code"] for item in events[0][2]["items"]] == ["510500", "510300"]
+    assert "tags" not in events[0][2]["items"][0]
+
+
+@pytest.mark.asyncio
+async def test_pushes_only_subscribed_changes(cache, hub):
+    sub_300 = hub.subscribe(["510300"])
+    sub_500 = hub.subscribe(["510500"])
+
+    await asyncio.to_thread(cache.set_etf_list, _etfs(price_300=3.9))
+
+    events = _parse(await _drain(sub_300))
+    assert [(e[0], e[1], e[2]["price"]) for e in events] == [("quote", "2", 3.9)]
+    assert await _drain(sub_500) == b""
+
+
+@pytest.mark.asyncio
+async def test_frame_encoded_once_per_code(cache, hub):
+    subs = [hub.subscribe(["510300", "510500"]) for _ in range(5)]
+
+    cache.set_etf_list(_etfs(price_300=3.9, price_500=5.2))
+
+    payloads = {await _drain(sub) for sub in subs}
+    assert len(payloads) == 1
+    assert [e[2]["code"] for e in _parse(payloads.pop())] == ["510300", "510500"]
+    stats = hub.stats()
+    assert stats["frames_encoded"] == 2
+    assert stats["frames_delivered"] == 10
+
+
+@pytest.mark.asyncio
+async def test_removed_code(cache, hub):
+    subscription = hub.subscribe(["510500"])
+
+    cache.set_etf_list(_etfs()[:1])
+
+    assert _parse(await _drain(subscription)) == [("removed", "2", {"code": "510500"})]
+
+
+@pytest.mark.asyncio
+async def test_unsubscribe(cache, hub):
+    subscription = hub.subscribe(["510300"])
+    hub.unsubscribe(subscription)
+
+    cache.set_etf_list(_etfs(price_300=3.9))
+
+    assert await _drain(subscription) == b""
+    assert hub.stats()["connections"] == 0
+    assert hub.stats()["codes"] == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_gets_resync(cache, hub):
+    subscription = hub.subscribe(["510300"], queue_size=2)
+
+    for i in range(3):
+        cache.set_etf_list(_etfs(price_300=3.9 + i / 100))
+
+    events = _parse(await _drain(subscription))
+    assert [e[0] for e in events] == ["resync"]
+    assert hub.stats()["frames_dropped"] == 2
+
+
+@pytest.mark.asyncio
+async def test_next_frame_timeout(hub):
+    subscription = hub.subscribe(["510300"])
+    assert await subscription.next_frame(0.01) is None
@@ -0,0 +1,50 @@
+"""
+Tests for rank_index - 滑动窗口排名索引
+"""
+
+import numpy as np
+import pytest
+
+from app.services.rank_index import SortedWindow
+
+
+class TestSortedWindow:
+    def test_count_below_matches_bruteforce(self):
+        values = np.random.default_rng(0).normal(size=500)
+        window = SortedWindow(values)
+        for probe in (-10.0, -0.5, 0.0, 0.3, values[17], 10.0):
+            assert window.count_below(probe) == int((values < probe).sum())
+
+    def test_maxlen_keeps_latest_values(self):
+        window = SortedWindow(np.arange(10.0), maxlen=4)
+        assert len(window) == 4
+        np.testing.assert_array_equal(window.values, [6.0, 7.0, 8.0, 9.0])
+
+    def test_push_evicts_oldest(self):
+        rng = np.random.default_rng(1)
+        values = list(rng.normal(size=30))
+        window = SortedWindow(np.array(values), maxlen=30)
+        for value in rng.normal(size=200):
+            window = window.push(float(value))
+            values = (values + [float(value)])[-30:]
+            probe = float(rng.normal())
+            assert window.count_below(probe) == sum(v < probe for v in values)
+        np.testing.assert_array_equal(window.values, values)
+
+    def test_push_with_duplicates(self):
+        window = SortedWindow(np.array([1.0, 1.0, 2.0]), maxlen=3)
+        window = window.push(1.0)
+        assert window.count_below(1.5) == 2
+        assert window.count_below(1.0) == 0
+
+    def test_push_returns_new_window(self):
+        window = SortedWindow(np.array([1.0, 2.0]))
+        pushed = window.push(0.5)
+        assert len(window) == 2
+        assert len(pushed) == 3
+        assert pushed.count_below(1.0) == 1
+
+    def test_values_are_read_only(self):
+        window = SortedWindow(np.array([1.0, 2.0]))
+        with pytest.raises(ValueError):
+            window.values[0] = 5.0
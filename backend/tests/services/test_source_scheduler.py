@@ -0,0 +1,149 @@
+"""SourceScheduler 单元测试"""
+import math
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from app.core.metrics import DataSourceMetrics
+from app.services.source_scheduler import SourceScheduler
+
+
+def _record(metrics, name, successes=0, failures=0, latency=100.0):
+    for _ in range(successes):
+        metrics.record_success(name, latency)
+    for _ in range(failures):
+        metrics.record_failure(name, "err", 10000.0)
+
+
+class _Source:
+    def __init__(self, name):
+        self.name = name
+        self.call_count = 0
+
+    def fetch_history(self, code, start_date, end_date, adjust="qfq"):
+        self.call_count += 1
+        return pd.DataFrame({"date": ["2024-01-02"], "close": [1.0]})
+
+    def is_available(self):
+        return True
+
+
+@pytest.fixture
+def metrics():
+    return DataSourceMetrics()
+
+
+class TestScore:
+    def test_unsampled_source_not_scored(self, metrics):
+        scheduler = SourceScheduler(metrics, min_samples=5)
+        _record(metrics, "sina", successes=4)
+        assert scheduler.score("sina") is None
+        assert scheduler.score("unknown") is None
+
+    def test_all_failures_last(self, metrics):
+        scheduler = SourceScheduler(metrics, min_samples=5)
+        _record(metrics, "eastmoney", failures=5)
+        assert math.isinf(scheduler.score("eastmoney"))
+
+    def test_latency_over_success_rate(self, metrics):
+        scheduler = SourceScheduler(metrics, min_samples=5)
+        _record(metrics, "ths", successes=5, failures=5, latency=200.0)
+        # 成功延迟的 p90（分桶估计，不超过 200ms）/ 成功率 0.5；失败的超时不计入延迟
+        assert 300.0 < scheduler.score("ths") <= 400.0
+
+    def test_scores_only_its_operation(self, metrics):
+        """同名数据源的列表接口延迟不影响历史数据的排序"""
+        history = SourceScheduler(metrics, min_samples=5, operation="history")
+        for _ in range(5):
+            metrics.record_success("eastmoney", 60000.0, "list")
+            metrics.record_success("eastmoney", 200.0, "history")
+        assert history.score("eastmoney") <= 200.0
+        assert SourceScheduler(metrics, min_samples=5, operation="list").score("eastmoney") > 30000
+
+
+class TestOrder:
+    def test_cold_start_keeps_configured_order(self, metrics):
+        scheduler = SourceScheduler(metrics, explore_every=0)
+        assert scheduler.order(["sina", "eastmoney", "ths"]) == ["sina", "eastmoney", "ths"]
+
+    def test_blocked_source_demoted(self, metrics):
+        """区域性封锁的源（全部超时失败）排到最后"""
+        scheduler = SourceScheduler(metrics, explore_every=0)
+        _record(metrics, "eastmoney", failures=10)
+        _record(metrics, "sina", successes=10, latency=800.0)
+        _record(metrics, "ths", successes=10, latency=300.0)
+        assert scheduler.order(["eastmoney", "sina", "ths"]) == ["ths", "sina", "eastmoney"]
+
+    def test_unsampled_source_gets_neutral_prior(self, metrics):
+        """未积累样本的源不会越过已测得的快源，也不会排在全部失败的源之后"""
+        scheduler = SourceScheduler(metrics, explore_every=0)
+        _record(metrics, "failing", failures=10)
+        _record(metrics, "fast", successes=10, latency=100.0)
+        _record(metrics, "slow", successes=10, latency=5000.0)
+        assert scheduler.order(["failing", "new", "slow", "fast"]) == ["fast", "new", "slow", "failing"]
+        # 只有全部失败的源被测得时，未打分的源保持配置顺序排在其前
+        assert scheduler.order(["failing", "x", "y"]) == ["x", "y", "failing"]
+
+    def test_samples_counted_per_operation(self, metrics):
+        """列表接口的调用不算作历史数据的样本，也不影响其成功率"""
+        scheduler = SourceScheduler(metrics, explore_every=0, operation="history")
+        for _ in range(10):
+            metrics.record_failure("eastmoney", "blocked", 100.0, "list")
+            metrics.record_success("ths_history", 300.0, "history")
+        assert scheduler.score("eastmoney") is None
+        assert scheduler.order(["eastmoney", "ths_history"]) == ["eastmoney", "ths_history"]
+
+        for _ in range(10):
+            metrics.record_success("eastmoney", 100.0, "history")
+        assert scheduler.score("eastmoney") <= 100.0
+
+    def test_exploration_rotates_demoted_sources(self, metrics):
+        scheduler = SourceScheduler(metrics, explore_every=3)
+        _record(metrics, "a", successes=10, latency=100.0)
+        _record(metrics, "b", successes=10, latency=200.0)
+        _record(metrics, "c", failures=10)
+        names = ["a", "b", "c"]
+
+        firsts = [scheduler.order(names)[0] for _ in range(6)]
+        assert firsts == ["a", "a", "b", "a", "a", "c"]
+
+    def test_stats(self, metrics):
+        scheduler = SourceScheduler(metrics, explore_every=0)
+        _record(metrics, "a", failures=10)
+        scheduler.order(["a", "b"])
+        assert scheduler.stats() == {"order": ["b", "a"], "scores": {"a": None}, "unsampled": ["b"]}
+
+
+class TestApplied:
+    def test_history_manager_uses_order(self, metrics):
+        from app.services.datasource_manager import DataSourceManager
+
+        _record(metrics, "src1", failures=2, successes=8, latency=5000.0)
+        _record(metrics, "src2", successes=10, latency=100.0)
+        src1 = _Source("src1")
+        src2 = _Source("src2")
+        mgr = DataSourceManager(
+            sources=[src1, src2], metrics=metrics,
+            scheduler=SourceScheduler(metrics, explore_every=0),
+        )
+
+        assert mgr.fetch_history("510300", "2024-01-01", "2024-12-31") is not None
+        assert src1.call_count == 0
+        assert src2.call_count == 1
+        assert mgr.scheduler_stats()["order"] == ["src2", "src1"]
+
+    def test_etf_list_uses_order(self, metrics):
+        from app.services import akshare_service
+        from app.services.akshare_service import AkShareService
+
+        _record(metrics, "sina", failures=10)
+        scheduler = SourceScheduler(metrics, explore_every=0)
+        records = [{"code": "510300", "name": "沪深300ETF"}]
+        with patch.object(akshare_service, "etf_list_scheduler", scheduler), \
+                patch.object(akshare_service, "disk_cache"), \
+                patch.object(AkShareService, "_fetch_etfs_sina") as sina, \
+                patch.object(AkShareService, "_fetch_etfs_eastmoney", return_value=records) as em:
+            assert AkShareService.fetch_all_etfs() == records
+        sina.assert_not_called()
+        em.assert_called_once()
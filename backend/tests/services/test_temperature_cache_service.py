@@ -15,6 +15,8 @@ import pytest
 from unittest.mock import patch, MagicMock
 import pandas as pd
 
+from tests.assertions import assert_same_temperature
+
 
 class TestTemperatureCache:
     """Tests for temperature caching."""
@@ -189,3 +191,80 @@ class TestTemperatureCache:
         
         # In a bullish trend, we expect high drawdown score (close to peak)
         assert drawdown_score >= 50  # Should be reasonably high
+
+
+class TestIncrementalTemperature:
+    """Cached rolling state replaces full-history recomputation."""
+
+    def test_new_bars_advance_cached_state(self, sample_long_history, dict_disk_cache):
+        from app.services.temperature_cache_service import TemperatureCacheService
+        from app.services.temperature_service import temperature_service
+
+        service = TemperatureCacheService()
+        expected = [temperature_service.calculate_temperature(sample_long_history.iloc[:end])
+                    for end in (-3, -2, -1, None)]
+
+        with patch("app.services.temperature_cache_service.disk_cache", dict_disk_cache):
+            service.calculate_temperature("510300", sample_long_history.iloc[:-3])
+            with patch.object(
+                temperature_service, "calculate_temperature", side_effect=AssertionError
+            ):
+                results = [
+                    service.calculate_temperature("510300", sample_long_history.iloc[:end])
+                    for end in (-2, -1, None)
+                ]
+
+        for result, exp in zip(results, expected[1:]):
+            assert_same_temperature(result, exp)
+        state = dict_disk_cache["temperature:510300"]["state"]
+        assert state.count == len(sample_long_history) - 1
+        assert state.last_date == str(sample_long_history["date"].iloc[-2])
+
+    def test_skipped_days_are_caught_up(self, sample_long_history, dict_disk_cache):
+        from app.services.temperature_cache_service import TemperatureCacheService
+        from app.services.temperature_service import temperature_service
+
+        with patch("app.services.temperature_cache_service.disk_cache", dict_disk_cache):
+            service = TemperatureCacheService()
+            service.calculate_temperature("510300", sample_long_history.iloc[:-10])
+            result = service.calculate_temperature("510300", sample_long_history)
+
+        assert_same_temperature(result, temperature_service.calculate_temperature(sample_long_history))
+
+    def test_intraday_price_uses_state_without_write(self, sample_long_history, dict_disk_cache):
+        from app.services.temperature_cache_service import TemperatureCacheService
+        from app.services.temperature_service import temperature_service
+
+        service = TemperatureCacheService()
+        intraday = sample_long_history.copy()
+        intraday.loc[intraday.index[-1], "close"] *= 1.03
+
+        with patch("app.services.temperature_cache_service.disk_cache", dict_disk_cache):
+            service.calculate_temperature("510300", sample_long_history)
+            with patch.object(
+                temperature_service, "calculate_temperature", side_effect=AssertionError
+            ):
+                result = service.calculate_temperature("510300", intraday, realtime_price=1.0)
+
+        assert dict_disk_cache.set_calls == 1
+        assert_same_temperature(result, temperature_service.calculate_temperature(intraday))
+
+    def test_adjusted_history_recomputes(self, sample_long_history, dict_disk_cache):
+        """复权后历史价格整体变化，缓存状态失效并全量重算"""
+        from app.services.temperature_cache_service import TemperatureCacheService
+        from app.services.temperature_service import temperature_service
+
+        adjusted = sample_long_history.copy()
+        adjusted[["open", "high", "low", "close"]] *= 0.9
+
+        with patch("app.services.temperature_cache_service.disk_cache", dict_disk_cache):
+            service = TemperatureCacheService()
+            service.calculate_temperature("510300", sample_long_history.iloc[:-1])
+            with patch.object(
+                temperature_service, "calculate_temperature",
+                wraps=temperature_service.calculate_temperature,
+            ) as full:
+                result = service.calculate_temperature("510300", adjusted)
+
+        full.assert_called_once()
+        assert result == temperature_service.calculate_temperature(adjusted)
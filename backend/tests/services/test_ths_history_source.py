@@ -40,7 +40,7 @@ class TestParseThsResponse:
 
 
 class TestThsHistorySourceFetch:
-    @patch("app.services.ths_history_source.requests.get")
+    @patch("app.services.ths_history_source.http_client.get")
     def test_success(self, mock_get):
         mock_resp = MagicMock()
         mock_resp.status_code = 200
@@ -52,7 +52,7 @@ class TestThsHistorySourceFetch:
         assert df is not None
         assert len(df) == 2
 
-    @patch("app.services.ths_history_source.requests.get")
+    @patch("app.services.ths_history_source.http_client.get")
     def test_http_error(self, mock_get):
         mock_resp = MagicMock()
         mock_resp.status_code = 403
@@ -62,7 +62,7 @@ class TestThsHistorySourceFetch:
         source = ThsHistorySource()
         assert source.fetch_history("510300", "2024-01-01", "2024-12-31") is None
 
-    @patch("app.services.ths_history_source.requests.get")
+    @patch("app.services.ths_history_source.http_client.get")
     def test_network_exception_propagates(self, mock_get):
         """网络异常向上抛出，由 DataSourceManager 统一处理"""
         mock_get.side_effect = Exception("connection refused")
@@ -71,7 +71,7 @@ class TestThsHistorySourceFetch:
         with pytest.raises(Exception, match="connection refused"):
             source.fetch_history("510300", "2024-01-01", "2024-12-31")
 
-    @patch("app.services.ths_history_source.requests.get")
+    @patch("app.services.ths_history_source.http_client.get")
     def test_date_filtering(self, mock_get):
         """只返回 start_date ~ end_date 范围内的数据"""
         mock_resp = MagicMock()
@@ -84,3 +84,26 @@ class TestThsHistorySourceFetch:
         assert df is not None
         assert len(df) == 1
         assert df.iloc[0]["date"] == "2024-01-03"
+
+    @patch("app.services.ths_history_source.http_client.get")
+    def test_requests_only_tail_bars(self, mock_get):
+        """增量拉取时按 start_date 推算 lastN，而不是固定 last36000"""
+        mock_resp = MagicMock()
+        mock_resp.status_code = 200
+        mock_resp.text = _SAMPLE_RESPONSE
+        mock_get.return_value = mock_resp
+
+        start = (pd.Timestamp.now() - pd.Timedelta(days=20)).strftime("%Y%m%d")
+        ThsHistorySource().fetch_history("510300", start, "20500101")
+        url = mock_get.call_args[0][0]
+        assert url.endswith("/last30.js")
+
+    @patch("app.services.ths_history_source.http_client.get")
+    def test_full_fetch_clamped(self, mock_get):
+        mock_resp = MagicMock()
+        mock_resp.status_code = 200
+        mock_resp.text = _SAMPLE_RESPONSE
+        mock_get.return_value = mock_resp
+
+        ThsHistorySource().fetch_history("510300", "18000101", "20500101")
+        assert mock_get.call_args[0][0].endswith("/last36000.js")
@@ -14,6 +14,8 @@ import pytest
 from unittest.mock import patch, MagicMock
 import pandas as pd
 
+from tests.assertions import assert_same_trend
+
 
 class TestIsIntraday:
     """Tests for intraday detection logic."""
@@ -217,3 +219,50 @@ class TestWeeklyTrendCache:
         
         # Result should be the cached result
         assert result == cached_data["result"]
+
+
+class TestIncrementalDailyTrend:
+    """Daily trend is derived from the cached closes tail on new bars."""
+
+    def test_new_bars_use_cached_tail(self, sample_daily_data, dict_disk_cache):
+        from app.services.trend_cache_service import TrendCacheService
+        from app.services.trend_service import trend_service
+
+        service = TrendCacheService()
+        with patch("app.services.trend_cache_service.disk_cache", dict_disk_cache):
+            service.get_daily_trend("510300", sample_daily_data.iloc[:-5])
+            with patch.object(trend_service, "get_daily_trend", side_effect=AssertionError):
+                results = {
+                    end: service.get_daily_trend("510300", sample_daily_data.iloc[:end])
+                    for end in (-3, -2, -1, None)
+                }
+
+        for end, result in results.items():
+            assert_same_trend(result, trend_service.get_daily_trend(sample_daily_data.iloc[:end]))
+
+    def test_intraday_uses_cached_tail(self, sample_daily_data, dict_disk_cache):
+        from app.services.trend_cache_service import TrendCacheService
+        from app.services.trend_service import trend_service
+
+        intraday = sample_daily_data.copy()
+        intraday.loc[intraday.index[-1], "close"] *= 0.9
+
+        service = TrendCacheService()
+        with patch("app.services.trend_cache_service.disk_cache", dict_disk_cache):
+            service.get_daily_trend("510300", sample_daily_data)
+            cached = dict_disk_cache["daily_trend:510300"]
+            with patch.object(trend_service, "get_daily_trend", side_effect=AssertionError):
+                result = service.get_daily_trend("510300", intraday, realtime_price=1.0)
+
+        assert dict_disk_cache["daily_trend:510300"] is cached
+        assert_same_trend(result, trend_service.get_daily_trend(intraday))
+
+    def test_from_closes_matches_full_history(self, bullish_trend_data, bearish_trend_data):
+        from app.services.trend_service import trend_service
+
+        for df in (bullish_trend_data, bearish_trend_data):
+            closes = df["close"].to_numpy()
+            assert_same_trend(
+                trend_service.get_daily_trend_from_closes(closes[-61:]),
+                trend_service.get_daily_trend(df),
+            )